@@ -1,4 +1,4 @@
-from app import create_app, db
+from app import create_app, db, start_schedulers
 from app.models.property import Property
 from app.models.agent import Agent
 from app.models.user import User
@@ -34,4 +34,5 @@ if __name__ == '__main__':
                     port = 5007
     
     print(f"Starting server on port {port}")
+    start_schedulers(app)
     app.run(debug=False, host='0.0.0.0', port=port)
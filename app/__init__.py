@@ -11,12 +11,19 @@ import pymysql
 pymysql.install_as_MySQLdb()
 
 # Import extensions from the central location
-from app.extensions import db, migrate, login_manager, cache, csrf, limiter
+from app.extensions import db, migrate, login_manager, csrf, limiter
+# ``app.cache`` is the caching package; importing any of its modules rebinds that
+# name on this package, so the Flask-Caching instance is bound under another name
+from app.extensions import cache as flask_cache
 from app.security.middleware import security_middleware
 from app.security.rate_limiter import rate_limiter
 
-def create_app(config_name=None):
-    """Application factory pattern."""
+def create_app(config_name=None, overrides=None):
+    """Application factory pattern.
+    
+    ``overrides`` are applied on top of the configuration class before any
+    extension is initialized (tests use them for paths and tuning knobs).
+    """
     
     app = Flask(__name__)
     
@@ -26,12 +33,18 @@ def create_app(config_name=None):
     
     from config.config import config
     app.config.from_object(config[config_name])
+    if overrides:
+        app.config.update(overrides)
     
     # Set up logging first
     from app.logging_config import setup_logging, setup_error_handlers, log_request_start, log_request_end
     loggers = setup_logging(app)
     setup_error_handlers(app, loggers)
     
+    # Request tracing hooks go first so later hooks (rate limiting, security) run inside the trace
+    from app.tracing import tracer
+    tracer.init_app(app)
+    
     # Set up error handling
     from app.error_handling import global_error_handler, global_error_metrics
     
@@ -48,7 +61,8 @@ def create_app(config_name=None):
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
-    cache.init_app(app)
+    flask_cache.init_app(app)
+    tracer.instrument_cache(app, flask_cache)
     csrf.init_app(app)
     
     # Initialize rate limiter
@@ -56,25 +70,32 @@ def create_app(config_name=None):
     
     # Initialize custom rate limiter
     redis_client = None
-    try:
-        import redis
-        redis_client = redis.Redis(
-            host=app.config.get('REDIS_HOST', 'localhost'),
-            port=app.config.get('REDIS_PORT', 6379),
-            db=app.config.get('REDIS_DB', 0),
-            decode_responses=True
-        )
-        # Test Redis connection
-        redis_client.ping()
-        rate_limiter.redis_client = redis_client
-        app.logger.info("Rate limiter initialized with Redis backend")
-    except Exception as e:
-        app.logger.warning(f"Redis not available for rate limiting: {e}")
-        app.logger.info("Rate limiter will use in-memory backend")
-        redis_client = None
+    if app.config.get('REDIS_ENABLED', True):
+        try:
+            import redis
+            redis_client = redis.Redis(
+                host=app.config.get('REDIS_HOST', 'localhost'),
+                port=app.config.get('REDIS_PORT', 6379),
+                db=app.config.get('REDIS_DB', 0),
+                decode_responses=True
+            )
+            # Test Redis connection
+            redis_client.ping()
+            rate_limiter.redis_client = redis_client
+            app.logger.info("Rate limiter initialized with Redis backend")
+        except Exception as e:
+            app.logger.warning(f"Redis not available for rate limiting: {e}")
+            app.logger.info("Rate limiter will use in-memory backend")
+            redis_client = None
+    else:
+        app.logger.info("Redis disabled (REDIS_ENABLED); rate limiter will use in-memory backend")
     
     rate_limiter.init_app(app)
     
+    # Blocklist and penalty token bucket run before abuse detection's pattern analysis
+    from app.security.enhanced_integration import enhanced_security
+    enhanced_security.init_app(app)
+    
     # Initialize abuse detection system
     from app.security.abuse_detection import init_abuse_detection
     try:
@@ -83,6 +104,26 @@ def create_app(config_name=None):
     except Exception as e:
         app.logger.warning(f"Abuse detection system initialization failed: {e}")
     
+    # Size the security verdict cache and share it across workers via Redis
+    from app.security.verdict_cache import verdict_cache
+    verdict_cache.configure(
+        maxsize=app.config.get('SECURITY_VERDICT_CACHE_SIZE', verdict_cache.DEFAULT_MAXSIZE),
+        ttl=app.config.get('SECURITY_VERDICT_CACHE_TTL', verdict_cache.DEFAULT_TTL),
+        redis_client=redis_client if app.config.get('SECURITY_VERDICT_CACHE_SHARED', True) else None
+    )
+    
+    # Size the price prediction cache (shared through the Flask cache)
+    from app.services.prediction_cache import prediction_cache
+    prediction_cache.configure(
+        maxsize=app.config.get('PREDICTION_CACHE_SIZE', prediction_cache.DEFAULT_MAXSIZE),
+        ttl=app.config.get('PREDICTION_CACHE_TTL', prediction_cache.DEFAULT_TTL),
+        shared=app.config.get('PREDICTION_CACHE_SHARED', True)
+    )
+    
+    # Rebuild the homepage and economic snapshots in the background, in serving processes only
+    if app.config.get('START_SCHEDULERS'):
+        start_schedulers(app)
+    
     # Initialize API key rate limiter
     from app.security.api_key_limiter import get_api_key_limiter
     try:
@@ -167,6 +208,31 @@ def create_app(config_name=None):
         
         return health_status, 200 if health_status['status'] == 'healthy' else 503
     
+    # Latency histograms and logging pipeline counters (Prometheus text, or JSON with ?format=json)
+    @app.route('/metrics')
+    def metrics():
+        from app.logging_config import get_log_pipeline_stats
+        log_stats = get_log_pipeline_stats()
+        if request.args.get('format') == 'json':
+            return {**tracer.get_metrics(), 'logging': log_stats}
+        
+        lines = [tracer.render_prometheus().rstrip('\n')]
+        if log_stats:
+            lines.append('# TYPE nextproperty_log_queue_size gauge')
+            lines.append(f"nextproperty_log_queue_size {log_stats['queue_size']}")
+            lines.append('# TYPE nextproperty_log_records_written_total counter')
+            lines.append(f"nextproperty_log_records_written_total {log_stats['written']}")
+            lines.append('# TYPE nextproperty_log_records_dropped_total counter')
+            for route, count in sorted(log_stats['dropped'].items()):
+                lines.append(f'nextproperty_log_records_dropped_total{{route="{route}"}} {count}')
+            lines.append('# TYPE nextproperty_log_records_bypassed_total counter')
+            for route, count in sorted(log_stats['bypassed'].items()):
+                lines.append(f'nextproperty_log_records_bypassed_total{{route="{route}"}} {count}')
+            lines.append('# TYPE nextproperty_access_log_sampled_out_total counter')
+            for status_class, count in sorted(log_stats['sampled_out'].items()):
+                lines.append(f'nextproperty_access_log_sampled_out_total{{status_class="{status_class}"}} {count}')
+        return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    
     # Register blueprints
     from app.routes.main import bp as main_bp
     app.register_blueprint(main_bp)
@@ -283,3 +349,11 @@ def create_app(config_name=None):
     register_cli_commands(app)
     
     return app
+
+
+def start_schedulers(app):
+    """Start the homepage and economic snapshot rebuild threads (an interval of 0 disables)."""
+    from app.services.homepage_snapshot import homepage_snapshot
+    from app.services.economic_snapshot import economic_snapshot
+    homepage_snapshot.start_scheduler(app)
+    economic_snapshot.start_scheduler(app)
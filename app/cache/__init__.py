@@ -15,6 +15,7 @@ from .cache_decorators import (
     invalidate_cache_pattern
 )
 from .cache_warming import CacheWarmer
+from .local_cache import LocalTTLCache
 
 __all__ = [
     'CacheManager',
@@ -26,5 +27,6 @@ __all__ = [
     'cache_property_data',
     'cache_market_data',
     'invalidate_cache_pattern',
-    'CacheWarmer'
+    'CacheWarmer',
+    'LocalTTLCache'
 ]
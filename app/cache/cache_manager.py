@@ -168,13 +168,20 @@ class CacheManager:
             default_ttl: Default TTL in seconds
             key_prefix: Prefix for all cache keys
         """
-        self.redis_url = redis_url or current_app.config.get(
-            'REDIS_URL', 'redis://localhost:6379/0'
-        )
+        self._redis_url = redis_url
         self.default_ttl = default_ttl
         self.key_prefix = key_prefix
         self._redis = None
     
+    @property
+    def redis_url(self) -> str:
+        """Redis URL, resolved from app config on first use."""
+        if self._redis_url is None:
+            self._redis_url = current_app.config.get(
+                'REDIS_URL', 'redis://localhost:6379/0'
+            )
+        return self._redis_url
+    
     @property
     def redis(self) -> redis.Redis:
         """Get Redis connection (lazy loading)."""
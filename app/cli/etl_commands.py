@@ -97,6 +97,28 @@ def import_data(file_path, data_type, batch_size, resume_from, validation_level,
         
         click.echo("\n✅ Import completed successfully!")
         
+        if not dry_run and data_type == 'property':
+            from app.services.homepage_snapshot import homepage_snapshot
+            try:
+                snapshot = homepage_snapshot.refresh()
+                click.echo(f"✓ Homepage snapshot v{snapshot['version']} rebuilt")
+            except Exception as e:
+                click.echo(f"⚠️  Homepage snapshot rebuild failed: {str(e)}")
+        
+        if not dry_run and data_type == 'economic':
+            from app.services.economic_snapshot import economic_snapshot
+            from app.services.economic_timeseries import economic_timeseries
+            try:
+                series = economic_timeseries.build()
+                click.echo(f"✓ {series['series']} economic series rebuilt")
+            except Exception as e:
+                click.echo(f"⚠️  Economic series rebuild failed: {str(e)}")
+            try:
+                snapshot = economic_snapshot.refresh()
+                click.echo(f"✓ Economic snapshot v{snapshot['version']} rebuilt")
+            except Exception as e:
+                click.echo(f"⚠️  Economic snapshot rebuild failed: {str(e)}")
+        
     except Exception as e:
         click.echo(f"\n❌ Import failed: {str(e)}")
         logger.error(f"Import failed: {str(e)}", exc_info=True)
@@ -332,6 +354,87 @@ def optimize_db(table, analyze, reindex):
         raise click.ClickException(f"Database optimization failed: {str(e)}")
 
 
+@etl.command()
+@click.option('--rebuild', is_flag=True, help='Repopulate an existing SQLite search index')
+@with_appcontext
+def build_search_index(rebuild):
+    """Create the full-text property search index (MySQL FULLTEXT or SQLite FTS5)."""
+    from app.services.search_service import search_service
+    
+    click.echo("Building property search index...")
+    
+    try:
+        results = search_service.build_index(rebuild=rebuild)
+        
+        for action in results['actions'] or ['Index already up to date']:
+            click.echo(f"✓ {action}")
+        click.echo(f"\n✅ Search index ready ({results['backend']}) "
+                   f"in {results['elapsed_seconds']:.2f}s")
+        
+    except Exception as e:
+        click.echo(f"\n❌ Search index build failed: {str(e)}")
+        raise click.ClickException(f"Search index build failed: {str(e)}")
+
+
+@etl.command()
+@with_appcontext
+def build_location_index():
+    """Populate the city/property type lookup tables and backfill property ids."""
+    from app.services.location_resolver import location_resolver
+    
+    click.echo("Building location lookup tables...")
+    
+    try:
+        results = location_resolver.rebuild()
+        
+        click.echo(f"✓ {results['cities']} cities, {results['property_types']} property types, "
+                   f"{results['aliases']} new aliases")
+        click.echo(f"✓ Updated {results['properties_updated']} properties")
+        click.echo(f"\n✅ Location index ready in {results['elapsed_seconds']:.2f}s")
+        
+    except Exception as e:
+        click.echo(f"\n❌ Location index build failed: {str(e)}")
+        raise click.ClickException(f"Location index build failed: {str(e)}")
+
+
+@etl.command()
+@with_appcontext
+def build_market_cube():
+    """Rebuild the weekly market aggregates used for trends and predictions."""
+    from app.services.market_cube import market_cube
+
+    click.echo("Building market aggregate cube...")
+
+    try:
+        results = market_cube.rebuild()
+
+        click.echo(f"✓ {results['cells']} weekly cells from {results['sales']} sales")
+        click.echo(f"\n✅ Market cube ready in {results['elapsed_seconds']:.2f}s")
+
+    except Exception as e:
+        click.echo(f"\n❌ Market cube build failed: {str(e)}")
+        raise click.ClickException(f"Market cube build failed: {str(e)}")
+
+
+@etl.command()
+@with_appcontext
+def build_economic_series():
+    """Rebuild the columnar economic time series files."""
+    from app.services.economic_timeseries import economic_timeseries
+
+    click.echo("Building economic time series...")
+
+    try:
+        results = economic_timeseries.build()
+
+        click.echo(f"✓ {results['series']} series with {results['points']} observations")
+        click.echo(f"\n✅ Economic series written to {economic_timeseries.storage_directory()}")
+
+    except Exception as e:
+        click.echo(f"\n❌ Economic series build failed: {str(e)}")
+        raise click.ClickException(f"Economic series build failed: {str(e)}")
+
+
 @etl.command()
 @click.option('--keep-days', default=30, type=int, help='Number of days of logs to keep')
 @with_appcontext
@@ -581,6 +684,7 @@ def switch_model(model_name):
     """Switch to a different trained model."""
     try:
         from app.services.ml_service import MLService
+        from app.services.model_compiler import CompiledModel
         
         click.echo(f"🔄 Switching to model: {model_name}")
         
@@ -588,13 +692,85 @@ def switch_model(model_name):
         success = ml_service.switch_model(model_name)
         
         if success:
-            click.echo(f"✅ Successfully switched to {model_name}")
+            served = "compiled" if isinstance(ml_service.models.get('valuation'), CompiledModel) else "pickled"
+            click.echo(f"✅ Successfully switched to {model_name} ({served} model)")
         else:
             click.echo(f"❌ Failed to switch to {model_name}")
             
     except Exception as e:
         click.echo(f"❌ Model switching failed: {str(e)}")
 
+@etl.command()
+@click.argument('model_name', default='property')
+@with_appcontext
+def compile_model(model_name):
+    """Compile a trained model to the lean inference format and benchmark it."""
+    try:
+        from app.services.ml_service import MLService
+        
+        click.echo(f"⚙️ Compiling model: {model_name}")
+        
+        result = MLService().compile_model(model_name)
+        if not result['success']:
+            click.echo(f"❌ Compilation failed: {result['error']}")
+            return
+        
+        parity = result['parity']
+        click.echo(f"✓ {result['model']} compiled to {result['path']}")
+        click.echo(f"✓ Parity on {parity['rows']} rows: max relative difference {parity['max_rel_diff']:.2e}")
+        click.echo("\nBatch size   Source (ms)   Compiled (ms)   Speedup")
+        for batch_size, timings in result['benchmark'].items():
+            click.echo(f"{batch_size:>10}   {timings['source_ms']:>11.3f}   "
+                       f"{timings['compiled_ms']:>13.3f}   {timings['speedup']:>6.1f}x")
+        click.echo(f"\n✅ Compiled model ready")
+        
+    except Exception as e:
+        click.echo(f"❌ Model compilation failed: {str(e)}")
+
+@etl.command()
+@click.option('--batch-size', type=int, help='Properties per batch (default: VALUATION_BACKFILL_BATCH_SIZE)')
+@click.option('--max-batches', type=int, help='Stop after this many batches; the next run resumes')
+@click.option('--full', is_flag=True, help='Start a new pass over every property')
+@click.option('--status', 'show_status', is_flag=True, help='Show the checkpoint and exit')
+@with_appcontext
+def backfill_valuations(batch_size, max_batches, full, show_status):
+    """Refresh stored AI valuations for properties changed since the last run."""
+    try:
+        from app.services.valuation_backfill import valuation_backfill
+
+        if show_status:
+            status = valuation_backfill.status()
+            checkpoint = status['checkpoint'] or {}
+            click.echo("📊 Valuation Backfill Status:")
+            click.echo(f"  Running: {'yes' if status['running'] else 'no'}")
+            click.echo(f"  Model: {checkpoint.get('model_version', 'N/A')}")
+            click.echo(f"  Watermark: {checkpoint.get('watermark_updated_at', 'N/A')} / {checkpoint.get('watermark_key', 'N/A')}")
+            click.echo(f"  Last pass completed: {checkpoint.get('pass_completed_at') or 'N/A'}")
+            click.echo(f"  Pending properties: {status['pending_rows']:,}")
+            return
+
+        click.echo("🚀 Backfilling AI valuations...")
+
+        def report(batch):
+            click.echo(f"  Batch {batch['batch']}: {batch['rows']} rows, {batch['written']} written, "
+                       f"{batch['skipped']} changed concurrently ({batch['rows_per_second']:,.0f} rows/s)")
+
+        result = valuation_backfill.run(batch_size=batch_size, max_batches=max_batches,
+                                        full=full, progress=report)
+
+        if result['status'] == 'busy':
+            click.echo(f"⚠️  {result['message']}")
+        elif result['status'] == 'error':
+            click.echo(f"❌ Backfill failed: {result['error']}")
+        else:
+            click.echo(f"✅ {result['rows']:,} properties valued, {result['written']:,} updated "
+                       f"in {result['elapsed_seconds']:.1f}s ({result['rows_per_second']:,.0f} rows/s)")
+            if result['status'] == 'partial':
+                click.echo("   Stopped early; run again to resume from the checkpoint")
+
+    except Exception as e:
+        click.echo(f"❌ Valuation backfill failed: {str(e)}")
+
 @etl.command()
 @click.option('--property-type', default='Detached', help='Property type for prediction test')
 @click.option('--city', default='Toronto', help='City for prediction test')
@@ -606,6 +782,7 @@ def test_prediction(property_type, city, bedrooms, bathrooms, sqft):
     """Test ML model prediction with sample data."""
     try:
         from app.services.ml_service import MLService
+        from app.services.prediction_cache import prediction_cache
         
         click.echo("🧪 Testing ML model prediction...")
         
@@ -635,6 +812,9 @@ def test_prediction(property_type, city, bedrooms, bathrooms, sqft):
             click.echo(f"  Confidence: {result['confidence']:.1%}")
             click.echo(f"  Method: {result['prediction_method']}")
             click.echo(f"  Features Used: {result['features_used']}")
+            cache_stats = prediction_cache.get_stats()
+            click.echo(f"  Prediction Cache: {cache_stats['hit_rate']:.1%} hit rate "
+                       f"over {cache_stats['lookups']} lookups")
         else:
             click.echo(f"  Error: {result.get('error', 'Unknown error')}")
             
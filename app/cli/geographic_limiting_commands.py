@@ -12,6 +12,7 @@ from app.security.geographic_rate_limiter import (
     GeographicRateLimiter, check_geographic_rate_limit, get_geographic_status,
     CanadianProvince, CanadianTimeZone, GeographicRiskLevel
 )
+from app.security.ip_geolocation import build_geo_database, IPGeoDatabase
 
 
 @click.group(name='geographic-limiting')
@@ -430,6 +431,54 @@ def cleanup(max_age, dry_run):
         click.echo(f"❌ Error during cleanup: {e}")
 
 
+@geographic_limiting_commands.command('build-geo-db')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', default='data/geoip/canada-ip.npgeo', help='Output database path')
+def build_geo_db(csv_path, output):
+    """Build the memory-mapped IP geolocation database from a CSV file."""
+    click.echo(f"🗺️ Building geolocation database from {csv_path}")
+    
+    try:
+        start_time = time.time()
+        counts = build_geo_database(csv_path, output)
+        elapsed = time.time() - start_time
+        
+        click.echo(f"✅ Wrote {counts['records']} ranges to {output} in {elapsed:.2f}s")
+        click.echo(f"  Distinct strings: {counts['strings']}")
+        if counts['invalid']:
+            click.echo(f"  ⚠️ Skipped {counts['invalid']} invalid rows")
+        if counts['overlapping']:
+            click.echo(f"  ⚠️ Skipped {counts['overlapping']} overlapping ranges")
+        click.echo("Workers pick up the new file on their next location lookup.")
+    
+    except Exception as e:
+        click.echo(f"❌ Error building geolocation database: {e}")
+
+
+@geographic_limiting_commands.command('lookup-ip')
+@click.argument('ip_address')
+@click.option('--database', default='data/geoip/canada-ip.npgeo', help='Geolocation database path')
+def lookup_ip(ip_address, database):
+    """Look up an IP address in the geolocation database."""
+    try:
+        geo_db = IPGeoDatabase(database)
+        start_time = time.perf_counter()
+        result = geo_db.lookup(ip_address)
+        elapsed_us = (time.perf_counter() - start_time) * 1_000_000
+        
+        if result is None:
+            click.echo(f"❓ {ip_address} not found in {database}")
+        else:
+            click.echo(f"📍 {ip_address}:")
+            for key, value in result.items():
+                click.echo(f"  {key}: {value}")
+        click.echo(f"Lookup time: {elapsed_us:.1f}µs")
+        geo_db.close()
+    
+    except Exception as e:
+        click.echo(f"❌ Error looking up IP: {e}")
+
+
 def _get_province_name(province_code: str) -> str:
     """Get full province name from code."""
     province_names = {
@@ -21,14 +21,15 @@ def predictive_limiting():
 
 
 @predictive_limiting.command()
+@click.option('--predictions', is_flag=True, help='Score every client and show predicted load per category')
 @with_appcontext
-def status():
+def status(predictions):
     """Show predictive rate limiting system status."""
     click.echo("🔮 Predictive Rate Limiting System Status")
     click.echo("=" * 60)
     
     try:
-        metrics = get_global_prediction_metrics()
+        metrics = get_global_prediction_metrics(include_predictions=predictions)
         
         click.echo(f"📊 Global Metrics:")
         click.echo(f"  Total clients tracked: {metrics['total_clients']}")
@@ -52,6 +53,12 @@ def status():
             for category, count in metrics['global_patterns'].items():
                 click.echo(f"  {category}: {count} requests tracked")
         
+        if metrics.get('predicted_load'):
+            click.echo(f"\n🔭 Predicted Load:")
+            for category, load in metrics['predicted_load'].items():
+                click.echo(f"  {category}: {load['predicted_requests']} requests "
+                          f"across {load['clients']} clients")
+        
         click.echo("\n✅ Predictive rate limiting system is operational")
         
     except Exception as e:
@@ -4,6 +4,7 @@ Provides custom exception classes and error handling mechanisms.
 """
 
 import logging
+import os
 import traceback
 from typing import Dict, Any, Optional, List
 from datetime import datetime
@@ -487,9 +488,12 @@ class AdvancedErrorHandler:
         """Setup comprehensive logging configuration."""
         if not self.logger.handlers:
             # Create handlers
-            error_handler = logging.FileHandler('logs/nextproperty-ai-errors.log')
-            performance_handler = logging.FileHandler('logs/nextproperty-ai-performance.log')
-            security_handler = logging.FileHandler('logs/nextproperty-ai-security.log')
+            # Created at import, before any app config exists, so LOG_DIR comes from the environment
+            log_dir = os.environ.get('LOG_DIR', 'logs')
+            os.makedirs(log_dir, exist_ok=True)
+            error_handler = logging.FileHandler(os.path.join(log_dir, 'nextproperty-ai-errors.log'))
+            performance_handler = logging.FileHandler(os.path.join(log_dir, 'nextproperty-ai-performance.log'))
+            security_handler = logging.FileHandler(os.path.join(log_dir, 'nextproperty-ai-security.log'))
             
             # Create formatters
             detailed_formatter = logging.Formatter(
@@ -3,16 +3,23 @@ Logging configuration for NextProperty AI platform.
 Provides structured logging with different handlers and formatters.
 """
 
+import atexit
+import copy
+import hashlib
 import logging
 import logging.handlers
+import queue
+import random
 import sys
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import json
-from flask import Flask, request, g, has_request_context
+from flask import Flask, request, g, has_request_context, current_app
 from pythonjsonlogger import jsonlogger
 
+from app.tracing import tracer
+
 
 class RequestContextFilter(logging.Filter):
     """Add request context to log records."""
@@ -96,6 +103,259 @@ class ErrorHandler:
         self.logger.error("Application error occurred", extra=error_data)
 
 
+class AccessLogSampler(logging.Filter):
+    """
+    Sample access log records by response status class.
+    
+    Rates map ``2xx``..``5xx`` (and ``start`` for request start records,
+    which carry no status) to the fraction of records kept; unlisted classes
+    are always kept.
+    
+    Inside a request the decision is drawn once, from a hash of
+    ``g.request_id``, and shared by the start and end records: a request
+    whose end record is kept also has its start record kept whenever the
+    ``start`` rate is at least the end record's rate.
+    """
+    
+    def __init__(self, rates: Optional[Dict[str, float]] = None, pipeline: 'AsyncLogPipeline' = None):
+        super().__init__()
+        self.rates = rates or {}
+        self.pipeline = pipeline
+    
+    @staticmethod
+    def _sample_point() -> float:
+        """Uniform value in [0, 1) fixed per request (random outside a request)."""
+        request_id = getattr(g, 'request_id', None) if has_request_context() else None
+        if request_id is None:
+            return random.random()
+        digest = hashlib.blake2b(str(request_id).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') / 2 ** 64
+    
+    def filter(self, record):
+        status_code = getattr(record, 'status_code', None)
+        status_class = f'{status_code // 100}xx' if isinstance(status_code, int) else 'start'
+        rate = self.rates.get(status_class, 1.0)
+        if rate >= 1.0 or self._sample_point() < rate:
+            return True
+        if self.pipeline is not None:
+            self.pipeline.count('sampled_out', status_class)
+        return False
+
+
+class BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotating file handler that writes a batch of records under one lock and one flush."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._size = None
+    
+    def handle_batch(self, records: List[logging.LogRecord]):
+        records = [record for record in records if self.filter(record)]
+        if not records:
+            return
+        
+        self.acquire()
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            if self._size is None:
+                self.stream.seek(0, 2)
+                self._size = self.stream.tell()
+            for record in records:
+                try:
+                    msg = self.format(record) + self.terminator
+                    if self.maxBytes > 0 and self._size + len(msg) >= self.maxBytes and self._size > 0:
+                        self.doRollover()
+                    self.stream.write(msg)
+                    self._size += len(msg)
+                except Exception:
+                    self.handleError(record)
+            self.flush()
+        finally:
+            self.release()
+    
+    def doRollover(self):
+        super().doRollover()
+        self._size = 0
+    
+    def emit(self, record):
+        self.handle_batch([record])
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records for a pipeline route without blocking.
+    
+    When the queue is full, ordinary records are dropped and counted. Priority
+    records (security route, ERROR and above) wait briefly for room and are
+    written on the calling thread if none frees up.
+    """
+    
+    def __init__(self, pipeline: 'AsyncLogPipeline', route: str):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+        self.route = route
+    
+    def prepare(self, record):
+        # Render the message on the calling thread (its args may change later) but keep
+        # exc_info and extra fields intact for the JSON formatter; the queue is in-process.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.log_route = self.route
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        
+        if not self.pipeline.is_priority(record):
+            self.pipeline.count('dropped', self.route)
+            return
+        try:
+            self.queue.put(record, timeout=self.pipeline.priority_timeout)
+        except queue.Full:
+            # Security and error records are never dropped; pay for the write here instead
+            self.pipeline.dispatch([record])
+            self.pipeline.count('bypassed', self.route)
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """Queue listener that drains records in batches and dispatches them by route."""
+    
+    def __init__(self, pipeline: 'AsyncLogPipeline', batch_size: int):
+        super().__init__(pipeline.queue, respect_handler_level=True)
+        self.pipeline = pipeline
+        self.batch_size = batch_size
+    
+    def enqueue_sentinel(self):
+        # Wait for room rather than fail when stopping with a full queue
+        self.queue.put(self._sentinel)
+    
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while batch[-1] is not self._sentinel and len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is self._sentinel
+            records = batch[:-1] if stop else batch
+            if records:
+                self.handle_batch(records)
+            for _ in batch:
+                q.task_done()
+            if stop:
+                break
+    
+    def handle_batch(self, records: List[logging.LogRecord]):
+        self.pipeline.dispatch(records)
+
+
+class AsyncLogPipeline:
+    """
+    Bounded queue between the loggers and their file/console handlers.
+    
+    Loggers get ``BoundedQueueHandler`` instances that only enqueue; one
+    listener thread formats and writes batches, so request latency no longer
+    depends on disk I/O. When the queue is full, ordinary records are dropped
+    and counted instead of blocking the caller; security and error records
+    wait up to ``priority_timeout`` seconds and are then written directly.
+    """
+    
+    PRIORITY_ROUTES = frozenset({'security'})
+    PRIORITY_LEVEL = logging.ERROR
+    
+    def __init__(self, queue_size: int = 10000, batch_size: int = 256, priority_timeout: float = 0.5):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.priority_timeout = priority_timeout
+        self.routes: Dict[str, List[logging.Handler]] = {}
+        self.counters: Dict[str, Dict[str, int]] = {'dropped': {}, 'bypassed': {}, 'sampled_out': {}}
+        self.written = 0
+        self.listener: Optional[BatchingQueueListener] = None
+    
+    def handler(self, route: str, handlers: List[logging.Handler], filters=()) -> BoundedQueueHandler:
+        """Queue handler for ``route``, whose records the listener writes to ``handlers``."""
+        self.routes[route] = list(handlers)
+        queue_handler = BoundedQueueHandler(self, route)
+        for log_filter in filters:
+            queue_handler.addFilter(log_filter)
+        return queue_handler
+    
+    def is_priority(self, record: logging.LogRecord) -> bool:
+        """Whether a record may block briefly or bypass the queue rather than be dropped."""
+        return record.log_route in self.PRIORITY_ROUTES or record.levelno >= self.PRIORITY_LEVEL
+    
+    def dispatch(self, records: List[logging.LogRecord]):
+        """Write records to the handlers of their routes, in batches where supported."""
+        by_route: Dict[str, List[logging.LogRecord]] = {}
+        for record in records:
+            by_route.setdefault(record.log_route, []).append(record)
+        
+        for route, route_records in by_route.items():
+            for handler in self.routes.get(route, ()):
+                accepted = [record for record in route_records if record.levelno >= handler.level]
+                if not accepted:
+                    continue
+                if hasattr(handler, 'handle_batch'):
+                    handler.handle_batch(accepted)
+                else:
+                    for record in accepted:
+                        handler.handle(record)
+        self.count('written', None, len(records))
+    
+    def count(self, counter: str, key: Optional[str], amount: int = 1):
+        # Approximate under contention; these are monitoring counters
+        if counter == 'written':
+            self.written += amount
+        else:
+            self.counters[counter][key] = self.counters[counter].get(key, 0) + amount
+    
+    def start(self):
+        self.listener = BatchingQueueListener(self, self.batch_size)
+        self.listener.start()
+    
+    def stop(self):
+        """Flush queued records and stop the listener."""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+        for handlers in self.routes.values():
+            for handler in handlers:
+                handler.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'queue_size': self.queue.qsize(),
+            'queue_capacity': self.queue.maxsize,
+            'written': self.written,
+            'dropped': dict(self.counters['dropped']),
+            'bypassed': dict(self.counters['bypassed']),
+            'sampled_out': dict(self.counters['sampled_out'])
+        }
+
+
+# Pipeline of the most recent setup_logging call
+_log_pipeline: Optional[AsyncLogPipeline] = None
+
+
+def get_log_pipeline_stats() -> Dict[str, Any]:
+    """Queue depth, drops and sampling counters of the logging pipeline."""
+    return _log_pipeline.get_stats() if _log_pipeline is not None else {}
+
+
+@atexit.register
+def _stop_log_pipeline():
+    if _log_pipeline is not None:
+        _log_pipeline.stop()
+
+
 def setup_logging(app: Flask) -> Dict[str, logging.Logger]:
     """
     Set up logging configuration for the Flask application.
@@ -130,51 +390,61 @@ def setup_logging(app: Flask) -> Dict[str, logging.Logger]:
         '%(timestamp)s %(level)s %(name)s %(message)s'
     )
     
-    # Create request context filter
+    # Create request context filter (runs on the calling thread, before enqueueing)
     request_filter = RequestContextFilter()
     
+    # All handlers write from one listener thread fed by a bounded queue
+    global _log_pipeline
+    if _log_pipeline is not None:
+        _log_pipeline.stop()
+    pipeline = AsyncLogPipeline(
+        queue_size=app.config.get('LOG_QUEUE_SIZE', 10000),
+        batch_size=app.config.get('LOG_BATCH_SIZE', 256),
+        priority_timeout=app.config.get('LOG_PRIORITY_TIMEOUT', 0.5)
+    )
+    
+    root_handlers = []
+    
     # Console handler for development
     if app.config.get('FLASK_ENV') == 'development':
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(logging.DEBUG)
         console_handler.setFormatter(console_formatter)
-        console_handler.addFilter(request_filter)
-        root_logger.addHandler(console_handler)
+        root_handlers.append(console_handler)
     
     # File handler for application logs
     app_log_file = os.path.join(log_dir, f'{app_name}.log')
-    file_handler = logging.handlers.RotatingFileHandler(
+    file_handler = BatchingRotatingFileHandler(
         app_log_file,
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=5
     )
     file_handler.setLevel(getattr(logging, log_level.upper()))
     file_handler.setFormatter(json_formatter)
-    file_handler.addFilter(request_filter)
-    root_logger.addHandler(file_handler)
+    root_handlers.append(file_handler)
     
     # Error file handler
     error_log_file = os.path.join(log_dir, f'{app_name}-errors.log')
-    error_handler = logging.handlers.RotatingFileHandler(
+    error_handler = BatchingRotatingFileHandler(
         error_log_file,
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=10
     )
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(json_formatter)
-    error_handler.addFilter(request_filter)
-    root_logger.addHandler(error_handler)
+    root_handlers.append(error_handler)
+    
+    root_logger.addHandler(pipeline.handler('root', root_handlers, filters=[request_filter]))
     
     # Access log handler
     access_log_file = os.path.join(log_dir, f'{app_name}-access.log')
-    access_handler = logging.handlers.RotatingFileHandler(
+    access_handler = BatchingRotatingFileHandler(
         access_log_file,
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=5
     )
     access_handler.setLevel(logging.INFO)
     access_handler.setFormatter(json_formatter)
-    access_handler.addFilter(request_filter)
     
     # Create specialized loggers
     loggers = {}
@@ -212,36 +482,41 @@ def setup_logging(app: Flask) -> Dict[str, logging.Logger]:
     # Performance logger
     performance_logger = logging.getLogger('nextproperty.performance')
     performance_logger.setLevel(logging.INFO)
-    performance_handler = logging.handlers.RotatingFileHandler(
+    performance_handler = BatchingRotatingFileHandler(
         os.path.join(log_dir, f'{app_name}-performance.log'),
         maxBytes=10 * 1024 * 1024,
         backupCount=5
     )
     performance_handler.setFormatter(json_formatter)
-    performance_handler.addFilter(request_filter)
-    performance_logger.addHandler(performance_handler)
+    performance_logger.handlers.clear()
+    performance_logger.addHandler(pipeline.handler('performance', [performance_handler], filters=[request_filter]))
     loggers['performance'] = performance_logger
     
     # Security logger
     security_logger = logging.getLogger('nextproperty.security')
     security_logger.setLevel(logging.WARNING)
-    security_handler = logging.handlers.RotatingFileHandler(
+    security_handler = BatchingRotatingFileHandler(
         os.path.join(log_dir, f'{app_name}-security.log'),
         maxBytes=10 * 1024 * 1024,
         backupCount=10
     )
     security_handler.setFormatter(json_formatter)
-    security_handler.addFilter(request_filter)
-    security_logger.addHandler(security_handler)
+    security_logger.handlers.clear()
+    security_logger.addHandler(pipeline.handler('security', [security_handler], filters=[request_filter]))
     loggers['security'] = security_logger
     
-    # Access logger (separate from root)
+    # Access logger (separate from root), sampled by status class before anything else runs
     access_logger = logging.getLogger('nextproperty.access')
     access_logger.setLevel(logging.INFO)
-    access_logger.addHandler(access_handler)
+    access_sampler = AccessLogSampler(app.config.get('ACCESS_LOG_SAMPLE_RATES'), pipeline)
+    access_logger.handlers.clear()
+    access_logger.addHandler(pipeline.handler('access', [access_handler], filters=[access_sampler, request_filter]))
     access_logger.propagate = False  # Don't propagate to root logger
     loggers['access'] = access_logger
     
+    pipeline.start()
+    _log_pipeline = pipeline
+    
     # Configure third-party loggers
     logging.getLogger('urllib3').setLevel(logging.WARNING)
     logging.getLogger('requests').setLevel(logging.WARNING)
@@ -290,7 +565,10 @@ def setup_error_handlers(app: Flask, loggers: Dict[str, logging.Logger]):
 def log_request_start():
     """Log request start."""
     g.request_start_time = datetime.utcnow()
-    g.request_id = f"req_{int(g.request_start_time.timestamp() * 1000)}"
+    # Keep the id assigned by before_request; a millisecond timestamp is not unique per
+    # request, and the access log sampler keys its per-request decision on this id
+    if not getattr(g, 'request_id', None):
+        g.request_id = f"req_{int(g.request_start_time.timestamp() * 1000)}"
     
     access_logger = logging.getLogger('nextproperty.access')
     access_logger.info("Request started", extra={
@@ -321,11 +599,14 @@ def log_request_end(response):
         
         access_logger.info("Request completed", extra=log_data)
         
-        # Log slow requests
-        if duration > 2.0:  # Log requests slower than 2 seconds
+        # Log slow requests, with the per-stage breakdown when the request was traced
+        threshold = current_app.config.get('SLOW_REQUEST_THRESHOLD', 2.0)
+        if duration > threshold:
+            trace = tracer.current_trace()
             performance_logger.warning("Slow request detected", extra={
                 **log_data,
-                'threshold_exceeded': '2s'
+                'threshold_exceeded': f'{threshold}s',
+                'stage_breakdown_ms': trace.breakdown() if trace is not None and trace.sampled else None
             })
     
     return response
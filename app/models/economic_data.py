@@ -1,6 +1,7 @@
 from app import db
-from datetime import datetime
-from sqlalchemy import Index
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import Index, UniqueConstraint, and_, bindparam, or_, select
 
 class EconomicData(db.Model):
     """Economic indicators from Bank of Canada and Statistics Canada."""
@@ -33,6 +34,7 @@ class EconomicData(db.Model):
     
     # Indexes for efficient querying
     __table_args__ = (
+        UniqueConstraint('indicator_code', 'date', 'source', name='uq_economic_observation'),
         Index('idx_indicator_date', 'indicator_code', 'date'),
         Index('idx_source_date', 'source', 'date'),
         Index('idx_name_date', 'indicator_name', 'date'),
@@ -97,27 +99,140 @@ class EconomicData(db.Model):
         
         return query.all()
     
+    # Rows per INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE statement
+    UPSERT_CHUNK_SIZE = 500
+    KEY_COLUMNS = ('indicator_code', 'date', 'source')
+    
     @classmethod
-    def bulk_upsert(cls, data_list):
-        """Bulk insert or update economic data."""
-        for data in data_list:
-            existing = cls.query.filter_by(
-                indicator_code=data['indicator_code'],
-                date=data['date']
-            ).first()
+    def bulk_upsert(cls, data_list, chunk_size=None):
+        """
+        Bulk insert or update economic data.
+        
+        Observations are keyed by (indicator_code, date, source). Stored
+        values for each series' date range are pre-fetched in one query,
+        rows whose values are unchanged are skipped, and the rest are
+        written with multi-row upserts. Only the columns a row supplies are
+        written; stored values of omitted columns are kept.
+        
+        Args:
+            data_list: Dictionaries of column values including the key
+                columns; ``date`` may be a date or an ISO string
+            chunk_size: Rows per upsert statement
             
-            if existing:
-                # Update existing record
-                for key, value in data.items():
-                    if hasattr(existing, key):
-                        setattr(existing, key, value)
-                existing.updated_at = datetime.utcnow()
+        Returns:
+            Dictionary with inserted, updated and unchanged counts
+        """
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        
+        # Later rows for the same observation win
+        rows = {}
+        for data in data_list:
+            row = dict(data)
+            if isinstance(row['date'], str):
+                row['date'] = date.fromisoformat(row['date'][:10])
+            rows[tuple(row[key] for key in cls.KEY_COLUMNS)] = row
+        if not rows:
+            return counts
+        
+        skipped_columns = set(cls.KEY_COLUMNS) | {'id', 'created_at', 'updated_at'}
+        value_columns = sorted({key for row in rows.values() for key in row} - skipped_columns)
+        stored = cls._stored_values(rows.keys(), value_columns)
+        
+        # Rows are grouped by the columns they supply, so each upsert only sets those
+        now = datetime.utcnow()
+        changed = {}
+        for key, row in rows.items():
+            row_columns = tuple(sorted(set(row) - skipped_columns))
+            current = stored.get(key)
+            if current is None:
+                counts['inserted'] += 1
+            elif all(cls._same_value(current[column], row[column]) for column in row_columns):
+                counts['unchanged'] += 1
+                continue
             else:
-                # Create new record
-                new_record = cls(**data)
-                db.session.add(new_record)
+                counts['updated'] += 1
+            changed.setdefault(row_columns, []).append({
+                **{column: row[column] for column in row_columns},
+                **{key_column: row[key_column] for key_column in cls.KEY_COLUMNS},
+                'created_at': now,
+                'updated_at': now
+            })
+        
+        chunk_size = chunk_size or cls.UPSERT_CHUNK_SIZE
+        for row_columns, shape_rows in changed.items():
+            for start in range(0, len(shape_rows), chunk_size):
+                cls._upsert_chunk(shape_rows[start:start + chunk_size], row_columns, stored)
         
         db.session.commit()
+        return counts
+    
+    @classmethod
+    def _stored_values(cls, keys, value_columns):
+        """Stored values by (indicator_code, date, source) for the series in ``keys``."""
+        ranges = {}
+        for indicator_code, observed, source in keys:
+            low, high = ranges.get((indicator_code, source), (observed, observed))
+            ranges[(indicator_code, source)] = (min(low, observed), max(high, observed))
+        
+        columns = [getattr(cls, column) for column in cls.KEY_COLUMNS + tuple(value_columns)]
+        query = select(*columns).where(or_(*(
+            and_(cls.indicator_code == indicator_code, cls.source == source, cls.date.between(low, high))
+            for (indicator_code, source), (low, high) in ranges.items()
+        )))
+        
+        stored = {}
+        for row in db.session.execute(query):
+            stored[tuple(row[:3])] = dict(zip(value_columns, row[3:]))
+        return stored
+    
+    @staticmethod
+    def _same_value(stored, new):
+        if isinstance(stored, (Decimal, float)) and isinstance(new, (Decimal, float, int)):
+            # value is stored as NUMERIC(15, 6)
+            return round(float(stored), 6) == round(float(new), 6)
+        return stored == new
+    
+    @classmethod
+    def _upsert_chunk(cls, rows, value_columns, stored):
+        """Write ``rows`` with one dialect-specific upsert statement."""
+        table = cls.__table__
+        update_columns = list(value_columns) + ['updated_at']
+        dialect_name = db.session.get_bind().dialect.name
+        
+        if dialect_name == 'mysql':
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            stmt = mysql_insert(table)
+            stmt = stmt.on_duplicate_key_update(
+                **{column: stmt.inserted[column] for column in update_columns}
+            )
+        elif dialect_name in ('sqlite', 'postgresql'):
+            if dialect_name == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            stmt = dialect_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(cls.KEY_COLUMNS),
+                set_={column: stmt.excluded[column] for column in update_columns}
+            )
+        else:
+            # Other databases: executemany UPDATE for stored observations, INSERT for new ones
+            updates = [row for row in rows if tuple(row[key] for key in cls.KEY_COLUMNS) in stored]
+            if updates:
+                db.session.execute(
+                    table.update()
+                    .where(and_(*(table.c[key] == bindparam(f'key_{key}') for key in cls.KEY_COLUMNS)))
+                    .values({column: bindparam(f'value_{column}') for column in update_columns}),
+                    [{**{f'key_{key}': row[key] for key in cls.KEY_COLUMNS},
+                      **{f'value_{column}': row[column] for column in update_columns}} for row in updates]
+                )
+            inserts = [row for row in rows if tuple(row[key] for key in cls.KEY_COLUMNS) not in stored]
+            if not inserts:
+                return
+            stmt, rows = table.insert(), inserts
+        
+        # One executemany per chunk; pymysql sends it as a single multi-row INSERT
+        db.session.execute(stmt, rows)
 
 
 class EconomicIndicator(db.Model):
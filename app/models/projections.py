@@ -0,0 +1,140 @@
+"""
+Named column projections of the Property model.
+
+Listing endpoints used to hydrate full ``Property`` instances, including the
+large ``features``, ``community_features`` and ``remarks`` TEXT columns, only
+to serialize a subset of fields. A projection names the columns a view needs
+and either:
+
+- selects just those columns (``rows``), returning SQLAlchemy ``Row`` tuples
+  that are serialized by a converter list compiled once per projection, or
+- loads ``Property`` instances with only those columns (``load_only``) for
+  templates that need model methods and relationships.
+"""
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import Numeric
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import load_only
+
+from app.models.property import Property
+
+FieldSpec = Union[str, Tuple[str, str]]
+
+
+def _float_or_none(value):
+    """``to_dict`` semantics: falsy numbers serialize as None."""
+    return float(value) if value else None
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+class PropertyProjection:
+    """A named set of Property columns with a precompiled serializer."""
+
+    __slots__ = ('name', 'keys', 'columns', '_converters')
+
+    def __init__(self, name: str, fields: Sequence[FieldSpec],
+                 numeric: Callable[[Any], Any] = _float_or_none,
+                 converters: Optional[Dict[str, Callable[[Any], Any]]] = None):
+        """
+        Args:
+            name: Projection name
+            fields: Column names, or ``(output_key, column_name)`` pairs
+            numeric: Converter for ``Numeric`` columns
+            converters: Per-output-key converter overrides (None for pass-through)
+        """
+        self.name = name
+        specs = [(field, field) if isinstance(field, str) else field for field in fields]
+        self.keys = tuple(key for key, _ in specs)
+        self.columns = tuple(getattr(Property, column) for _, column in specs)
+
+        converters = converters or {}
+        compiled = []
+        for (key, column_name), column in zip(specs, self.columns):
+            if key in converters:
+                compiled.append(converters[key])
+                continue
+            column_type = Property.__table__.c[column_name].type
+            if isinstance(column_type, Numeric):
+                compiled.append(numeric)
+            elif column_type.python_type in (date, datetime):
+                compiled.append(_isoformat)
+            else:
+                compiled.append(None)
+        self._converters = tuple(compiled)
+
+    def __repr__(self):
+        return f'<PropertyProjection {self.name}: {", ".join(self.keys)}>'
+
+    def rows(self, query):
+        """Restrict ``query`` (keeping its filters, joins and ordering) to the projected columns."""
+        return query.with_entities(*self.columns)
+
+    def load_only(self, query):
+        """Load Property instances with only the projected columns (others load on access)."""
+        return query.options(load_only(*self.columns))
+
+    def serialize(self, row: Union[Row, Property]) -> Dict[str, Any]:
+        """Serialize a projected row, or a Property instance, to a dictionary."""
+        if not isinstance(row, Row):
+            row = tuple(getattr(row, column.key) for column in self.columns)
+        return {
+            key: convert(value) if convert is not None else value
+            for key, convert, value in zip(self.keys, self._converters, row)
+        }
+
+    def serialize_all(self, rows: Iterable[Union[Row, Property]]) -> List[Dict[str, Any]]:
+        """Serialize a sequence of rows."""
+        return [self.serialize(row) for row in rows]
+
+
+# All fields of Property.to_dict(), in the same order and with the same conversions
+PROPERTY_DETAIL = PropertyProjection('detail', [
+    'listing_id', 'mls', 'property_type', 'address', 'city', 'province', 'postal_code',
+    'latitude', 'longitude', 'sold_price', 'original_price', 'price_per_sqft',
+    'bedrooms', 'bathrooms', 'kitchens_plus', 'rooms', 'sqft', 'lot_size', 'year_built',
+    'sold_date', 'dom', 'taxes', 'maintenance_fee',
+    'features', 'community_features', 'remarks',
+    'ai_valuation', 'investment_score', 'risk_assessment', 'market_trend',
+    'created_at', 'updated_at'
+])
+
+# Listing cards: the detail fields without the large TEXT columns
+PROPERTY_CARD = PropertyProjection('card', [
+    key for key in PROPERTY_DETAIL.keys
+    if key not in ('features', 'community_features', 'remarks')
+] + ['agent_id'])
+
+# Map markers, as emitted by main.map_data
+PROPERTY_MAP_PIN = PropertyProjection('map_pin', [
+    'listing_id', ('lat', 'latitude'), ('lng', 'longitude'), ('price', 'sold_price'),
+    'address', 'city', 'property_type', 'bedrooms', 'bathrooms', 'sqft', 'sold_date'
+], converters={'lat': float, 'lng': float})
+
+# Export records, as emitted by EnhancedExportService._property_to_dict
+PROPERTY_EXPORT = PropertyProjection('export', [
+    'listing_id', 'mls', 'property_type', 'address', 'city', 'province', 'postal_code',
+    'latitude', 'longitude', 'sold_price', 'bedrooms', 'bathrooms', 'sqft', 'lot_size',
+    'sold_date', 'dom', 'taxes', 'maintenance_fee',
+    'features', 'community_features', 'remarks',
+    'ai_valuation', 'investment_score', 'risk_assessment', 'market_trend',
+    'created_at', 'updated_at'
+], numeric=_float)
+
+PROJECTIONS = {
+    projection.name: projection
+    for projection in (PROPERTY_DETAIL, PROPERTY_CARD, PROPERTY_MAP_PIN, PROPERTY_EXPORT)
+}
+
+
+def projection_for_fields(fields: Sequence[str], name: str = 'custom') -> PropertyProjection:
+    """Projection of an arbitrary list of Property column names (unknown names are dropped)."""
+    return PropertyProjection(name, [field for field in fields if field in Property.__table__.c])
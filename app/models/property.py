@@ -1,6 +1,6 @@
 from app import db
 from datetime import datetime
-from sqlalchemy import Index, text
+from sqlalchemy import Index, UniqueConstraint, event, text
 from flask import current_app
 from functools import cached_property
 
@@ -20,6 +20,10 @@ class Property(db.Model):
     province = db.Column(db.String(50))
     postal_code = db.Column(db.String(10))
     
+    # Normalized location dimensions (kept in sync with city/province/property_type)
+    city_id = db.Column(db.Integer, db.ForeignKey('cities.id'), index=True)
+    property_type_id = db.Column(db.Integer, db.ForeignKey('property_types.id'), index=True)
+    
     # Location coordinates
     latitude = db.Column(db.Numeric(10, 8))
     longitude = db.Column(db.Numeric(11, 8))
@@ -70,13 +74,21 @@ class Property(db.Model):
         Index('idx_price_range', 'sold_price'),
         Index('idx_property_search', 'city', 'property_type', 'sold_price'),
         Index('idx_date_type', 'sold_date', 'property_type'),
+        Index('idx_sold_date_listing', 'sold_date', 'listing_id'),  # Keyset pagination
         Index('idx_ai_valuation', 'ai_valuation'),  # For top deals queries
         Index('idx_original_price', 'original_price'),  # For price comparisons
         Index('idx_sqft_bedrooms', 'sqft', 'bedrooms'),  # For rental estimates
         Index('idx_city_type_price', 'city', 'property_type', 'original_price'),  # Composite index
         Index('idx_investment_score', 'investment_score'),  # For investment queries
         Index('idx_year_built', 'year_built'),  # For age-based queries
-        # Full-text search index for MySQL
+        Index('idx_city_type_price_id', 'city_id', 'property_type_id', 'original_price'),  # Resolved city/type filters
+        Index('idx_property_search_id', 'city_id', 'property_type_id', 'sold_price'),
+        Index('idx_updated_listing', 'updated_at', 'listing_id'),  # Valuation backfill watermark
+        # Full-text search indexes for MySQL (see app.services.search_service)
+        Index('ft_property_text', 'address', 'features', 'community_features', 'remarks',
+              mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+        Index('ft_property_location', 'city', 'province', 'postal_code',
+              mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
         {'mysql_charset': 'utf8mb4'}
     )
     
@@ -240,10 +252,12 @@ class Property(db.Model):
         """Get filtered property listings."""
         query = cls.query
         
-        if city:
-            query = query.filter(cls.city.ilike(f'%{city}%'))
-        if property_type:
-            query = query.filter(cls.property_type.ilike(f'%{property_type}%'))
+        if city or property_type:
+            from app.services.location_resolver import location_resolver
+            if city:
+                query = query.filter(location_resolver.city_clause(city))
+            if property_type:
+                query = query.filter(location_resolver.property_type_clause(property_type))
         if min_price:
             query = query.filter(cls.sold_price >= min_price)
         if max_price:
@@ -253,18 +267,9 @@ class Property(db.Model):
     
     @classmethod
     def search_properties(cls, query_text, limit=20):
-        """Full-text search on property features and descriptions."""
-        # MySQL full-text search
-        search_query = cls.query.filter(
-            db.or_(
-                cls.features.contains(query_text),
-                cls.community_features.contains(query_text),
-                cls.remarks.contains(query_text),
-                cls.address.contains(query_text)
-            )
-        )
-        
-        return search_query.limit(limit).all()
+        """Full-text search on property features and descriptions, ranked by relevance."""
+        from app.services.search_service import search_service
+        return search_service.search(query_text, limit=limit)
     
     @classmethod
     def get_nearby_properties(cls, latitude, longitude, radius_km=5, limit=20):
@@ -324,3 +329,123 @@ class PropertyRoom(db.Model):
     
     def __repr__(self):
         return f'<PropertyRoom {self.id}: {self.room_type} in {self.listing_id}>'
+
+
+class City(db.Model):
+    """Canonical city referenced by properties through ``city_id``."""
+    
+    __tablename__ = 'cities'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    province = db.Column(db.String(50), nullable=False, default='')
+    name_key = db.Column(db.String(100), nullable=False, index=True)  # Lowercase, accents stripped
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    properties = db.relationship('Property', backref='city_ref', lazy='dynamic')
+    
+    __table_args__ = (
+        UniqueConstraint('name_key', 'province', name='uq_city_name_province'),
+    )
+    
+    def __repr__(self):
+        return f'<City {self.id}: {self.name}, {self.province}>'
+
+
+class PropertyType(db.Model):
+    """Canonical property type referenced by properties through ``property_type_id``."""
+    
+    __tablename__ = 'property_types'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    name_key = db.Column(db.String(50), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    properties = db.relationship('Property', backref='property_type_ref', lazy='dynamic')
+    
+    def __repr__(self):
+        return f'<PropertyType {self.id}: {self.name}>'
+
+
+class LocationAlias(db.Model):
+    """Alternative spelling that resolves to a city or property type id."""
+    
+    __tablename__ = 'location_aliases'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # city, property_type
+    alias_key = db.Column(db.String(100), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('kind', 'alias_key', name='uq_location_alias'),
+    )
+    
+    def __repr__(self):
+        return f'<LocationAlias {self.kind}: {self.alias_key} -> {self.target_id}>'
+
+
+class MarketAggregate(db.Model):
+    """Weekly sales count and price moments per city and property type (see market_cube)."""
+    
+    __tablename__ = 'market_aggregates'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    city_id = db.Column(db.Integer, nullable=False, default=0)  # 0: no city_id
+    property_type_id = db.Column(db.Integer, nullable=False, default=0)  # 0: no property_type_id
+    week_start = db.Column(db.Date, nullable=False)  # Monday of the sale week
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    # Double precision (DOUBLE on MySQL): sums of squared prices need ~15 significant digits
+    price_sum = db.Column(db.Float(precision=53), nullable=False, default=0)
+    price_sum_sq = db.Column(db.Float(precision=53), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('city_id', 'property_type_id', 'week_start', name='uq_market_aggregate_cell'),
+        Index('idx_market_aggregate_week', 'week_start'),
+    )
+    
+    def __repr__(self):
+        return f'<MarketAggregate {self.city_id}/{self.property_type_id} {self.week_start}: {self.sales_count}>'
+
+
+class BackfillCheckpoint(db.Model):
+    """Position and totals of a resumable backfill pass (see valuation_backfill)."""
+    
+    __tablename__ = 'backfill_checkpoints'
+    
+    job = db.Column(db.String(50), primary_key=True)
+    model_version = db.Column(db.String(64))  # Model the current pass scores with
+    # Last (updated_at, listing_id) processed; empty at the start of a pass
+    watermark_updated_at = db.Column(db.DateTime)
+    watermark_key = db.Column(db.String(50))
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    pass_started_at = db.Column(db.DateTime)
+    pass_completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<BackfillCheckpoint {self.job}: {self.rows_processed} rows>'
+    
+    def to_dict(self):
+        return {
+            'job': self.job,
+            'model_version': self.model_version,
+            'watermark_updated_at': self.watermark_updated_at.isoformat() if self.watermark_updated_at else None,
+            'watermark_key': self.watermark_key,
+            'rows_processed': self.rows_processed,
+            'rows_written': self.rows_written,
+            'pass_started_at': self.pass_started_at.isoformat() if self.pass_started_at else None,
+            'pass_completed_at': self.pass_completed_at.isoformat() if self.pass_completed_at else None
+        }
+
+
+@event.listens_for(Property, 'before_insert')
+@event.listens_for(Property, 'before_update')
+def _assign_location_ids(mapper, connection, target):
+    """Keep city_id/property_type_id in sync for ORM writes (ETL upserts set them in DataMapper)."""
+    from app.services.location_resolver import location_resolver
+    location_resolver.assign_ids(target, connection)
@@ -4,6 +4,10 @@ from app.models.property import Property
 from app.services.ml_service import MLService
 from app.services.data_service import DataService
 from app.services.database_optimizer import DatabaseOptimizer, BulkOperationManager
+from app.services.economic_snapshot import economic_snapshot
+from app.services.homepage_snapshot import homepage_snapshot
+from app.services.location_resolver import location_resolver
+from app.services.prediction_cache import prediction_cache
 from app.security.rate_limiter import rate_limit
 from datetime import datetime, timedelta
 from sqlalchemy import func, text
@@ -328,7 +332,11 @@ def system_stats():
             'success': True,
             'property_stats': property_stats,
             'model_stats': model_stats,
+            'prediction_cache': prediction_cache.get_stats(),
             'db_health': db_health,
+            'homepage_snapshot': homepage_snapshot.get_status(),
+            'economic_snapshot': economic_snapshot.get_status(),
+            'location_index': location_resolver.get_status(),
             'timestamp': datetime.utcnow().isoformat()
         })
         
@@ -1,13 +1,20 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
-from app import db, cache
-from app.extensions import limiter
+from app import db
+from app.extensions import cache, limiter
 from app.models.property import Property, PropertyPhoto, PropertyRoom
 from app.models.agent import Agent
 from app.models.economic_data import EconomicData, EconomicIndicator
 from app.services.ml_service import MLService
 from app.services.data_service import DataService
 from app.services.geospatial_service import GeospatialService
+from app.services.search_service import search_service
+from app.services.prediction_cache import prediction_cache
+from app.services.valuation_backfill import valuation_backfill
+from app.services.location_resolver import location_resolver
+from app.models.projections import PROPERTY_CARD, PROPERTY_DETAIL
+from app.services.keyset_pagination import property_paginator, TOTAL_MODES
+from app.utils.errors import ValidationError
 from app.security.middleware import csrf_protect, xss_protect
 from app.security.rate_limiter import rate_limit
 # from app.utils.helpers import validate_request_args, paginate_query  # TODO: Implement these functions
@@ -22,6 +29,47 @@ ml_service = MLService()
 data_service = DataService()
 geo_service = GeospatialService()
 
+
+def _cursor_mode():
+    """Whether the request asks for keyset pagination (``cursor`` or ``pagination=cursor``)."""
+    return 'cursor' in request.args or request.args.get('pagination') == 'cursor'
+
+
+def _paginate_listings(query, page, per_page, ranked=False):
+    """
+    Page a listing query by ``(sold_date, listing_id)``, newest first.
+    
+    Cursor mode seeks past the previous page's last row and reports an
+    approximate total unless ``total=exact`` or ``total=none`` is given.
+    Page mode keeps the OFFSET pagination with an exact total, and also
+    returns ``next_cursor`` so clients can switch to cursors after page one.
+    ``ranked`` queries are ordered by relevance first, which cursors (always
+    in recency order) cannot continue, so they get no ``next_cursor``.
+    """
+    if _cursor_mode():
+        total = request.args.get('total', 'approximate')
+        if total not in TOTAL_MODES:
+            raise ValidationError(f"total must be one of: {', '.join(TOTAL_MODES)}", field='total')
+        result = property_paginator.paginate(
+            query, cursor=request.args.get('cursor') or None,
+            per_page=per_page, page=page, total=total
+        )
+        return result.items, result.to_dict()
+    
+    properties = property_paginator.order(query).paginate(page=page, per_page=per_page, error_out=False)
+    next_cursor = (property_paginator.cursor_for(properties.items[-1])
+                   if properties.has_next and properties.items and not ranked else None)
+    return properties.items, {
+        'page': properties.page,
+        'per_page': properties.per_page,
+        'total': properties.total,
+        'pages': properties.pages,
+        'has_next': properties.has_next,
+        'has_prev': properties.has_prev,
+        'next_cursor': next_cursor
+    }
+
+
 @bp.route('/health', methods=['GET'])
 @cache.cached(timeout=60)
 def health_check():
@@ -140,7 +188,7 @@ def get_market_data():
         
         query = Property.query
         if city:
-            query = query.filter(Property.city.ilike(f'%{city}%'))
+            query = query.filter(location_resolver.city_clause(city))
         
         # Get price statistics
         price_stats = db.session.query(
@@ -183,15 +231,17 @@ def get_properties():
         max_price = request.args.get('max_price', type=float)
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 20, type=int), 100)
+        # card omits the features/community_features/remarks text; detail matches to_dict()
+        projection = PROPERTY_DETAIL if request.args.get('view') == 'detail' else PROPERTY_CARD
         
         # Build query
         query = Property.query
         
         # Apply filters
         if city:
-            query = query.filter(Property.city.ilike(f'%{city}%'))
+            query = query.filter(location_resolver.city_clause(city))
         if property_type:
-            query = query.filter(Property.property_type.ilike(f'%{property_type}%'))
+            query = query.filter(location_resolver.property_type_clause(property_type))
         if min_price:
             query = query.filter(
                 db.or_(
@@ -207,29 +257,17 @@ def get_properties():
                 )
             )
         
-        # Order by most recent
-        query = query.order_by(Property.sold_date.desc())
-        
-        # Paginate
-        properties = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
+        # Most recent first, over the projected columns only
+        items, pagination = _paginate_listings(projection.rows(query), page, per_page)
         
         return jsonify({
             'success': True,
-            'data': [prop.to_dict() for prop in properties.items],
-            'pagination': {
-                'page': properties.page,
-                'per_page': properties.per_page,
-                'total': properties.total,
-                'pages': properties.pages,
-                'has_next': properties.has_next,
-                'has_prev': properties.has_prev
-            }
+            'data': projection.serialize_all(items),
+            'pagination': pagination
         })
         
+    except ValidationError as e:
+        return jsonify({'success': False, 'error': e.message}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching properties: {str(e)}")
         return jsonify({'success': False, 'error': 'Internal server error'}), 500
@@ -416,26 +454,21 @@ def search_properties():
         bathrooms = request.args.get('bathrooms', type=float)
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 20, type=int), 100)
+        projection = PROPERTY_DETAIL if request.args.get('view') == 'detail' else PROPERTY_CARD
         
         # Start with base query
         query = Property.query
         
-        # Apply text search if provided
+        # Apply text search if provided (ranked by relevance when indexed,
+        # except in cursor mode, which pages by recency)
         if query_text:
-            query = query.filter(
-                db.or_(
-                    Property.features.contains(query_text),
-                    Property.community_features.contains(query_text),
-                    Property.remarks.contains(query_text),
-                    Property.address.contains(query_text)
-                )
-            )
+            query = search_service.filter_query(query, query_text, rank=not _cursor_mode())
         
         # Apply filters
         if city:
-            query = query.filter(Property.city.ilike(f'%{city}%'))
+            query = query.filter(location_resolver.city_clause(city))
         if property_type:
-            query = query.filter(Property.property_type.ilike(f'%{property_type}%'))
+            query = query.filter(location_resolver.property_type_clause(property_type))
         if min_price:
             query = query.filter(
                 db.or_(
@@ -455,21 +488,14 @@ def search_properties():
         if bathrooms:
             query = query.filter(Property.bathrooms >= bathrooms)
         
-        # Order by relevance (sold_date for now)
-        query = query.order_by(Property.sold_date.desc())
-        
-        # Paginate
-        properties = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Most recent first (after relevance for text searches)
+        items, pagination = _paginate_listings(projection.rows(query), page, per_page,
+                                               ranked=bool(query_text) and not _cursor_mode())
         
         return jsonify({
             'success': True,
-            'data': [prop.to_dict() for prop in properties.items],
-            'pagination': {
-                'page': properties.page,
-                'per_page': properties.per_page,
-                'total': properties.total,
-                'pages': properties.pages
-            },
+            'data': projection.serialize_all(items),
+            'pagination': pagination,
             'search_params': {
                 'query': query_text,
                 'city': city,
@@ -481,6 +507,8 @@ def search_properties():
             }
         })
         
+    except ValidationError as e:
+        return jsonify({'success': False, 'error': e.message}), 400
     except Exception as e:
         current_app.logger.error(f"Error in property search: {str(e)}")
         return jsonify({'success': False, 'error': 'Internal server error'}), 500
@@ -738,61 +766,33 @@ def get_property_prediction(listing_id):
 
 
 @bp.route('/properties/bulk-analyze', methods=['POST'])
+@limiter.limit("10 per hour")
 def bulk_analyze_properties():
-    """Analyze multiple properties and generate AI predictions."""
+    """
+    Start the incremental AI valuation backfill in the background.
+    
+    Only rows changed since the last run are revalued. A full pass over
+    every property is left to ``flask etl backfill-valuations --full``.
+    """
     try:
-        # Get properties without AI valuation or need update
-        properties_to_analyze = Property.query.filter(
-            db.or_(
-                Property.ai_valuation.is_(None),
-                Property.investment_score.is_(None)
-            ),
-            Property.bedrooms.isnot(None)
-        ).limit(100).all()
-        
-        analyzed_count = 0
-        
-        for property_obj in properties_to_analyze:
-            try:
-                # Generate prediction
-                property_features = {
-                    'bedrooms': property_obj.bedrooms or 3,
-                    'bathrooms': property_obj.bathrooms or 2,
-                    'square_feet': property_obj.sqft or 1500,
-                    'lot_size': property_obj.lot_size or 0,
-                    'year_built': 2020,
-                    'property_type': property_obj.property_type or 'Detached',
-                    'city': property_obj.city or 'Toronto',
-                    'province': property_obj.province or 'ON',
-                    'postal_code': property_obj.postal_code or 'M1M1M1'
-                }
-                
-                prediction_result = ml_service.predict_property_price(property_features)
-                
-                if not prediction_result.get('error'):
-                    # Update property with AI analysis
-                    analysis = ml_service.analyze_property(property_obj)
-                    property_obj.ai_valuation = prediction_result['predicted_price']
-                    property_obj.investment_score = analysis.get('investment_score')
-                    property_obj.risk_assessment = analysis.get('risk_level')
-                    property_obj.market_trend = analysis.get('market_trend')
-                    analyzed_count += 1
-                    
-            except Exception as prop_error:
-                current_app.logger.warning(f"Error analyzing property {property_obj.listing_id}: {str(prop_error)}")
-                continue
-        
-        db.session.commit()
+        data = request.get_json(silent=True) or {}
+        if data.get('full'):
+            raise ValidationError(
+                "Full revaluation is not available over HTTP; "
+                "run 'flask etl backfill-valuations --full'", field='full'
+            )
+        started = valuation_backfill.start(current_app._get_current_object())
         
         return jsonify({
             'success': True,
-            'analyzed_count': analyzed_count,
-            'total_processed': len(properties_to_analyze)
-        })
+            'started': started,
+            'status': valuation_backfill.status()
+        }), 202
         
+    except ValidationError as e:
+        return jsonify({'success': False, 'error': e.message}), 400
     except Exception as e:
         current_app.logger.error(f"Error in bulk analysis: {str(e)}")
-        db.session.rollback()
         return jsonify({'success': False, 'error': 'Internal server error'}), 500
 
 
@@ -869,6 +869,7 @@ def get_model_status():
             'success': True,
             'model_status': validation,
             'metadata': metadata,
+            'prediction_cache': prediction_cache.get_stats(),
             'retrain_recommended': ml_service.retrain_recommended()
         })
     except Exception as e:
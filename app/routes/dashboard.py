@@ -228,16 +228,16 @@ def analytics_insights():
 def economic():
     """Economic indicators dashboard."""
     try:
+        from app.services.economic_snapshot import economic_snapshot
         from app.services.external_apis import ExternalAPIsService
         
-        # Get latest economic summary
-        economic_summary = ExternalAPIsService.get_latest_economic_summary()
+        # Latest economic summary and interest rates, from the shared snapshot
+        economic_summary = economic_snapshot.summary()
         
         # Get detailed economic indicators
         economic_indicators = data_service.get_trending_economic_indicators()
         
-        # Get interest rates data
-        interest_rates = ExternalAPIsService.get_current_interest_rates()
+        interest_rates = economic_snapshot.interest_rates()
         
         # Get housing market indicators
         housing_indicators = ExternalAPIsService.get_housing_market_indicators()
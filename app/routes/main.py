@@ -5,6 +5,11 @@ from app.models.user import SavedProperty, User
 from app.services.ml_service import MLService
 from app.services.data_service import DataService
 from app.services.external_apis import ExternalAPIsService
+from app.services.search_service import search_service
+from app.services.location_resolver import location_resolver
+from app.services.homepage_snapshot import homepage_snapshot
+from app.models.projections import PROPERTY_CARD, PROPERTY_MAP_PIN
+from app.services.keyset_pagination import property_paginator
 from app.utils.validators import validate_property_photos
 from app.security.middleware import csrf_protect, xss_protect
 from app.security.rate_limiter import rate_limit
@@ -45,88 +50,15 @@ def health():
         }), 503
 
 @bp.route('/')
-@cache.cached(timeout=300)  # Cache for 5 minutes
 def index():
     """Homepage with featured properties, top properties, and market overview."""
     try:
-        # Get top properties (below AI prediction price - good deals) - limit to reduce load time
-        top_properties = ml_service.get_top_properties(limit=3)
+        # Served from the precomputed snapshot; the scheduler keeps it fresh
+        snapshot = homepage_snapshot.get() or homepage_snapshot.refresh_cold()
+        if snapshot is None:
+            raise RuntimeError("Homepage snapshot is still being built by another worker")
         
-        # Get featured properties (recent high-value properties) - optimized query
-        featured_properties = Property.query.filter(
-            Property.sold_price.isnot(None)
-        ).order_by(Property.sold_price.desc()).limit(3).all()
-        
-        # Get market statistics - use cached aggregations
-        try:
-            # Use more efficient queries with specific columns
-            total_properties = db.session.query(func.count(Property.listing_id)).scalar() or 0
-            avg_price = db.session.query(func.avg(Property.sold_price)).filter(
-                Property.sold_price.isnot(None)
-            ).scalar()
-            cities_covered = db.session.query(func.count(func.distinct(Property.city))).scalar() or 0
-            ai_analyzed = db.session.query(func.count(Property.listing_id)).filter(
-                Property.ai_valuation.isnot(None)
-            ).scalar() or 0
-            
-            market_stats = {
-                'total_properties': total_properties,
-                'avg_price': float(avg_price) if avg_price else 0,
-                'cities_covered': cities_covered,
-                'ai_analyzed': ai_analyzed
-            }
-        except Exception as stats_error:
-            current_app.logger.warning(f"Could not get market stats: {str(stats_error)}")
-            market_stats = {
-                'total_properties': 0,
-                'avg_price': 0,
-                'cities_covered': 0,
-                'ai_analyzed': 0
-            }
-        
-        # Get top cities by property count - limit and optimize
-        try:
-            top_cities = db.session.query(
-                Property.city,
-                func.count(Property.listing_id).label('count'),
-                func.avg(Property.sold_price).label('avg_price')
-            ).filter(
-                and_(
-                    Property.city.isnot(None),
-                    Property.sold_price.isnot(None)
-                )
-            ).group_by(Property.city).order_by(
-                func.count(Property.listing_id).desc()
-            ).limit(6).all()  # Reduced from 8
-        except Exception as cities_error:
-            current_app.logger.warning(f"Could not get top cities: {str(cities_error)}")
-            top_cities = []
-        
-        # Get market predictions summary - make this optional to speed up loading
-        market_predictions = {}
-        try:
-            market_predictions = ml_service.get_market_predictions()
-        except Exception as pred_error:
-            current_app.logger.warning(f"Could not get market predictions: {str(pred_error)}")
-        
-        # Get trend data for chart
-        trend_data = {}
-        try:
-            trend_data = data_service.get_property_price_trends(period_days=180)
-        except Exception as trend_error:
-            current_app.logger.warning(f"Could not get trend data: {str(trend_error)}")
-            trend_data = {
-                'dates': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
-                'avg_prices': [580000, 595000, 610000, 625000, 640000, 655000]
-            }
-        
-        return render_template('index.html',
-                             top_properties=top_properties,
-                             featured_properties=featured_properties,
-                             market_stats=market_stats,
-                             top_cities=top_cities,
-                             market_predictions=market_predictions,
-                             trend_data=trend_data)
+        return render_template('index.html', **homepage_snapshot.template_context(snapshot))
     
     except Exception as e:
         current_app.logger.error(f"Error loading homepage: {str(e)}")
@@ -167,9 +99,9 @@ def properties():
         
         # Apply filters
         if city:
-            query = query.filter(Property.city.ilike(f'%{city}%'))
+            query = query.filter(location_resolver.city_clause(city))
         if property_type:
-            query = query.filter(Property.property_type.ilike(f'%{property_type}%'))
+            query = query.filter(location_resolver.property_type_clause(property_type))
         if min_price:
             query = query.filter(
                 db.or_(
@@ -315,6 +247,7 @@ def search():
         bedrooms = request.args.get('bedrooms', type=int)
         bathrooms = request.args.get('bathrooms', type=float)
         page = request.args.get('page', 1, type=int)
+        cursor = request.args.get('cursor')
         
         # Get form options
         cities = data_service.get_unique_cities()
@@ -330,13 +263,9 @@ def search():
             
             # Apply filters
             if location:
-                query = query.filter(
-                    Property.city.ilike(f'%{location}%') |
-                    Property.province.ilike(f'%{location}%') |
-                    Property.postal_code.ilike(f'%{location}%')
-                )
+                query = search_service.filter_query(query, location, fields='location', rank=False)
             if property_type:
-                query = query.filter(Property.property_type.ilike(f'%{property_type}%'))
+                query = query.filter(location_resolver.property_type_clause(property_type))
             if min_price:
                 query = query.filter(
                     db.or_(
@@ -356,15 +285,23 @@ def search():
             if bathrooms:
                 query = query.filter(Property.bathrooms >= bathrooms)
             
-            # Order by most recent
-            query = query.order_by(Property.sold_date.desc())
+            # The card template never reads the large text columns
+            query = PROPERTY_CARD.load_only(query)
+            per_page = current_app.config.get('PROPERTIES_PER_PAGE', 20)
             
-            # Paginate results
-            properties = query.paginate(
-                page=page,
-                per_page=current_app.config.get('PROPERTIES_PER_PAGE', 20),
-                error_out=False
-            )
+            # Most recent first; "Next" links seek by cursor, numbered links use pages.
+            # Cursor pages show the cached approximate count; numbered pages keep the
+            # exact count, since it decides the page links and whether there is a next page
+            if cursor:
+                properties = property_paginator.paginate(query, cursor=cursor, per_page=per_page, page=page)
+            else:
+                properties = property_paginator.order(query).paginate(
+                    page=page,
+                    per_page=per_page,
+                    error_out=False
+                )
+                properties.next_cursor = (property_paginator.cursor_for(properties.items[-1])
+                                          if properties.has_next and properties.items else None)
             
             return render_template('properties/search.html',
                                  cities=cities,
@@ -454,9 +391,9 @@ def mapview():
         
         # Apply filters
         if city:
-            query = query.filter(Property.city.ilike(f'%{city}%'))
+            query = query.filter(location_resolver.city_clause(city))
         if property_type:
-            query = query.filter(Property.property_type.ilike(f'%{property_type}%'))
+            query = query.filter(location_resolver.property_type_clause(property_type))
         if min_price:
             query = query.filter(Property.sold_price >= min_price)
         if max_price:
@@ -637,9 +574,9 @@ def map_data():
         
         # Apply filters
         if city:
-            query = query.filter(Property.city.ilike(f'%{city}%'))
+            query = query.filter(location_resolver.city_clause(city))
         if property_type:
-            query = query.filter(Property.property_type.ilike(f'%{property_type}%'))
+            query = query.filter(location_resolver.property_type_clause(property_type))
         if min_price:
             query = query.filter(Property.sold_price >= min_price)
         if max_price:
@@ -649,25 +586,8 @@ def map_data():
         if bathrooms:
             query = query.filter(Property.bathrooms >= bathrooms)
         
-        # Limit results for performance
-        properties = query.limit(500).all()
-        
-        # Format data for map
-        map_data = []
-        for prop in properties:
-            map_data.append({
-                'listing_id': prop.listing_id,
-                'lat': float(prop.latitude),
-                'lng': float(prop.longitude),
-                'price': float(prop.sold_price) if prop.sold_price else None,
-                'address': prop.address,
-                'city': prop.city,
-                'property_type': prop.property_type,
-                'bedrooms': prop.bedrooms,
-                'bathrooms': float(prop.bathrooms) if prop.bathrooms else None,
-                'sqft': prop.sqft,
-                'sold_date': prop.sold_date.isoformat() if prop.sold_date else None
-            })
+        # Limit results for performance and load only the marker columns
+        map_data = PROPERTY_MAP_PIN.serialize_all(PROPERTY_MAP_PIN.rows(query).limit(500).all())
         
         return jsonify({
             'properties': map_data,
@@ -1182,7 +1102,7 @@ def upload_property():
         
         # Clear analytics cache to ensure real-time updates
         try:
-            from app import cache
+            from app.extensions import cache
             cache.delete('analytics_real_time_updates')
             cache.delete('market_summary')
             cache.delete('stats_summary')
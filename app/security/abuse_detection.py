@@ -5,7 +5,6 @@ Provides intelligent abuse detection with progressive rate limiting and behavior
 
 import time
 import json
-import hashlib
 from collections import defaultdict, deque
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any, Set
@@ -13,9 +12,8 @@ from dataclasses import dataclass, field
 from enum import Enum
 from flask import request, current_app, g, session
 import redis
-from threading import Lock
+from threading import Event, Lock, Thread
 import logging
-import numpy as np
 import statistics
 
 # Import pattern analysis rate limiter
@@ -23,6 +21,9 @@ from app.security.pattern_analysis_rate_limiter import (
     PatternAnalysisType, AnalysisComplexity, 
     check_pattern_analysis_rate_limit, record_pattern_analysis
 )
+from app.security.request_payload import get_request_payload
+from app.security.streaming_stats import WindowedRequestStats, WindowSummary
+from app.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -78,6 +79,9 @@ class AbuseIncident:
 class AbuseDetectionRateLimiter:
     """Rate limiter specifically designed for abuse detection and prevention."""
     
+    # Seconds between background sweeps of idle client statistics
+    CLEANUP_INTERVAL = 300
+    
     def __init__(self, redis_client=None, app=None):
         self.redis_client = redis_client
         self.app = app
@@ -85,6 +89,12 @@ class AbuseDetectionRateLimiter:
         self.client_metrics = defaultdict(lambda: defaultdict(deque))
         self.lock = Lock()
         
+        # Per-client streaming request statistics over the analysis window
+        self.analysis_window = 300  # 5 minutes
+        self.client_stats: Dict[str, WindowedRequestStats] = {}
+        self._cleanup_thread: Optional[Thread] = None
+        self._stop_cleanup = Event()
+        
         # Abuse-specific rate limiting rules
         self.abuse_limits = {
             # Progressive limits based on abuse level
@@ -124,21 +134,19 @@ class AbuseDetectionRateLimiter:
     def analyze_request_patterns(self, client_id: str) -> AbuseMetrics:
         """Analyze request patterns for a specific client with rate limiting."""
         current_time = time.time()
-        window = 300  # 5 minutes
-        cutoff_time = current_time - window
-        
-        # Get recent requests for this client
-        requests = self.client_metrics[client_id]['requests']
+        window = self.analysis_window
         
-        # Clean old requests
-        while requests and requests[0]['timestamp'] < cutoff_time:
-            requests.popleft()
+        stats = self.client_stats.get(client_id)
+        if stats is None:
+            return AbuseMetrics()
         
-        if not requests:
+        # Cheap counters first; distinct-value sketches only for detailed analysis
+        summary = stats.summarize(current_time, include_distinct=False)
+        if not summary.request_count:
             return AbuseMetrics()
         
         # Check rate limit for pattern analysis
-        data_size = len(str(requests))  # Approximate data size
+        data_size = summary.data_bytes  # Approximate data size
         parameters = {'window': window, 'client_id': client_id}
         
         analysis_allowed, retry_after, reason = check_pattern_analysis_rate_limit(
@@ -148,14 +156,14 @@ class AbuseDetectionRateLimiter:
         if not analysis_allowed:
             logger.warning(f"Pattern analysis rate limited for {client_id}: {reason}")
             # Return cached or simplified analysis
-            return self._get_cached_or_simple_analysis(client_id, requests)
+            return self._get_cached_or_simple_analysis(client_id, summary)
         
         # Record the start of analysis
         analysis_start_time = time.time()
         
         try:
             # Perform full pattern analysis
-            metrics = self._perform_detailed_pattern_analysis(requests)
+            metrics = self._perform_detailed_pattern_analysis(stats, current_time)
             
             # Record successful analysis
             processing_time = time.time() - analysis_start_time
@@ -174,9 +182,9 @@ class AbuseDetectionRateLimiter:
                 data_size, parameters, processing_time
             )
             # Return simplified analysis on error
-            return self._get_simple_analysis(requests)
+            return self._get_simple_analysis(summary)
     
-    def _get_cached_or_simple_analysis(self, client_id: str, requests: deque) -> AbuseMetrics:
+    def _get_cached_or_simple_analysis(self, client_id: str, summary: WindowSummary) -> AbuseMetrics:
         """Get cached analysis or perform simple analysis when rate limited."""
         # Check if we have cached results
         cache_key = f"pattern_analysis_cache:{client_id}"
@@ -195,68 +203,36 @@ class AbuseDetectionRateLimiter:
                 logger.debug(f"Cache lookup failed: {e}")
         
         # Perform simple analysis
-        return self._get_simple_analysis(requests)
+        return self._get_simple_analysis(summary)
     
-    def _perform_detailed_pattern_analysis(self, requests: deque) -> AbuseMetrics:
-        """Perform detailed pattern analysis with full metrics calculation."""
-        request_count = len(requests)
-        
-        # Error rate calculation
-        error_requests = sum(1 for r in requests if r.get('status_code', 200) >= 400)
-        error_rate = error_requests / request_count if request_count > 0 else 0
-        
-        # Response time variance
-        response_times = [r.get('response_time', 0) for r in requests]
-        response_time_variance = np.var(response_times) if len(response_times) > 1 else 0
+    def _perform_detailed_pattern_analysis(self, stats: WindowedRequestStats,
+                                           current_time: float) -> AbuseMetrics:
+        """Perform detailed pattern analysis from the client's streaming accumulators."""
+        summary = stats.summarize(current_time)
         
-        # Unique endpoints analysis
-        unique_endpoints = len(set(r.get('endpoint', '') for r in requests))
-        
-        # Parameter variations analysis
-        param_sets = set()
-        for r in requests:
-            params = r.get('parameters', {})
-            param_hash = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
-            param_sets.add(param_hash)
-        parameter_variations = len(param_sets)
-        
-        # User agent analysis
-        user_agents = set(r.get('user_agent', '') for r in requests)
-        user_agent_switches = len(user_agents) - 1 if len(user_agents) > 1 else 0
-        
-        # Failed auth attempts
-        failed_auth_attempts = sum(1 for r in requests 
-                                 if 'auth' in r.get('endpoint', '') and r.get('status_code', 200) >= 400)
+        unique_user_agents = summary.unique_user_agents
+        user_agent_switches = unique_user_agents - 1 if unique_user_agents > 1 else 0
         
         return AbuseMetrics(
-            request_count=request_count,
-            error_rate=error_rate,
-            response_time_variance=response_time_variance,
-            unique_endpoints=unique_endpoints,
-            parameter_variations=parameter_variations,
+            request_count=summary.request_count,
+            error_rate=summary.error_rate,
+            response_time_variance=summary.response_time_variance,
+            unique_endpoints=summary.unique_endpoints,
+            parameter_variations=summary.parameter_variations,
             user_agent_switches=user_agent_switches,
-            failed_auth_attempts=failed_auth_attempts
+            failed_auth_attempts=summary.failed_auth_count
         )
     
-    def _get_simple_analysis(self, requests: deque) -> AbuseMetrics:
+    def _get_simple_analysis(self, summary: WindowSummary) -> AbuseMetrics:
         """Perform simple analysis when detailed analysis is not available."""
-        request_count = len(requests)
-        
-        # Basic calculations only
-        error_requests = sum(1 for r in requests if r.get('status_code', 200) >= 400)
-        error_rate = error_requests / request_count if request_count > 0 else 0
-        
-        failed_auth_attempts = sum(1 for r in requests 
-                                 if 'auth' in r.get('endpoint', '') and r.get('status_code', 200) >= 400)
-        
         return AbuseMetrics(
-            request_count=request_count,
-            error_rate=error_rate,
+            request_count=summary.request_count,
+            error_rate=summary.error_rate,
             response_time_variance=0,  # Skip complex calculation
             unique_endpoints=0,        # Skip complex calculation
             parameter_variations=0,    # Skip complex calculation
             user_agent_switches=0,     # Skip complex calculation
-            failed_auth_attempts=failed_auth_attempts
+            failed_auth_attempts=summary.failed_auth_count
         )
     
     def detect_abuse_type(self, metrics: AbuseMetrics, client_id: str) -> Tuple[AbuseType, AbuseLevel, float]:
@@ -315,25 +291,78 @@ class AbuseDetectionRateLimiter:
         """Record a request for analysis."""
         current_time = time.time()
         
-        request_record = {
-            'timestamp': current_time,
-            'endpoint': request_data.get('endpoint', ''),
-            'method': request_data.get('method', 'GET'),
-            'status_code': request_data.get('status_code', 200),
-            'response_time': request_data.get('response_time', 0),
-            'user_agent': request_data.get('user_agent', ''),
-            'parameters': request_data.get('parameters', {}),
-            'ip_address': request_data.get('ip_address', ''),
-        }
+        endpoint = request_data.get('endpoint', '') or ''
+        user_agent = request_data.get('user_agent', '') or ''
+        parameter_key = json.dumps(request_data.get('parameters', {}), sort_keys=True, default=str)
+        
+        stats = self.client_stats.get(client_id)
+        if stats is None:
+            with self.lock:
+                stats = self.client_stats.setdefault(
+                    client_id, WindowedRequestStats(window=self.analysis_window)
+                )
+        
+        stats.record(
+            timestamp=current_time,
+            endpoint=endpoint,
+            status_code=request_data.get('status_code', 200),
+            response_time=request_data.get('response_time', 0),
+            user_agent=user_agent,
+            parameter_key=parameter_key,
+            data_bytes=len(endpoint) + len(user_agent) + len(parameter_key) + 64
+        )
         
+        # Idle clients are dropped by a background sweep, never on the request path
+        if self._cleanup_thread is None:
+            self._start_cleanup_thread()
+    
+    def _start_cleanup_thread(self):
+        """Start the idle-client sweep (on the first recorded request, so only serving processes run it)."""
         with self.lock:
-            self.client_metrics[client_id]['requests'].append(request_record)
-            
-            # Keep only recent requests (last hour)
-            cutoff_time = current_time - 3600
-            requests = self.client_metrics[client_id]['requests']
-            while requests and requests[0]['timestamp'] < cutoff_time:
-                requests.popleft()
+            if self._cleanup_thread is not None:
+                return
+            self._stop_cleanup.clear()
+            self._cleanup_thread = Thread(
+                target=self._cleanup_loop, name='abuse-detection-cleanup', daemon=True
+            )
+            self._cleanup_thread.start()
+    
+    def _cleanup_loop(self):
+        while not self._stop_cleanup.wait(self.CLEANUP_INTERVAL):
+            try:
+                removed = self.cleanup_inactive_clients()
+                if removed:
+                    logger.debug(f"Dropped request statistics for {removed} idle clients")
+            except Exception as e:
+                logger.error(f"Abuse detection cleanup failed: {e}")
+    
+    def stop_cleanup(self):
+        """Stop the background sweep."""
+        self._stop_cleanup.set()
+        thread, self._cleanup_thread = self._cleanup_thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+    
+    def cleanup_inactive_clients(self, current_time: Optional[float] = None) -> int:
+        """Remove streaming statistics for clients idle longer than the analysis window."""
+        current_time = current_time or time.time()
+        cutoff_time = current_time - self.analysis_window
+        
+        # Scan a snapshot without the lock; new clients only wait for the deletes
+        inactive = [
+            client_id for client_id, stats in list(self.client_stats.items())
+            if stats.last_seen < cutoff_time
+        ]
+        removed = 0
+        with self.lock:
+            for client_id in inactive:
+                stats = self.client_stats.get(client_id)
+                # Skip clients that sent a request since the scan
+                if stats is not None and stats.last_seen < cutoff_time:
+                    del self.client_stats[client_id]
+                    removed += 1
+        
+        return removed
     
     def check_abuse_rate_limit(self, client_id: str) -> Tuple[bool, int, Optional[AbuseIncident]]:
         """Check if client should be rate limited based on abuse detection."""
@@ -526,6 +555,8 @@ class AbuseDetectionRateLimiter:
             del self.incidents[client_id]
         if client_id in self.client_metrics:
             del self.client_metrics[client_id]
+        with self.lock:
+            self.client_stats.pop(client_id, None)
         
         logger.info(f"Cleared abuse history for client: {client_id}")
 
@@ -552,6 +583,7 @@ class AbuseDetectionMiddleware:
         # Fall back to IP address
         return f"ip:{request.remote_addr}"
     
+    @tracer.traced('rate_limit')
     def _before_request(self):
         """Check for abuse before processing request."""
         # Skip abuse detection for certain endpoints
@@ -603,7 +635,8 @@ class AbuseDetectionMiddleware:
             'status_code': response.status_code,
             'response_time': response_time,
             'user_agent': request.headers.get('User-Agent', ''),
-            'parameters': dict(request.args),
+            # Query arguments decoded once per request by the security pipeline
+            'parameters': get_request_payload().args,
             'ip_address': request.remote_addr,
         }
         
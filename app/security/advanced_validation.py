@@ -10,13 +10,64 @@ import json
 import pickle
 import hashlib
 from typing import Dict, List, Tuple, Optional, Any, Union
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, replace
 from enum import Enum
 import numpy as np
 from collections import Counter, defaultdict
 import time
 from flask import current_app
 
+from .pattern_scanner import MultiPatternScanner
+from .verdict_cache import MISSING, verdict_cache
+
+
+# ML feature layout: counted characters, letter frequencies, keywords, trigrams
+_COUNTED_CHARS = ['<', '>', '(', ')', '"', "'", '=', ';', '&', '%', '\\']
+_FREQUENCY_CHARS = ['s', 'c', 'r', 'i', 'p', 't']
+_FEATURE_KEYWORDS = [
+    'script', 'javascript', 'eval', 'alert', 'document',
+    'window', 'location', 'cookie', 'onload', 'onerror',
+    'union', 'select', 'insert', 'delete', 'drop',
+    'exec', 'system', 'cmd', 'shell'
+]
+_SUSPICIOUS_TRIGRAMS = ['scr', 'ipt', 'eva', 'ale', 'ert', 'uni', 'ion', 'sel']
+_ENCODING_FEATURES = [
+    ('%', re.compile(r'%[0-9a-f]{2}', re.IGNORECASE)),    # URL encoded
+    ('&', re.compile(r'&#\d+;')),                          # HTML entities
+    ('\\', re.compile(r'\\u[0-9a-f]{4}', re.IGNORECASE)),  # Unicode
+    ('\\', re.compile(r'\\x[0-9a-f]{2}', re.IGNORECASE)),  # Hex
+]
+_HTML_TAG = re.compile(r'<[^>]+>')
+_FUNCTION_CALL = re.compile(r'\b\w+\s*\(')
+
+# Code points above this share one histogram bin
+_HISTOGRAM_BINS = 129
+
+_KEYWORD_OFFSET = 1 + len(_COUNTED_CHARS) + len(_FREQUENCY_CHARS)
+_TRIGRAM_OFFSET = _KEYWORD_OFFSET + len(_FEATURE_KEYWORDS)
+_ENCODING_OFFSET = _TRIGRAM_OFFSET + len(_SUSPICIOUS_TRIGRAMS)
+_STRUCTURE_OFFSET = _ENCODING_OFFSET + len(_ENCODING_FEATURES)
+FEATURE_COUNT = _STRUCTURE_OFFSET + 3
+
+# Heuristic model weights: the counted characters matter most
+_ML_WEIGHTS = np.array(
+    [2.0, 5.0, 5.0, 3.0, 3.0, 2.0, 2.0, 3.0, 4.0, 2.0, 3.0, 3.0]
+    + [1.0] * (FEATURE_COUNT - 12)
+)
+
+
+def _char_histograms(strings: List[str]) -> np.ndarray:
+    """Per-string code point histograms (one row per string) from a single bincount."""
+    lengths = np.fromiter((len(s) for s in strings), dtype=np.int64, count=len(strings))
+    code_points = np.frombuffer(
+        ''.join(strings).encode('utf-32-le', 'surrogatepass'), dtype='<u4'
+    )
+    bins = np.minimum(code_points, _HISTOGRAM_BINS - 1).astype(np.int64)
+    bins += np.repeat(np.arange(len(strings), dtype=np.int64) * _HISTOGRAM_BINS, lengths)
+    return np.bincount(bins, minlength=len(strings) * _HISTOGRAM_BINS).reshape(
+        len(strings), _HISTOGRAM_BINS
+    )
+
 
 class ValidationResult(Enum):
     """Validation result types."""
@@ -52,6 +103,19 @@ class ValidationReport:
     processing_time: float = 0.0
 
 
+def _encode_validation_report(report: ValidationReport) -> Dict[str, Any]:
+    """Serialize a ValidationReport for the shared verdict cache."""
+    data = asdict(report)
+    data['result'] = report.result.value
+    return data
+
+
+def _decode_validation_report(data: Dict[str, Any]) -> ValidationReport:
+    """Rebuild a ValidationReport from the shared verdict cache."""
+    data['result'] = ValidationResult(data['result'])
+    return ValidationReport(**data)
+
+
 class AdvancedInputValidator:
     """Advanced input validator with ML-based threat detection."""
     
@@ -60,6 +124,7 @@ class AdvancedInputValidator:
         self.feature_cache = {}
         self.pattern_weights = {}
         self.model_cache = {}
+        self.verdict_cache = verdict_cache
         
         # Enhanced XSS detection patterns with weights
         self.xss_patterns = {
@@ -232,6 +297,16 @@ class AdvancedInputValidator:
             }
         }
         
+        # Every detection pattern compiled once into a literal-indexed scanner
+        self.pattern_scanner = MultiPatternScanner(
+            (f"{prefix}_{category}", pattern, pattern_info['weight'])
+            for prefix, pattern_group in (('xss', self.xss_patterns),
+                                          ('sqli', self.sqli_patterns),
+                                          ('cmdi', self.command_injection_patterns))
+            for category, pattern_info in pattern_group.items()
+            for pattern in pattern_info['patterns']
+        )
+        
         # Input type specific validators
         self.type_validators = {
             InputType.EMAIL: self._validate_email,
@@ -284,14 +359,29 @@ class AdvancedInputValidator:
                 processing_time=time.time() - start_time
             )
         
+        report = self.verdict_cache.get_or_compute(
+            'validation', f"{input_type.value}:{context or ''}", input_str,
+            lambda: self._validate_uncached(input_str, input_type, context),
+            encode=_encode_validation_report, decode=_decode_validation_report
+        )
+        return replace(report, patterns_detected=list(report.patterns_detected),
+                       processing_time=time.time() - start_time)
+
+    def _validate_uncached(self, input_str: str, input_type: InputType,
+                           context: Optional[str],
+                           ml_score: Optional[float] = None) -> ValidationReport:
+        """Run pattern, ML, context and type checks on non-empty input."""
+        start_time = time.time()
+        
         # Pattern-based detection
         pattern_score, patterns = self._detect_patterns(input_str)
         
-        # Feature extraction for ML
-        features = self._extract_features(input_str, input_type)
-        
-        # ML-based prediction
-        ml_score = self._ml_predict(features, input_type)
+        if ml_score is None:
+            # Feature extraction for ML
+            features = self._extract_features(input_str, input_type)
+            
+            # ML-based prediction
+            ml_score = self._ml_predict(features, input_type)
         
         # Context-specific validation
         context_score = self._validate_context(input_str, context)
@@ -333,6 +423,10 @@ class AdvancedInputValidator:
         """
         Validate multiple inputs in batch.
         
+        Produces the same per-field reports as calling ``validate_input`` for
+        each field, but extracts ML features for all uncached fields into one
+        matrix and scores it in a single pass.
+        
         Args:
             inputs: Dictionary of input names to values
             input_types: Dictionary of input names to types
@@ -340,11 +434,43 @@ class AdvancedInputValidator:
         Returns:
             Dict: Validation reports for each input
         """
+        start_time = time.time()
         results = {}
+        pending = []
         
         for name, value in inputs.items():
             input_type = input_types.get(name, InputType.TEXT) if input_types else InputType.TEXT
-            results[name] = self.validate_input(value, input_type, context=name)
+            input_str = str(value) if value is not None else ""
+            
+            if not input_str.strip():
+                results[name] = self.validate_input(input_str, input_type, context=name)
+                continue
+            
+            cached = self.verdict_cache.lookup(
+                'validation', f"{input_type.value}:{name}", input_str, _decode_validation_report
+            )
+            if cached is not MISSING:
+                results[name] = replace(cached, patterns_detected=list(cached.patterns_detected))
+            else:
+                results[name] = None
+                pending.append((name, input_str, input_type))
+        
+        if pending:
+            features = self._extract_features_batch([input_str for _, input_str, _ in pending])
+            ml_scores = self._ml_predict_batch(features)
+            
+            for (name, input_str, input_type), ml_score in zip(pending, ml_scores):
+                report = self._validate_uncached(input_str, input_type, name, float(ml_score))
+                self.verdict_cache.store(
+                    'validation', f"{input_type.value}:{name}", input_str, report,
+                    _encode_validation_report
+                )
+                results[name] = replace(report, patterns_detected=list(report.patterns_detected))
+        
+        # Share the batch cost evenly across the fields it covered
+        per_field_time = (time.time() - start_time) / len(results) if results else 0.0
+        for report in results.values():
+            report.processing_time = per_field_time
         
         return results
 
@@ -353,138 +479,91 @@ class AdvancedInputValidator:
         total_score = 0.0
         detected_patterns = []
         
-        input_lower = input_str.lower()
-        
-        # Check XSS patterns
-        for category, pattern_info in self.xss_patterns.items():
-            for pattern in pattern_info['patterns']:
-                matches = re.findall(pattern, input_str, re.IGNORECASE | re.DOTALL)
-                if matches:
-                    total_score += pattern_info['weight'] * len(matches)
-                    detected_patterns.append(f"xss_{category}")
-        
-        # Check SQL injection patterns
-        for category, pattern_info in self.sqli_patterns.items():
-            for pattern in pattern_info['patterns']:
-                matches = re.findall(pattern, input_str, re.IGNORECASE | re.DOTALL)
-                if matches:
-                    total_score += pattern_info['weight'] * len(matches)
-                    detected_patterns.append(f"sqli_{category}")
-        
-        # Check command injection patterns
-        for category, pattern_info in self.command_injection_patterns.items():
-            for pattern in pattern_info['patterns']:
-                matches = re.findall(pattern, input_str, re.IGNORECASE | re.DOTALL)
-                if matches:
-                    total_score += pattern_info['weight'] * len(matches)
-                    detected_patterns.append(f"cmdi_{category}")
+        # XSS, SQL injection and command injection patterns in one scan
+        for rule, count in self.pattern_scanner.scan(input_str):
+            total_score += rule.weight * count
+            detected_patterns.append(rule.category)
         
         return total_score, detected_patterns
 
     def _extract_features(self, input_str: str, input_type: InputType) -> np.ndarray:
         """Extract features for ML prediction."""
-        features = []
-        
-        # Basic features
-        features.extend([
-            len(input_str),  # Length
-            input_str.count('<'),  # HTML tag indicators
-            input_str.count('>'),
-            input_str.count('('),  # Function call indicators
-            input_str.count(')'),
-            input_str.count('"'),  # Quote indicators
-            input_str.count("'"),
-            input_str.count('='),  # Assignment indicators
-            input_str.count(';'),  # Statement separators
-            input_str.count('&'),  # Entity indicators
-            input_str.count('%'),  # Encoding indicators
-            input_str.count('\\'),  # Escape indicators
-        ])
+        return self._extract_features_batch([input_str])[0]
+
+    def _extract_features_batch(self, inputs: List[str]) -> np.ndarray:
+        """
+        Extract ML features for many inputs into a (len(inputs), FEATURE_COUNT) array.
         
-        # Character distribution features
-        char_counts = Counter(input_str.lower())
-        total_chars = len(input_str)
-        
-        if total_chars > 0:
-            features.extend([
-                char_counts.get('s', 0) / total_chars,  # 's' frequency (script)
-                char_counts.get('c', 0) / total_chars,  # 'c' frequency
-                char_counts.get('r', 0) / total_chars,  # 'r' frequency
-                char_counts.get('i', 0) / total_chars,  # 'i' frequency
-                char_counts.get('p', 0) / total_chars,  # 'p' frequency
-                char_counts.get('t', 0) / total_chars,  # 't' frequency
-            ])
-        else:
-            features.extend([0.0] * 6)
+        Character counts and letter frequencies come from code point
+        histograms built with one ``bincount`` over all inputs; regex features
+        are only evaluated when their trigger character is present.
+        """
+        features = np.zeros((len(inputs), FEATURE_COUNT), dtype=np.float64)
+        if not inputs:
+            return features.astype(np.float32)
         
-        # Keyword presence features
-        keywords = [
-            'script', 'javascript', 'eval', 'alert', 'document',
-            'window', 'location', 'cookie', 'onload', 'onerror',
-            'union', 'select', 'insert', 'delete', 'drop',
-            'exec', 'system', 'cmd', 'shell'
-        ]
+        lowered = [input_str.lower() for input_str in inputs]
+        counts = _char_histograms(inputs)
+        lower_counts = _char_histograms(lowered)
+        lengths = np.array([len(input_str) for input_str in inputs], dtype=np.float64)
         
-        input_lower = input_str.lower()
-        for keyword in keywords:
-            features.append(1.0 if keyword in input_lower else 0.0)
-        
-        # N-gram features (trigrams of suspicious patterns)
-        suspicious_trigrams = ['scr', 'ipt', 'eva', 'ale', 'ert', 'uni', 'ion', 'sel']
-        for trigram in suspicious_trigrams:
-            features.append(1.0 if trigram in input_lower else 0.0)
-        
-        # Encoding features
-        features.extend([
-            1.0 if re.search(r'%[0-9a-f]{2}', input_str, re.IGNORECASE) else 0.0,  # URL encoded
-            1.0 if re.search(r'&#\d+;', input_str) else 0.0,  # HTML entities
-            1.0 if re.search(r'\\u[0-9a-f]{4}', input_str, re.IGNORECASE) else 0.0,  # Unicode
-            1.0 if re.search(r'\\x[0-9a-f]{2}', input_str, re.IGNORECASE) else 0.0,  # Hex
-        ])
-        
-        # Structure features
-        features.extend([
-            input_str.count('http://') + input_str.count('https://'),  # URL count
-            len(re.findall(r'<[^>]+>', input_str)),  # HTML tag count
-            len(re.findall(r'\b\w+\s*\(', input_str)),  # Function call count
-        ])
-        
-        return np.array(features, dtype=np.float32)
+        # Basic features: length and counted characters
+        features[:, 0] = lengths
+        for column, char in enumerate(_COUNTED_CHARS, start=1):
+            features[:, column] = counts[:, ord(char)]
+        
+        # Character distribution features
+        safe_lengths = np.where(lengths > 0, lengths, 1.0)
+        for column, char in enumerate(_FREQUENCY_CHARS, start=1 + len(_COUNTED_CHARS)):
+            features[:, column] = np.where(lengths > 0, lower_counts[:, ord(char)] / safe_lengths, 0.0)
+        
+        percent, ampersand, backslash, open_angle, open_paren = (
+            counts[:, ord(char)] for char in ('%', '&', '\\', '<', '(')
+        )
+        trigger_counts = {'%': percent, '&': ampersand, '\\': backslash}
+        
+        for row, (input_str, input_lower) in enumerate(zip(inputs, lowered)):
+            # Keyword presence and n-gram features
+            for column, keyword in enumerate(_FEATURE_KEYWORDS, start=_KEYWORD_OFFSET):
+                if keyword in input_lower:
+                    features[row, column] = 1.0
+            for column, trigram in enumerate(_SUSPICIOUS_TRIGRAMS, start=_TRIGRAM_OFFSET):
+                if trigram in input_lower:
+                    features[row, column] = 1.0
+            
+            # Encoding features
+            for column, (trigger, pattern) in enumerate(_ENCODING_FEATURES, start=_ENCODING_OFFSET):
+                if trigger_counts[trigger][row] and pattern.search(input_str):
+                    features[row, column] = 1.0
+            
+            # Structure features
+            features[row, _STRUCTURE_OFFSET] = input_str.count('http://') + input_str.count('https://')
+            if open_angle[row]:
+                features[row, _STRUCTURE_OFFSET + 1] = len(_HTML_TAG.findall(input_str))
+            if open_paren[row]:
+                features[row, _STRUCTURE_OFFSET + 2] = len(_FUNCTION_CALL.findall(input_str))
+        
+        return features.astype(np.float32)
 
     def _ml_predict(self, features: np.ndarray, input_type: InputType) -> float:
         """Make ML-based prediction (simplified heuristic model)."""
+        return float(self._ml_predict_batch(features[np.newaxis, :])[0])
+
+    def _ml_predict_batch(self, features: np.ndarray) -> np.ndarray:
+        """Score a feature matrix row by row with the heuristic model."""
         # Simple heuristic model (replace with trained ML model in production)
         
         # Normalize features
-        normalized_features = features / (np.linalg.norm(features) + 1e-8)
-        
-        # Weight important features more heavily
-        weights = np.array([
-            2.0,  # Length (suspicious if very long)
-            5.0,  # '<' count
-            5.0,  # '>' count
-            3.0,  # '(' count
-            3.0,  # ')' count
-            2.0,  # '"' count
-            2.0,  # "'" count
-            3.0,  # '=' count
-            4.0,  # ';' count
-            2.0,  # '&' count
-            3.0,  # '%' count
-            3.0,  # '\\' count
-        ] + [1.0] * (len(normalized_features) - 12))  # Rest get weight 1.0
-        
-        # Ensure weights array matches features length
-        if len(weights) != len(normalized_features):
-            weights = np.ones(len(normalized_features))
+        norms = np.sqrt(np.add.reduce(features * features, axis=1))
+        normalized_features = features / (norms + np.float32(1e-8))[:, np.newaxis]
         
         # Calculate weighted score
-        score = np.dot(normalized_features[:len(weights)], weights[:len(normalized_features)])
+        scores = np.add.reduce(normalized_features * _ML_WEIGHTS, axis=1)
         
         # Apply sigmoid to get probability between 0 and 1
-        probability = 1 / (1 + np.exp(-score + 5))  # Bias towards lower scores
+        probabilities = 1 / (1 + np.exp(-scores + 5))  # Bias towards lower scores
         
-        return float(probability * 10)  # Scale to 0-10
+        return probabilities * 10  # Scale to 0-10
 
     def _validate_context(self, input_str: str, context: Optional[str]) -> float:
         """Validate input based on context."""
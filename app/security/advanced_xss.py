@@ -10,7 +10,7 @@ import base64
 import json
 import urllib.parse
 from typing import Dict, List, Tuple, Optional, Any, Union
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, replace
 from enum import Enum
 import hashlib
 import time
@@ -20,6 +20,11 @@ from markupsafe import Markup
 from flask import current_app, request, g
 import html
 
+from .pattern_scanner import MultiPatternScanner
+from .verdict_cache import verdict_cache
+
+_BASE64_CANDIDATE = re.compile(r'[A-Za-z0-9+/]{20,}={0,2}')
+
 
 class ThreatLevel(Enum):
     """Threat level enumeration."""
@@ -52,13 +57,25 @@ class ThreatAnalysis:
     reason: Optional[str] = None
 
 
+def _encode_threat_analysis(analysis: ThreatAnalysis) -> Dict[str, Any]:
+    """Serialize a ThreatAnalysis for the shared verdict cache."""
+    data = asdict(analysis)
+    data['threat_level'] = analysis.threat_level.name
+    return data
+
+
+def _decode_threat_analysis(data: Dict[str, Any]) -> ThreatAnalysis:
+    """Rebuild a ThreatAnalysis from the shared verdict cache."""
+    data['threat_level'] = ThreatLevel[data['threat_level']]
+    return ThreatAnalysis(**data)
+
+
 class AdvancedXSSProtection:
     """Advanced XSS protection with behavioral analysis and threat scoring."""
     
     def __init__(self):
         """Initialize the advanced XSS protection system."""
-        self.threat_cache = {}
-        self.pattern_cache = {}
+        self.verdict_cache = verdict_cache
         self.request_tracking = defaultdict(list)
         
         # Advanced XSS patterns with severity scores
@@ -184,6 +201,13 @@ class AdvancedXSSProtection:
             'postMessage', 'addEventListener', 'removeEventListener'
         }
         
+        # All XSS patterns compiled once into a literal-indexed scanner
+        self.pattern_scanner = MultiPatternScanner(
+            (category, pattern, pattern_info['score'])
+            for category, pattern_info in self.xss_patterns.items()
+            for pattern in pattern_info['patterns']
+        )
+        
         # Context-specific encoders
         self.encoders = {
             Context.HTML: self._encode_html,
@@ -215,6 +239,17 @@ class AdvancedXSSProtection:
                 sanitized_content=""
             )
         
+        analysis = self.verdict_cache.get_or_compute(
+            'xss', context.value, content,
+            lambda: self._analyze_uncached(content, context),
+            encode=_encode_threat_analysis, decode=_decode_threat_analysis
+        )
+        # Callers may extend the result, so never hand out the cached lists
+        return replace(analysis, patterns_detected=list(analysis.patterns_detected),
+                       context_violations=list(analysis.context_violations))
+
+    def _analyze_uncached(self, content: str, context: Context) -> ThreatAnalysis:
+        """Run the full threat analysis for non-empty content."""
         # Calculate threat score
         score, patterns_detected = self._calculate_threat_score(content)
         
@@ -253,12 +288,10 @@ class AdvancedXSSProtection:
         content_lower = content.lower()
         
         # Check for XSS patterns
-        for category, pattern_info in self.xss_patterns.items():
-            for pattern in pattern_info['patterns']:
-                matches = re.findall(pattern, content, re.IGNORECASE | re.DOTALL)
-                if matches:
-                    total_score += pattern_info['score'] * len(matches)
-                    patterns_detected.append(f"{category}: {pattern}")
+        for rule, count in self.pattern_scanner.scan(
+                content, content_lower if content.isascii() else None):
+            total_score += rule.weight * count
+            patterns_detected.append(f"{rule.category}: {rule.pattern}")
         
         # Check for suspicious keywords
         for keyword in self.suspicious_keywords:
@@ -267,7 +300,7 @@ class AdvancedXSSProtection:
                 patterns_detected.append(f"suspicious_keyword: {keyword}")
         
         # Check for base64 encoded content (potential evasion)
-        base64_matches = re.findall(r'[A-Za-z0-9+/]{20,}={0,2}', content)
+        base64_matches = _BASE64_CANDIDATE.findall(content)
         for match in base64_matches:
             try:
                 decoded = base64.b64decode(match).decode('utf-8', errors='ignore')
@@ -16,6 +16,9 @@ import re
 from flask import request, session, g
 import numpy as np
 
+from .request_payload import get_request_payload
+from .verdict_cache import verdict_cache
+
 
 class BehaviorPattern(Enum):
     """Behavioral patterns that indicate potential threats."""
@@ -176,14 +179,15 @@ class BehavioralAnalyzer:
 
     def _extract_request_data(self) -> Dict:
         """Extract data from Flask request object."""
+        payload = get_request_payload()
         return {
             'ip_address': request.remote_addr,
             'user_agent': request.headers.get('User-Agent', ''),
             'url': request.url,
             'method': request.method,
-            'parameters': dict(request.args) if request.args else {},
-            'form_data': dict(request.form) if request.form else {},
-            'json_data': request.get_json() if request.is_json else {},
+            'parameters': payload.args,
+            'form_data': payload.form,
+            'json_data': payload.json_data if isinstance(payload.json_data, dict) else {},
             'headers': dict(request.headers),
             'cookies': dict(request.cookies) if request.cookies else {}
         }
@@ -410,28 +414,42 @@ class BehavioralAnalyzer:
             if not isinstance(param_value, str):
                 continue
             
-            param_lower = param_value.lower()
-            
-            # Script injection attempts
-            script_patterns = ['<script', 'javascript:', 'onload=', 'onerror=', 'eval(']
-            for pattern in script_patterns:
-                if pattern in param_lower:
-                    score += 1.5
-                    patterns.append(BehaviorPattern.SCRIPT_INJECTION_ATTEMPTS.value)
-            
-            # DOM manipulation attempts
-            dom_patterns = ['document.write', 'innerHTML', 'location.href', 'window.open']
-            for pattern in dom_patterns:
-                if pattern in param_lower:
-                    score += 1.0
-                    patterns.append(BehaviorPattern.DOM_MANIPULATION.value)
-            
-            # Social engineering indicators
-            social_patterns = ['alert(', 'confirm(', 'prompt(', 'document.cookie']
-            for pattern in social_patterns:
-                if pattern in param_lower:
-                    score += 0.5
-                    patterns.append(BehaviorPattern.SOCIAL_ENGINEERING.value)
+            value_score, value_patterns = verdict_cache.get_or_compute(
+                'behavior', 'content', param_value,
+                lambda: self._score_content_value(param_value),
+                encode=list, decode=tuple
+            )
+            score += value_score
+            patterns.extend(value_patterns)
+        
+        return score, patterns
+
+    def _score_content_value(self, param_value: str) -> Tuple[float, List[str]]:
+        """Score a single parameter value for attack patterns."""
+        patterns = []
+        score = 0.0
+        param_lower = param_value.lower()
+        
+        # Script injection attempts
+        script_patterns = ['<script', 'javascript:', 'onload=', 'onerror=', 'eval(']
+        for pattern in script_patterns:
+            if pattern in param_lower:
+                score += 1.5
+                patterns.append(BehaviorPattern.SCRIPT_INJECTION_ATTEMPTS.value)
+        
+        # DOM manipulation attempts
+        dom_patterns = ['document.write', 'innerHTML', 'location.href', 'window.open']
+        for pattern in dom_patterns:
+            if pattern in param_lower:
+                score += 1.0
+                patterns.append(BehaviorPattern.DOM_MANIPULATION.value)
+        
+        # Social engineering indicators
+        social_patterns = ['alert(', 'confirm(', 'prompt(', 'document.cookie']
+        for pattern in social_patterns:
+            if pattern in param_lower:
+                score += 0.5
+                patterns.append(BehaviorPattern.SOCIAL_ENGINEERING.value)
         
         return score, patterns
 
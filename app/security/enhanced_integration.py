@@ -8,10 +8,12 @@ security infrastructure, providing a unified security layer.
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
+import re
 import time
-import json
-from flask import request, g, current_app, session
+from contextlib import contextmanager
+from flask import abort, request, g, current_app, session
 from functools import wraps
+from werkzeug.exceptions import RequestEntityTooLarge
 
 # Import existing security modules
 from app.security.middleware import XSSProtection, CSRFProtection, security_middleware
@@ -22,6 +24,28 @@ from .advanced_xss import advanced_xss, ThreatLevel, Context, ThreatAnalysis
 from .behavioral_analysis import behavioral_analyzer, BehaviorAnalysis, BehaviorPattern
 from .enhanced_csp import csp_manager, CSPPolicy, CSPMode, CSPDirective
 from .advanced_validation import advanced_validator, ValidationResult, InputType, ValidationReport
+from .request_payload import RequestPayload, get_request_payload, request_body_length
+from .verdict_cache import verdict_cache
+from app.tracing import tracer
+
+
+# Cheap pre-filter for the expensive analyzers. The XSS analyzer and the input
+# validator only score content containing one of these tokens, so fields
+# without a match skip deep analysis. Keep it in step with their rules:
+# test_prefilter_passes_every_analyzer_rule checks a sample of every rule.
+PREFILTER_PATTERN = re.compile(
+    r'[<>]|&#|%[0-9a-f]{2}|\\[ux]'                               # markup and encodings
+    r'|[\w.]\s*\(|on\w+\s*='                                      # calls and event handlers
+    r'|(?:script|data|file|about|mocha|behavior)\s*:'             # URL schemes, CSS behaviors
+    r'|document\.|window\.|location\.|history\.|console\.log|debugger'
+    r'|innerhtml|outerhtml|adjacenthtml|createelement|(?:append|remove)child'
+    r'|attribute|storage|indexeddb|xmlhttprequest|fetch|websocket'
+    r'|postmessage|eventlistener|alert|confirm|prompt|fromcharcode'
+    r'|expression|@import|-moz-binding'
+    r'|union\s|waitfor|\s(?:or|and)\s+(?:\d+\s*=|\')|[;|&]\s*\w+\s'       # SQL and command injection
+    r'|[a-z0-9+/]{20,}',                                         # possible base64 payloads
+    re.IGNORECASE
+)
 
 
 class SecurityLevel(Enum):
@@ -43,6 +67,7 @@ class SecurityConfig:
     block_critical_threats: bool = True
     rate_limit_suspicious: bool = True
     log_all_attempts: bool = False
+    max_payload_bytes: Optional[int] = 1024 * 1024
 
 
 @dataclass
@@ -66,24 +91,51 @@ class ComprehensiveSecurityReport:
     
     # Performance metrics
     processing_time: float = 0.0
+    stage_timings: Dict[str, float] = None
+    prefilter_flagged: int = 0
+    
+    # HTTP status for requests rejected outright (429 rate limit, 413 payload size)
+    rejection_status: Optional[int] = None
     
     def __post_init__(self):
         if self.actions_taken is None:
             self.actions_taken = []
+        if self.stage_timings is None:
+            self.stage_timings = {}
         if self.validation_reports is None:
             self.validation_reports = {}
         if self.csp_violations is None:
             self.csp_violations = []
 
 
+class _StageTimer:
+    """Records per-stage wall time into a report."""
+    
+    def __init__(self, report: ComprehensiveSecurityReport):
+        self.report = report
+    
+    @contextmanager
+    def __call__(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.report.stage_timings[stage] = time.perf_counter() - start
+
+
 class EnhancedSecurityManager:
     """Enhanced security manager integrating all security features."""
     
+    # Token bucket applied while an IP is under a rate-limit penalty
+    PENALTY_BUCKET_CAPACITY = 10
+    PENALTY_REFILL_RATE = 10 / 60.0  # tokens per second
+    
     def __init__(self):
         """Initialize enhanced security manager."""
         self.security_reports = []
         self.blocked_ips = set()
         self.rate_limited_ips = {}
+        self.penalty_buckets: Dict[str, Tuple[float, float]] = {}
         
         # Security configurations for different contexts
         self.context_configs = {
@@ -113,14 +165,22 @@ class EnhancedSecurityManager:
                 enable_behavioral_analysis=True,
                 enable_advanced_xss=True,
                 enable_enhanced_csp=True,
-                log_all_attempts=True
+                log_all_attempts=True,
+                max_payload_bytes=16 * 1024 * 1024
             )
         }
 
+    @tracer.traced('security')
     def analyze_request(self, context: str = 'public') -> ComprehensiveSecurityReport:
         """
         Perform comprehensive security analysis on current request.
         
+        Stages run cheapest first and stop early once a verdict is final:
+        blocklist, penalty token bucket and payload size checks run on every
+        request; behavioral analysis always runs because it tracks request
+        history; XSS analysis and input validation only run for the fields a
+        pre-filter scan flags. The payload is parsed once and shared via ``g``.
+        
         Args:
             context: Security context (public, admin, api, upload)
             
@@ -132,32 +192,66 @@ class EnhancedSecurityManager:
         # Get security configuration for context
         config = self.context_configs.get(context, self.context_configs['public'])
         
-        # Generate unique request ID
-        request_id = self._generate_request_id()
-        
         # Extract request information
         ip_address = request.remote_addr if request else 'unknown'
         user_agent = request.headers.get('User-Agent', 'unknown') if request else 'unknown'
         
         # Initialize report
         report = ComprehensiveSecurityReport(
-            timestamp=time.time(),
-            request_id=request_id,
+            timestamp=start_time,
+            request_id=self._generate_request_id(),
             ip_address=ip_address,
             user_agent=user_agent
         )
+        timer = _StageTimer(report)
         
-        # Check if IP is already blocked
-        if ip_address in self.blocked_ips:
+        # 1. Blocklist
+        with timer('blocklist'):
+            blocked = self._is_blocked(ip_address)
+        if blocked:
             report.overall_threat_level = ThreatLevel.CRITICAL
             report.recommendation = "BLOCKED: IP address is on blocklist"
             report.actions_taken.append("request_blocked")
-            return report
+            return self._finish_report(report, config, start_time)
         
-        # 1. Behavioral Analysis
+        # 2. Token bucket for clients already under a rate-limit penalty
+        with timer('rate_limit'):
+            allowed = self._penalty_allows(ip_address, start_time)
+        if not allowed:
+            report.overall_threat_level = ThreatLevel.HIGH
+            report.recommendation = "REJECT: Rate limit penalty exceeded"
+            report.actions_taken.append("rate_limit_exceeded")
+            report.rejection_status = 429
+            return self._finish_report(report, config, start_time)
+        
+        # 3. Payload size limit
+        with timer('size_limit'):
+            try:
+                content_length = request_body_length() if request else 0
+                oversized = bool(config.max_payload_bytes) and content_length > config.max_payload_bytes
+            except RequestEntityTooLarge:
+                oversized = True
+        if oversized:
+            report.overall_threat_level = ThreatLevel.HIGH
+            report.recommendation = "REJECT: Request payload exceeds size limit"
+            report.actions_taken.append("payload_too_large")
+            report.rejection_status = 413
+            return self._finish_report(report, config, start_time)
+        
+        # 4. Parse payload once and pre-filter fields for the expensive analyzers
+        with timer('parse'):
+            payload = get_request_payload()
+        with timer('prefilter'):
+            flagged = self._prefilter_fields(payload.fields) if payload else {}
+        report.prefilter_flagged = len(flagged)
+        
+        # 5. Behavioral Analysis
         if config.enable_behavioral_analysis:
             try:
-                report.behavior_analysis = behavioral_analyzer.analyze_request()
+                with timer('behavioral'):
+                    report.behavior_analysis = behavioral_analyzer.analyze_request(
+                        self._behavior_request_data(payload) if payload else None
+                    )
                 
                 # Handle behavioral threats
                 if report.behavior_analysis.should_block:
@@ -172,23 +266,22 @@ class EnhancedSecurityManager:
                 if current_app:
                     current_app.logger.error(f"Behavioral analysis error: {e}")
         
-        # 2. Advanced XSS Analysis
-        if config.enable_advanced_xss and request:
+        # 6. Advanced XSS Analysis (flagged fields only)
+        if config.enable_advanced_xss and flagged:
             try:
-                # Analyze form data
-                if request.form:
-                    for key, value in request.form.items():
+                with timer('xss'):
+                    # Analyze form data
+                    for key, value in payload.form.items():
+                        if key not in flagged:
+                            continue
                         analysis = advanced_xss.analyze_content(value, Context.HTML)
                         if analysis.threat_level.value >= ThreatLevel.HIGH.value:
                             report.xss_analysis = analysis
                             break
-                
-                # Analyze JSON data
-                if request.is_json:
-                    json_data = request.get_json(silent=True)
-                    if json_data:
-                        content = json.dumps(json_data)
-                        analysis = advanced_xss.analyze_content(content, Context.JSON)
+                    
+                    # Analyze JSON data as a whole document
+                    if any(key in flagged for key in payload.json_fields):
+                        analysis = advanced_xss.analyze_content(payload.json_text, Context.JSON)
                         if analysis.threat_level.value >= ThreatLevel.HIGH.value:
                             report.xss_analysis = analysis
                 
@@ -200,62 +293,54 @@ class EnhancedSecurityManager:
                 if current_app:
                     current_app.logger.error(f"Advanced XSS analysis error: {e}")
         
-        # 3. Advanced Input Validation
-        if config.enable_advanced_validation and request:
+        # 7. Advanced Input Validation (flagged fields only)
+        if config.enable_advanced_validation and flagged:
             try:
-                inputs_to_validate = {}
-                
-                # Collect all inputs
-                if request.form:
-                    inputs_to_validate.update(request.form.to_dict())
-                if request.args:
-                    inputs_to_validate.update(request.args.to_dict())
-                if request.is_json:
-                    json_data = request.get_json(silent=True)
-                    if json_data:
-                        inputs_to_validate.update(self._flatten_dict(json_data))
+                with timer('validation'):
+                    report.validation_reports = advanced_validator.batch_validate(flagged)
                 
-                # Validate inputs
-                if inputs_to_validate:
-                    report.validation_reports = advanced_validator.batch_validate(inputs_to_validate)
-                    
-                    # Check for critical validation failures
-                    for field, validation in report.validation_reports.items():
-                        if validation.result == ValidationResult.BLOCKED:
-                            report.actions_taken.append(f"input_blocked_{field}")
-                            
+                # Check for critical validation failures
+                for field, validation in report.validation_reports.items():
+                    if validation.result == ValidationResult.BLOCKED:
+                        report.actions_taken.append(f"input_blocked_{field}")
+                        
             except Exception as e:
                 if current_app:
                     current_app.logger.error(f"Advanced validation error: {e}")
         
-        # 4. Enhanced CSP Management
+        # 8. Enhanced CSP Management
         if config.enable_enhanced_csp and request and request.endpoint:
             try:
-                # Generate CSP policy for this request
-                csp_policy = csp_manager.create_dynamic_policy(context)
-                
-                # Store CSP policy in g for response headers
-                g.csp_policy = csp_policy
-                
-                # Check for recent CSP violations
-                violation_stats = csp_manager.get_violation_stats(300)  # Last 5 minutes
-                if violation_stats['total_violations'] > 10:
-                    report.csp_violations.append("high_violation_rate")
+                with timer('csp'):
+                    # Generate CSP policy for this request
+                    csp_policy = csp_manager.create_dynamic_policy(context)
+                    
+                    # Store CSP policy in g for response headers
+                    g.csp_policy = csp_policy
+                    
+                    # Check for recent CSP violations
+                    violation_stats = csp_manager.get_violation_stats(300)  # Last 5 minutes
+                    if violation_stats['total_violations'] > 10:
+                        report.csp_violations.append("high_violation_rate")
                     
             except Exception as e:
                 if current_app:
                     current_app.logger.error(f"Enhanced CSP error: {e}")
         
-        # 5. Determine Overall Threat Level
+        # 9. Determine Overall Threat Level
         report.overall_threat_level = self._calculate_overall_threat_level(report)
         
-        # 6. Generate Recommendation
+        # 10. Generate Recommendation
         report.recommendation = self._generate_comprehensive_recommendation(report, config)
         
-        # 7. Apply Security Actions
+        # 11. Apply Security Actions
         self._apply_security_actions(report, config)
         
-        # Calculate processing time
+        return self._finish_report(report, config, start_time)
+
+    def _finish_report(self, report: ComprehensiveSecurityReport, config: SecurityConfig,
+                       start_time: float) -> ComprehensiveSecurityReport:
+        """Record timing, store and log a finished report."""
         report.processing_time = time.time() - start_time
         
         # Store report
@@ -267,6 +352,86 @@ class EnhancedSecurityManager:
         
         return report
 
+    def _prefilter_fields(self, fields: Dict[str, str]) -> Dict[str, str]:
+        """Return the fields containing any token the deep analyzers score on."""
+        return {
+            key: value for key, value in fields.items()
+            if value and PREFILTER_PATTERN.search(value)
+        }
+
+    def _behavior_request_data(self, payload: RequestPayload) -> Dict[str, Any]:
+        """Build behavioral analyzer input from the shared payload."""
+        return {
+            'ip_address': request.remote_addr,
+            'user_agent': request.headers.get('User-Agent', ''),
+            'url': request.url,
+            'method': request.method,
+            'parameters': payload.args,
+            'form_data': payload.form,
+            'json_data': payload.json_data if isinstance(payload.json_data, dict) else {},
+            'headers': dict(request.headers),
+            'cookies': dict(request.cookies) if request.cookies else {}
+        }
+
+    def init_app(self, app):
+        """
+        Register the blocklist and penalty checks as a request hook.
+        
+        Register it before hooks that analyze request history (abuse
+        detection) so rejected clients never reach them.
+        """
+        app.before_request(self._before_request)
+
+    def _before_request(self):
+        """Reject blocklisted and penalty-exhausted clients before heavier hooks run."""
+        ip_address = request.remote_addr
+        if self._is_blocked(ip_address):
+            abort(403)
+        if not self._penalty_allows(ip_address, time.time()):
+            abort(429)
+
+    def _is_blocked(self, ip_address: str) -> bool:
+        return ip_address in self.blocked_ips
+
+    def _penalty_allows(self, ip_address: str, current_time: float) -> bool:
+        """
+        Penalty bucket verdict for the current request.
+        
+        Taken once per request and kept on ``g``, so the request hook and
+        ``analyze_request`` share one token.
+        """
+        allowed = g.get('security_penalty_allowed')
+        if allowed is None:
+            allowed = self._consume_penalty_token(ip_address, current_time)
+            g.security_penalty_allowed = allowed
+        return allowed
+
+    def _consume_penalty_token(self, ip_address: str, current_time: float) -> bool:
+        """
+        Take a token from the IP's penalty bucket.
+        
+        Only IPs with an active rate-limit penalty have a bucket; everyone else
+        is allowed without bookkeeping.
+        """
+        expiry = self.rate_limited_ips.get(ip_address)
+        if expiry is None or expiry <= current_time:
+            self.penalty_buckets.pop(ip_address, None)
+            return True
+        
+        tokens, last_refill = self.penalty_buckets.get(
+            ip_address, (float(self.PENALTY_BUCKET_CAPACITY), current_time)
+        )
+        tokens = min(
+            float(self.PENALTY_BUCKET_CAPACITY),
+            tokens + (current_time - last_refill) * self.PENALTY_REFILL_RATE
+        )
+        if tokens < 1.0:
+            self.penalty_buckets[ip_address] = (tokens, current_time)
+            return False
+        
+        self.penalty_buckets[ip_address] = (tokens - 1.0, current_time)
+        return True
+
     def validate_file_upload(self, file_content: bytes, filename: str, 
                            context: str = 'upload') -> ComprehensiveSecurityReport:
         """
@@ -359,7 +524,10 @@ class EnhancedSecurityManager:
                 
                 # Block if threat level is critical or high (depending on config)
                 if block_on_threat:
-                    if report.overall_threat_level == ThreatLevel.CRITICAL:
+                    if report.rejection_status:
+                        from flask import abort
+                        abort(report.rejection_status)
+                    elif report.overall_threat_level == ThreatLevel.CRITICAL:
                         from flask import abort
                         abort(403)
                     elif (report.overall_threat_level == ThreatLevel.HIGH and 
@@ -376,17 +544,6 @@ class EnhancedSecurityManager:
         import uuid
         return str(uuid.uuid4())[:8]
 
-    def _flatten_dict(self, d: Dict, parent_key: str = '', sep: str = '.') -> Dict[str, str]:
-        """Flatten nested dictionary."""
-        items = []
-        for k, v in d.items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
-            if isinstance(v, dict):
-                items.extend(self._flatten_dict(v, new_key, sep=sep).items())
-            else:
-                items.append((new_key, str(v)))
-        return dict(items)
-
     def _apply_rate_limit(self, ip_address: str):
         """Apply rate limiting to IP address."""
         current_time = time.time()
@@ -481,11 +638,31 @@ class EnhancedSecurityManager:
             'threat_level_distribution': {
                 level.name: len([r for r in recent_reports if r.overall_threat_level == level])
                 for level in ThreatLevel
-            }
+            },
+            'deep_scanned_requests': len([r for r in recent_reports if r.prefilter_flagged]),
+            'stage_timings': self._summarize_stage_timings(recent_reports),
+            'verdict_cache': verdict_cache.get_stats()
         }
         
         return metrics
 
+    def _summarize_stage_timings(self, reports: List[ComprehensiveSecurityReport]) -> Dict[str, Dict[str, float]]:
+        """Aggregate per-stage timings (milliseconds) across reports."""
+        stages: Dict[str, List[float]] = {}
+        for report in reports:
+            for stage, duration in report.stage_timings.items():
+                stages.setdefault(stage, []).append(duration * 1000)
+        
+        return {
+            stage: {
+                'count': len(durations),
+                'avg_ms': sum(durations) / len(durations),
+                'max_ms': max(durations),
+                'total_ms': sum(durations)
+            }
+            for stage, durations in stages.items()
+        }
+
     def cleanup_old_data(self, max_age: int = 86400):
         """Clean up old security data."""
         current_time = time.time()
@@ -499,6 +676,10 @@ class EnhancedSecurityManager:
             ip: expiry for ip, expiry in self.rate_limited_ips.items()
             if expiry > current_time
         }
+        self.penalty_buckets = {
+            ip: bucket for ip, bucket in self.penalty_buckets.items()
+            if ip in self.rate_limited_ips
+        }
         
         # Clean other modules
         behavioral_analyzer.cleanup_old_data(max_age)
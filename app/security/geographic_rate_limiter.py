@@ -8,14 +8,21 @@ import pytz
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional, Any, Set
 from dataclasses import dataclass, field
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
 from enum import Enum
 import logging
 from threading import Lock
 import json
 import ipaddress
+import bisect
+import os
 import requests
 
+from flask import current_app
+
+from app.cache.local_cache import LocalTTLCache
+from app.security.ip_geolocation import open_geo_database
+
 # Try to import Redis for distributed caching
 try:
     import redis
@@ -105,16 +112,83 @@ class RegionalQuota:
     reset_time: float = field(default_factory=time.time)
 
 
+class CompiledIPRangeSet:
+    """
+    Immutable set of IP networks compiled into sorted integer intervals.
+    
+    Overlapping and adjacent networks are merged at build time, so membership
+    is a single bisect over the interval starts instead of a linear scan of
+    ``ipaddress.ip_network`` objects.
+    """
+    
+    def __init__(self, ranges=()):
+        intervals = {4: [], 6: []}
+        for range_str in ranges:
+            try:
+                network = ipaddress.ip_network(range_str, strict=False)
+            except ValueError as e:
+                logger.warning(f"Skipping invalid IP range {range_str}: {e}")
+                continue
+            intervals[network.version].append(
+                (int(network.network_address), int(network.broadcast_address))
+            )
+        
+        self._starts: Dict[int, List[int]] = {}
+        self._ends: Dict[int, List[int]] = {}
+        for version, spans in intervals.items():
+            merged: List[List[int]] = []
+            for start, end in sorted(spans):
+                if merged and start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            self._starts[version] = [span[0] for span in merged]
+            self._ends[version] = [span[1] for span in merged]
+        
+        self.source_count = len(ranges)
+    
+    def __len__(self) -> int:
+        """Number of merged intervals."""
+        return len(self._starts[4]) + len(self._starts[6])
+    
+    def contains(self, ip: Any) -> bool:
+        """Check whether an ``ipaddress`` address falls inside any interval."""
+        starts = self._starts[ip.version]
+        index = bisect.bisect_right(starts, int(ip)) - 1
+        return index >= 0 and int(ip) <= self._ends[ip.version][index]
+
+
 class GeographicRateLimiter:
     """Rate limiter with Canadian geographic restrictions."""
     
-    def __init__(self, redis_client=None):
+    # Upper bound on cached per-IP range verdicts
+    IP_VERDICT_CACHE_SIZE = 10000
+    
+    # Bounds for the resolved client location cache
+    CLIENT_LOCATION_CACHE_SIZE = 50000
+    CLIENT_LOCATION_TTL = 3600  # seconds
+    
+    # Used when neither the app config nor the environment sets GEOIP_DATABASE_PATH
+    DEFAULT_GEO_DATABASE_PATH = 'data/geoip/canada-ip.npgeo'
+    
+    def __init__(self, redis_client=None, geo_database_path: Optional[str] = None):
         self.redis_client = redis_client
-        self.client_locations: Dict[str, ClientLocation] = {}
+        self.client_locations = LocalTTLCache(
+            maxsize=self.CLIENT_LOCATION_CACHE_SIZE, ttl=self.CLIENT_LOCATION_TTL
+        )
+        
+        # Offline geolocation database (memory-mapped, shared across workers)
+        self.geo_database_path = geo_database_path or self._configured_database_path()
+        self.geo_database = open_geo_database(self.geo_database_path)
         self.regional_quotas: Dict[str, RegionalQuota] = {}
         self.blocked_ranges: Set[str] = set()  # IP ranges to block
         self.lock = Lock()
         
+        # Compiled range matchers and LRU of recent (is_canadian, is_blocked) verdicts
+        self._compiled_blocked_ranges = CompiledIPRangeSet()
+        self._compiled_canadian_ranges = CompiledIPRangeSet()
+        self._ip_verdicts: OrderedDict = OrderedDict()
+        
         # Major Canadian cities with special limits
         self.major_cities = {
             'Toronto': {'province': 'ON', 'timezone': 'America/Toronto', 'risk': GeographicRiskLevel.HIGH},
@@ -208,6 +282,45 @@ class GeographicRateLimiter:
             '198.0.0.0/8', '199.0.0.0/8', '206.0.0.0/8', '207.0.0.0/8',
             '208.0.0.0/8', '209.0.0.0/8', '216.0.0.0/8'
         ]
+        self._compiled_canadian_ranges = CompiledIPRangeSet(self.canadian_ip_ranges)
+    
+    def rebuild_ip_ranges(self):
+        """Recompile the Canadian and blocked range lists and reset cached verdicts."""
+        with self.lock:
+            canadian = CompiledIPRangeSet(list(self.canadian_ip_ranges))
+            blocked = CompiledIPRangeSet(list(self.blocked_ranges))
+            # Swap in the new matchers together so lookups never mix generations
+            self._compiled_canadian_ranges = canadian
+            self._compiled_blocked_ranges = blocked
+            self._ip_verdicts = OrderedDict()
+    
+    def _get_ip_verdict(self, ip_address: str) -> Tuple[bool, bool]:
+        """Return (is_canadian, is_blocked) for an IP, using the LRU when possible."""
+        verdicts = self._ip_verdicts
+        verdict = verdicts.get(ip_address)
+        if verdict is not None:
+            try:
+                verdicts.move_to_end(ip_address)
+            except KeyError:
+                pass
+            return verdict
+        
+        canadian = self._compiled_canadian_ranges
+        blocked = self._compiled_blocked_ranges
+        try:
+            ip = ipaddress.ip_address(ip_address)
+            verdict = (canadian.contains(ip), blocked.contains(ip))
+        except ValueError:
+            verdict = (False, False)
+        
+        with self.lock:
+            # Only cache against the matchers the verdict was computed from
+            if verdicts is self._ip_verdicts:
+                verdicts[ip_address] = verdict
+                while len(verdicts) > self.IP_VERDICT_CACHE_SIZE:
+                    verdicts.popitem(last=False)
+        
+        return verdict
     
     def _initialize_canadian_limits(self) -> Dict[str, GeographicLimit]:
         """Initialize rate limits for Canadian provinces and major cities."""
@@ -325,33 +438,61 @@ class GeographicRateLimiter:
         for city, quota in major_city_quotas.items():
             self.regional_quotas[f'city_{city}'] = quota
     
+    @classmethod
+    def _configured_database_path(cls) -> str:
+        """``GEOIP_DATABASE_PATH`` from the app config, or the environment outside an app context."""
+        try:
+            return current_app.config['GEOIP_DATABASE_PATH']
+        except (RuntimeError, KeyError):
+            return os.environ.get('GEOIP_DATABASE_PATH', cls.DEFAULT_GEO_DATABASE_PATH)
+    
     def get_client_location(self, client_id: str, ip_address: str) -> ClientLocation:
         """Get or resolve client location information."""
-        if client_id in self.client_locations:
-            location = self.client_locations[client_id]
-            # Update if IP changed or data is stale
-            if location.ip_address != ip_address or time.time() - location.last_updated > 3600:
-                location = self._resolve_location(ip_address)
-                self.client_locations[client_id] = location
-        else:
+        location = self.client_locations.get(client_id)
+        
+        # Entries expire after CLIENT_LOCATION_TTL; re-resolve if the IP changed
+        if location is None or location.ip_address != ip_address:
             location = self._resolve_location(ip_address)
             self.client_locations[client_id] = location
         
         return location
     
+    def load_geo_database(self, path: Optional[str] = None) -> bool:
+        """(Re)open the offline geolocation database and drop cached locations."""
+        path = path or self.geo_database_path
+        database = open_geo_database(path)
+        if database is None:
+            return False
+        
+        # The previous mapping is released once in-flight lookups drop it
+        self.geo_database_path = path
+        self.geo_database = database
+        self.client_locations.clear()
+        
+        logger.info(f"Loaded geolocation database {path} ({database.record_count} ranges)")
+        return True
+    
     def _resolve_location(self, ip_address: str) -> ClientLocation:
         """Resolve IP address to Canadian location."""
         location = ClientLocation(ip_address=ip_address)
         
-        # Basic validation - check if IP is in Canadian ranges
-        if not self._is_canadian_ip(ip_address):
+        if self.geo_database is not None:
+            if self.geo_database.is_stale():
+                self.load_geo_database()
+            location_info = self.geo_database.lookup(ip_address)
+            if not location_info or location_info.get('country') != 'CA':
+                location.country = (location_info or {}).get('country') or "UNKNOWN"
+                location.is_proxy = True  # Treat non-Canadian IPs as potential proxies
+                return location
+        elif not self._is_canadian_ip(ip_address):
+            # Basic validation - check if IP is in Canadian ranges
             location.country = "UNKNOWN"
             location.is_proxy = True  # Treat non-Canadian IPs as potential proxies
             return location
-        
-        # Mock location resolution (in production, use a real geolocation service)
-        # For demo purposes, we'll assign based on IP patterns
-        location_info = self._mock_location_resolution(ip_address)
+        else:
+            # No geolocation database configured; fall back to deterministic
+            # mock resolution for development and demos
+            location_info = self._mock_location_resolution(ip_address)
         
         location.country = "CA"
         location.province = location_info.get('province')
@@ -367,14 +508,7 @@ class GeographicRateLimiter:
     
     def _is_canadian_ip(self, ip_address: str) -> bool:
         """Check if IP address is in Canadian ranges."""
-        try:
-            ip = ipaddress.ip_address(ip_address)
-            for range_str in self.canadian_ip_ranges:
-                if ip in ipaddress.ip_network(range_str, strict=False):
-                    return True
-        except Exception:
-            pass
-        return False
+        return self._get_ip_verdict(ip_address)[0]
     
     def _mock_location_resolution(self, ip_address: str) -> Dict[str, Any]:
         """Mock location resolution for Canadian IPs."""
@@ -705,14 +839,7 @@ class GeographicRateLimiter:
     
     def _is_ip_blocked(self, ip_address: str) -> bool:
         """Check if IP is in blocked ranges."""
-        try:
-            ip = ipaddress.ip_address(ip_address)
-            for blocked_range in self.blocked_ranges:
-                if ip in ipaddress.ip_network(blocked_range, strict=False):
-                    return True
-        except Exception:
-            pass
-        return False
+        return self._get_ip_verdict(ip_address)[1]
     
     def _record_successful_request(self, client_id: str, location: ClientLocation):
         """Record a successful request for quota tracking."""
@@ -733,6 +860,7 @@ class GeographicRateLimiter:
             # Validate the range
             ipaddress.ip_network(ip_range, strict=False)
             self.blocked_ranges.add(ip_range)
+            self.rebuild_ip_ranges()
             logger.info(f"Added IP range to block list: {ip_range}")
         except Exception as e:
             logger.error(f"Invalid IP range {ip_range}: {e}")
@@ -741,6 +869,7 @@ class GeographicRateLimiter:
         """Remove an IP range from the block list."""
         if ip_range in self.blocked_ranges:
             self.blocked_ranges.remove(ip_range)
+            self.rebuild_ip_ranges()
             logger.info(f"Removed IP range from block list: {ip_range}")
     
     def get_geographic_status(self, client_id: str = None) -> Dict[str, Any]:
@@ -748,6 +877,9 @@ class GeographicRateLimiter:
         status = {
             'total_clients': len(self.client_locations),
             'blocked_ip_ranges': len(self.blocked_ranges),
+            'cached_ip_verdicts': len(self._ip_verdicts),
+            'location_cache': self.client_locations.get_stats(),
+            'geo_database': self.geo_database.get_info() if self.geo_database else None,
             'regional_quotas': {},
             'province_distribution': defaultdict(int),
             'city_distribution': defaultdict(int),
@@ -792,13 +924,14 @@ class GeographicRateLimiter:
         current_time = time.time()
         cutoff_time = current_time - (max_age_hours * 3600)
         
+        self.client_locations.purge_expired()
         inactive_clients = [
             client_id for client_id, location in self.client_locations.items()
             if location.last_updated < cutoff_time
         ]
         
         for client_id in inactive_clients:
-            del self.client_locations[client_id]
+            self.client_locations.pop(client_id)
         
         logger.info(f"Cleaned up {len(inactive_clients)} old location records")
 
@@ -0,0 +1,238 @@
+"""
+Offline IP geolocation backed by a memory-mapped binary database.
+
+The database is a compact, project-defined format built from a CSV export with
+``flask geographic-limiting build-geo-db``. Lookups binary-search the mapped
+file in place, so every worker process shares the same page-cache pages and a
+lookup never touches the network.
+
+File layout (little endian)::
+
+    header   8s magic | H version | H reserved | I record_count | I string_count | I string_index_offset
+    records  record_count x (I start | I end | 6H string ids | f latitude | f longitude), sorted by start
+    strings  string_count x (I offset | I length), followed by the UTF-8 string blob
+"""
+
+import csv
+import ipaddress
+import logging
+import mmap
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GEO_DB_MAGIC = b'NPGEODB\x00'
+GEO_DB_VERSION = 1
+
+_HEADER = struct.Struct('<8sHHIII')
+_RECORD = struct.Struct('<II6Hff')
+_RECORD_START = struct.Struct('<I')
+_STRING_ENTRY = struct.Struct('<II')
+
+# Sentinel string id for empty fields
+_NO_STRING = 0xFFFF
+
+# Order of the string-id fields within a record
+_STRING_FIELDS = ('country', 'province', 'city', 'timezone', 'postal_code', 'isp')
+
+
+def _parse_csv_range(row: Dict[str, str]) -> Tuple[int, int]:
+    """Return integer (start, end) bounds for a CSV row using ``network`` or ``start_ip``/``end_ip``."""
+    if row.get('network'):
+        network = ipaddress.ip_network(row['network'].strip(), strict=False)
+        if network.version != 4:
+            raise ValueError('only IPv4 networks are supported')
+        return int(network.network_address), int(network.broadcast_address)
+
+    start = ipaddress.ip_address(row['start_ip'].strip())
+    end = ipaddress.ip_address(row['end_ip'].strip())
+    if start.version != 4 or end.version != 4:
+        raise ValueError('only IPv4 ranges are supported')
+    if int(end) < int(start):
+        raise ValueError('end_ip precedes start_ip')
+    return int(start), int(end)
+
+
+def build_geo_database(csv_path: str, output_path: str) -> Dict[str, int]:
+    """
+    Compile a geolocation CSV into the binary database format.
+
+    The CSV must provide either a ``network`` column (CIDR) or ``start_ip`` and
+    ``end_ip`` columns, plus any of ``country``, ``province``, ``city``,
+    ``timezone``, ``postal_code``, ``isp``, ``latitude`` and ``longitude``.
+    Overlapping ranges are skipped so each address resolves to one record.
+
+    Returns counts of written, invalid and overlapping rows.
+    """
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+
+    def intern(value: Optional[str]) -> int:
+        value = (value or '').strip()
+        if not value:
+            return _NO_STRING
+        if value not in string_ids:
+            if len(strings) >= _NO_STRING:
+                raise ValueError('too many distinct string values for database format')
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    rows = []
+    invalid = 0
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                start, end = _parse_csv_range(row)
+                latitude = float(row.get('latitude') or 'nan')
+                longitude = float(row.get('longitude') or 'nan')
+            except (KeyError, ValueError) as e:
+                invalid += 1
+                logger.debug(f"Skipping geolocation row {row}: {e}")
+                continue
+            ids = tuple(intern(row.get(name)) for name in _STRING_FIELDS)
+            rows.append((start, end, ids, latitude, longitude))
+
+    rows.sort(key=lambda r: (r[0], r[1]))
+
+    records = []
+    overlapping = 0
+    last_end = -1
+    for start, end, ids, latitude, longitude in rows:
+        if start <= last_end:
+            overlapping += 1
+            continue
+        records.append(_RECORD.pack(start, end, *ids, latitude, longitude))
+        last_end = end
+
+    encoded = [s.encode('utf-8') for s in strings]
+    string_index_offset = _HEADER.size + len(records) * _RECORD.size
+    blob_offset = string_index_offset + len(encoded) * _STRING_ENTRY.size
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = f'{output_path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(GEO_DB_MAGIC, GEO_DB_VERSION, 0, len(records),
+                             len(encoded), string_index_offset))
+        f.writelines(records)
+        offset = blob_offset
+        for data in encoded:
+            f.write(_STRING_ENTRY.pack(offset, len(data)))
+            offset += len(data)
+        f.writelines(encoded)
+    # Replace atomically so running workers keep their old mapping intact
+    os.replace(tmp_path, output_path)
+
+    logger.info(f"Built geolocation database {output_path} with {len(records)} ranges")
+    return {'records': len(records), 'invalid': invalid, 'overlapping': overlapping,
+            'strings': len(encoded)}
+
+
+class IPGeoDatabase:
+    """Read-only view over a memory-mapped geolocation database."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        magic, version, _, record_count, string_count, string_index_offset = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != GEO_DB_MAGIC or version != GEO_DB_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {GEO_DB_VERSION} geolocation database")
+
+        self.record_count = record_count
+        self.string_count = string_count
+        self._string_index_offset = string_index_offset
+        self.mtime = os.path.getmtime(path)
+
+    def _string(self, string_id: int) -> Optional[str]:
+        """Decode a string from the table, or None for the empty sentinel."""
+        if string_id == _NO_STRING or string_id >= self.string_count:
+            return None
+        offset, length = _STRING_ENTRY.unpack_from(
+            self._mm, self._string_index_offset + string_id * _STRING_ENTRY.size
+        )
+        return str(self._mm[offset:offset + length], 'utf-8')
+
+    def _find_record(self, ip_int: int) -> Optional[int]:
+        """Binary search for the offset of the record whose range contains ``ip_int``."""
+        lo, hi = 0, self.record_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = _RECORD_START.unpack_from(self._mm, _HEADER.size + mid * _RECORD.size)[0]
+            if start <= ip_int:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+
+        offset = _HEADER.size + (lo - 1) * _RECORD.size
+        end = _RECORD_START.unpack_from(self._mm, offset + 4)[0]
+        return offset if ip_int <= end else None
+
+    def lookup(self, ip_address: str) -> Optional[Dict[str, Any]]:
+        """Return location fields for an IPv4 address, or None if not covered."""
+        try:
+            ip = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None
+        if ip.version != 4:
+            return None
+
+        offset = self._find_record(int(ip))
+        if offset is None:
+            return None
+
+        unpacked = _RECORD.unpack_from(self._mm, offset)
+        location = {
+            name: self._string(string_id)
+            for name, string_id in zip(_STRING_FIELDS, unpacked[2:8])
+        }
+        latitude, longitude = unpacked[8], unpacked[9]
+        # NaN marks a missing coordinate
+        location['latitude'] = latitude if latitude == latitude else None
+        location['longitude'] = longitude if longitude == longitude else None
+        return location
+
+    def is_stale(self) -> bool:
+        """Whether the file on disk has been replaced since it was mapped."""
+        try:
+            return os.path.getmtime(self.path) != self.mtime
+        except OSError:
+            return False
+
+    def close(self):
+        """Release the mapping and file handle."""
+        try:
+            self._mm.close()
+        finally:
+            self._file.close()
+
+    def get_info(self) -> Dict[str, Any]:
+        """Return database metadata for status output."""
+        return {
+            'path': self.path,
+            'records': self.record_count,
+            'strings': self.string_count,
+            'size_bytes': len(self._mm)
+        }
+
+
+def open_geo_database(path: Optional[str]) -> Optional[IPGeoDatabase]:
+    """Open a geolocation database if the path exists, logging rather than raising on failure."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return IPGeoDatabase(path)
+    except Exception as e:
+        logger.error(f"Failed to open geolocation database {path}: {e}")
+        return None
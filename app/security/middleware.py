@@ -3,7 +3,7 @@ Security middleware for XSS and CSRF protection.
 """
 
 from flask import request, g, session, current_app, abort, jsonify
-from werkzeug.exceptions import BadRequest
+from werkzeug.exceptions import BadRequest, HTTPException
 import secrets
 import re
 from functools import wraps
@@ -13,6 +13,8 @@ import html
 from markupsafe import Markup
 import time
 
+from .request_payload import get_request_payload
+
 
 class SecurityMiddleware:
     """Middleware for comprehensive security protection."""
@@ -291,9 +293,11 @@ def xss_protect(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        payload = get_request_payload()
+        
         # Validate form data
-        if request.form:
-            for key, value in request.form.items():
+        if payload.form:
+            for key, value in payload.form.items():
                 if not XSSProtection.validate_input(value):
                     current_app.logger.warning(f"XSS attempt detected in form field {key}")
                     if request.is_json:
@@ -302,8 +306,8 @@ def xss_protect(f):
                         abort(400)
         
         # Validate JSON data
-        if request.is_json:
-            json_data = request.get_json(silent=True)
+        if payload.json_data is not None:
+            json_data = payload.json_data
             if json_data:
                 def validate_json_recursive(data):
                     if isinstance(data, dict):
@@ -429,6 +433,14 @@ def enhanced_xss_protect(f):
             # Store report in g for access in route
             g.security_report = security_report
             
+            # Rate-limited and oversized requests are rejected in every context
+            if security_report.rejection_status:
+                current_app.logger.warning(f"Request rejected: {security_report.recommendation}")
+                if request.is_json:
+                    return jsonify({'error': security_report.recommendation}), security_report.rejection_status
+                else:
+                    abort(security_report.rejection_status)
+            
             # Block critical threats
             if security_report.overall_threat_level.name == 'CRITICAL':
                 current_app.logger.error(f"Critical XSS threat blocked: {security_report.recommendation}")
@@ -444,6 +456,9 @@ def enhanced_xss_protect(f):
         except ImportError:
             # Fallback to standard XSS protection
             return xss_protect(f)(*args, **kwargs)
+        except HTTPException:
+            # abort() above; only analysis errors should fall through to the route
+            raise
         except Exception as e:
             current_app.logger.error(f"Enhanced XSS protection error: {e}")
             # Continue with request but log the error
@@ -0,0 +1,173 @@
+"""
+Compiled multi-pattern scanner for the XSS and input validation analyzers.
+
+Every rule is compiled once and indexed by the literal substrings any match
+must contain. A scan checks each distinct literal against the case-folded
+input once, then runs only the rules whose literals are all present, so benign
+input no longer pays a full regex pass per pattern. Match counts and the order
+of reported rules are identical to running every pattern with ``re.findall``.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+# Non-ASCII characters that re.IGNORECASE treats as equal to an ASCII letter.
+# Folding them before lowercasing keeps the literal pre-check a strict superset
+# of what the case-insensitive regexes can match.
+_ASCII_CASE_FOLDS = str.maketrans({
+    '\u0130': 'i',  # LATIN CAPITAL LETTER I WITH DOT ABOVE
+    '\u0131': 'i',  # LATIN SMALL LETTER DOTLESS I
+    '\u017f': 's',  # LATIN SMALL LETTER LONG S
+    '\u212a': 'k',  # KELVIN SIGN
+})
+
+# Escapes that stand for a character class or an assertion rather than a literal
+_CLASS_ESCAPES = set('sSwWdDbBAZ0123456789')
+
+
+def fold_case(content: str) -> str:
+    """Lowercase ``content`` the way the scanner's literal index expects."""
+    if not content.isascii():
+        content = content.translate(_ASCII_CASE_FOLDS)
+    return content.lower()
+
+
+def required_literals(pattern: str) -> Optional[List[str]]:
+    """
+    Return the lowercased literal runs every match of ``pattern`` must contain.
+
+    Only flat patterns are indexed; groups and alternation return None so the
+    rule is always evaluated.
+    """
+    runs: List[str] = []
+    current: List[str] = []
+    last_is_literal = False
+
+    def end_run():
+        if current:
+            runs.append(''.join(current))
+            current.clear()
+
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char in '()|':
+            return None
+
+        if char == '\\' and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            if escaped in _CLASS_ESCAPES:
+                end_run()
+                last_is_literal = False
+            else:
+                current.append(escaped)
+                last_is_literal = True
+            continue
+
+        if char == '[':
+            # Skip the character class, allowing ']' as its first member
+            j = i + 1
+            if j < len(pattern) and pattern[j] == '^':
+                j += 1
+            if j < len(pattern) and pattern[j] == ']':
+                j += 1
+            while j < len(pattern) and pattern[j] != ']':
+                j += 2 if pattern[j] == '\\' else 1
+            i = j + 1
+            end_run()
+            last_is_literal = False
+            continue
+
+        if char in '*?{+':
+            optional = char in '*?'
+            if char == '{':
+                close = pattern.find('}', i)
+                if close == -1:
+                    return None
+                minimum = pattern[i + 1:close].split(',')[0].strip()
+                optional = not minimum or minimum == '0'
+                i = close + 1
+            else:
+                i += 1
+            if last_is_literal and optional and current:
+                current.pop()
+            end_run()
+            last_is_literal = False
+            continue
+
+        if char in '.^$':
+            end_run()
+            last_is_literal = False
+        else:
+            current.append(char)
+            last_is_literal = True
+        i += 1
+
+    end_run()
+    return [run.lower() for run in runs]
+
+
+@dataclass(frozen=True)
+class ScanRule:
+    """A compiled pattern with its category label and weight."""
+    category: str
+    pattern: str
+    weight: float
+    regex: Pattern
+    literals: Tuple[str, ...]
+
+
+class MultiPatternScanner:
+    """Scans content against an ordered set of weighted patterns."""
+
+    def __init__(self, rules: Iterable[Tuple[str, str, float]],
+                 flags: int = re.IGNORECASE | re.DOTALL):
+        """
+        Compile rules.
+
+        Args:
+            rules: (category, pattern, weight) tuples in reporting order
+            flags: Regex flags shared by every rule
+        """
+        self.rules: List[ScanRule] = []
+        literal_set = set()
+        for category, pattern, weight in rules:
+            literals = required_literals(pattern) if flags & re.IGNORECASE else None
+            literals = tuple(literals or ())
+            literal_set.update(literals)
+            self.rules.append(ScanRule(category, pattern, weight, re.compile(pattern, flags), literals))
+
+        self._literals = sorted(literal_set)
+
+    def scan(self, content: str, folded: Optional[str] = None) -> List[Tuple[ScanRule, int]]:
+        """
+        Return (rule, match count) for every rule that matches, in rule order.
+
+        Args:
+            content: Text to scan
+            folded: ``fold_case(content)`` if the caller already has it
+        """
+        if folded is None:
+            folded = fold_case(content)
+
+        present: Dict[str, bool] = {literal: literal in folded for literal in self._literals}
+
+        hits = []
+        for rule in self.rules:
+            if not all(present[literal] for literal in rule.literals):
+                continue
+            count = len(rule.regex.findall(content))
+            if count:
+                hits.append((rule, count))
+        return hits
+
+    def score(self, content: str, folded: Optional[str] = None) -> Tuple[float, List[ScanRule]]:
+        """Return the weighted match score and the matching rules."""
+        total = 0.0
+        matched = []
+        for rule, count in self.scan(content, folded):
+            total += rule.weight * count
+            matched.append(rule)
+        return total, matched
@@ -14,6 +14,8 @@ from enum import Enum
 import logging
 from threading import Lock
 import json
+import numpy as np
+from scipy.signal import lfilter
 
 # Try to import Redis for distributed caching
 try:
@@ -62,12 +64,72 @@ class PredictionMetrics:
     last_updated: float = field(default_factory=time.time)
 
 
+class RequestTimeRing:
+    """
+    Bounded ring of request timestamps for one endpoint category.
+    
+    Timestamps are appended in order into a buffer of up to twice the
+    capacity, so the most recent ``capacity`` entries are always one
+    contiguous, sorted NumPy slice and window queries are a ``searchsorted``
+    away. The buffer starts small and doubles as the category sees traffic;
+    most clients never come near the capacity.
+    """
+    
+    INITIAL_SIZE = 16
+    
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self._buffer = np.empty(min(self.INITIAL_SIZE, capacity * 2), dtype=np.float64)
+        self._end = 0
+        # Concurrent requests from one client append to the same ring
+        self._lock = Lock()
+    
+    def append(self, timestamp: float):
+        """Append a timestamp, growing or compacting the buffer when it fills."""
+        with self._lock:
+            if self._end == self._buffer.size:
+                if self._buffer.size < self.capacity * 2:
+                    grown = np.empty(min(self._buffer.size * 2, self.capacity * 2), dtype=np.float64)
+                    grown[:self._end] = self._buffer[:self._end]
+                    self._buffer = grown
+                else:
+                    self._buffer[:self.capacity] = self._buffer[self._end - self.capacity:self._end]
+                    self._end = self.capacity
+            self._buffer[self._end] = timestamp
+            self._end += 1
+    
+    def _values(self) -> np.ndarray:
+        # Callers hold the lock; the slice is only valid until the next compaction
+        return self._buffer[max(0, self._end - self.capacity):self._end]
+    
+    def values(self) -> np.ndarray:
+        """Sorted copy of the retained timestamps."""
+        with self._lock:
+            return self._values().copy()
+    
+    def since(self, start_time: float) -> np.ndarray:
+        """Sorted copy of the timestamps at or after ``start_time``."""
+        with self._lock:
+            values = self._values()
+            return values[np.searchsorted(values, start_time, side='left'):].copy()
+    
+    def count_since(self, start_time: float) -> int:
+        """Number of timestamps at or after ``start_time``."""
+        with self._lock:
+            values = self._values()
+            return int(values.size - np.searchsorted(values, start_time, side='left'))
+    
+    def __len__(self) -> int:
+        return min(self._end, self.capacity)
+
+
 @dataclass
 class ClientProfile:
     """Profile of client behavior and patterns."""
     client_id: str
     behavior_type: ClientBehaviorType = ClientBehaviorType.NORMAL
     request_history: deque = field(default_factory=lambda: deque(maxlen=1000))
+    category_series: Dict[str, RequestTimeRing] = field(default_factory=dict)
     hourly_patterns: Dict[int, List[int]] = field(default_factory=lambda: defaultdict(list))
     daily_patterns: Dict[int, List[int]] = field(default_factory=lambda: defaultdict(list))
     prediction_metrics: PredictionMetrics = field(default_factory=PredictionMetrics)
@@ -186,6 +248,12 @@ class PredictiveRateLimiter:
         profile.request_history.append(request_info)
         profile.last_activity = current_time
         
+        # Pre-bucketed per-category timestamps for the prediction kernels
+        series = profile.category_series.get(endpoint_category)
+        if series is None:
+            series = profile.category_series.setdefault(endpoint_category, RequestTimeRing())
+        series.append(current_time)
+        
         # Update hourly and daily patterns
         dt = datetime.fromtimestamp(current_time)
         hour = dt.hour
@@ -247,159 +315,176 @@ class PredictiveRateLimiter:
                                prediction_window: int, model: PredictionModel) -> Tuple[int, float]:
         """Predict future request count using specified model."""
         profile = self.get_or_create_client_profile(client_id)
-        
+        return self._predict_for_profile(
+            profile, endpoint_category, prediction_window, model, time.time()
+        )
+    
+    def _predict_for_profile(self, profile: ClientProfile, endpoint_category: str,
+                             prediction_window: int, model: PredictionModel,
+                             current_time: float) -> Tuple[int, float]:
+        """Run a prediction model over a profile's ring for one endpoint category."""
         if len(profile.request_history) < 5:
             return 0, 0.5  # Low confidence for new clients
         
-        current_time = time.time()
+        series = profile.category_series.get(endpoint_category)
+        if series is None:
+            return 0, 0.3
         
-        # Get recent request data
-        window_start = current_time - prediction_window * 2  # Look back 2x prediction window
-        recent_requests = [
-            req for req in profile.request_history 
-            if req['timestamp'] >= window_start and 
-               req.get('endpoint_category') == endpoint_category
-        ]
+        # Look back 2x prediction window
+        timestamps = series.since(current_time - prediction_window * 2)
         
-        if len(recent_requests) < 3:
+        if timestamps.size < 3:
             return 0, 0.3
         
         # Apply prediction model
         if model == PredictionModel.LINEAR_REGRESSION:
-            return self._linear_regression_prediction(recent_requests, prediction_window)
+            return self._linear_regression_prediction(timestamps, prediction_window)
         elif model == PredictionModel.EXPONENTIAL_SMOOTHING:
-            return self._exponential_smoothing_prediction(recent_requests, prediction_window)
+            return self._exponential_smoothing_prediction(timestamps, prediction_window)
         elif model == PredictionModel.MOVING_AVERAGE:
-            return self._moving_average_prediction(recent_requests, prediction_window)
+            return self._moving_average_prediction(timestamps, prediction_window, current_time)
         elif model == PredictionModel.SEASONAL_DECOMPOSITION:
             return self._seasonal_prediction(profile, endpoint_category, prediction_window)
         elif model == PredictionModel.ADAPTIVE_THRESHOLD:
-            return self._adaptive_threshold_prediction(recent_requests, prediction_window)
+            return self._adaptive_threshold_prediction(timestamps, prediction_window)
         else:
-            return self._exponential_smoothing_prediction(recent_requests, prediction_window)
+            return self._exponential_smoothing_prediction(timestamps, prediction_window)
+    
+    def predict_all_clients(self, endpoint_category: str = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Score every client profile in a single pass.
+        
+        Each profile is predicted for every category it has traffic in (or only
+        ``endpoint_category`` when given) using that category's configured model.
+        """
+        current_time = time.time()
+        with self.lock:
+            profiles = list(self.client_profiles.values())
+        
+        results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for profile in profiles:
+            categories = [endpoint_category] if endpoint_category else list(profile.category_series)
+            client_results = {}
+            for category in categories:
+                limit_config = self._get_limit_config(profile.client_id, category)
+                predicted, confidence = self._predict_for_profile(
+                    profile, category, limit_config.prediction_window,
+                    limit_config.model, current_time
+                )
+                client_results[category] = {
+                    'predicted_requests': predicted,
+                    'confidence': confidence,
+                    'model': limit_config.model.value,
+                    'prediction_window': limit_config.prediction_window
+                }
+            if client_results:
+                results[profile.client_id] = client_results
+        
+        return results
     
-    def _linear_regression_prediction(self, requests: List[Dict], window: int) -> Tuple[int, float]:
+    def _linear_regression_prediction(self, timestamps: np.ndarray, window: int) -> Tuple[int, float]:
         """Linear regression prediction model."""
-        if len(requests) < 3:
+        if timestamps.size < 3:
             return 0, 0.3
         
         # Group requests by time buckets
         bucket_size = 60  # 1-minute buckets
-        buckets = defaultdict(int)
-        
-        base_time = requests[0]['timestamp']
-        for req in requests:
-            bucket = int((req['timestamp'] - base_time) / bucket_size)
-            buckets[bucket] += 1
-        
-        if len(buckets) < 2:
-            return len(requests), 0.5
-        
-        # Simple linear regression
-        x_values = list(buckets.keys())
-        y_values = list(buckets.values())
-        
-        n = len(x_values)
-        sum_x = sum(x_values)
-        sum_y = sum(y_values)
-        sum_xy = sum(x * y for x, y in zip(x_values, y_values))
-        sum_x2 = sum(x * x for x in x_values)
-        
-        # Calculate slope and intercept
-        denominator = n * sum_x2 - sum_x * sum_x
-        if denominator == 0:
-            return int(sum_y / n), 0.4
-        
-        slope = (n * sum_xy - sum_x * sum_y) / denominator
+        counts = np.bincount(((timestamps - timestamps[0]) / bucket_size).astype(np.int64))
+        
+        # Only occupied buckets take part in the fit
+        x_values = np.flatnonzero(counts)
+        if x_values.size < 2:
+            return int(timestamps.size), 0.5
+        y_values = counts[x_values]
+        
+        # Closed-form least squares over integer sums; polyfit leaves rounding residue
+        # (a flat series gets a slope of -1e-16) that int() turns into an off-by-one
+        n = x_values.size
+        sum_x, sum_y = int(x_values.sum()), int(y_values.sum())
+        sum_xy, sum_x2 = int(np.dot(x_values, y_values)), int(np.dot(x_values, x_values))
+        slope = (n * sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x * sum_x)
         intercept = (sum_y - slope * sum_x) / n
         
         # Predict for the next window
-        next_bucket = max(x_values) + (window / bucket_size)
-        predicted = max(0, slope * next_bucket + intercept)
+        next_bucket = x_values[-1] + (window / bucket_size)
+        predicted = max(0.0, slope * next_bucket + intercept)
         
         # Calculate confidence based on variance
-        variance = sum((y - (slope * x + intercept)) ** 2 for x, y in zip(x_values, y_values)) / n
+        residuals = y_values - (slope * x_values + intercept)
+        variance = float(np.mean(residuals * residuals))
         confidence = max(0.1, min(0.9, 1.0 / (1.0 + variance)))
         
         return int(predicted), confidence
     
-    def _exponential_smoothing_prediction(self, requests: List[Dict], window: int) -> Tuple[int, float]:
+    @staticmethod
+    def _ewma(values: np.ndarray, alpha: float) -> np.ndarray:
+        """Exponential smoothing seeded with the first value."""
+        # lfilter runs smoothed[i] = alpha * v[i] + (1 - alpha) * smoothed[i-1] in C, in the
+        # same operation order as the loop, so results are bit-for-bit the recurrence's
+        smoothed = np.empty(values.size, dtype=np.float64)
+        smoothed[0] = values[0]
+        if values.size > 1:
+            smoothed[1:], _ = lfilter([alpha], [1.0, alpha - 1.0], values[1:],
+                                      zi=[(1.0 - alpha) * values[0]])
+        return smoothed
+    
+    def _exponential_smoothing_prediction(self, timestamps: np.ndarray, window: int) -> Tuple[int, float]:
         """Exponential smoothing prediction model."""
-        if len(requests) < 2:
+        if timestamps.size < 2:
             return 0, 0.3
         
         # Group by time intervals
         interval_size = max(60, window // 10)  # At least 1 minute intervals
-        intervals = defaultdict(int)
+        values = np.bincount(((timestamps - timestamps[0]) / interval_size).astype(np.int64))
         
-        base_time = requests[0]['timestamp']
-        for req in requests:
-            interval = int((req['timestamp'] - base_time) / interval_size)
-            intervals[interval] += 1
-        
-        if len(intervals) < 2:
-            return len(requests), 0.4
+        if np.count_nonzero(values) < 2:
+            return int(timestamps.size), 0.4
         
-        # Exponential smoothing
+        # Exponential smoothing (lookback is 2x window, so at most ~21 intervals)
         alpha = 0.3  # Smoothing parameter
-        values = [intervals.get(i, 0) for i in range(max(intervals.keys()) + 1)]
-        
-        if len(values) < 2:
-            return int(statistics.mean(values)), 0.4
-        
-        smoothed = [values[0]]
-        for i in range(1, len(values)):
-            smoothed.append(alpha * values[i] + (1 - alpha) * smoothed[i-1])
-        
-        # Predict next value
-        predicted = smoothed[-1]
+        smoothed = self._ewma(values.astype(np.float64), alpha)
         
-        # Scale to prediction window
-        predicted_count = predicted * (window / interval_size)
+        # Predict next value, scaled to prediction window
+        predicted_count = smoothed[-1] * (window / interval_size)
         
         # Calculate confidence based on recent accuracy
-        recent_errors = [abs(values[i] - smoothed[i]) for i in range(len(values))]
-        avg_error = statistics.mean(recent_errors) if recent_errors else 0
+        avg_error = float(np.mean(np.abs(values - smoothed)))
         confidence = max(0.1, min(0.9, 1.0 / (1.0 + avg_error)))
         
         return int(predicted_count), confidence
     
-    def _moving_average_prediction(self, requests: List[Dict], window: int) -> Tuple[int, float]:
+    # Moving-average windows: 5min, 10min, 30min, weighted towards recent
+    _MA_WINDOWS = np.array([300, 600, 1800], dtype=np.float64)
+    _MA_WEIGHTS = np.array([3, 2, 1], dtype=np.float64)
+    
+    def _moving_average_prediction(self, timestamps: np.ndarray, window: int,
+                                   current_time: float = None) -> Tuple[int, float]:
         """Moving average prediction model."""
-        if len(requests) < 3:
+        if timestamps.size < 3:
             return 0, 0.3
         
         # Calculate request rate over time
-        time_span = requests[-1]['timestamp'] - requests[0]['timestamp']
+        time_span = timestamps[-1] - timestamps[0]
         if time_span < 60:  # Less than 1 minute of data
-            return len(requests), 0.4
-        
-        # Calculate moving averages for different window sizes
-        windows = [300, 600, 1800]  # 5min, 10min, 30min
-        rates = []
-        
-        current_time = time.time()
+            return int(timestamps.size), 0.4
         
-        for w in windows:
-            window_start = current_time - w
-            window_requests = [r for r in requests if r['timestamp'] >= window_start]
-            if window_requests:
-                rate = len(window_requests) / (w / 60)  # requests per minute
-                rates.append(rate)
+        current_time = current_time or time.time()
+        counts = timestamps.size - np.searchsorted(timestamps, current_time - self._MA_WINDOWS)
         
-        if not rates:
+        # Windows without any requests are left out, as before
+        present = counts > 0
+        if not present.any():
             return 0, 0.3
-        
-        # Weighted average (more recent = higher weight)
-        weights = [3, 2, 1][:len(rates)]
-        weighted_rate = sum(r * w for r, w in zip(rates, weights)) / sum(weights)
+        rates = counts[present] / (self._MA_WINDOWS[present] / 60)  # requests per minute
+        weights = self._MA_WEIGHTS[:rates.size]
+        weighted_rate = float(np.dot(rates, weights) / weights.sum())
         
         # Predict for the window
         predicted_count = weighted_rate * (window / 60)
         
         # Confidence based on rate consistency
-        if len(rates) > 1:
-            rate_variance = statistics.variance(rates)
+        if rates.size > 1:
+            rate_variance = float(np.var(rates, ddof=1))
             confidence = max(0.2, min(0.8, 1.0 / (1.0 + rate_variance)))
         else:
             confidence = 0.5
@@ -449,23 +534,17 @@ class PredictiveRateLimiter:
         
         return int(predicted), confidence
     
-    def _adaptive_threshold_prediction(self, requests: List[Dict], window: int) -> Tuple[int, float]:
+    def _adaptive_threshold_prediction(self, timestamps: np.ndarray, window: int) -> Tuple[int, float]:
         """Adaptive threshold prediction model."""
-        if len(requests) < 5:
+        if timestamps.size < 5:
             return 0, 0.3
         
         # Calculate recent request patterns
-        recent_intervals = []
-        for i in range(1, len(requests)):
-            interval = requests[i]['timestamp'] - requests[i-1]['timestamp']
-            recent_intervals.append(interval)
-        
-        if not recent_intervals:
-            return 0, 0.3
+        recent_intervals = np.diff(timestamps)
         
         # Adaptive threshold based on recent behavior
-        mean_interval = statistics.mean(recent_intervals)
-        std_interval = statistics.stdev(recent_intervals) if len(recent_intervals) > 1 else 0
+        mean_interval = float(recent_intervals.mean())
+        std_interval = float(recent_intervals.std(ddof=1)) if recent_intervals.size > 1 else 0.0
         
         # Predict based on adaptive threshold
         if mean_interval > 0:
@@ -480,10 +559,10 @@ class PredictiveRateLimiter:
             predicted = expected_requests * adjustment
             
             # Confidence based on interval consistency
-            coefficient_of_variation = std_interval / mean_interval if mean_interval > 0 else 1
+            coefficient_of_variation = std_interval / mean_interval
             confidence = max(0.2, min(0.8, 1.0 / (1.0 + coefficient_of_variation)))
         else:
-            predicted = len(requests)
+            predicted = timestamps.size
             confidence = 0.4
         
         return int(predicted), confidence
@@ -495,23 +574,11 @@ class PredictiveRateLimiter:
         profile = self.get_or_create_client_profile(client_id)
         
         # Determine which limit to use
-        if limit_type and limit_type in self.predictive_limits:
-            limit_config = self.predictive_limits[limit_type]
-        elif endpoint_category in self.predictive_limits:
-            limit_config = self.predictive_limits[endpoint_category]
-        else:
-            # Use default based on client type
-            client_type = self._determine_client_type(client_id)
-            limit_config = self.predictive_limits.get(client_type, 
-                          self.predictive_limits['free_users'])
+        limit_config = self._get_limit_config(client_id, endpoint_category, limit_type)
         
         # Get current request count in window
         window_start = current_time - limit_config.prediction_window
-        current_requests = len([
-            req for req in profile.request_history
-            if req['timestamp'] >= window_start and 
-               req.get('endpoint_category') == endpoint_category
-        ])
+        current_requests = self._count_category_requests(profile, endpoint_category, window_start)
         
         # Get prediction
         predicted_requests, confidence = self.predict_future_requests(
@@ -572,6 +639,25 @@ class PredictiveRateLimiter:
         
         return allowed, retry_after, metadata
     
+    def _get_limit_config(self, client_id: str, endpoint_category: str,
+                          limit_type: str = None) -> PredictiveLimit:
+        """Resolve the predictive limit that applies to a client and category."""
+        if limit_type and limit_type in self.predictive_limits:
+            return self.predictive_limits[limit_type]
+        if endpoint_category in self.predictive_limits:
+            return self.predictive_limits[endpoint_category]
+        
+        # Use default based on client type
+        client_type = self._determine_client_type(client_id)
+        return self.predictive_limits.get(client_type, self.predictive_limits['free_users'])
+    
+    @staticmethod
+    def _count_category_requests(profile: ClientProfile, endpoint_category: str,
+                                 window_start: float) -> int:
+        """Count a profile's requests for a category since ``window_start``."""
+        series = profile.category_series.get(endpoint_category)
+        return series.count_since(window_start) if series is not None else 0
+    
     def _determine_client_type(self, client_id: str) -> str:
         """Determine client type from client ID."""
         if client_id.startswith('premium:'):
@@ -624,11 +710,7 @@ class PredictiveRateLimiter:
         
         # Check if we have a previous prediction to validate
         window_start = current_time - 300  # 5 minutes ago
-        actual_requests = len([
-            req for req in profile.request_history
-            if req['timestamp'] >= window_start and
-               req.get('endpoint_category') == endpoint_category
-        ])
+        actual_requests = self._count_category_requests(profile, endpoint_category, window_start)
         
         # Update model performance
         if model in self.model_performance:
@@ -698,7 +780,7 @@ class PredictiveRateLimiter:
         
         return status
     
-    def get_global_prediction_metrics(self) -> Dict[str, Any]:
+    def get_global_prediction_metrics(self, include_predictions: bool = False) -> Dict[str, Any]:
         """Get global prediction system metrics."""
         total_clients = len(self.client_profiles)
         
@@ -721,7 +803,7 @@ class PredictiveRateLimiter:
         
         avg_trust_score = statistics.mean(trust_scores) if trust_scores else 0.0
         
-        return {
+        metrics = {
             'total_clients': total_clients,
             'average_trust_score': avg_trust_score,
             'behavior_distribution': dict(behavior_distribution),
@@ -730,6 +812,17 @@ class PredictiveRateLimiter:
                 category: len(patterns) for category, patterns in self.global_patterns.items()
             }
         }
+        
+        if include_predictions:
+            # Aggregate predicted load per category across all clients
+            predicted_load = defaultdict(lambda: {'clients': 0, 'predicted_requests': 0})
+            for client_predictions in self.predict_all_clients().values():
+                for category, prediction in client_predictions.items():
+                    predicted_load[category]['clients'] += 1
+                    predicted_load[category]['predicted_requests'] += prediction['predicted_requests']
+            metrics['predicted_load'] = dict(predicted_load)
+        
+        return metrics
     
     def clear_client_data(self, client_id: str):
         """Clear all data for a specific client."""
@@ -787,9 +880,17 @@ def get_client_prediction_status(client_id: str) -> Dict[str, Any]:
     return check_predictive_rate_limit._limiter.get_client_prediction_status(client_id)
 
 
-def get_global_prediction_metrics() -> Dict[str, Any]:
+def get_global_prediction_metrics(include_predictions: bool = False) -> Dict[str, Any]:
     """Get global prediction metrics."""
     if not hasattr(check_predictive_rate_limit, '_limiter'):
         check_predictive_rate_limit._limiter = PredictiveRateLimiter()
     
-    return check_predictive_rate_limit._limiter.get_global_prediction_metrics()
+    return check_predictive_rate_limit._limiter.get_global_prediction_metrics(include_predictions)
+
+
+def predict_all_clients(endpoint_category: str = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Score every tracked client profile in one pass."""
+    if not hasattr(check_predictive_rate_limit, '_limiter'):
+        check_predictive_rate_limit._limiter = PredictiveRateLimiter()
+    
+    return check_predictive_rate_limit._limiter.predict_all_clients(endpoint_category)
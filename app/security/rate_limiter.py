@@ -14,6 +14,7 @@ from flask import request, jsonify, current_app, g, session
 from werkzeug.exceptions import TooManyRequests
 import redis
 from threading import Lock
+from app.tracing import tracer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -277,6 +278,7 @@ class RateLimiter:
         
         return True, 0
     
+    @tracer.traced('rate_limit')
     def _before_request(self):
         """Check rate limits before processing request."""
         # Skip rate limiting for certain endpoints
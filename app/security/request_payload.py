@@ -0,0 +1,112 @@
+"""
+Parsed request payload shared by the security layers.
+
+Form fields, query arguments and the JSON body are decoded once per request
+and cached on ``g`` so the security pipeline, behavioral analysis and the XSS
+decorators all inspect the same parsed data instead of re-reading the request.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+from flask import g, has_request_context, request
+
+
+@dataclass
+class RequestPayload:
+    """Decoded inputs of the current request."""
+    args: Dict[str, str] = field(default_factory=dict)
+    form: Dict[str, str] = field(default_factory=dict)
+    json_data: Any = None
+    content_length: int = 0
+    json_error: bool = False
+    _fields: Optional[Dict[str, str]] = None
+    _json_fields: Optional[Dict[str, str]] = None
+    _json_text: Optional[str] = None
+
+    @property
+    def json_fields(self) -> Dict[str, str]:
+        """JSON body flattened to dotted keys with string values."""
+        if self._json_fields is None:
+            if isinstance(self.json_data, (dict, list)):
+                self._json_fields = flatten_json(self.json_data)
+            elif self.json_data is not None:
+                # A bare string or number is still a value to check
+                self._json_fields = {'json': str(self.json_data)}
+            else:
+                self._json_fields = {}
+        return self._json_fields
+
+    @property
+    def fields(self) -> Dict[str, str]:
+        """All inputs keyed by name (form, then query arguments, then JSON)."""
+        if self._fields is None:
+            fields = dict(self.form)
+            fields.update(self.args)
+            fields.update(self.json_fields)
+            self._fields = fields
+        return self._fields
+
+    @property
+    def json_text(self) -> str:
+        """JSON body serialized once for whole-document analysis."""
+        if self._json_text is None:
+            self._json_text = json.dumps(self.json_data) if self.json_data else ''
+        return self._json_text
+
+    def is_empty(self) -> bool:
+        return not (self.args or self.form or self.json_data)
+
+
+def flatten_json(data: Union[Dict, List], parent_key: str = '', sep: str = '.') -> Dict[str, str]:
+    """Flatten nested dictionaries and arrays into dotted keys (array items by index)."""
+    entries = data.items() if isinstance(data, dict) else enumerate(data)
+    items = {}
+    for key, value in entries:
+        new_key = f"{parent_key}{sep}{key}" if parent_key else str(key)
+        if isinstance(value, (dict, list)):
+            items.update(flatten_json(value, new_key, sep=sep))
+        else:
+            items[new_key] = str(value)
+    return items
+
+
+def request_body_length() -> int:
+    """
+    Size of the current request body in bytes.
+    
+    Chunked bodies carry no Content-Length, so they are read (and cached for
+    later parsing) to measure them. The read is bounded by the app-wide
+    ``MAX_CONTENT_LENGTH``; larger bodies raise ``RequestEntityTooLarge``.
+    """
+    if request.content_length is not None:
+        return request.content_length
+    if 'chunked' not in request.headers.get('Transfer-Encoding', '').lower():
+        return 0
+    return len(request.get_data(cache=True))
+
+
+def parse_request_payload() -> RequestPayload:
+    """Decode the current request's inputs without touching the cache on ``g``."""
+    payload = RequestPayload(
+        args=request.args.to_dict() if request.args else {},
+        form=request.form.to_dict() if request.form else {},
+        content_length=request_body_length()
+    )
+    if request.is_json:
+        payload.json_data = request.get_json(silent=True)
+        payload.json_error = payload.json_data is None and bool(payload.content_length)
+    return payload
+
+
+def get_request_payload() -> Optional[RequestPayload]:
+    """Return the current request's payload, parsing it on first use."""
+    if not has_request_context():
+        return None
+
+    payload = g.get('security_payload')
+    if payload is None:
+        payload = parse_request_payload()
+        g.security_payload = payload
+    return payload
@@ -0,0 +1,214 @@
+"""
+Streaming accumulators for per-client request pattern analysis.
+
+Request statistics are kept in a ring of sub-window buckets. Recording a request
+touches one bucket in O(1) and a window summary merges a fixed number of
+buckets, so the cost of analysis does not grow with the number of requests a
+client has made inside the window.
+"""
+
+import hashlib
+import math
+from dataclasses import dataclass
+from threading import Lock
+from typing import List
+
+
+class HyperLogLog:
+    """Small HyperLogLog distinct counter with linear-counting correction."""
+
+    def __init__(self, precision: int = 8):
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.registers = bytearray(self.num_registers)
+
+    @staticmethod
+    def hash_value(value: str) -> int:
+        """64-bit hash of a string value."""
+        return int.from_bytes(
+            hashlib.blake2b(value.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'big'
+        )
+
+    def add(self, value: str):
+        """Add a value to the sketch."""
+        self.add_hash(self.hash_value(value))
+
+    def add_hash(self, hashed: int):
+        """Add a pre-computed 64-bit hash to the sketch."""
+        index = hashed & (self.num_registers - 1)
+        remainder = hashed >> self.precision
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def clear(self):
+        """Reset all registers."""
+        self.registers[:] = bytes(self.num_registers)
+
+    @staticmethod
+    def estimate_registers(registers, num_registers: int) -> int:
+        """Estimate cardinality from a register array."""
+        zeros = registers.count(0)
+        if zeros == num_registers:
+            return 0
+
+        alpha = 0.7213 / (1 + 1.079 / num_registers)
+        harmonic = sum(_INVERSE_POWERS[r] for r in registers)
+        estimate = alpha * num_registers * num_registers / harmonic
+
+        # Small-range correction keeps low counts (the ones we threshold on) accurate
+        if estimate <= 2.5 * num_registers and zeros:
+            estimate = num_registers * math.log(num_registers / zeros)
+        return int(round(estimate))
+
+    def estimate(self) -> int:
+        """Estimated number of distinct values added."""
+        return self.estimate_registers(self.registers, self.num_registers)
+
+    @staticmethod
+    def merge_registers(sketches: List['HyperLogLog']) -> bytes:
+        """Register-wise maximum over several sketches of equal precision."""
+        if len(sketches) == 1:
+            return bytes(sketches[0].registers)
+        return bytes(map(max, *(sketch.registers for sketch in sketches)))
+
+
+_INVERSE_POWERS = [2.0 ** -r for r in range(65)]
+
+
+@dataclass
+class WindowSummary:
+    """Aggregated request statistics for a sliding window."""
+    request_count: int = 0
+    error_count: int = 0
+    failed_auth_count: int = 0
+    response_time_mean: float = 0.0
+    response_time_variance: float = 0.0
+    unique_endpoints: int = 0
+    parameter_variations: int = 0
+    unique_user_agents: int = 0
+    data_bytes: int = 0
+
+    @property
+    def error_rate(self) -> float:
+        return self.error_count / self.request_count if self.request_count else 0.0
+
+
+class _StatsBucket:
+    """Accumulators for one sub-window."""
+
+    __slots__ = ('epoch', 'count', 'errors', 'failed_auth', 'mean', 'm2',
+                 'data_bytes', 'endpoints', 'parameters', 'user_agents')
+
+    def __init__(self, precision: int):
+        self.epoch = -1
+        self.endpoints = HyperLogLog(precision)
+        self.parameters = HyperLogLog(precision)
+        self.user_agents = HyperLogLog(precision)
+        self.reset(-1)
+
+    def reset(self, epoch: int):
+        self.epoch = epoch
+        self.count = 0
+        self.errors = 0
+        self.failed_auth = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.data_bytes = 0
+        self.endpoints.clear()
+        self.parameters.clear()
+        self.user_agents.clear()
+
+
+class WindowedRequestStats:
+    """
+    Sliding-window request statistics for a single client.
+
+    The window is divided into ``num_buckets`` sub-windows; entries expire a
+    whole bucket at a time, so the effective window is between
+    ``window * (num_buckets - 1) / num_buckets`` and ``window`` seconds.
+    """
+
+    def __init__(self, window: int = 300, num_buckets: int = 10, precision: int = 8):
+        self.window = window
+        self.num_buckets = num_buckets
+        self.bucket_span = window / num_buckets
+        self._buckets = [_StatsBucket(precision) for _ in range(num_buckets)]
+        self._lock = Lock()
+        self.last_seen = 0.0
+
+    def _live_buckets(self, current_time: float) -> List[_StatsBucket]:
+        oldest_epoch = int(current_time // self.bucket_span) - self.num_buckets + 1
+        return [b for b in self._buckets if b.epoch >= oldest_epoch and b.count]
+
+    def record(self, timestamp: float, endpoint: str, status_code: int,
+               response_time: float, user_agent: str, parameter_key: str,
+               data_bytes: int = 0):
+        """Fold one request into the current bucket (Welford update for response time)."""
+        epoch = int(timestamp // self.bucket_span)
+        is_error = status_code >= 400
+
+        with self._lock:
+            bucket = self._buckets[epoch % self.num_buckets]
+            if bucket.epoch != epoch:
+                if bucket.epoch > epoch:
+                    # Late arrival for an already-expired bucket; ignore
+                    return
+                bucket.reset(epoch)
+
+            bucket.count += 1
+            delta = response_time - bucket.mean
+            bucket.mean += delta / bucket.count
+            bucket.m2 += delta * (response_time - bucket.mean)
+
+            if is_error:
+                bucket.errors += 1
+                if 'auth' in endpoint:
+                    bucket.failed_auth += 1
+            bucket.data_bytes += data_bytes
+
+            bucket.endpoints.add(endpoint)
+            bucket.parameters.add(parameter_key)
+            bucket.user_agents.add(user_agent)
+            self.last_seen = max(self.last_seen, timestamp)
+
+    def request_count(self, current_time: float) -> int:
+        """Number of requests still inside the window."""
+        with self._lock:
+            return sum(b.count for b in self._live_buckets(current_time))
+
+    def summarize(self, current_time: float, include_distinct: bool = True) -> WindowSummary:
+        """Merge the live buckets into a window summary."""
+        with self._lock:
+            buckets = self._live_buckets(current_time)
+            summary = WindowSummary()
+            if not buckets:
+                return summary
+
+            count, mean, m2 = 0, 0.0, 0.0
+            for bucket in buckets:
+                summary.error_count += bucket.errors
+                summary.failed_auth_count += bucket.failed_auth
+                summary.data_bytes += bucket.data_bytes
+
+                # Chan et al. parallel merge of Welford partials
+                combined = count + bucket.count
+                delta = bucket.mean - mean
+                mean += delta * bucket.count / combined
+                m2 += bucket.m2 + delta * delta * count * bucket.count / combined
+                count = combined
+
+            summary.request_count = count
+            summary.response_time_mean = mean
+            summary.response_time_variance = m2 / count if count > 1 else 0.0
+
+            if include_distinct:
+                num_registers = buckets[0].endpoints.num_registers
+                summary.unique_endpoints = HyperLogLog.estimate_registers(
+                    HyperLogLog.merge_registers([b.endpoints for b in buckets]), num_registers)
+                summary.parameter_variations = HyperLogLog.estimate_registers(
+                    HyperLogLog.merge_registers([b.parameters for b in buckets]), num_registers)
+                summary.unique_user_agents = HyperLogLog.estimate_registers(
+                    HyperLogLog.merge_registers([b.user_agents for b in buckets]), num_registers)
+
+            return summary
@@ -0,0 +1,170 @@
+"""
+Content-hash verdict cache for the security analyzers.
+
+Identical inputs (repeated search strings, the same form descriptions, the
+same JSON bodies from API clients) reach the XSS analyzer, the input validator
+and behavioral content analysis over and over. Verdicts are cached under
+(namespace, context, BLAKE2 digest of the content) in a bounded in-process
+LRU with TTL, optionally backed by Redis so every worker shares the results.
+"""
+
+import hashlib
+import json
+import logging
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+from app.cache.local_cache import LocalTTLCache
+
+logger = logging.getLogger(__name__)
+
+# Sentinel returned by lookup() on a miss
+MISSING = object()
+
+
+class VerdictCache:
+    """Two-tier (local LRU, optional Redis) cache of analyzer verdicts."""
+
+    DEFAULT_MAXSIZE = 4096
+    DEFAULT_TTL = 600  # seconds
+    # Larger inputs are analyzed uncached so a few huge bodies cannot pin memory
+    MAX_CACHEABLE_LENGTH = 32 * 1024
+    KEY_PREFIX = 'security_verdict'
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: int = DEFAULT_TTL,
+                 redis_client=None):
+        self.ttl = ttl
+        self.redis_client = redis_client
+        self._local = LocalTTLCache(maxsize=maxsize, ttl=ttl)
+        self._stats_lock = Lock()
+        self._namespace_stats: Dict[str, Dict[str, int]] = {}
+
+    def configure(self, maxsize: Optional[int] = None, ttl: Optional[int] = None,
+                  redis_client=MISSING):
+        """Resize the cache, change the TTL or attach/detach a Redis client."""
+        if maxsize is not None or ttl is not None:
+            self.ttl = ttl if ttl is not None else self.ttl
+            self._local = LocalTTLCache(
+                maxsize=maxsize if maxsize is not None else self._local.maxsize,
+                ttl=self.ttl
+            )
+        if redis_client is not MISSING:
+            self.redis_client = redis_client
+
+    @staticmethod
+    def digest(content: str) -> str:
+        """BLAKE2b digest identifying the content."""
+        return hashlib.blake2b(
+            content.encode('utf-8', 'surrogatepass'), digest_size=16
+        ).hexdigest()
+
+    def get_or_compute(self, namespace: str, context: str, content: str,
+                       compute: Callable[[], Any],
+                       encode: Optional[Callable[[Any], Any]] = None,
+                       decode: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Return the cached verdict for ``content`` or compute and store it.
+
+        Verdicts are shared between callers and must be treated as read-only.
+
+        Args:
+            namespace: Analyzer name (``xss``, ``validation``, ...)
+            context: Anything besides the content that changes the verdict
+            content: Analyzed text
+            compute: Produces the verdict on a miss
+            encode: Converts a verdict to JSON-compatible data for Redis
+            decode: Rebuilds a verdict from ``encode`` output
+        """
+        verdict = self.lookup(namespace, context, content, decode)
+        if verdict is not MISSING:
+            return verdict
+
+        verdict = compute()
+        self.store(namespace, context, content, verdict, encode)
+        return verdict
+
+    def cacheable(self, content: str) -> bool:
+        """Whether ``content`` is small enough to be cached."""
+        return len(content) <= self.MAX_CACHEABLE_LENGTH
+
+    def _key(self, namespace: str, context: str, content: str) -> str:
+        return f"{self.KEY_PREFIX}:{namespace}:{context}:{self.digest(content)}"
+
+    def lookup(self, namespace: str, context: str, content: str,
+               decode: Optional[Callable[[Any], Any]] = None) -> Any:
+        """Return the cached verdict, or ``MISSING`` on a miss."""
+        if not self.cacheable(content):
+            return MISSING
+
+        key = self._key(namespace, context, content)
+        verdict = self._local.get(key, MISSING)
+        if verdict is not MISSING:
+            self._record(namespace, 'hits')
+            return verdict
+
+        if self.redis_client is not None and decode is not None:
+            try:
+                cached = self.redis_client.get(key)
+                if cached:
+                    verdict = decode(json.loads(cached))
+                    self._local.set(key, verdict)
+                    self._record(namespace, 'redis_hits')
+                    return verdict
+            except Exception as e:
+                logger.debug(f"Verdict cache lookup failed: {e}")
+
+        self._record(namespace, 'misses')
+        return MISSING
+
+    def store(self, namespace: str, context: str, content: str, verdict: Any,
+              encode: Optional[Callable[[Any], Any]] = None):
+        """Cache a verdict locally and, when an encoder is given, in Redis."""
+        if not self.cacheable(content):
+            return
+
+        key = self._key(namespace, context, content)
+        self._local.set(key, verdict)
+
+        if self.redis_client is not None and encode is not None:
+            try:
+                self.redis_client.setex(key, self.ttl, json.dumps(encode(verdict)))
+            except Exception as e:
+                logger.debug(f"Verdict cache store failed: {e}")
+
+    def _record(self, namespace: str, counter: str):
+        with self._stats_lock:
+            stats = self._namespace_stats.setdefault(
+                namespace, {'hits': 0, 'redis_hits': 0, 'misses': 0}
+            )
+            stats[counter] += 1
+
+    def clear(self):
+        """Drop local entries and reset counters (Redis entries expire on their own)."""
+        self._local.clear()
+        with self._stats_lock:
+            self._namespace_stats.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit-rate metrics per analyzer plus local cache statistics."""
+        with self._stats_lock:
+            namespaces = {}
+            for namespace, stats in self._namespace_stats.items():
+                lookups = stats['hits'] + stats['redis_hits'] + stats['misses']
+                namespaces[namespace] = dict(
+                    stats,
+                    hit_rate=(stats['hits'] + stats['redis_hits']) / lookups if lookups else 0.0
+                )
+
+        local_stats = self._local.get_stats()
+        return {
+            'redis_enabled': self.redis_client is not None,
+            'size': local_stats['size'],
+            'maxsize': local_stats['maxsize'],
+            'ttl': self.ttl,
+            'evictions': local_stats['evictions'],
+            'namespaces': namespaces
+        }
+
+
+# Global instance shared by the analyzers
+verdict_cache = VerdictCache()
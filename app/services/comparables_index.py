@@ -0,0 +1,300 @@
+"""
+Comparable-sales neighbour index.
+
+``MLService._find_comparable_properties`` ran a multi-predicate range query
+per analyzed property, so ranking 200 candidates cost 200 queries. This index
+keeps recent sales in memory, partitioned by (city_id, property_type_id),
+as standardized (sqft, bedrooms, bathrooms, latitude, longitude, sale age)
+vectors with a KD-tree per partition. Comparables for one or many properties
+come from one vectorized tree query per partition.
+
+Partitions are refreshed incrementally: a single grouped query compares each
+partition's sale count and latest ``updated_at`` with the loaded ones, and
+only changed partitions are reloaded and re-indexed.
+"""
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from flask import current_app
+from scipy.spatial import cKDTree
+from sqlalchemy import func, select
+
+from app.models.property import Property
+
+logger = logging.getLogger(__name__)
+
+PartitionKey = Tuple[int, int]
+
+
+class _Partition:
+    """Sales of one city and property type with their KD-tree."""
+
+    __slots__ = ('signature', 'listing_ids', 'addresses', 'cities', 'prices', 'sqft',
+                 'bedrooms', 'bathrooms', 'sold_ordinals', 'center', 'scale', 'tree')
+
+    def __init__(self, signature, rows: List[Tuple]):
+        self.signature = signature
+        (self.listing_ids, self.addresses, self.cities, prices, sqft, bedrooms,
+         bathrooms, latitude, longitude, sold_dates) = (list(column) for column in zip(*rows))
+        self.listing_ids = np.array(self.listing_ids, dtype=object)
+        self.prices = _floats(prices)
+        self.sqft = _floats(sqft)
+        self.bedrooms = _floats(bedrooms)
+        self.bathrooms = _floats(bathrooms)
+        self.sold_ordinals = np.array([d.toordinal() for d in sold_dates], dtype=np.int64)
+
+        ages = float(date.today().toordinal()) - self.sold_ordinals
+        features = np.column_stack([
+            self.sqft, self.bedrooms, self.bathrooms, _floats(latitude), _floats(longitude), ages
+        ])
+        # Missing values take the partition median so they do not affect distances
+        medians = np.array([
+            0.0 if np.isnan(column).all() else np.nanmedian(column) for column in features.T
+        ])
+        features = np.where(np.isnan(features), medians, features)
+
+        self.center = medians
+        self.scale = features.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        self.tree = cKDTree((features - self.center) / self.scale)
+
+    def __len__(self):
+        return len(self.listing_ids)
+
+    def standardize(self, targets: np.ndarray) -> np.ndarray:
+        targets = np.where(np.isnan(targets), self.center, targets)
+        return (targets - self.center) / self.scale
+
+
+def _floats(values: Iterable) -> np.ndarray:
+    return np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+
+
+class ComparablesIndex:
+    """Nearest-neighbour comparables by city and property type."""
+
+    # Neighbours fetched per requested comparable before the band filters
+    CANDIDATE_FACTOR = 8
+    DEFAULT_WINDOW_DAYS = 730
+    DEFAULT_RECHECK_SECONDS = 300
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # engine url -> (partitions, loaded_at)
+        self._loaded: Dict[str, Tuple[Dict[PartitionKey, _Partition], float]] = {}
+
+    def _get_db(self):
+        """Get database instance from current Flask app context."""
+        from app import db
+        return db
+
+    def _config(self, key: str, default):
+        try:
+            return current_app.config.get(key, default)
+        except RuntimeError:
+            return default
+
+    def clear_cache(self):
+        """Forget every loaded partition."""
+        with self._lock:
+            self._loaded.clear()
+
+    # Queries
+
+    def find(self, prop, k: int = 5, max_age_days: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """Comparables for one property; None when it cannot be answered from the index."""
+        results = self.find_many([prop], k=k, max_age_days=max_age_days)
+        if results is None:
+            return None
+        return results.get(prop.listing_id)
+
+    def find_many(self, properties: Iterable, k: int = 5,
+                  max_age_days: Optional[int] = None) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """
+        Up to ``k`` comparable sales per property, most similar first.
+
+        Comparables share the property's city and type, exclude the property
+        itself, and keep the bands the query path used: bedrooms within one
+        and square footage within 20% when known, and sold within
+        ``max_age_days`` when given.
+
+        Returns:
+            Dictionary of listing_id -> comparables, for properties with
+            location ids (others are omitted); None when no sales are indexed
+        """
+        partitions = self._get_partitions()
+        if not partitions:
+            return None
+
+        grouped: Dict[PartitionKey, List[Any]] = {}
+        for prop in properties:
+            if prop.city_id is not None and prop.property_type_id is not None:
+                grouped.setdefault((prop.city_id, prop.property_type_id), []).append(prop)
+
+        today = date.today().toordinal()
+        min_ordinal = today - max_age_days if max_age_days is not None else None
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        for key, targets in grouped.items():
+            partition = partitions.get(key)
+            if partition is None:
+                for prop in targets:
+                    results[prop.listing_id] = []
+                continue
+            results.update(self._query_partition(partition, targets, k, min_ordinal))
+        return results
+
+    def _query_partition(self, partition: _Partition, targets: List[Any], k: int,
+                         min_ordinal: Optional[int]) -> Dict[str, List[Dict[str, Any]]]:
+        target_sqft = _floats(t.sqft if t.sqft and t.sqft > 0 else None for t in targets)
+        target_bedrooms = _floats(t.bedrooms or None for t in targets)
+        # Targets are compared against sales made today
+        features = np.column_stack([
+            target_sqft, target_bedrooms, _floats(t.bathrooms for t in targets),
+            _floats(t.latitude for t in targets), _floats(t.longitude for t in targets),
+            np.zeros(len(targets))
+        ])
+
+        target_ids = np.array([t.listing_id for t in targets], dtype=object)
+        standardized = partition.standardize(features)
+        found: List[Optional[np.ndarray]] = [None] * len(targets)
+        pending = np.arange(len(targets))
+        candidates = min(len(partition), k * self.CANDIDATE_FACTOR + 1)
+        while len(pending):
+            _, neighbours = partition.tree.query(standardized[pending], k=candidates)
+            neighbours = np.asarray(neighbours).reshape(len(pending), candidates)
+
+            # Band filters over the whole (targets x candidates) matrix
+            keep = partition.listing_ids[neighbours] != target_ids[pending, None]
+            if min_ordinal is not None:
+                keep &= partition.sold_ordinals[neighbours] >= min_ordinal
+            with np.errstate(invalid='ignore'):
+                bedrooms = target_bedrooms[pending, None]
+                keep &= np.isnan(bedrooms) | (np.abs(partition.bedrooms[neighbours] - bedrooms) <= 1)
+                sqft = target_sqft[pending, None]
+                keep &= np.isnan(sqft) | (np.abs(partition.sqft[neighbours] - sqft) <= sqft * 0.2)
+
+            # Rows with too few matches among the candidates retry with more of them
+            short = keep.sum(axis=1) < k
+            for row in np.flatnonzero(~short | (candidates == len(partition))):
+                found[pending[row]] = neighbours[row][keep[row]][:k]
+            if candidates == len(partition):
+                break
+            pending = pending[short]
+            candidates = min(len(partition), candidates * self.CANDIDATE_FACTOR)
+
+        return {
+            prop.listing_id: [self._comparable(partition, i) for i in found[row]]
+            for row, prop in enumerate(targets)
+        }
+
+    @staticmethod
+    def _comparable(partition: _Partition, i: int) -> Dict[str, Any]:
+        sqft = partition.sqft[i]
+        bathrooms = partition.bathrooms[i]
+        return {
+            'listing_id': partition.listing_ids[i],
+            'address': partition.addresses[i],
+            'city': partition.cities[i],
+            'sold_price': float(partition.prices[i]),
+            'sqft': None if np.isnan(sqft) else int(sqft),
+            'bedrooms': None if np.isnan(partition.bedrooms[i]) else int(partition.bedrooms[i]),
+            'bathrooms': None if np.isnan(bathrooms) else float(bathrooms),
+            'sold_date': date.fromordinal(int(partition.sold_ordinals[i]))
+        }
+
+    # Maintenance
+
+    def _get_partitions(self) -> Dict[PartitionKey, _Partition]:
+        db = self._get_db()
+        engine_key = str(db.engine.url)
+        loaded = self._loaded.get(engine_key)
+        recheck = self._config('COMPARABLES_RECHECK_SECONDS', self.DEFAULT_RECHECK_SECONDS)
+        if loaded and time.time() - loaded[1] < recheck:
+            return loaded[0]
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning(f"Could not refresh comparables index: {e}")
+            return loaded[0] if loaded else {}
+        return self._loaded[engine_key][0]
+
+    def _sales_filter(self):
+        window_days = self._config('COMPARABLES_WINDOW_DAYS', self.DEFAULT_WINDOW_DAYS)
+        return (
+            Property.sold_price.isnot(None),
+            Property.sold_date >= date.today() - timedelta(days=window_days),
+            Property.city_id.isnot(None),
+            Property.property_type_id.isnot(None)
+        )
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        Reload the partitions whose sales changed since they were indexed.
+
+        Returns:
+            Dictionary with partition, reloaded partition and sale counts
+        """
+        db = self._get_db()
+        start_time = time.time()
+        engine_key = str(db.engine.url)
+        loaded = self._loaded.get(engine_key)
+        current = loaded[0] if loaded else {}
+
+        with db.engine.connect() as conn:
+            signatures = {
+                (city_id, property_type_id): (count, updated_at)
+                for city_id, property_type_id, count, updated_at in conn.execute(
+                    select(Property.city_id, Property.property_type_id,
+                           func.count(), func.max(Property.updated_at))
+                    .where(*self._sales_filter())
+                    .group_by(Property.city_id, Property.property_type_id)
+                )
+            }
+            changed = [key for key, signature in signatures.items()
+                       if key not in current or current[key].signature != signature]
+
+            rows_by_key: Dict[PartitionKey, List[Tuple]] = {}
+            if changed:
+                query = select(
+                    Property.city_id, Property.property_type_id, Property.listing_id,
+                    Property.address, Property.city, Property.sold_price, Property.sqft,
+                    Property.bedrooms, Property.bathrooms, Property.latitude,
+                    Property.longitude, Property.sold_date
+                ).where(*self._sales_filter())
+                if len(changed) < len(signatures):
+                    query = query.where(Property.city_id.in_({key[0] for key in changed}))
+                wanted = set(changed)
+                for row in conn.execute(query):
+                    key = (row[0], row[1])
+                    if key in wanted:
+                        rows_by_key.setdefault(key, []).append(tuple(row[2:]))
+
+        partitions = {key: partition for key, partition in current.items() if key in signatures}
+        for key in changed:
+            rows = rows_by_key.get(key)
+            if rows:
+                partitions[key] = _Partition(signatures[key], rows)
+            else:
+                partitions.pop(key, None)
+
+        with self._lock:
+            self._loaded[engine_key] = (partitions, time.time())
+
+        results = {
+            'partitions': len(partitions),
+            'reloaded': len(changed),
+            'sales': sum(len(partition) for partition in partitions.values()),
+            'elapsed_seconds': time.time() - start_time
+        }
+        if changed:
+            logger.info(f"Comparables index refreshed: {len(changed)} of {len(partitions)} partitions "
+                        f"reloaded in {results['elapsed_seconds']:.2f}s")
+        return results
+
+
+# Global instance shared by MLService and DataService
+comparables_index = ComparablesIndex()
@@ -14,6 +14,7 @@ from dataclasses import dataclass
 from app.models.property import Property
 from app.models.agent import Agent
 from app.models.economic_data import EconomicIndicator
+from app.services.location_resolver import location_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -523,6 +524,9 @@ class DataMapper:
         mapped_record['created_at'] = datetime.utcnow()
         mapped_record['updated_at'] = datetime.utcnow()
         
+        # Resolve canonical city/property type ids so filters can use integer keys
+        location_resolver.assign_ids(mapped_record)
+        
         return mapped_record
 
     def _extract_numeric_from_text(self, text: str) -> Optional[float]:
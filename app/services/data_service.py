@@ -2,6 +2,7 @@
 Data service for market analysis and property insights.
 Handles data processing, aggregation, and market trend analysis.
 """
+import re
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -9,6 +10,9 @@ from typing import Dict, List, Optional, Tuple
 from sqlalchemy import func, and_, or_
 from app.models.property import Property
 from app.models.economic_data import EconomicIndicator
+from app.services.comparables_index import comparables_index
+from app.services.economic_timeseries import economic_timeseries
+from app.services.location_resolver import location_resolver
 from app.extensions import db, cache
 import logging
 
@@ -36,7 +40,7 @@ class DataService:
             )
             
             if city:
-                query = query.filter(Property.city.ilike(f'%{city}%'))
+                query = query.filter(location_resolver.city_clause(city))
             if property_type:
                 query = query.filter(Property.property_type == property_type)
                 
@@ -111,7 +115,7 @@ class DataService:
         try:
             base_query = db.session.query(Property)
             if city:
-                base_query = base_query.filter(Property.city.ilike(f'%{city}%'))
+                base_query = base_query.filter(location_resolver.city_clause(city))
             
             # Basic statistics
             total_properties = base_query.count()
@@ -130,7 +134,7 @@ class DataService:
             
             if city:
                 type_distribution = type_distribution.filter(
-                    Property.city.ilike(f'%{city}%')
+                    location_resolver.city_clause(city)
                 )
             
             type_data = type_distribution.all()
@@ -143,7 +147,7 @@ class DataService:
             
             if city:
                 recent_activity = recent_activity.filter(
-                    Property.city.ilike(f'%{city}%')
+                    location_resolver.city_clause(city)
                 )
             
             recent_transactions = recent_activity.scalar() or 0
@@ -218,7 +222,7 @@ class DataService:
         """Get detailed neighborhood insights and comparisons."""
         try:
             base_query = db.session.query(Property).filter(
-                Property.city.ilike(f'%{city}%')
+                location_resolver.city_clause(city)
             )
             
             if neighborhood:
@@ -234,7 +238,7 @@ class DataService:
                 func.avg(Property.sqft).label('avg_sqft'),
                 func.avg(Property.bedrooms).label('avg_bedrooms'),
                 func.avg(Property.bathrooms).label('avg_bathrooms')
-            ).filter(Property.city.ilike(f'%{city}%')).group_by(
+            ).filter(location_resolver.city_clause(city)).group_by(
                 Property.neighborhood
             ).having(func.count(Property.listing_id) >= 5).all()  # Min 5 properties
             
@@ -307,6 +311,45 @@ class DataService:
         else:
             return "Balanced Market"
     
+    @staticmethod
+    def get_economic_indicators_chart_data(timeframe: str = '12m') -> Dict:
+        """
+        Monthly economic indicator series for the dashboard chart.
+    
+        Args:
+            timeframe: Window such as '6m', '12m' or '5y'
+    
+        Returns:
+            Dictionary with the timeframe and, per Bank of Canada indicator,
+            monthly average dates/values, the latest value and its
+            year-over-year change
+        """
+        try:
+            from app.services.external_apis import ExternalAPIsService
+    
+            match = re.fullmatch(r'(\d+)([my])', (timeframe or '').lower())
+            months = 12 if not match else int(match.group(1)) * (12 if match.group(2) == 'y' else 1)
+            start = (np.datetime64(datetime.utcnow().date(), 'M') - (months - 1)).astype('datetime64[D]')
+    
+            indicators = {}
+            for name, code in ExternalAPIsService.BOC_INDICATORS.items():
+                series = economic_timeseries.get(code)
+                if series is None or not len(series):
+                    continue
+                yoy = series.yoy_change()
+                indicators[name] = {
+                    'indicator_code': code,
+                    **series.window(start=start).resample('M', how='mean').to_dict(),
+                    'latest': series.latest()[1],
+                    'yoy_change': yoy.latest()[1] if len(yoy) else None
+                }
+    
+            return {'timeframe': f'{months}m', 'indicators': indicators}
+    
+        except Exception as e:
+            logger.error(f"Error building economic chart data: {str(e)}")
+            return {}
+    
     @staticmethod
     def get_comparable_properties(property_id: int, limit: int = 5) -> List[Dict]:
         """Find comparable properties for valuation."""
@@ -315,6 +358,14 @@ class DataService:
             if not target_property:
                 return []
             
+            # Nearest sales from the comparables index, loaded in one query
+            matches = comparables_index.find(target_property, k=limit)
+            if matches is not None:
+                ids = [match['listing_id'] for match in matches]
+                by_id = {comp.listing_id: comp for comp in
+                         Property.query.filter(Property.listing_id.in_(ids)).all()} if ids else {}
+                return [by_id[listing_id].to_dict() for listing_id in ids if listing_id in by_id]
+            
             # Find similar properties
             comparables = db.session.query(Property).filter(
                 and_(
@@ -345,7 +396,7 @@ class DataService:
         try:
             query = db.session.query(Property)
             if city:
-                query = query.filter(Property.city.ilike(f'%{city}%'))
+                query = query.filter(location_resolver.city_clause(city))
             
             properties = query.all()
             
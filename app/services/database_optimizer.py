@@ -11,6 +11,7 @@ import time
 
 from app.models.property import Property
 from app.models.agent import Agent
+from app.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -559,6 +560,7 @@ def receive_before_cursor_execute(conn, cursor, statement, parameters, context,
 def receive_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
     """Log query execution time."""
     total = time.time() - context._query_start_time
+    tracer.record('db', total)
     
     # Log queries that take longer than 1 second
     if total > 1.0:
@@ -0,0 +1,218 @@
+"""
+Concurrent fetch engine for Bank of Canada and Statistics Canada series.
+
+``ExternalAPIsService.refresh_all_data`` used to fetch each series in turn,
+so a full refresh took the sum of every response time. The engine runs all
+requests on an asyncio event loop with a concurrency limit per host, so a
+refresh takes about as long as the slowest series.
+
+Each request is conditional: the ``ETag`` and ``Last-Modified`` validators
+of the last stored response are kept in the shared cache and sent back as
+``If-None-Match`` / ``If-Modified-Since``, and a ``304`` skips parsing and
+storage. The fetcher only returns a response's validators; the caller saves
+them with ``save_validators`` once the points are stored, so a failed store
+is fetched again in full next time. Connection errors, ``429`` and ``5xx`` responses are retried with
+full-jitter exponential backoff (honouring ``Retry-After``).
+
+HTTP calls go through ``requests`` (as elsewhere in the services) on worker
+threads; nothing here touches the database, so callers store results on
+their own thread and app context.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+import requests
+
+from app.extensions import cache
+from app.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SeriesRequest:
+    """One series to fetch."""
+    key: str
+    url: str
+    parse: Callable[[requests.Response], List[Dict[str, Any]]]
+    params: Dict[str, Any] = field(default_factory=dict)
+    timeout: float = 30
+
+
+@dataclass
+class FetchResult:
+    """Outcome of fetching one series."""
+    key: str
+    status: str  # 'updated', 'not_modified' or 'error'
+    points: List[Dict[str, Any]] = field(default_factory=list)
+    attempts: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    # inserted / updated / unchanged counts, filled in by the caller that stores ``points``
+    stored: Dict[str, int] = field(default_factory=dict)
+    # ETag / Last-Modified of an 'updated' response, to be saved after ``points`` are stored
+    validators: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.status != 'error'
+
+
+class _RetryableError(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class EconomicFetcher:
+    """Fetch many series concurrently with conditional requests and retries."""
+
+    VALIDATOR_CACHE_PREFIX = 'economic_fetch:validators:'
+    VALIDATOR_TIMEOUT = 7 * 24 * 3600
+    # Query parameters that move with incremental fetches rather than identify a series
+    DATE_RANGE_PARAMS = frozenset({'start_date', 'end_date'})
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, per_host_limit: int = 4, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_cap: float = 8.0):
+        self.per_host_limit = per_host_limit
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    # Running
+
+    def run(self, series: List[SeriesRequest]) -> Dict[str, FetchResult]:
+        """Fetch ``series`` concurrently from synchronous code."""
+        return asyncio.run(self.fetch_all(series))
+
+    async def fetch_all(self, series: List[SeriesRequest]) -> Dict[str, FetchResult]:
+        """Fetch ``series`` concurrently, keyed by ``SeriesRequest.key``."""
+        if not series:
+            return {}
+        semaphores: Dict[str, asyncio.Semaphore] = {}
+        for request in series:
+            semaphores.setdefault(urlsplit(request.url).netloc, asyncio.Semaphore(self.per_host_limit))
+
+        # Sized so the host limits, not the worker count, bound concurrency
+        executor = ThreadPoolExecutor(
+            max_workers=min(len(series), self.per_host_limit * len(semaphores)),
+            thread_name_prefix='economic-fetch'
+        )
+        session = requests.Session()
+        try:
+            results = await asyncio.gather(*(
+                self._fetch(executor, session, request, semaphores[urlsplit(request.url).netloc])
+                for request in series
+            ))
+        finally:
+            session.close()
+            executor.shutdown(wait=False)
+        return {result.key: result for result in results}
+
+    async def _fetch(self, executor: ThreadPoolExecutor, session: requests.Session,
+                     request: SeriesRequest, semaphore: asyncio.Semaphore) -> FetchResult:
+        start_time = time.perf_counter()
+        validators = self._get_validators(request)
+        result = FetchResult(key=request.key, status='error')
+
+        for attempt in range(self.max_retries + 1):
+            result.attempts = attempt + 1
+            try:
+                async with semaphore:
+                    # Run in a copy of this context so request tracing sees the call
+                    call = functools.partial(contextvars.copy_context().run,
+                                             self._get, session, request, validators)
+                    response = await asyncio.get_running_loop().run_in_executor(executor, call)
+                if response.status_code == 304:
+                    result.status = 'not_modified'
+                    break
+                if response.status_code in self.RETRY_STATUSES:
+                    raise _RetryableError(f'HTTP {response.status_code}',
+                                          self._retry_after(response.headers.get('Retry-After')))
+                response.raise_for_status()
+
+                result.points = request.parse(response)
+                result.status = 'updated'
+                result.error = None
+                result.validators = self._response_validators(response)
+                break
+            except (_RetryableError, requests.ConnectionError, requests.Timeout) as e:
+                result.error = str(e)
+                if attempt == self.max_retries:
+                    break
+                await asyncio.sleep(self._backoff(attempt, getattr(e, 'retry_after', None)))
+            except Exception as e:
+                result.error = str(e)
+                break
+
+        result.elapsed = time.perf_counter() - start_time
+        if result.status == 'error':
+            logger.warning(f"Fetching {request.key} failed after {result.attempts} attempts: {result.error}")
+        return result
+
+    @staticmethod
+    def _get(session: requests.Session, request: SeriesRequest, validators: Dict[str, str]):
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        with tracer.span('external_api'):
+            return session.get(request.url, params=request.params, headers=headers, timeout=request.timeout)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full-jitter exponential backoff, at least ``Retry-After`` when given."""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_cap))
+        return delay
+
+    @staticmethod
+    def _retry_after(value: Optional[str]) -> Optional[float]:
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    # Conditional request validators
+
+    def _validator_key(self, request: SeriesRequest) -> str:
+        # Validators describe a resource: the URL plus identifying parameters (StatCan tables
+        # share one URL and differ by ``pid``); date parameters change with incremental fetches
+        identity = sorted(
+            (name, str(value)) for name, value in request.params.items()
+            if name not in self.DATE_RANGE_PARAMS
+        )
+        return self.VALIDATOR_CACHE_PREFIX + request.url + ('?' + urlencode(identity) if identity else '')
+
+    def _get_validators(self, request: SeriesRequest) -> Dict[str, str]:
+        try:
+            return cache.get(self._validator_key(request)) or {}
+        except Exception:
+            return {}
+
+    @staticmethod
+    def _response_validators(response: requests.Response) -> Dict[str, str]:
+        validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }
+        return validators if any(validators.values()) else {}
+
+    def save_validators(self, request: SeriesRequest, validators: Dict[str, str]):
+        """Remember a stored response's validators for the next conditional request."""
+        if not validators:
+            return
+        try:
+            cache.set(self._validator_key(request), validators, timeout=self.VALIDATOR_TIMEOUT)
+        except Exception as e:
+            logger.debug(f"Could not store validators for {request.key}: {e}")
@@ -0,0 +1,167 @@
+"""
+Versioned economic snapshot.
+
+ML feature extraction, the economic dashboard and ``/api/economic-indicators``
+read the same handful of economic values. Each ``MLService`` instance used to
+cache them in its own dict and, on a miss, load 30 days of ``EconomicData``
+rows plus three more series queries. This service builds the indicators,
+the dashboard summary and current interest rates once into an immutable
+snapshot stamped with a version. The snapshot is published through the shared
+Flask cache and each process keeps a local copy, so reads run no queries.
+
+Snapshots are rebuilt by a background thread every
+``ECONOMIC_SNAPSHOT_INTERVAL`` seconds (one builder at a time across workers;
+the thread runs in serving processes, see ``START_SCHEDULERS``), after
+``ExternalAPIsService.refresh_all_data`` and after economic ETL imports.
+Workers pick up a new version within ``VERSION_CHECK_SECONDS``.
+"""
+import logging
+import time
+from types import MappingProxyType, SimpleNamespace
+from typing import Any, Dict, Mapping, Optional
+
+from app.extensions import cache
+from app.services.versioned_snapshot import VersionedSnapshotService
+
+logger = logging.getLogger(__name__)
+
+
+class EconomicSnapshotService(VersionedSnapshotService):
+    """Build, publish and serve the economic snapshot."""
+
+    CACHE_KEY = 'economic:snapshot'
+    VERSION_KEY = 'economic:snapshot:version'
+    BUILD_LOCK_KEY = 'economic:snapshot:building'
+    INTERVAL_CONFIG = 'ECONOMIC_SNAPSHOT_INTERVAL'
+    NAME = 'economic'
+
+    DEFAULT_INTERVAL = 3600
+    POLL_SECONDS = 60
+    # How long a process serves its local copy before checking for a newer version
+    VERSION_CHECK_SECONDS = 30
+
+    def __init__(self):
+        super().__init__()
+        # (snapshot, summary namespace, checked_at)
+        self._local: Optional[tuple] = None
+
+    # Serving
+
+    def get(self) -> Mapping[str, Any]:
+        """
+        The current snapshot (read-only).
+
+        Served from this process's copy; the shared cache is consulted every
+        ``VERSION_CHECK_SECONDS``, and a snapshot is built only when none
+        exists anywhere.
+        """
+        local = self._local
+        if local is not None and time.time() - local[2] < self.VERSION_CHECK_SECONDS:
+            return local[0]
+
+        version = cache.get(self.VERSION_KEY)
+        if local is not None and version == local[0]['version']:
+            self._local = (local[0], local[1], time.time())
+            return local[0]
+
+        snapshot = cache.get(self.CACHE_KEY)
+        if snapshot is None:
+            if local is not None and version is None:
+                # Shared cache was flushed; keep serving while the scheduler rebuilds
+                self._local = (local[0], local[1], time.time())
+                return local[0]
+            # One worker builds through the build lock; the others wait for its snapshot
+            snapshot = self.refresh_cold()
+            if snapshot is None:
+                # The builder is stuck: serve a private copy rather than fail the request
+                logger.warning("Economic snapshot still missing; building an unpublished copy")
+                snapshot = self.build()
+        self._install(snapshot)
+        return self._local[0]
+
+    def indicators(self) -> Dict[str, float]:
+        """Economic indicators for ML features and the indicator endpoints (a copy)."""
+        return dict(self.get()['indicators'])
+
+    def summary(self) -> SimpleNamespace:
+        """Dashboard summary with attribute access (``bank_rate``, ``market_sentiment``, ...)."""
+        self.get()
+        return self._local[1]
+
+    def interest_rates(self) -> Dict[str, Any]:
+        """Current interest rates for the economic dashboard (a copy)."""
+        return dict(self.get()['interest_rates'])
+
+    def _install(self, snapshot: Dict[str, Any]):
+        frozen = MappingProxyType({
+            **snapshot,
+            'indicators': MappingProxyType(dict(snapshot['indicators'])),
+            'summary': MappingProxyType(dict(snapshot['summary'])),
+            'interest_rates': MappingProxyType(dict(snapshot['interest_rates']))
+        })
+        summary = SimpleNamespace(**{
+            key: list(value) if isinstance(value, (list, tuple)) else value
+            for key, value in snapshot['summary'].items()
+        })
+        self._local = (frozen, summary, time.time())
+
+    # Building
+
+    def refresh(self) -> Mapping[str, Any]:
+        """Build a new snapshot, publish it and install it in this process."""
+        snapshot = self.build()
+        # Versions only move forward, even for rebuilds within the same millisecond
+        published = cache.get(self.VERSION_KEY)
+        if published is not None and snapshot['version'] <= published:
+            snapshot['version'] = published + 1
+        timeout = self._get_interval() * self.CACHE_TIMEOUT_INTERVALS
+        cache.set(self.CACHE_KEY, snapshot, timeout=timeout)
+        cache.set(self.VERSION_KEY, snapshot['version'], timeout=timeout)
+        self._install(snapshot)
+        logger.info(f"Economic snapshot v{snapshot['version']} built in {snapshot['build_seconds']:.2f}s")
+        return self._local[0]
+
+    def build(self) -> Dict[str, Any]:
+        """Compute the summary, indicators and interest rates as plain data."""
+        from app.services.external_apis import ExternalAPIsService
+
+        start_time = time.time()
+        ml_service = self._get_ml_service()
+
+        try:
+            summary = self._summary_dict(ExternalAPIsService.get_latest_economic_summary())
+        except Exception as e:
+            logger.warning(f"Could not build economic summary: {str(e)}")
+            summary = self._summary_dict(None)
+
+        try:
+            interest_rates = ExternalAPIsService.get_current_interest_rates() or {}
+        except Exception as e:
+            logger.warning(f"Could not fetch interest rates: {str(e)}")
+            interest_rates = {}
+
+        return self._stamp({
+            'indicators': ml_service._build_economic_indicators(summary),
+            'summary': summary,
+            'interest_rates': interest_rates
+        }, start_time)
+
+    @staticmethod
+    def _summary_dict(summary) -> Dict[str, Any]:
+        """Plain-data copy of the ``get_latest_economic_summary`` object."""
+        return {
+            'bank_rate': getattr(summary, 'bank_rate', 2.75),
+            'prime_rate': getattr(summary, 'prime_rate', 4.95),
+            'inflation_rate': getattr(summary, 'inflation_rate', 2.3),
+            'cad_usd_rate': getattr(summary, 'cad_usd_rate', 1.369),
+            'market_sentiment': getattr(summary, 'market_sentiment', "Using default economic indicators."),
+            'key_trends': list(getattr(summary, 'key_trends', []))
+        }
+
+    def clear(self):
+        """Forget this process's copy (the shared snapshot is kept)."""
+        self._local = None
+
+
+# Global instance shared by MLService, the economic routes and refresh hooks
+economic_snapshot = EconomicSnapshotService()
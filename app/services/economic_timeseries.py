@@ -0,0 +1,342 @@
+"""
+Columnar economic time series.
+
+Economic history is stored one ``EconomicData`` row per observation and was
+read back through ``EconomicData.get_time_series`` into ORM objects whenever
+a chart or derived indicator needed it. This store keeps each indicator as a
+pair of contiguous arrays (``datetime64[D]`` dates, ``float64`` values,
+oldest first) persisted as ``.npy`` files under ``ECONOMIC_TIMESERIES_PATH``
+and memory-mapped on load, so every worker shares the same pages.
+
+``TimeSeries`` offers vectorized calendar resampling, year-over-year change
+and rolling windows. Series are rebuilt from the database after economic
+data is stored (``ExternalAPIsService._store_economic_data``), after economic
+ETL imports and with ``flask etl build-economic-series``; a process notices a
+rebuilt file by its modification time.
+
+File layout: ``<indicator_code>.dates.npy`` and ``<indicator_code>.values.npy``
+(codes are made filename-safe).
+"""
+import logging
+import os
+import re
+import tempfile
+import threading
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from app.models.economic_data import EconomicData
+
+logger = logging.getLogger(__name__)
+
+DateLike = Union[date, str, np.datetime64]
+
+# Resampling frequency -> NumPy calendar unit of the period
+_PERIOD_UNITS = {'M': 'M', 'Q': 'M', 'Y': 'Y'}
+
+
+class TimeSeries:
+    """Dates and values of one indicator, oldest first."""
+
+    __slots__ = ('indicator_code', 'dates', 'values')
+
+    def __init__(self, indicator_code: str, dates: np.ndarray, values: np.ndarray):
+        self.indicator_code = indicator_code
+        self.dates = dates
+        self.values = values
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __repr__(self):
+        return f'<TimeSeries {self.indicator_code}: {len(self)} points>'
+
+    def latest(self) -> Optional[Tuple[date, float]]:
+        """The most recent (date, value), or None for an empty series."""
+        if not len(self):
+            return None
+        return self.dates[-1].item(), float(self.values[-1])
+
+    def window(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> 'TimeSeries':
+        """Points with ``start <= date <= end`` (views, no copy)."""
+        low = 0 if start is None else np.searchsorted(self.dates, np.datetime64(start, 'D'), side='left')
+        high = len(self) if end is None else np.searchsorted(self.dates, np.datetime64(end, 'D'), side='right')
+        return TimeSeries(self.indicator_code, self.dates[low:high], self.values[low:high])
+
+    def resample(self, freq: str = 'M', how: str = 'last') -> 'TimeSeries':
+        """
+        Aggregate into calendar periods.
+
+        Args:
+            freq: 'M' (monthly), 'Q' (quarterly) or 'Y' (yearly)
+            how: 'last', 'first', 'mean', 'min', 'max' or 'sum' of each period's values
+
+        Returns:
+            TimeSeries dated at the start of each period that has observations
+        """
+        if freq not in _PERIOD_UNITS:
+            raise ValueError(f"Unknown frequency: {freq}")
+        if not len(self):
+            return TimeSeries(self.indicator_code, self.dates[:0], self.values[:0])
+
+        periods = self.dates.astype(f'datetime64[{_PERIOD_UNITS[freq]}]')
+        if freq == 'Q':
+            months = periods.astype(np.int64)
+            periods = (months - months % 3).astype('datetime64[M]')
+
+        # Dates are sorted, so each period is a contiguous run
+        starts = np.concatenate(([0], np.flatnonzero(periods[1:] != periods[:-1]) + 1))
+        if how == 'last':
+            aggregated = self.values[np.append(starts[1:], len(self)) - 1]
+        elif how == 'first':
+            aggregated = self.values[starts]
+        elif how == 'sum':
+            aggregated = np.add.reduceat(self.values, starts)
+        elif how == 'mean':
+            aggregated = np.add.reduceat(self.values, starts) / np.diff(np.append(starts, len(self)))
+        elif how == 'min':
+            aggregated = np.minimum.reduceat(self.values, starts)
+        elif how == 'max':
+            aggregated = np.maximum.reduceat(self.values, starts)
+        else:
+            raise ValueError(f"Unknown aggregation: {how}")
+
+        return TimeSeries(self.indicator_code, periods[starts].astype('datetime64[D]'),
+                          np.asarray(aggregated, dtype=np.float64))
+
+    def yoy_change(self) -> 'TimeSeries':
+        """
+        Percent change from the value one year earlier.
+
+        Each point is compared with the latest observation on or before the
+        same calendar day a year before; points without a year of history
+        and comparisons with a zero base are dropped.
+        """
+        months = self.dates.astype('datetime64[M]')
+        year_ago = (months - 12).astype('datetime64[D]') + (self.dates - months.astype('datetime64[D]'))
+        previous = np.searchsorted(self.dates, year_ago, side='right') - 1
+
+        valid = previous >= 0
+        base = self.values[np.where(valid, previous, 0)]
+        valid &= base != 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = (self.values - base) / np.abs(base) * 100
+        return TimeSeries(self.indicator_code, self.dates[valid], change[valid])
+
+    def rolling(self, window: int, how: str = 'mean') -> 'TimeSeries':
+        """
+        Rolling statistic over the last ``window`` observations.
+
+        Args:
+            window: Number of observations per window
+            how: 'mean', 'sum', 'std', 'min' or 'max'
+
+        Returns:
+            TimeSeries dated at the last observation of each full window
+        """
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        if len(self) < window:
+            return TimeSeries(self.indicator_code, self.dates[:0], self.values[:0])
+
+        if how in ('mean', 'sum'):
+            cumulative = np.concatenate(([0.0], np.cumsum(self.values)))
+            result = cumulative[window:] - cumulative[:-window]
+            if how == 'mean':
+                result = result / window
+        elif how in ('std', 'min', 'max'):
+            windows = np.lib.stride_tricks.sliding_window_view(self.values, window)
+            result = getattr(windows, how)(axis=1)
+        else:
+            raise ValueError(f"Unknown rolling statistic: {how}")
+
+        return TimeSeries(self.indicator_code, self.dates[window - 1:], result)
+
+    def to_dict(self) -> Dict[str, list]:
+        """ISO dates and values for JSON responses."""
+        return {
+            'dates': np.datetime_as_string(self.dates, unit='D').tolist(),
+            'values': self.values.tolist()
+        }
+
+
+class EconomicTimeSeriesStore:
+    """Persist, memory-map and serve columnar economic series."""
+
+    DEFAULT_DIRECTORY = 'data/timeseries'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # indicator code -> (series, values file mtime_ns or None when not written)
+        self._series: Dict[str, Tuple[TimeSeries, int]] = {}
+
+    def _get_db(self):
+        """Get database instance from current Flask app context."""
+        from app import db
+        return db
+
+    def storage_directory(self) -> str:
+        """Directory of the ``.npy`` files (``ECONOMIC_TIMESERIES_PATH``)."""
+        try:
+            return current_app.config.get('ECONOMIC_TIMESERIES_PATH', self.DEFAULT_DIRECTORY)
+        except RuntimeError:
+            return self.DEFAULT_DIRECTORY
+
+    def _paths(self, indicator_code: str) -> Tuple[str, str]:
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', indicator_code)
+        directory = self.storage_directory()
+        return (os.path.join(directory, f'{name}.dates.npy'),
+                os.path.join(directory, f'{name}.values.npy'))
+
+    def clear_cache(self):
+        """Forget every loaded series (files are kept)."""
+        with self._lock:
+            self._series.clear()
+
+    # Serving
+
+    def get(self, indicator_code: str) -> Optional[TimeSeries]:
+        """
+        Series for ``indicator_code``.
+
+        Served from memory while its file is unchanged, memory-mapped from
+        disk otherwise, and built from the database when no file exists.
+
+        Returns:
+            TimeSeries, or None when the indicator has no observations
+        """
+        dates_path, values_path = self._paths(indicator_code)
+        try:
+            mtime = os.stat(values_path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        # Series that could not be written are kept with no mtime
+        loaded = self._series.get(indicator_code)
+        if loaded is not None and loaded[1] == mtime:
+            return loaded[0] if len(loaded[0]) else None
+
+        if mtime is not None:
+            series = self._load(indicator_code, dates_path, values_path)
+            if series is not None:
+                with self._lock:
+                    self._series[indicator_code] = (series, mtime)
+                return series
+
+        self.build([indicator_code])
+        series = self._series[indicator_code][0]
+        return series if len(series) else None
+
+    @staticmethod
+    def _load(indicator_code: str, dates_path: str, values_path: str) -> Optional[TimeSeries]:
+        try:
+            dates = np.load(dates_path, mmap_mode='r')
+            values = np.load(values_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load time series {indicator_code}: {e}")
+            return None
+        if len(dates) != len(values):
+            # A rebuild replaced one of the files since the other was read
+            return None
+        return TimeSeries(indicator_code, dates, values)
+
+    # Building
+
+    def build(self, indicator_codes: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Rebuild series from ``economic_data`` and write their files.
+
+        Args:
+            indicator_codes: Codes to rebuild (every stored indicator by default)
+
+        Returns:
+            Dictionary with series and point counts
+        """
+        db = self._get_db()
+        query = select(EconomicData.indicator_code, EconomicData.date, EconomicData.value)
+        if indicator_codes is not None:
+            indicator_codes = list(indicator_codes)
+            if not indicator_codes:
+                return {'series': 0, 'points': 0}
+            query = query.where(EconomicData.indicator_code.in_(indicator_codes))
+        query = query.where(EconomicData.value.isnot(None)).order_by(
+            EconomicData.indicator_code, EconomicData.date, EconomicData.updated_at
+        )
+
+        rows = db.session.execute(query).all()
+        results = {'series': 0, 'points': 0}
+
+        # Requested codes without observations are remembered as empty
+        found = {row[0] for row in rows}
+        for indicator_code in indicator_codes or ():
+            if indicator_code not in found:
+                self._forget(indicator_code)
+        if not rows:
+            return results
+
+        codes = np.array([row[0] for row in rows], dtype=object)
+        dates = np.array([row[1] for row in rows], dtype='datetime64[D]')
+        values = np.array([float(row[2]) for row in rows], dtype=np.float64)
+
+        try:
+            os.makedirs(self.storage_directory(), exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not create time series directory: {e}")
+        boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        for start, end in zip(np.concatenate(([0], boundaries)), np.append(boundaries, len(rows))):
+            series_dates, series_values = dates[start:end], values[start:end]
+            # The same date from several sources keeps the most recently updated value
+            last = np.append(series_dates[1:] != series_dates[:-1], True)
+            series = TimeSeries(codes[start], series_dates[last], series_values[last])
+            self._write(series)
+            results['series'] += 1
+            results['points'] += len(series)
+        return results
+
+    def _write(self, series: TimeSeries):
+        dates_path, values_path = self._paths(series.indicator_code)
+        try:
+            for path, array in ((dates_path, series.dates), (values_path, series.values)):
+                self._save(path, array)
+            mtime = os.stat(values_path).st_mtime_ns
+        except OSError as e:
+            # Keep serving this process from memory; others rebuild their own copy
+            logger.warning(f"Could not write time series {series.indicator_code}: {e}")
+            mtime = None
+
+        with self._lock:
+            self._series[series.indicator_code] = (series, mtime)
+
+    def _forget(self, indicator_code: str):
+        """Remove the files of an indicator with no observations and cache it as empty."""
+        for path in self._paths(indicator_code):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove time series file {path}: {e}")
+        empty = TimeSeries(indicator_code, np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64))
+        with self._lock:
+            self._series[indicator_code] = (empty, None)
+
+    @staticmethod
+    def _save(path: str, array: np.ndarray):
+        """Write ``array`` to ``path`` atomically."""
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npy.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+# Global instance shared by MLService, DataService and the economic data writers
+economic_timeseries = EconomicTimeSeriesStore()
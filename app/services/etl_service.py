@@ -357,7 +357,19 @@ class ETLService:
             engine = db.engine
             dialect_name = engine.dialect.name
             
+            # Sold listings touched by this batch, folded into the market cube afterwards
+            track_market = model_class is Property
+            if track_market:
+                from app.services.market_cube import market_cube
+            
+            cube_changes = 0
             with engine.begin() as conn:
+                if track_market:
+                    track_market = market_cube.is_built(conn)
+                if track_market:
+                    batch_ids = [record.get('listing_id') for record in batch_data]
+                    sales_before = market_cube.capture(conn, batch_ids)
+                
                 for record in batch_data:
                     try:
                         listing_id = record.get('listing_id')
@@ -447,6 +459,13 @@ class ETLService:
                             'timestamp': datetime.utcnow().isoformat()
                         })
                         logger.error(f"Error processing record {listing_id}: {e}")
+                
+                if track_market:
+                    cube_changes = market_cube.apply_changes(conn, sales_before, market_cube.capture(conn, batch_ids))
+            
+            # Only after the commit, so other workers never load uncommitted cells
+            if cube_changes:
+                market_cube.publish_changes()
                         
         except Exception as e:
             logger.error(f"Batch database load failed: {e}")
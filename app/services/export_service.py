@@ -24,6 +24,8 @@ from app.models.agent import Agent
 from app.models.economic_data import EconomicIndicator
 from app.extensions import db
 from app.services.etl_service import PerformanceMonitor
+from app.services.location_resolver import location_resolver
+from app.models.projections import PROPERTY_EXPORT, projection_for_fields
 
 logger = logging.getLogger(__name__)
 
@@ -130,7 +132,7 @@ class EnhancedExportService:
             if isinstance(filters['city'], list):
                 query = query.filter(Property.city.in_(filters['city']))
             else:
-                query = query.filter(Property.city.ilike(f"%{filters['city']}%"))
+                query = query.filter(location_resolver.city_clause(filters['city']))
         
         if 'province' in filters:
             if isinstance(filters['province'], list):
@@ -209,6 +211,8 @@ class EnhancedExportService:
                 'maintenance_fee', 'ai_valuation', 'investment_score', 'risk_assessment'
             ]
         
+        # Select only the exported columns instead of hydrating Property objects
+        rows_query = self._batch_query(query, selected_fields)
         processed_count = 0
         
         async with aiofiles.open(file_path, 'w', newline='', encoding='utf-8') as f:
@@ -220,7 +224,7 @@ class EnhancedExportService:
             # Process in batches
             offset = 0
             while offset < total_count:
-                batch = query.offset(offset).limit(self.batch_size).all()
+                batch = rows_query.offset(offset).limit(self.batch_size).all()
                 
                 if not batch:
                     break
@@ -265,6 +269,7 @@ class EnhancedExportService:
         
         file_path = f"{output_path}.json"
         
+        rows_query = self._batch_query(query, fields) if fields else PROPERTY_EXPORT.rows(query)
         processed_count = 0
         
         async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
@@ -274,7 +279,7 @@ class EnhancedExportService:
             first_record = True
             
             while offset < total_count:
-                batch = query.offset(offset).limit(self.batch_size).all()
+                batch = rows_query.offset(offset).limit(self.batch_size).all()
                 
                 if not batch:
                     break
@@ -370,6 +375,8 @@ class EnhancedExportService:
                 'maintenance_fee', 'ai_valuation', 'investment_score', 'risk_assessment'
             ]
         
+        rows_query = self._batch_query(query, selected_fields)
+        
         # Write headers
         for col, field in enumerate(selected_fields):
             worksheet.write(0, col, field.replace('_', ' ').title(), header_format)
@@ -380,7 +387,7 @@ class EnhancedExportService:
         offset = 0
         
         while True:
-            batch = query.offset(offset).limit(self.batch_size).all()
+            batch = rows_query.offset(offset).limit(self.batch_size).all()
             
             if not batch:
                 break
@@ -499,6 +506,11 @@ class EnhancedExportService:
         
         file_path = f"{output_path}.xml"
         
+        export_fields = fields or [
+            'listing_id', 'property_type', 'address', 'city', 'province',
+            'sold_price', 'bedrooms', 'bathrooms', 'sqft'
+        ]
+        rows_query = self._batch_query(query, export_fields)
         processed_count = 0
         
         async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
@@ -507,7 +519,7 @@ class EnhancedExportService:
             
             offset = 0
             while offset < total_count:
-                batch = query.offset(offset).limit(self.batch_size).all()
+                batch = rows_query.offset(offset).limit(self.batch_size).all()
                 
                 if not batch:
                     break
@@ -516,11 +528,6 @@ class EnhancedExportService:
                     await f.write('  <property>\n')
                     
                     # Write fields
-                    export_fields = fields or [
-                        'listing_id', 'property_type', 'address', 'city', 'province',
-                        'sold_price', 'bedrooms', 'bathrooms', 'sqft'
-                    ]
-                    
                     for field in export_fields:
                         if hasattr(property_obj, field):
                             value = getattr(property_obj, field)
@@ -576,11 +583,12 @@ class EnhancedExportService:
         """Create Parquet file using pandas."""
         
         # Read data in chunks and build DataFrame
+        rows_query = self._batch_query(query, fields) if fields else PROPERTY_EXPORT.rows(query)
         all_data = []
         offset = 0
         
         while True:
-            batch = query.offset(offset).limit(self.batch_size).all()
+            batch = rows_query.offset(offset).limit(self.batch_size).all()
             
             if not batch:
                 break
@@ -632,37 +640,15 @@ class EnhancedExportService:
         
         return export_result
     
-    def _property_to_dict(self, property_obj: Property) -> Dict[str, Any]:
-        """Convert Property object to dictionary."""
-        return {
-            'listing_id': property_obj.listing_id,
-            'mls': property_obj.mls,
-            'property_type': property_obj.property_type,
-            'address': property_obj.address,
-            'city': property_obj.city,
-            'province': property_obj.province,
-            'postal_code': property_obj.postal_code,
-            'latitude': self._serialize_value(property_obj.latitude),
-            'longitude': self._serialize_value(property_obj.longitude),
-            'sold_price': self._serialize_value(property_obj.sold_price),
-            'bedrooms': property_obj.bedrooms,
-            'bathrooms': self._serialize_value(property_obj.bathrooms),
-            'sqft': property_obj.sqft,
-            'lot_size': self._serialize_value(property_obj.lot_size),
-            'sold_date': property_obj.sold_date.isoformat() if property_obj.sold_date else None,
-            'dom': property_obj.dom,
-            'taxes': self._serialize_value(property_obj.taxes),
-            'maintenance_fee': self._serialize_value(property_obj.maintenance_fee),
-            'features': property_obj.features,
-            'community_features': property_obj.community_features,
-            'remarks': property_obj.remarks,
-            'ai_valuation': self._serialize_value(property_obj.ai_valuation),
-            'investment_score': self._serialize_value(property_obj.investment_score),
-            'risk_assessment': property_obj.risk_assessment,
-            'market_trend': property_obj.market_trend,
-            'created_at': property_obj.created_at.isoformat() if property_obj.created_at else None,
-            'updated_at': property_obj.updated_at.isoformat() if property_obj.updated_at else None
-        }
+    def _property_to_dict(self, property_obj) -> Dict[str, Any]:
+        """Convert a Property object or PROPERTY_EXPORT row to dictionary."""
+        return PROPERTY_EXPORT.serialize(property_obj)
+    
+    def _batch_query(self, query: Query, fields: List[str]) -> Query:
+        """Select only ``fields`` when they are all columns; otherwise load full Property rows."""
+        if fields and all(field in Property.__table__.c for field in fields):
+            return projection_for_fields(fields).rows(query)
+        return query
     
     def _serialize_value(self, value: Any) -> Any:
         """Serialize value for JSON/export compatibility."""
@@ -690,7 +676,7 @@ class EnhancedExportService:
         query = db.session.query(Property)
         
         if city:
-            query = query.filter(Property.city.ilike(f"%{city}%"))
+            query = query.filter(location_resolver.city_clause(city))
         if province:
             query = query.filter(Property.province == province)
         if date_range:
@@ -4,10 +4,12 @@ Handles fetching economic data and indicators that affect real estate markets.
 """
 import requests
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
 from app.models.economic_data import EconomicData, EconomicIndicator
 from app.extensions import db, cache
+from app.services.economic_fetcher import EconomicFetcher, FetchResult, SeriesRequest
+from app.tracing import tracer
 import logging
 import xml.etree.ElementTree as ET
 
@@ -24,6 +26,7 @@ class ExternalAPIsService:
     # Statistics Canada API endpoints
     STATCAN_BASE_URL = "https://www150.statcan.gc.ca/t1/wds/rest"
     STATCAN_GETDATA_URL = f"{STATCAN_BASE_URL}/getFullTableDownloadCSV"
+    STATCAN_DOWNLOAD_URL = "https://www150.statcan.gc.ca/t1/tbl1/en/tv.action"
     
     # Common economic indicators we track
     BOC_INDICATORS = {
@@ -77,7 +80,8 @@ class ExternalAPIsService:
             
             logger.info(f"Fetching BoC data for {indicator} ({series_code})")
             
-            response = requests.get(url, params=params, timeout=30)
+            with tracer.span('external_api'):
+                response = requests.get(url, params=params, timeout=30)
             response.raise_for_status()
             
             data = response.json()
@@ -86,19 +90,7 @@ class ExternalAPIsService:
                 logger.warning(f"No observations in BoC response for {indicator}")
                 return {'error': 'No data available'}
             
-            # Process observations
-            processed_data = []
-            for obs in data['observations']:
-                # BoC API structure: obs[series_code]['v'] contains the value
-                if series_code in obs and obs[series_code] and 'v' in obs[series_code]:
-                    value_str = obs[series_code]['v']
-                    if value_str and value_str.strip():  # Skip null/empty values
-                        processed_data.append({
-                            'date': obs['d'],
-                            'value': float(value_str),
-                            'indicator': indicator,
-                            'source': 'Bank of Canada'
-                        })
+            processed_data = cls._parse_boc_observations(data, indicator, series_code)
             
             # Store in database
             cls._store_economic_data(processed_data, indicator, 'BOC')
@@ -126,6 +118,35 @@ class ExternalAPIsService:
             logger.error(f"Error processing BoC data for {indicator}: {str(e)}")
             return {'error': f'Data processing failed: {str(e)}'}
     
+    @staticmethod
+    def _parse_boc_observations(data: Dict, indicator: str, series_code: str) -> List[Dict]:
+        """Data points from a BoC Valet observations response."""
+        processed_data = []
+        for obs in data.get('observations', []):
+            # BoC API structure: obs[series_code]['v'] contains the value
+            if series_code in obs and obs[series_code] and 'v' in obs[series_code]:
+                value_str = obs[series_code]['v']
+                if value_str and value_str.strip():  # Skip null/empty values
+                    processed_data.append({
+                        'date': obs['d'],
+                        'value': float(value_str),
+                        'indicator': indicator,
+                        'source': 'Bank of Canada'
+                    })
+        return processed_data
+    
+    @staticmethod
+    def _statcan_placeholder_points(table_name: str) -> List[Dict]:
+        """Data points recorded for a successful StatsCan table download."""
+        # For now, return a simplified success response
+        # In production, you'd parse the CSV data
+        return [{
+            'date': datetime.now().strftime('%Y-%m-%d'),
+            'value': 100.0,  # Placeholder
+            'indicator': table_name,
+            'source': 'Statistics Canada'
+        }]
+    
     @classmethod
     def get_statcan_data(cls, table_name: str, reference_period: str = None) -> Dict:
         """Fetch data from Statistics Canada API."""
@@ -138,23 +159,17 @@ class ExternalAPIsService:
             logger.info(f"Fetching StatsCan data for {table_name} ({table_id})")
             
             # Build API URL - using a simpler approach
-            url = f"https://www150.statcan.gc.ca/t1/tbl1/en/tv.action"
+            url = cls.STATCAN_DOWNLOAD_URL
             params = {
                 'pid': table_id.replace('-', ''),
                 'format': 'CSV'
             }
             
-            response = requests.get(url, params=params, timeout=60)
+            with tracer.span('external_api'):
+                response = requests.get(url, params=params, timeout=60)
             
             if response.status_code == 200:
-                # For now, return a simplified success response
-                # In production, you'd parse the CSV data
-                processed_data = [{
-                    'date': datetime.now().strftime('%Y-%m-%d'),
-                    'value': 100.0,  # Placeholder
-                    'indicator': table_name,
-                    'source': 'Statistics Canada'
-                }]
+                processed_data = cls._statcan_placeholder_points(table_name)
                 
                 cls._store_economic_data(processed_data, table_name, 'STATCAN')
                 
@@ -174,44 +189,51 @@ class ExternalAPIsService:
             return {'error': f'Data processing failed: {str(e)}'}
     
     @classmethod
-    def _store_economic_data(cls, data_points: List[Dict], indicator: str, source: str):
-        """Store economic data in the database."""
+    def _store_economic_data(cls, data_points: List[Dict], indicator: str, source: str,
+                             raise_errors: bool = False) -> Dict:
+        """
+        Store economic data in the database.
+        
+        Args:
+            raise_errors: Re-raise storage errors (after rolling back) instead of only logging them
+        
+        Returns:
+            Dictionary with inserted, updated and unchanged counts
+        """
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
         try:
             from flask import has_app_context
             
             # Only try to store in database if we have an app context
             if not has_app_context():
                 logger.warning("No Flask app context, skipping database storage")
-                return
+                return counts
                 
             from app.models.economic_data import EconomicData
             
-            for point in data_points:
-                # Check if record already exists
-                existing = EconomicData.query.filter_by(
-                    indicator_name=indicator,
-                    date=datetime.strptime(point['date'], '%Y-%m-%d').date(),
-                    source=source
-                ).first()
-                
-                if not existing:
-                    economic_data = EconomicData(
-                        indicator_name=indicator,
-                        indicator_code=cls.BOC_INDICATORS.get(indicator, indicator),
-                        value=point['value'],
-                        date=datetime.strptime(point['date'], '%Y-%m-%d').date(),
-                        source=source,
-                        unit='%' if 'rate' in indicator else 'Index',
-                        frequency='daily'
-                    )
-                    db.session.add(economic_data)
-                else:
-                    # Update existing record
-                    existing.value = point['value']
-                    existing.updated_at = datetime.utcnow()
-            
-            db.session.commit()
-            logger.info(f"Stored {len(data_points)} data points for {indicator}")
+            indicator_code = cls.BOC_INDICATORS.get(indicator, indicator)
+            counts = EconomicData.bulk_upsert([
+                {
+                    'indicator_name': indicator,
+                    'indicator_code': indicator_code,
+                    'value': point['value'],
+                    'date': datetime.strptime(point['date'], '%Y-%m-%d').date(),
+                    'source': source,
+                    'unit': '%' if 'rate' in indicator else 'Index',
+                    'frequency': 'daily'
+                }
+                for point in data_points
+            ])
+            logger.info(f"Stored {len(data_points)} data points for {indicator}: "
+                        f"{counts['inserted']} inserted, {counts['updated']} updated, "
+                        f"{counts['unchanged']} unchanged")
+            
+            if counts['inserted'] or counts['updated']:
+                from app.services.economic_timeseries import economic_timeseries
+                try:
+                    economic_timeseries.build([indicator_code])
+                except Exception as e:
+                    logger.warning(f"Could not rebuild time series for {indicator}: {str(e)}")
             
         except Exception as e:
             logger.error(f"Error storing economic data: {str(e)}")
@@ -219,6 +241,9 @@ class ExternalAPIsService:
                 db.session.rollback()
             except:
                 pass
+            if raise_errors:
+                raise
+        return counts
     
     @classmethod
     def get_all_indicators(cls) -> Dict:
@@ -364,42 +389,152 @@ class ExternalAPIsService:
             
             return error_obj
     
+    @classmethod
+    def _last_observation_dates(cls, source: str) -> Dict[str, date]:
+        """Latest stored observation date per indicator for ``source``."""
+        try:
+            rows = db.session.query(
+                EconomicData.indicator_name, db.func.max(EconomicData.date)
+            ).filter(EconomicData.source == source).group_by(EconomicData.indicator_name).all()
+            return {name: last_date for name, last_date in rows if last_date is not None}
+        except Exception as e:
+            logger.warning(f"Could not load last observation dates for {source}: {str(e)}")
+            return {}
+    
+    @classmethod
+    def _boc_series_request(cls, indicator: str, start_date: str = None) -> SeriesRequest:
+        """Fetch engine request for a BoC series."""
+        series_code = cls.BOC_INDICATORS[indicator]
+        if not start_date:
+            start_date = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
+        return SeriesRequest(
+            key=f"boc_{indicator}",
+            url=f"{cls.BOC_OBSERVATIONS_URL}/{series_code}/json",
+            params={
+                'start_date': start_date,
+                'end_date': datetime.now().strftime('%Y-%m-%d')
+            },
+            parse=lambda response: cls._parse_boc_observations(response.json(), indicator, series_code)
+        )
+    
+    @classmethod
+    def _statcan_series_request(cls, table_name: str) -> SeriesRequest:
+        """Fetch engine request for a StatsCan table."""
+        return SeriesRequest(
+            key=f"statcan_{table_name}",
+            url=cls.STATCAN_DOWNLOAD_URL,
+            params={
+                'pid': cls.STATCAN_TABLES[table_name].replace('-', ''),
+                'format': 'CSV'
+            },
+            parse=lambda response: cls._statcan_placeholder_points(table_name),
+            timeout=60
+        )
+    
+    @classmethod
+    def _get_fetcher(cls) -> EconomicFetcher:
+        try:
+            from flask import current_app
+            return EconomicFetcher(
+                per_host_limit=current_app.config.get('ECONOMIC_FETCH_CONCURRENCY', 4),
+                max_retries=current_app.config.get('ECONOMIC_FETCH_RETRIES', 3)
+            )
+        except RuntimeError:
+            return EconomicFetcher()
+    
+    @classmethod
+    def fetch_series(cls, boc_indicators: Iterable[str] = None,
+                     statcan_tables: Iterable[str] = None) -> Dict[str, FetchResult]:
+        """
+        Fetch BoC and StatsCan series concurrently and store the new observations.
+        
+        BoC series start from the last stored observation (re-fetching that
+        day picks up revisions), so a refresh only transfers new data.
+        
+        Args:
+            boc_indicators: BoC indicator names (all by default)
+            statcan_tables: StatsCan table names (all by default)
+            
+        Returns:
+            Dictionary of series key (``boc_<indicator>``, ``statcan_<table>``) -> FetchResult
+        """
+        boc_indicators = list(cls.BOC_INDICATORS if boc_indicators is None else boc_indicators)
+        statcan_tables = list(cls.STATCAN_TABLES if statcan_tables is None else statcan_tables)
+        
+        last_dates = cls._last_observation_dates('BOC') if boc_indicators else {}
+        series = [
+            cls._boc_series_request(
+                indicator,
+                last_dates[indicator].strftime('%Y-%m-%d') if indicator in last_dates else None
+            )
+            for indicator in boc_indicators
+        ]
+        series += [cls._statcan_series_request(table_name) for table_name in statcan_tables]
+        
+        fetcher = cls._get_fetcher()
+        results = fetcher.run(series)
+        
+        # Storage stays on this thread and session. Validators are saved only after a
+        # successful store; otherwise the next refresh would get a 304 for unstored data
+        names = [(indicator, 'BOC') for indicator in boc_indicators]
+        names += [(table_name, 'STATCAN') for table_name in statcan_tables]
+        for request, (name, source) in zip(series, names):
+            result = results[request.key]
+            if result.status != 'updated':
+                continue
+            try:
+                result.stored = cls._store_economic_data(result.points, name, source, raise_errors=True)
+            except Exception as e:
+                result.status = 'error'
+                result.error = f"Storing {len(result.points)} points failed: {str(e)}"
+                continue
+            fetcher.save_validators(request, result.validators)
+        
+        return results
+    
     @classmethod
     def refresh_all_data(cls) -> Dict:
         """Refresh all economic data from external APIs."""
         results = {
             'success': [],
+            'not_modified': [],
             'errors': [],
-            'total_processed': 0
+            'total_processed': 0,
+            'stored': {'inserted': 0, 'updated': 0, 'unchanged': 0}
         }
         
         logger.info("Starting refresh of all economic data")
+        start_time = datetime.now()
         
-        # Refresh BoC data
-        for indicator in cls.BOC_INDICATORS.keys():
-            try:
-                data = cls.get_bank_of_canada_data(indicator)
-                if 'error' not in data:
-                    results['success'].append(f"boc_{indicator}")
-                    results['total_processed'] += data.get('count', 0)
-                else:
-                    results['errors'].append(f"boc_{indicator}: {data['error']}")
-            except Exception as e:
-                results['errors'].append(f"boc_{indicator}: {str(e)}")
+        try:
+            fetched = cls.fetch_series()
+        except Exception as e:
+            logger.error(f"Economic data refresh failed: {str(e)}")
+            fetched = {}
+            results['errors'].append(f"fetch: {str(e)}")
         
-        # Refresh StatsCan data
-        for table_name in cls.STATCAN_TABLES.keys():
-            try:
-                data = cls.get_statcan_data(table_name)
-                if 'error' not in data:
-                    results['success'].append(f"statcan_{table_name}")
-                    results['total_processed'] += data.get('count', 0)
-                else:
-                    results['errors'].append(f"statcan_{table_name}: {data['error']}")
-            except Exception as e:
-                results['errors'].append(f"statcan_{table_name}: {str(e)}")
+        for key, result in fetched.items():
+            if result.status == 'updated':
+                results['success'].append(key)
+                results['total_processed'] += len(result.points)
+                for count, value in result.stored.items():
+                    results['stored'][count] += value
+            elif result.status == 'not_modified':
+                results['not_modified'].append(key)
+            else:
+                results['errors'].append(f"{key}: {result.error}")
         
-        logger.info(f"Economic data refresh completed: {len(results['success'])} success, {len(results['errors'])} errors")
+        results['elapsed_seconds'] = (datetime.now() - start_time).total_seconds()
+        logger.info(f"Economic data refresh completed in {results['elapsed_seconds']:.2f}s: "
+                    f"{len(results['success'])} success, {len(results['not_modified'])} not modified, "
+                    f"{len(results['errors'])} errors")
+        
+        # Publish the refreshed values to every worker
+        try:
+            from app.services.economic_snapshot import economic_snapshot
+            results['snapshot_version'] = economic_snapshot.refresh()['version']
+        except Exception as e:
+            logger.warning(f"Economic snapshot rebuild failed: {str(e)}")
         
         return results
     
@@ -419,7 +554,8 @@ class ExternalAPIsService:
                 'lang': 'en'
             }
             
-            response = requests.get(url, params=params, timeout=30)
+            with tracer.span('external_api'):
+                response = requests.get(url, params=params, timeout=30)
             response.raise_for_status()
             
             # Note: StatCan API often returns XML or requires specific parsing
@@ -647,20 +783,10 @@ class ExternalAPIsService:
     def fetch_and_store_boc_data(cls) -> bool:
         """Fetch and store Bank of Canada data for all indicators."""
         try:
-            success_count = 0
+            results = cls.fetch_series(statcan_tables=[])
+            success_count = sum(1 for result in results.values() if result.ok)
             total_count = len(cls.BOC_INDICATORS)
             
-            for indicator in cls.BOC_INDICATORS.keys():
-                try:
-                    result = cls.get_bank_of_canada_data(indicator)
-                    if 'error' not in result:
-                        success_count += 1
-                        logger.info(f"Successfully fetched BOC data for {indicator}")
-                    else:
-                        logger.warning(f"Failed to fetch BOC data for {indicator}: {result['error']}")
-                except Exception as e:
-                    logger.error(f"Error fetching BOC data for {indicator}: {str(e)}")
-            
             success_rate = success_count / total_count
             logger.info(f"BOC data fetch completed: {success_count}/{total_count} indicators successful")
             
@@ -674,20 +800,10 @@ class ExternalAPIsService:
     def fetch_and_store_statscan_data(cls) -> bool:
         """Fetch and store Statistics Canada data for all tables."""
         try:
-            success_count = 0
+            results = cls.fetch_series(boc_indicators=[])
+            success_count = sum(1 for result in results.values() if result.ok)
             total_count = len(cls.STATCAN_TABLES)
             
-            for table_name in cls.STATCAN_TABLES.keys():
-                try:
-                    result = cls.get_statcan_data(table_name)
-                    if 'error' not in result:
-                        success_count += 1
-                        logger.info(f"Successfully fetched StatsCan data for {table_name}")
-                    else:
-                        logger.warning(f"Failed to fetch StatsCan data for {table_name}: {result['error']}")
-                except Exception as e:
-                    logger.error(f"Error fetching StatsCan data for {table_name}: {str(e)}")
-            
             success_rate = success_count / total_count
             logger.info(f"StatsCan data fetch completed: {success_count}/{total_count} tables successful")
             
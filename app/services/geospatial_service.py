@@ -9,7 +9,8 @@ from geopy.geocoders import Nominatim
 from geopy.distance import geodesic
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 from app.models.property import Property
-from app import db, cache
+from app import db
+from app.extensions import cache
 import logging
 
 logger = logging.getLogger(__name__)
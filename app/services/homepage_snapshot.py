@@ -0,0 +1,178 @@
+"""
+Precomputed homepage snapshot.
+
+The homepage used to run its market statistics, top-cities aggregation, top
+properties, market predictions and price trend queries serially on every
+cache miss, in every worker. This service builds all of it into one plain-data
+snapshot, stored once in the shared Flask cache and stamped with a version, so
+``main.index`` renders without touching the database.
+
+Snapshots are rebuilt by a background thread every
+``HOMEPAGE_SNAPSHOT_INTERVAL`` seconds (one builder at a time across workers,
+coordinated through a cache lock) and after ETL imports. The thread runs in
+serving processes only (``START_SCHEDULERS``, set by ``wsgi.py``).
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func
+
+from app.extensions import cache
+from app.models.property import Property, PropertyPhoto
+from app.services.versioned_snapshot import VersionedSnapshotService
+
+logger = logging.getLogger(__name__)
+
+
+class HomepageSnapshotService(VersionedSnapshotService):
+    """Build, store and serve the homepage snapshot."""
+
+    CACHE_KEY = 'homepage:snapshot'
+    BUILD_LOCK_KEY = 'homepage:snapshot:building'
+    INTERVAL_CONFIG = 'HOMEPAGE_SNAPSHOT_INTERVAL'
+    NAME = 'homepage'
+
+    DEFAULT_INTERVAL = 300
+
+    DEFAULT_TREND_DATA = {
+        'dates': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
+        'avg_prices': [580000, 595000, 610000, 625000, 640000, 655000]
+    }
+
+    # Serving
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        """Return the current snapshot from the shared cache, if any."""
+        return cache.get(self.CACHE_KEY)
+
+    def template_context(self, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """Template variables for ``index.html``."""
+        return {
+            'top_properties': snapshot['top_properties'],
+            'featured_properties': snapshot['featured_properties'],
+            'market_stats': snapshot['market_stats'],
+            'top_cities': snapshot['top_cities'],
+            'market_predictions': snapshot['market_predictions'],
+            'trend_data': snapshot['trend_data'],
+        }
+
+    # Building
+
+    def refresh(self) -> Dict[str, Any]:
+        """Build a new snapshot and store it in the shared cache."""
+        snapshot = self.build()
+        cache.set(self.CACHE_KEY, snapshot, timeout=self._get_interval() * self.CACHE_TIMEOUT_INTERVALS)
+        logger.info(f"Homepage snapshot v{snapshot['version']} built in {snapshot['build_seconds']:.2f}s")
+        return snapshot
+
+    def build(self) -> Dict[str, Any]:
+        """
+        Compute every homepage section as plain, cacheable data.
+
+        Each section degrades independently to its empty value on error, as
+        the homepage did when it queried them per request.
+        """
+        start_time = time.time()
+        snapshot = {
+            'top_properties': self._section('top properties', self._build_top_properties, []),
+            'featured_properties': self._section('featured properties', self._build_featured_properties, []),
+            'market_stats': self._section('market stats', self._build_market_stats, {
+                'total_properties': 0,
+                'avg_price': 0,
+                'cities_covered': 0,
+                'ai_analyzed': 0
+            }),
+            'top_cities': self._section('top cities', self._build_top_cities, []),
+            'market_predictions': self._section(
+                'market predictions', lambda: self._get_ml_service().get_market_predictions(), {}
+            ),
+            'trend_data': self._section('trend data', self._build_trend_data, dict(self.DEFAULT_TREND_DATA)),
+        }
+
+        return self._stamp(snapshot, start_time)
+
+    def _section(self, name: str, builder, default):
+        try:
+            return builder()
+        except Exception as e:
+            logger.warning(f"Could not build homepage {name}: {str(e)}")
+            return default
+
+    def _build_top_properties(self) -> List[Dict[str, Any]]:
+        from app.services.ml_service import MLService
+
+        # Bypass the memoized copy so a rebuild after an import sees new listings
+        ml_service = self._get_ml_service()
+        top_properties = MLService.get_top_properties.uncached(ml_service, limit=3)
+        return [
+            {**entry, 'property': self._property_card(entry['property'])}
+            for entry in top_properties
+        ]
+
+    def _build_featured_properties(self) -> List[Dict[str, Any]]:
+        properties = Property.query.filter(
+            Property.sold_price.isnot(None)
+        ).order_by(Property.sold_price.desc()).limit(3).all()
+        return [self._property_card(prop) for prop in properties]
+
+    def _build_market_stats(self) -> Dict[str, Any]:
+        from app import db
+
+        total_properties, avg_price, cities_covered, ai_analyzed = db.session.query(
+            func.count(Property.listing_id),
+            func.avg(Property.sold_price),
+            func.count(func.distinct(Property.city)),
+            func.count(Property.ai_valuation)
+        ).one()
+
+        return {
+            'total_properties': total_properties or 0,
+            'avg_price': float(avg_price) if avg_price else 0,
+            'cities_covered': cities_covered or 0,
+            'ai_analyzed': ai_analyzed or 0
+        }
+
+    def _build_top_cities(self) -> List[Dict[str, Any]]:
+        from app import db
+
+        rows = db.session.query(
+            Property.city,
+            func.count(Property.listing_id).label('count'),
+            func.avg(Property.sold_price).label('avg_price')
+        ).filter(
+            and_(
+                Property.city.isnot(None),
+                Property.sold_price.isnot(None)
+            )
+        ).group_by(Property.city).order_by(
+            func.count(Property.listing_id).desc()
+        ).limit(6).all()
+
+        return [
+            {'city': city, 'count': count, 'avg_price': float(avg_price or 0)}
+            for city, count, avg_price in rows
+        ]
+
+    def _build_trend_data(self) -> Dict[str, Any]:
+        from app.services.data_service import DataService
+        return DataService.get_property_price_trends.uncached(period_days=180)
+
+    @staticmethod
+    def _property_card(prop: Property) -> Dict[str, Any]:
+        """Plain-data view of a property with the fields the homepage cards use."""
+        card = prop.to_dict()
+        photo = prop.photos.order_by(PropertyPhoto.order_index).first()
+        card['images'] = [{'image_url': photo.photo_url}] if photo else []
+
+        for name in ('estimated_rental_income', 'roi_estimate'):
+            try:
+                value = getattr(prop, name)
+                card[name] = float(value) if value is not None else None
+            except (TypeError, ArithmeticError):
+                card[name] = None
+        return card
+
+
+# Global instance shared by the homepage route, admin stats and ETL commands
+homepage_snapshot = HomepageSnapshotService()
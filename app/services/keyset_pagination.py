@@ -0,0 +1,241 @@
+"""
+Keyset ("seek") pagination for property listings.
+
+``query.paginate()`` skips rows with ``OFFSET`` and runs a separate
+``COUNT(*)`` over the filtered set, so every deep page rescans everything
+before it. Keyset pagination orders listings by ``(sold_date DESC,
+listing_id DESC)`` and resumes after the last row of the previous page, which
+the ``idx_sold_date_listing`` index answers directly: page N costs the same as
+page 1.
+
+Cursors are opaque URL-safe tokens encoding that ``(sold_date, listing_id)``
+position. Totals are optional and, when requested as approximate, come from
+cached counts (or table statistics for unfiltered MySQL queries) rather than
+an exact ``COUNT(*)`` per request.
+"""
+import base64
+import hashlib
+import json
+import logging
+import math
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import or_, text
+
+from app.extensions import cache
+from app.models.property import Property
+from app.utils.errors import ValidationError
+
+logger = logging.getLogger(__name__)
+
+TOTAL_MODES = ('exact', 'approximate', 'none')
+
+
+class KeysetPage:
+    """
+    One page of keyset results.
+
+    Mirrors the attributes of Flask-SQLAlchemy's ``Pagination`` that the
+    templates read, so ``properties/search.html`` renders either kind.
+    """
+
+    def __init__(self, items: List[Any], per_page: int, next_cursor: Optional[str],
+                 cursor: Optional[str] = None, page: int = 1,
+                 total: Optional[int] = None, total_is_approximate: bool = False):
+        self.items = items
+        self.per_page = per_page
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.page = page
+        self.total = total
+        self.total_is_approximate = total_is_approximate
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 1
+
+    @property
+    def next_num(self) -> Optional[int]:
+        return self.page + 1 if self.has_next else None
+
+    @property
+    def prev_num(self) -> Optional[int]:
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def pages(self) -> int:
+        if not self.total:
+            return self.page if self.items else 0
+        return max(self.page, int(math.ceil(self.total / float(self.per_page))))
+
+    def iter_pages(self):
+        # Numbered links would need OFFSET; only previous/next are offered
+        return []
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Pagination block for API responses."""
+        return {
+            'mode': 'cursor',
+            'per_page': self.per_page,
+            'cursor': self.cursor,
+            'next_cursor': self.next_cursor,
+            'has_next': self.has_next,
+            'total': self.total,
+            'total_is_approximate': self.total_is_approximate
+        }
+
+
+class KeysetPaginator:
+    """Seek pagination over ``(sold_date DESC, listing_id DESC)``."""
+
+    COUNT_CACHE_PREFIX = 'keyset:count:'
+    DEFAULT_COUNT_TIMEOUT = 300
+
+    def __init__(self, date_column=Property.sold_date, key_column=Property.listing_id):
+        self.date_column = date_column
+        self.key_column = key_column
+
+    # Cursors
+
+    def encode_cursor(self, sold_date: Optional[date], listing_id: str) -> str:
+        """Opaque token for the position after ``(sold_date, listing_id)``."""
+        payload = json.dumps(
+            [sold_date.isoformat() if sold_date else None, listing_id],
+            separators=(',', ':')
+        )
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> Tuple[Optional[date], str]:
+        """Decode a cursor; raises ``ValidationError`` for malformed tokens."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            sold_date, listing_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if not isinstance(listing_id, str):
+                raise ValueError('listing_id must be a string')
+            return (date.fromisoformat(sold_date) if sold_date else None), listing_id
+        except (ValueError, TypeError, UnicodeError) as e:
+            raise ValidationError('Invalid pagination cursor', field='cursor') from e
+
+    def cursor_for(self, item) -> str:
+        """Cursor positioned after a Property or projected row."""
+        return self.encode_cursor(getattr(item, self.date_column.key), getattr(item, self.key_column.key))
+
+    # Queries
+
+    def order(self, query):
+        """Apply the keyset ordering (NULL dates sort last on MySQL and SQLite)."""
+        return query.order_by(self.date_column.desc(), self.key_column.desc())
+
+    def fetch(self, query, cursor: Optional[str], limit: int) -> List[Any]:
+        """
+        Up to ``limit`` rows of an unordered query, after ``cursor``.
+
+        Dated rows are sought with a sargable ``sold_date <= :date`` range on
+        ``idx_sold_date_listing``; the NULL-dated tail is read separately once
+        they run out, since an ``OR sold_date IS NULL`` would defeat the index.
+        """
+        ordered = self.order(query)
+        if not cursor:
+            return ordered.limit(limit).all()
+
+        sold_date, listing_id = self.decode_cursor(cursor)
+        if sold_date is None:
+            return ordered.filter(
+                self.date_column.is_(None), self.key_column < listing_id
+            ).limit(limit).all()
+
+        rows = ordered.filter(
+            self.date_column <= sold_date,
+            or_(self.date_column < sold_date, self.key_column < listing_id)
+        ).limit(limit).all()
+        if len(rows) < limit:
+            rows += ordered.filter(self.date_column.is_(None)).limit(limit - len(rows)).all()
+        return rows
+
+    def paginate(self, query, cursor: Optional[str] = None, per_page: int = 20,
+                 page: int = 1, total: str = 'approximate') -> KeysetPage:
+        """
+        Fetch the page after ``cursor``.
+
+        Args:
+            query: Filtered, unordered query (Property or projected rows)
+            cursor: Cursor from the previous page's ``next_cursor``
+            per_page: Page size
+            page: Page number, for display only
+            total: ``exact``, ``approximate`` (cached) or ``none``
+        """
+        rows = self.fetch(query, cursor, per_page + 1)
+        items = rows[:per_page]
+        next_cursor = self.cursor_for(items[-1]) if len(rows) > per_page else None
+
+        count = None
+        if total == 'exact':
+            count = self.exact_count(query)
+        elif total == 'approximate':
+            count = self.approximate_count(query)
+
+        return KeysetPage(items, per_page, next_cursor, cursor=cursor, page=max(page, 1),
+                          total=count, total_is_approximate=(total == 'approximate'))
+
+    # Totals
+
+    @staticmethod
+    def exact_count(query) -> int:
+        return query.order_by(None).count()
+
+    def approximate_count(self, query) -> int:
+        """
+        Count of the filtered set, served from the shared cache.
+
+        Unfiltered queries on MySQL use the table statistics estimate; other
+        counts run once per filter combination and are reused until the
+        cache entry expires (``APPROXIMATE_COUNT_TIMEOUT`` seconds).
+        """
+        statement = query.order_by(None).statement
+        if statement.whereclause is None:
+            estimate = self._table_estimate(query)
+            if estimate is not None:
+                return estimate
+
+        compiled = statement.compile(dialect=query.session.get_bind().dialect)
+        digest = hashlib.blake2b(
+            f'{compiled}|{sorted(compiled.params.items(), key=lambda item: item[0])!r}'.encode('utf-8'),
+            digest_size=16
+        ).hexdigest()
+        cache_key = self.COUNT_CACHE_PREFIX + digest
+
+        count = cache.get(cache_key)
+        if count is None:
+            count = self.exact_count(query)
+            cache.set(cache_key, count, timeout=self._count_timeout())
+        return count
+
+    def _table_estimate(self, query) -> Optional[int]:
+        bind = query.session.get_bind()
+        if bind.dialect.name != 'mysql':
+            return None
+        try:
+            estimate = query.session.execute(text(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table'
+            ), {'table': Property.__tablename__}).scalar()
+            return int(estimate) if estimate is not None else None
+        except Exception as e:
+            logger.debug(f"Table statistics unavailable: {str(e)}")
+            return None
+
+    def _count_timeout(self) -> int:
+        try:
+            return current_app.config.get('APPROXIMATE_COUNT_TIMEOUT', self.DEFAULT_COUNT_TIMEOUT)
+        except RuntimeError:
+            return self.DEFAULT_COUNT_TIMEOUT
+
+
+# Global instance used by the listing routes
+property_paginator = KeysetPaginator()
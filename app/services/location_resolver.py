@@ -0,0 +1,404 @@
+"""
+Canonical city and property type resolution.
+
+City and property type filters used to be ``ILIKE '%text%'`` predicates, which
+cannot use ``idx_city_type_price`` or ``idx_property_search``. Properties now
+carry ``city_id`` and ``property_type_id`` keys into the ``cities`` and
+``property_types`` lookup tables, and this resolver maps user input to those
+ids once:
+
+- Input is normalized (case, whitespace, accents) and matched against the
+  lookup names and ``location_aliases`` by substring, mirroring the old
+  ``ILIKE`` semantics; close misspellings are matched when nothing else is
+- Resolutions are kept in a bounded LRU, so a repeated filter costs one
+  dictionary lookup before running as an integer ``IN``/equality predicate
+
+Until ``flask etl build-location-index`` has populated the ids (or when input
+resolves to nothing), filters fall back to the original ``ILIKE`` predicates.
+"""
+import difflib
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import exists, func, inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.models.property import City, LocationAlias, Property, PropertyType
+
+logger = logging.getLogger(__name__)
+
+
+class _Dimension(NamedTuple):
+    keys: Dict[str, Set[int]]
+    ready: bool
+    loaded_at: float
+
+
+class LocationResolver:
+    """Resolve free-text city and property type input to lookup table ids."""
+
+    # kind -> (lookup model, text column, id column)
+    KINDS = {
+        'city': (City, Property.city, Property.city_id),
+        'property_type': (PropertyType, Property.property_type, Property.property_type_id),
+    }
+
+    # ETL spellings normalized by DataValidator._clean_property_type
+    PROPERTY_TYPE_ALIASES = {
+        'single family': 'House',
+        'detached': 'House',
+        'condominium': 'Condo',
+        'apartment': 'Condo',
+    }
+
+    # How long a loaded lookup table is trusted before reloading it
+    RECHECK_SECONDS = 300
+    RESOLVE_CACHE_SIZE = 2048
+    FUZZY_CUTOFF = 0.85
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._dimensions: Dict[Tuple[str, str], _Dimension] = {}
+        self._resolved: "OrderedDict[Tuple[str, str, str], Tuple[int, ...]]" = OrderedDict()
+        self._ids: Dict[Tuple[str, str, str, Optional[str]], int] = {}
+        self._tables_exist: Dict[str, Tuple[bool, float]] = {}
+        self._assign_failures = 0
+
+    def _get_db(self):
+        """Get database instance from current Flask app context."""
+        from app import db
+        return db
+
+    @staticmethod
+    def normalize(value: Any) -> str:
+        """Lowercase, strip accents and collapse whitespace."""
+        if value is None:
+            return ''
+        decomposed = unicodedata.normalize('NFKD', str(value))
+        stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+        return ' '.join(stripped.lower().split())
+
+    def clear_cache(self):
+        """Forget loaded lookup tables, resolutions and created ids."""
+        with self._lock:
+            self._dimensions.clear()
+            self._resolved.clear()
+            self._ids.clear()
+            self._tables_exist.clear()
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Report whether id filters are active and how many rows still lack ids.
+
+        While any row is pending, filters on that kind fall back to ``ILIKE``;
+        ``flask etl build-location-index`` backfills them.
+        """
+        db = self._get_db()
+        status: Dict[str, Any] = {'assign_failures': self._assign_failures}
+        if not self._dimension_tables_exist():
+            return dict(status, tables_exist=False)
+
+        for kind, (_, text_column, id_column) in self.KINDS.items():
+            pending = db.session.execute(
+                select(func.count()).select_from(Property).where(
+                    text_column.isnot(None), text_column != '', id_column.is_(None)
+                )
+            ).scalar()
+            status[kind] = {'ready': self._get_dimension(kind)[0].ready, 'pending': pending}
+        return dict(status, tables_exist=True)
+
+    # Query filters
+
+    def city_clause(self, value: str):
+        """Filter clause for properties in the cities matching ``value``."""
+        return self._clause('city', value)
+
+    def property_type_clause(self, value: str):
+        """Filter clause for properties of the types matching ``value``."""
+        return self._clause('property_type', value)
+
+    def _clause(self, kind: str, value: str):
+        _, text_column, id_column = self.KINDS[kind]
+        ids = self.resolve(kind, value)
+        if ids:
+            return id_column == ids[0] if len(ids) == 1 else id_column.in_(ids)
+        return text_column.ilike(f'%{value}%')
+
+    def resolve(self, kind: str, value: str) -> Optional[Tuple[int, ...]]:
+        """
+        Map user input to lookup ids.
+
+        Returns:
+            Matching ids (empty when nothing matches), or None when the
+            dimension is not populated yet and callers must use ``ILIKE``
+        """
+        key = self.normalize(value)
+        if not key:
+            return None
+
+        dimension, engine_key = self._get_dimension(kind)
+        if not dimension.ready:
+            return None
+
+        cache_key = (engine_key, kind, key)
+        with self._lock:
+            ids = self._resolved.get(cache_key)
+            if ids is not None:
+                self._resolved.move_to_end(cache_key)
+                return ids
+
+        ids = self._match(dimension.keys, key)
+
+        with self._lock:
+            self._resolved[cache_key] = ids
+            while len(self._resolved) > self.RESOLVE_CACHE_SIZE:
+                self._resolved.popitem(last=False)
+        return ids
+
+    def _match(self, keys: Dict[str, Set[int]], key: str) -> Tuple[int, ...]:
+        ids = set()
+        for name_key, name_ids in keys.items():
+            if key in name_key:
+                ids.update(name_ids)
+
+        if not ids:
+            for name_key in difflib.get_close_matches(key, keys.keys(), n=3, cutoff=self.FUZZY_CUTOFF):
+                ids.update(keys[name_key])
+
+        return tuple(sorted(ids))
+
+    def _get_dimension(self, kind: str) -> Tuple[_Dimension, str]:
+        db = self._get_db()
+        engine_key = str(db.engine.url)
+        cached = self._dimensions.get((engine_key, kind))
+        if cached and time.time() - cached.loaded_at < self.RECHECK_SECONDS:
+            return cached, engine_key
+
+        try:
+            dimension = self._load_dimension(kind)
+        except Exception as e:
+            logger.warning(f"Could not load {kind} lookup table: {e}")
+            dimension = _Dimension({}, False, time.time())
+
+        with self._lock:
+            self._dimensions[(engine_key, kind)] = dimension
+            for cache_key in [k for k in self._resolved if k[:2] == (engine_key, kind)]:
+                del self._resolved[cache_key]
+        return dimension, engine_key
+
+    def _load_dimension(self, kind: str) -> _Dimension:
+        db = self._get_db()
+        model, text_column, id_column = self.KINDS[kind]
+
+        keys: Dict[str, Set[int]] = {}
+        for row_id, name_key in db.session.execute(select(model.id, model.name_key)):
+            keys.setdefault(name_key, set()).add(row_id)
+        aliases = db.session.execute(
+            select(LocationAlias.alias_key, LocationAlias.target_id).where(LocationAlias.kind == kind)
+        )
+        for alias_key, target_id in aliases:
+            keys.setdefault(alias_key, set()).add(target_id)
+
+        # Rows written before the ids existed would be missed by id filters
+        pending = db.session.execute(
+            select(exists().where(text_column.isnot(None), text_column != '', id_column.is_(None)))
+        ).scalar()
+
+        return _Dimension(keys, bool(keys) and not pending, time.time())
+
+    # Id assignment
+
+    def assign_ids(self, target, connection=None):
+        """
+        Set ``city_id``/``property_type_id`` on a property or ETL record.
+
+        Database errors inside a flush propagate so the flush fails instead of
+        writing rows without ids (which would keep id filters disabled). ETL
+        records are left without ids and counted in ``get_status``.
+
+        Args:
+            target: Property instance (from a flush) or mapped ETL record dict
+            connection: Connection of the flush in progress; ids are created
+                in a separate transaction when omitted
+        """
+        if connection is not None:
+            self._assign_ids(target, connection)
+            return
+
+        try:
+            self._assign_ids(target, connection)
+        except SQLAlchemyError as e:
+            with self._lock:
+                self._assign_failures += 1
+            logger.error(f"Could not assign location ids to {target.get('listing_id')}: {e}")
+
+    def _assign_ids(self, target, connection=None):
+        is_record = isinstance(target, dict)
+        state = None if is_record else inspect(target)
+
+        if not self._dimension_tables_exist(connection):
+            return
+
+        for kind, names in (('city', ('city', 'province')), ('property_type', ('property_type',))):
+            if is_record:
+                if names[0] not in target:
+                    continue
+                values = [target.get(name) for name in names]
+            else:
+                # Only touch changed columns so updates never load deferred ones
+                if state.has_identity and not any(
+                    state.attrs[name].history.has_changes() for name in names
+                ):
+                    continue
+                values = [getattr(target, name) for name in names]
+
+            province = values[1] if kind == 'city' else None
+            row_id = self.get_or_create_id(kind, values[0], province, connection)
+
+            if is_record:
+                target[f'{kind}_id'] = row_id
+            else:
+                setattr(target, f'{kind}_id', row_id)
+
+    def get_or_create_id(self, kind: str, name: Optional[str], province: Optional[str] = None,
+                         connection=None) -> Optional[int]:
+        """Return the lookup id for ``name``, creating the lookup row if needed."""
+        key = self.normalize(name)
+        if not key:
+            return None
+        if kind == 'city':
+            province = (province or '').strip()
+
+        if connection is not None:
+            # Ids created inside a caller's transaction are not cached: it may roll back
+            return self._fetch_or_insert(connection, kind, name, key, province)
+
+        db = self._get_db()
+        cache_key = (str(db.engine.url), kind, key, province)
+        row_id = self._ids.get(cache_key)
+        if row_id is None:
+            with self._lock, db.engine.begin() as conn:
+                row_id = self._fetch_or_insert(conn, kind, name, key, province)
+            self._ids[cache_key] = row_id
+        return row_id
+
+    def _fetch_or_insert(self, conn, kind: str, name: str, key: str,
+                         province: Optional[str]) -> int:
+        model = self.KINDS[kind][0]
+        conditions = [model.name_key == key]
+        values = {'name': str(name).strip(), 'name_key': key, 'created_at': datetime.utcnow()}
+        if kind == 'city':
+            conditions.append(model.province == province)
+            values['province'] = province
+
+        row_id = conn.execute(select(model.id).where(*conditions)).scalar()
+        if row_id is not None:
+            return row_id
+
+        try:
+            row_id = conn.execute(model.__table__.insert().values(**values)).inserted_primary_key[0]
+        except IntegrityError:
+            # Created concurrently by another worker
+            row_id = conn.execute(select(model.id).where(*conditions)).scalar()
+
+        self._dimensions.pop((str(conn.engine.url), kind), None)
+        return row_id
+
+    def _dimension_tables_exist(self, connection=None) -> bool:
+        bind = connection if connection is not None else self._get_db().engine
+        engine_key = str(bind.engine.url)
+        cached = self._tables_exist.get(engine_key)
+        if cached and (cached[0] or time.time() - cached[1] < self.RECHECK_SECONDS):
+            return cached[0]
+
+        inspector = inspect(bind)
+        found = all(
+            inspector.has_table(model.__tablename__)
+            for model in (City, PropertyType, LocationAlias)
+        )
+        self._tables_exist[engine_key] = (found, time.time())
+        return found
+
+    # Backfill
+
+    def rebuild(self) -> Dict[str, Any]:
+        """
+        Populate the lookup tables from existing properties and backfill their ids.
+
+        Safe to re-run: only rows whose id is missing or stale are updated.
+
+        Returns:
+            Dictionary with lookup row counts, updated properties and elapsed time
+        """
+        db = self._get_db()
+        start_time = time.time()
+        results = {'cities': 0, 'property_types': 0, 'aliases': 0, 'properties_updated': 0}
+
+        db.metadata.create_all(
+            bind=db.engine,
+            tables=[City.__table__, PropertyType.__table__, LocationAlias.__table__]
+        )
+
+        with db.engine.begin() as conn:
+            for kind, names in (('city', (Property.city, Property.province)),
+                                ('property_type', (Property.property_type,))):
+                _, text_column, id_column = self.KINDS[kind]
+                rows = conn.execute(select(*names).where(text_column.isnot(None)).distinct()).all()
+
+                for row in rows:
+                    key = self.normalize(row[0])
+                    if not key:
+                        continue
+                    province = (row[1] or '').strip() if kind == 'city' else None
+                    row_id = self._fetch_or_insert(conn, kind, row[0], key, province)
+
+                    conditions = [text_column == row[0], or_(id_column.is_(None), id_column != row_id)]
+                    if kind == 'city':
+                        conditions.append(
+                            Property.province.is_(None) if row[1] is None else Property.province == row[1]
+                        )
+                    # Keep updated_at: assigning a surrogate key is not a listing change
+                    updated = conn.execute(
+                        update(Property.__table__).where(*conditions)
+                        .values({id_column.key: row_id, 'updated_at': Property.__table__.c.updated_at})
+                    )
+                    results['properties_updated'] += updated.rowcount
+
+            results['cities'] = conn.execute(select(func.count(City.id))).scalar()
+            results['property_types'] = conn.execute(select(func.count(PropertyType.id))).scalar()
+            results['aliases'] = self._seed_aliases(conn)
+
+        self.clear_cache()
+        results['elapsed_seconds'] = time.time() - start_time
+        logger.info(f"Location lookup tables rebuilt: {results}")
+        return results
+
+    def _seed_aliases(self, conn) -> int:
+        """Add the ETL property type spellings as aliases of their canonical types."""
+        created = 0
+        for alias, canonical in self.PROPERTY_TYPE_ALIASES.items():
+            target_id = conn.execute(
+                select(PropertyType.id).where(PropertyType.name_key == self.normalize(canonical))
+            ).scalar()
+            alias_key = self.normalize(alias)
+            if target_id is None:
+                continue
+            known = conn.execute(select(exists().where(
+                LocationAlias.kind == 'property_type', LocationAlias.alias_key == alias_key
+            ))).scalar()
+            if not known:
+                conn.execute(LocationAlias.__table__.insert().values(
+                    kind='property_type', alias_key=alias_key, target_id=target_id,
+                    created_at=datetime.utcnow()
+                ))
+                created += 1
+        return created
+
+
+# Global instance shared by the models, services and routes
+location_resolver = LocationResolver()
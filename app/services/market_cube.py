@@ -0,0 +1,383 @@
+"""
+Rolling market-aggregate cube.
+
+``MLService._get_market_trend`` (run by every ``analyze_property``) and
+``MLService.get_market_predictions`` used to load the latest 50-100 matching
+``Property`` rows and average their prices in Python, so a page of top
+properties issued hundreds of near-identical queries.
+
+The ``market_aggregates`` table keeps sales counts, price sums and price
+sums of squares per (city_id, property_type_id, week). ETL upserts apply
+their changes to it incrementally. Each process holds the last year of cells
+in memory, reloaded when stale, so a trend lookup is a few dictionary reads;
+results are also memoized for the rest of the request.
+
+``flask etl build-market-cube`` (re)builds the table from existing sales.
+Until it has, callers fall back to querying properties.
+"""
+import logging
+import math
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import and_, delete, func, inspect, select, update
+
+from app.extensions import cache
+from app.models.property import MarketAggregate, Property
+
+logger = logging.getLogger(__name__)
+
+CellKey = Tuple[int, int, date]
+
+
+class WeekBucket(NamedTuple):
+    """Aggregated sales of one week."""
+    week_start: date
+    count: int
+    price_sum: float
+    price_sum_sq: float
+
+
+def week_start(day: date) -> date:
+    """Monday of the week containing ``day``."""
+    if isinstance(day, datetime):
+        day = day.date()
+    return day - timedelta(days=day.weekday())
+
+
+def summarize(buckets: Iterable[WeekBucket]) -> Tuple[int, Optional[float], Optional[float]]:
+    """Sales count, mean price and price standard deviation over ``buckets``."""
+    count = price_sum = price_sum_sq = 0
+    for bucket in buckets:
+        count += bucket.count
+        price_sum += bucket.price_sum
+        price_sum_sq += bucket.price_sum_sq
+    if not count:
+        return 0, None, None
+    mean = price_sum / count
+    variance = max(price_sum_sq / count - mean * mean, 0.0)
+    return count, mean, math.sqrt(variance)
+
+
+def take_sales(buckets: List[WeekBucket], sales: int) -> List[WeekBucket]:
+    """Leading whole weeks of ``buckets`` that cover at least ``sales`` sales."""
+    taken, count = [], 0
+    for bucket in buckets:
+        if count >= sales:
+            break
+        taken.append(bucket)
+        count += bucket.count
+    return taken
+
+
+class MarketCube:
+    """Maintain and query weekly sales aggregates by city and property type."""
+
+    # Weeks kept in memory (a year plus the partial current week)
+    WINDOW_WEEKS = 54
+    # How long a loaded cube is trusted before checking for a newer version
+    RECHECK_SECONDS = 60
+    VERSION_KEY = 'market_cube:version'
+    REQUEST_MEMO_ATTR = '_market_cube_series'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # engine url -> (cells, version, loaded_at)
+        self._loaded: Dict[str, Tuple[Dict[Tuple[int, int], Dict[date, Tuple[int, float, float]]], Any, float]] = {}
+        # engine url -> aggregate table exists
+        self._built: Dict[str, bool] = {}
+
+    def _get_db(self):
+        """Get database instance from current Flask app context."""
+        from app import db
+        return db
+
+    def clear_cache(self):
+        """Forget the in-memory cube."""
+        with self._lock:
+            self._loaded.clear()
+
+    # Queries
+
+    def weekly_series(self, city: Optional[str] = None, property_type: Optional[str] = None,
+                      days: int = 365) -> Optional[List[WeekBucket]]:
+        """
+        Weekly sales of the matching cells over the last ``days``, newest first.
+
+        City and property type input is resolved like the ``ILIKE`` filters
+        it replaces (see ``location_resolver``). Returns None when the cube or
+        the lookup tables are not built, or the input resolves to no ids (the
+        filters then fall back to ``ILIKE``), so callers query properties.
+        """
+        memo = getattr(g, self.REQUEST_MEMO_ATTR, None) if has_request_context() else None
+        memo_key = (city, property_type, days)
+        if memo is not None and memo_key in memo:
+            return memo[memo_key]
+
+        series = self._weekly_series(city, property_type, days)
+
+        if has_request_context():
+            if memo is None:
+                memo = {}
+                setattr(g, self.REQUEST_MEMO_ATTR, memo)
+            memo[memo_key] = series
+        return series
+
+    def _weekly_series(self, city, property_type, days) -> Optional[List[WeekBucket]]:
+        from app.services.location_resolver import location_resolver
+
+        cells = self._get_cells()
+        if not cells:
+            return None
+
+        city_ids = property_type_ids = None
+        if city:
+            city_ids = location_resolver.resolve('city', city)
+            if not city_ids:
+                return None
+            city_ids = set(city_ids)
+        if property_type:
+            property_type_ids = location_resolver.resolve('property_type', property_type)
+            if not property_type_ids:
+                return None
+            property_type_ids = set(property_type_ids)
+
+        first_week = week_start(date.today() - timedelta(days=days))
+        weeks: Dict[date, List[float]] = {}
+        for (city_id, property_type_id), cell_weeks in cells.items():
+            if city_ids is not None and city_id not in city_ids:
+                continue
+            if property_type_ids is not None and property_type_id not in property_type_ids:
+                continue
+            for week, (count, price_sum, price_sum_sq) in cell_weeks.items():
+                if week < first_week:
+                    continue
+                totals = weeks.setdefault(week, [0, 0.0, 0.0])
+                totals[0] += count
+                totals[1] += price_sum
+                totals[2] += price_sum_sq
+
+        return [
+            WeekBucket(week, int(totals[0]), totals[1], totals[2])
+            for week, totals in sorted(weeks.items(), reverse=True)
+            if totals[0] > 0
+        ]
+
+    def _get_cells(self):
+        db = self._get_db()
+        engine_key = str(db.engine.url)
+        loaded = self._loaded.get(engine_key)
+        now = time.time()
+        recheck = current_app.config.get('MARKET_CUBE_RECHECK_SECONDS', self.RECHECK_SECONDS)
+        if loaded and now - loaded[2] < recheck:
+            return loaded[0]
+
+        version = self._get_version()
+        if loaded and loaded[1] == version and version is not None:
+            with self._lock:
+                self._loaded[engine_key] = (loaded[0], version, now)
+            return loaded[0]
+
+        try:
+            cells = self._load_cells()
+        except Exception as e:
+            logger.warning(f"Could not load market cube: {e}")
+            cells = {}
+
+        with self._lock:
+            self._loaded[engine_key] = (cells, version, now)
+        return cells
+
+    def _load_cells(self):
+        db = self._get_db()
+        first_week = week_start(date.today() - timedelta(weeks=self.WINDOW_WEEKS))
+        cells: Dict[Tuple[int, int], Dict[date, Tuple[int, float, float]]] = {}
+        with db.engine.connect() as conn:
+            if not self.is_built(conn):
+                return cells
+            rows = conn.execute(
+                select(
+                    MarketAggregate.city_id, MarketAggregate.property_type_id, MarketAggregate.week_start,
+                    MarketAggregate.sales_count, MarketAggregate.price_sum, MarketAggregate.price_sum_sq
+                ).where(MarketAggregate.week_start >= first_week, MarketAggregate.sales_count > 0)
+            )
+            for city_id, property_type_id, week, count, price_sum, price_sum_sq in rows:
+                cells.setdefault((city_id, property_type_id), {})[week] = (count, price_sum, price_sum_sq)
+        return cells
+
+    def _get_version(self):
+        try:
+            return cache.get(self.VERSION_KEY)
+        except Exception:
+            return None
+
+    def _bump_version(self):
+        try:
+            cache.set(self.VERSION_KEY, time.time(), timeout=0)
+        except Exception as e:
+            logger.debug(f"Could not publish market cube version: {e}")
+        self.clear_cache()
+
+    # Maintenance
+
+    def is_built(self, conn) -> bool:
+        """Whether the aggregate table exists (and so should be kept up to date)."""
+        key = str(conn.engine.url)
+        built = self._built.get(key)
+        if not built:
+            built = self._built[key] = inspect(conn).has_table(MarketAggregate.__tablename__)
+        return built
+
+    @staticmethod
+    def capture(conn, listing_ids: Iterable[str]) -> List[Tuple]:
+        """
+        Current (city_id, property_type_id, sold_date, sold_price) of sold listings.
+
+        Called before and after an upsert batch; ``apply_changes`` folds the
+        difference into the aggregates.
+        """
+        listing_ids = [listing_id for listing_id in listing_ids if listing_id]
+        if not listing_ids:
+            return []
+        return conn.execute(
+            select(Property.listing_id, Property.city_id, Property.property_type_id,
+                   Property.sold_date, Property.sold_price)
+            .where(Property.listing_id.in_(listing_ids),
+                   Property.sold_price.isnot(None), Property.sold_date.isnot(None))
+        ).all()
+
+    def apply_changes(self, conn, before: List[Tuple], after: List[Tuple]) -> int:
+        """
+        Apply the difference between two ``capture`` results to the aggregates.
+
+        Runs inside the caller's transaction. Once it commits, the caller calls
+        ``publish_changes`` so workers reload committed cells, not pending ones.
+
+        Returns:
+            Number of aggregate cells changed
+        """
+        deltas: Dict[CellKey, List[float]] = {}
+        for rows, sign in ((before, -1), (after, 1)):
+            for _, city_id, property_type_id, sold_date, sold_price in rows:
+                price = float(sold_price)
+                key = (city_id or 0, property_type_id or 0, week_start(sold_date))
+                delta = deltas.setdefault(key, [0, 0.0, 0.0])
+                delta[0] += sign
+                delta[1] += sign * price
+                delta[2] += sign * price * price
+
+        cells = [
+            {'city_id': city_id, 'property_type_id': property_type_id, 'week_start': week,
+             'sales_count': count, 'price_sum': price_sum, 'price_sum_sq': price_sum_sq,
+             'updated_at': datetime.utcnow()}
+            for (city_id, property_type_id, week), (count, price_sum, price_sum_sq) in deltas.items()
+            if count != 0 or abs(price_sum) >= 1e-6
+        ]
+        if cells:
+            self._add_to_cells(conn, cells)
+        return len(cells)
+
+    @staticmethod
+    def _add_to_cells(conn, cells: List[Dict[str, Any]]):
+        """Add count and price deltas to their cells, creating missing cells."""
+        table = MarketAggregate.__table__
+        increments = ('sales_count', 'price_sum', 'price_sum_sq')
+        dialect_name = conn.dialect.name
+
+        # One upsert per batch: concurrent ETL batches creating the same new cell
+        # add to it instead of failing on uq_market_aggregate_cell
+        if dialect_name == 'mysql':
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            stmt = mysql_insert(table)
+            stmt = stmt.on_duplicate_key_update(
+                updated_at=stmt.inserted.updated_at,
+                **{column: table.c[column] + stmt.inserted[column] for column in increments}
+            )
+        elif dialect_name in ('sqlite', 'postgresql'):
+            if dialect_name == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            stmt = dialect_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['city_id', 'property_type_id', 'week_start'],
+                set_={'updated_at': stmt.excluded.updated_at,
+                      **{column: table.c[column] + stmt.excluded[column] for column in increments}}
+            )
+        else:
+            # Other databases: UPDATE each cell, INSERT the ones that did not exist
+            for cell in cells:
+                result = conn.execute(
+                    update(table).where(and_(
+                        table.c.city_id == cell['city_id'],
+                        table.c.property_type_id == cell['property_type_id'],
+                        table.c.week_start == cell['week_start']
+                    )).values(updated_at=cell['updated_at'],
+                              **{column: table.c[column] + cell[column] for column in increments})
+                )
+                if not result.rowcount:
+                    conn.execute(table.insert().values(**cell))
+            return
+
+        conn.execute(stmt, cells)
+
+    def publish_changes(self):
+        """Make every worker reload the cube after ``apply_changes`` has committed."""
+        self._bump_version()
+
+    def rebuild(self) -> Dict[str, Any]:
+        """
+        Recompute every aggregate cell from the properties table.
+
+        Returns:
+            Dictionary with cell and sale counts and elapsed time
+        """
+        db = self._get_db()
+        start_time = time.time()
+        db.metadata.create_all(bind=db.engine, tables=[MarketAggregate.__table__])
+        self._built[str(db.engine.url)] = True
+
+        cells: Dict[CellKey, List[float]] = {}
+        with db.engine.begin() as conn:
+            # Group by day in SQL (portable), fold days into weeks here
+            rows = conn.execute(
+                select(
+                    Property.city_id, Property.property_type_id, Property.sold_date,
+                    func.count(), func.sum(Property.sold_price),
+                    func.sum(Property.sold_price * Property.sold_price)
+                ).where(Property.sold_price.isnot(None), Property.sold_date.isnot(None))
+                .group_by(Property.city_id, Property.property_type_id, Property.sold_date)
+            )
+            for city_id, property_type_id, sold_date, count, price_sum, price_sum_sq in rows:
+                key = (city_id or 0, property_type_id or 0, week_start(sold_date))
+                cell = cells.setdefault(key, [0, 0.0, 0.0])
+                cell[0] += count
+                cell[1] += float(price_sum or 0)
+                cell[2] += float(price_sum_sq or 0)
+
+            conn.execute(delete(MarketAggregate.__table__))
+            now = datetime.utcnow()
+            records = [
+                {'city_id': city_id, 'property_type_id': property_type_id, 'week_start': week,
+                 'sales_count': int(count), 'price_sum': price_sum, 'price_sum_sq': price_sum_sq,
+                 'updated_at': now}
+                for (city_id, property_type_id, week), (count, price_sum, price_sum_sq) in cells.items()
+            ]
+            if records:
+                conn.execute(MarketAggregate.__table__.insert(), records)
+
+        self._bump_version()
+        results = {
+            'cells': len(cells),
+            'sales': int(sum(cell[0] for cell in cells.values())),
+            'elapsed_seconds': time.time() - start_time
+        }
+        logger.info(f"Market cube rebuilt: {results}")
+        return results
+
+
+# Global instance shared by MLService and the ETL loader
+market_cube = MarketCube()
@@ -6,8 +6,15 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple, Any
 from flask import current_app
 from app.models.property import Property
-from app.models.economic_data import EconomicData
+from app.services.comparables_index import comparables_index
+from app.services.economic_snapshot import economic_snapshot
+from app.services.economic_timeseries import economic_timeseries
+from app.services.location_resolver import location_resolver
+from app.services.market_cube import market_cube, summarize, take_sales
+from app.services.model_compiler import CompiledModel, model_compiler
+from app.services.prediction_cache import prediction_cache
 from app.extensions import cache
+from app.tracing import tracer
 import json
 import logging
 import warnings
@@ -30,14 +37,16 @@ def suppress_sklearn_warnings():
 class MLService:
     """Machine learning service for property analysis and predictions."""
     
+    # Comparables reported by analyze_property: recent sales, most similar first
+    COMPARABLES_LIMIT = 5
+    COMPARABLES_MAX_AGE_DAYS = 180
+    
     def __init__(self):
         self.model_path = None
         self.models = {}
         self.feature_columns = []
+        self.model_version = 'statistical'  # Model file and pickle digest once a model is loaded
         self._models_loaded = False
-        self._economic_cache = {}
-        self._economic_cache_time = None
-        self._economic_cache_ttl = 3600  # 1 hour cache
         self._use_economic_features = False  # Temporarily disabled until model retrained
     
     def _safe_float(self, value, default=0.0):
@@ -89,8 +98,12 @@ class MLService:
                 model_file_path = os.path.join(model_path, model_file)
                 if os.path.exists(model_file_path):
                     try:
+                        # Prefer the compiled artifact of this pickle (see ``compile_model``)
+                        test_model = self._load_compiled_model(model_file_path)
+                        if test_model is None:
+                            test_model = joblib.load(model_file_path)
+                        
                         # Test load the model with a dummy prediction to catch KeyError issues
-                        test_model = joblib.load(model_file_path)
                         
                         # Create a test feature array with the expected 26 features
                         test_features = np.array([[3, 2, 1500, 0.25, 7, 50, 10, 3, 2010, 2025, 6, 30, 5000, 
@@ -101,7 +114,9 @@ class MLService:
                         
                         # If we get here, the model works
                         self.models['valuation'] = test_model
-                        logger.info(f"{model_name} model loaded and tested successfully")
+                        self.model_version = self._model_version_for(model_file_path, test_model)
+                        compiled = ' (compiled)' if isinstance(test_model, CompiledModel) else ''
+                        logger.info(f"{model_name} model{compiled} loaded and tested successfully")
                         model_loaded = True
                         break
                         
@@ -140,60 +155,54 @@ class MLService:
             print(error_msg)  # Keep for backward compatibility
     
     def _get_economic_indicators(self) -> Dict[str, float]:
-        """Fetch current economic indicators with caching."""
+        """Current economic indicators from the shared economic snapshot."""
         try:
-            # Check cache first
-            now = datetime.now()
-            if (self._economic_cache_time and 
-                self._economic_cache and
-                (now - self._economic_cache_time).seconds < self._economic_cache_ttl):
-                return self._economic_cache
+            return economic_snapshot.indicators()
+        except Exception as e:
+            logger.error(f"Error fetching economic indicators: {str(e)}")
+            return self._default_economic_indicators()
+    
+    def _build_economic_indicators(self, summary: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Compute the economic indicators stored in the economic snapshot.
+        
+        Args:
+            summary: Plain-data economic summary (``bank_rate``, ``prime_rate``,
+                ``inflation_rate``, ``cad_usd_rate``)
+        """
+        try:
+            indicators = {}
             
-            # Try to get from external APIs service first
+            # Bank of Canada indicators
             try:
-                from app.services.external_apis import ExternalAPIsService
-                economic_summary = ExternalAPIsService.get_latest_economic_summary()
-                
-                # Extract key indicators
-                indicators = {}
+                indicators['policy_rate'] = float(summary['bank_rate'])
+                indicators['prime_rate'] = float(summary['prime_rate'])
+                indicators['inflation_rate'] = float(summary['inflation_rate'])
+                indicators['exchange_rate'] = float(summary['cad_usd_rate'])
+            except (KeyError, TypeError, ValueError) as summary_error:
+                logger.warning(f"Incomplete economic summary: {summary_error}")
+            
+            # Get additional indicators from the columnar series
+            try:
+                # Mortgage rate
+                mortgage_series = economic_timeseries.get('V80691335')  # 5-year mortgage
+                if mortgage_series is not None and len(mortgage_series):
+                    indicators['mortgage_5yr'] = mortgage_series.latest()[1]
                 
-                # Bank of Canada indicators
-                if hasattr(economic_summary, 'bank_rate'):
-                    indicators['policy_rate'] = float(economic_summary.bank_rate)
-                if hasattr(economic_summary, 'prime_rate'):
-                    indicators['prime_rate'] = float(economic_summary.prime_rate)
-                if hasattr(economic_summary, 'inflation_rate'):
-                    indicators['inflation_rate'] = float(economic_summary.inflation_rate)
-                if hasattr(economic_summary, 'cad_usd_rate'):
-                    indicators['exchange_rate'] = float(economic_summary.cad_usd_rate)
+                # Unemployment rate
+                unemployment_series = economic_timeseries.get('3579270')  # Unemployment rate
+                if unemployment_series is not None and len(unemployment_series):
+                    indicators['unemployment_rate'] = unemployment_series.latest()[1]
                 
-                # Get additional indicators from database
-                try:
-                    # Mortgage rate
-                    mortgage_data = EconomicData.get_latest_value('V80691335')  # 5-year mortgage
-                    if mortgage_data:
-                        indicators['mortgage_5yr'] = float(mortgage_data.value)
+                # Year-over-year GDP growth
+                gdp_series = economic_timeseries.get('65201210')  # GDP quarterly
+                if gdp_series is not None:
+                    gdp_growth = gdp_series.resample('Q').yoy_change()
+                    if len(gdp_growth):
+                        indicators['gdp_growth'] = gdp_growth.latest()[1]
                     
-                    # Unemployment rate
-                    unemployment_data = EconomicData.get_latest_value('3579270')  # Unemployment rate
-                    if unemployment_data:
-                        indicators['unemployment_rate'] = float(unemployment_data.value)
-                    
-                    # GDP growth
-                    gdp_data = EconomicData.get_time_series('65201210', limit=8)  # GDP quarterly
-                    if len(gdp_data) >= 4:
-                        # Calculate year-over-year GDP growth
-                        latest_gdp = float(gdp_data[0].value)
-                        year_ago_gdp = float(gdp_data[3].value) if len(gdp_data) > 3 else latest_gdp
-                        gdp_growth = ((latest_gdp - year_ago_gdp) / year_ago_gdp) * 100 if year_ago_gdp != 0 else 0
-                        indicators['gdp_growth'] = gdp_growth
-                        
-                except Exception as db_error:
-                    logger.warning(f"Could not fetch from database: {db_error}")
-                
-            except Exception as api_error:
-                logger.warning(f"External API not available: {api_error}")
-                indicators = {}
+            except Exception as db_error:
+                logger.warning(f"Could not load economic series: {db_error}")
             
             # Fill in defaults for missing indicators
             default_indicators = {
@@ -216,27 +225,27 @@ class MLService:
             indicators['economic_momentum'] = self._calculate_economic_momentum(indicators)
             indicators['affordability_pressure'] = self._calculate_affordability_pressure(indicators)
             
-            # Cache the results
-            self._economic_cache = indicators
-            self._economic_cache_time = now
-            
             return indicators
             
         except Exception as e:
-            logger.error(f"Error fetching economic indicators: {str(e)}")
-            # Return defaults if everything fails
-            return {
-                'policy_rate': 5.0,
-                'prime_rate': 7.2,
-                'mortgage_5yr': 6.5,
-                'inflation_rate': 2.3,
-                'unemployment_rate': 5.2,
-                'exchange_rate': 1.37,
-                'gdp_growth': 1.8,
-                'interest_rate_environment': 0.5,  # neutral
-                'economic_momentum': 0.0,  # stable
-                'affordability_pressure': 0.3,  # moderate
-            }
+            logger.error(f"Error building economic indicators: {str(e)}")
+            return self._default_economic_indicators()
+    
+    @staticmethod
+    def _default_economic_indicators() -> Dict[str, float]:
+        """Indicators used when economic data is unavailable."""
+        return {
+            'policy_rate': 5.0,
+            'prime_rate': 7.2,
+            'mortgage_5yr': 6.5,
+            'inflation_rate': 2.3,
+            'unemployment_rate': 5.2,
+            'exchange_rate': 1.37,
+            'gdp_growth': 1.8,
+            'interest_rate_environment': 0.5,  # neutral
+            'economic_momentum': 0.0,  # stable
+            'affordability_pressure': 0.3,  # moderate
+        }
     
     def _calculate_interest_environment(self, indicators: Dict[str, float]) -> float:
         """Calculate interest rate environment score (0=low, 1=high)."""
@@ -294,8 +303,15 @@ class MLService:
         # Combined pressure
         return (rate_pressure * 0.7 + inflation_pressure * 0.3)
     
-    def analyze_property(self, property):
-        """Comprehensive AI analysis of a property."""
+    def analyze_property(self, property, comparables: Optional[List[Dict]] = None):
+        """
+        Comprehensive AI analysis of a property.
+        
+        Args:
+            property: Property to analyze
+            comparables: Precomputed comparables (see ``_find_comparables_for``),
+                looked up individually when omitted
+        """
         # Load models if not already loaded
         self._load_models()
         
@@ -317,7 +333,8 @@ class MLService:
             if 'valuation' in self.models and self.models['valuation'] is not None and features is not None:
                 try:
                     with suppress_sklearn_warnings():
-                        predicted_price = self.models['valuation'].predict([features])[0]
+                        with tracer.span('ml'):
+                            predicted_price = self.models['valuation'].predict([features])[0]
                         analysis['predicted_price'] = float(predicted_price)
                 except Exception as model_error:
                     logger.warning(f"Model prediction failed in analyze_property: {model_error}")
@@ -362,7 +379,9 @@ class MLService:
             analysis['market_trend'] = self._get_market_trend(property.city, property.property_type)
             
             # Find comparable properties
-            analysis['comparables'] = self._find_comparable_properties(property)
+            if comparables is None:
+                comparables = self._find_comparable_properties(property)
+            analysis['comparables'] = comparables
             
             # Generate insights
             analysis['insights'].extend(self._generate_insights(property, features))
@@ -420,19 +439,20 @@ class MLService:
             )
             
             if location:
-                query = query.filter(Property.city.ilike(f'%{location}%'))
+                query = query.filter(location_resolver.city_clause(location))
             if property_type:
-                query = query.filter(Property.property_type.ilike(f'%{property_type}%'))
+                query = query.filter(location_resolver.property_type_clause(property_type))
                 
             # Limit initial query to reduce processing time
             properties = query.limit(200).all()  # Reduced from 500
             
             top_properties = []
+            comparables = self._find_comparables_for(properties)
             
             for property in properties:
                 try:
                     # Get AI analysis
-                    analysis = self.analyze_property(property)
+                    analysis = self.analyze_property(property, comparables.get(property.listing_id))
                     
                     # Use listing price (original_price) if available, otherwise use sold_price
                     actual_price = None
@@ -535,18 +555,19 @@ class MLService:
             )
             
             if location:
-                query = query.filter(Property.city.ilike(f'%{location}%'))
+                query = query.filter(location_resolver.city_clause(location))
             if property_type:
-                query = query.filter(Property.property_type.ilike(f'%{property_type}%'))
+                query = query.filter(location_resolver.property_type_clause(property_type))
                 
             # Get properties for analysis
             properties = query.limit(500).all()  # Analyze up to 500 properties
             
             count = 0
+            comparables = self._find_comparables_for(properties)
             
             for property in properties:
                 # Get AI analysis
-                analysis = self.analyze_property(property)
+                analysis = self.analyze_property(property, comparables.get(property.listing_id))
                 
                 if analysis['predicted_price']:
                     # Use listing price (original_price) if available, otherwise use sold_price
@@ -617,6 +638,14 @@ class MLService:
                     'error': 'Could not extract features from input'
                 }
             
+            # Model predictions are a function of the feature vector; reuse earlier results
+            cache_key = None
+            if self.models.get('valuation') is not None:
+                cache_key = prediction_cache.key(self.model_version, features)
+                cached = prediction_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
             predicted_price = None
             
             # Try to use trained model first
@@ -636,11 +665,13 @@ class MLService:
                             model = self.models['valuation']
                             
                             # Always use DataFrame to avoid feature name warnings
-                            predicted_price = model.predict(features_df)[0]
+                            with tracer.span('ml'):
+                                predicted_price = model.predict(features_df)[0]
                         else:
                             logger.warning(f"Feature mismatch: got {len(features)}, expected {len(feature_columns)}")
                             # Fallback to array prediction with warning suppression
-                            predicted_price = self.models['valuation'].predict([features])[0]
+                            with tracer.span('ml'):
+                                predicted_price = self.models['valuation'].predict([features])[0]
                         
                 except Exception as model_error:
                     logger.error(f"Model prediction failed: {str(model_error)}")
@@ -648,6 +679,7 @@ class MLService:
             
             # If model fails or doesn't exist, use statistical approach
             if predicted_price is None:
+                cache_key = None  # Statistical estimates vary between calls
                 predicted_price = self._statistical_price_prediction(property_features)
             
             # Ensure reasonable price range
@@ -664,7 +696,7 @@ class MLService:
             if 'valuation' in self.models:
                 confidence_score = 0.85
             
-            return {
+            result = {
                 'predicted_price': float(predicted_price),
                 'confidence': confidence_score,
                 'confidence_interval': {
@@ -675,6 +707,9 @@ class MLService:
                 'features_used': len(features) if isinstance(features, list) else 'unknown',
                 'prediction_method': 'ml_model' if 'valuation' in self.models else 'statistical'
             }
+            if cache_key is not None:
+                prediction_cache.set(cache_key, result)
+            return result
             
         except Exception as e:
             logger.error(f"Price prediction error: {str(e)}")
@@ -684,6 +719,56 @@ class MLService:
                 'error': f'Prediction failed: {str(e)}'
             }
     
+    def predict_prices(self, properties) -> List[float]:
+        """
+        Valuations for many properties with one model call.
+        
+        Properties whose features cannot be extracted, and every property
+        when no model is loaded or the model call fails, get the statistical
+        estimate. Prices are bounded like ``predict_property_price``.
+        
+        Args:
+            properties: Property objects, or rows with the same attributes
+            
+        Returns:
+            One predicted price per property
+        """
+        self._load_models()
+        
+        features = [self._extract_features(property) for property in properties]
+        prices = [None] * len(features)
+        model = self.models.get('valuation')
+        scored = [i for i, row in enumerate(features) if row is not None]
+        
+        if model is not None and scored:
+            try:
+                matrix = np.array([features[i] for i in scored], dtype=np.float64)
+                feature_columns = self._get_feature_columns()
+                if matrix.shape[1] == len(feature_columns):
+                    matrix = pd.DataFrame(matrix, columns=feature_columns)
+                with suppress_sklearn_warnings():
+                    with tracer.span('ml'):
+                        predicted = model.predict(matrix)
+                for i, price in zip(scored, predicted):
+                    prices[i] = float(price)
+            except Exception as e:
+                logger.warning(f"Batch prediction failed, using statistical estimates: {str(e)}")
+        
+        for i, price in enumerate(prices):
+            if price is None:
+                property = properties[i]
+                prices[i] = self._statistical_price_prediction({
+                    'bedrooms': property.bedrooms,
+                    'bathrooms': property.bathrooms,
+                    'square_feet': property.sqft,
+                    'city': property.city,
+                    'property_type': property.property_type,
+                    'year_built': property.year_built,
+                    'lot_size': property.lot_size
+                })
+        
+        return [min(max(price, 50000), 20000000) for price in prices]
+    
     def _statistical_price_prediction(self, property_features: Dict) -> float:
         """
         Statistical approach to price prediction when ML model is not available.
@@ -785,6 +870,11 @@ class MLService:
             from app import db
             from sqlalchemy import func
             
+            # Weekly aggregates answer this without loading properties when built
+            series = market_cube.weekly_series(city, property_type, days=365)
+            if series is not None:
+                return self._market_predictions_from_cube(series)
+            
             # Build query for recent sales
             query = Property.query.filter(
                 Property.sold_price.isnot(None),
@@ -792,9 +882,9 @@ class MLService:
             )
             
             if city:
-                query = query.filter(Property.city.ilike(f'%{city}%'))
+                query = query.filter(location_resolver.city_clause(city))
             if property_type:
-                query = query.filter(Property.property_type.ilike(f'%{property_type}%'))
+                query = query.filter(location_resolver.property_type_clause(property_type))
             
             # Get price trends over time
             recent_properties = query.order_by(Property.sold_date.desc()).limit(100).all()
@@ -852,6 +942,54 @@ class MLService:
                 'error': str(e)
             }
 
+    def _market_predictions_from_cube(self, series) -> Dict[str, Any]:
+        """
+        ``get_market_predictions`` over weekly aggregates, newest week first.
+        
+        Sample windows are rounded to whole weeks: the latest 100 sales become
+        the newest weeks holding at least 100 sales, and so on.
+        """
+        window = take_sales(series, 100)
+        sample_size, one_year_avg, price_std = summarize(window)
+        
+        if sample_size < 10:
+            return {
+                'trend': 'Insufficient data',
+                'avg_price': None,
+                'price_change_6m': None,
+                'price_change_1y': None,
+                'sample_size': sample_size
+            }
+        
+        now = datetime.now()
+        six_months_ago_date = (now - timedelta(days=180)).date()
+        
+        _, recent_avg, _ = summarize(take_sales(window, 30))
+        _, six_month_avg, _ = summarize(
+            bucket for bucket in window if bucket.week_start >= six_months_ago_date
+        )
+        six_month_avg = six_month_avg or 0
+        
+        price_change_6m = ((recent_avg - six_month_avg) / six_month_avg * 100) if six_month_avg > 0 else 0
+        price_change_1y = ((recent_avg - one_year_avg) / one_year_avg * 100) if one_year_avg > 0 else 0
+        
+        if price_change_6m > 5:
+            trend = 'Rising'
+        elif price_change_6m < -5:
+            trend = 'Declining'
+        else:
+            trend = 'Stable'
+        
+        return {
+            'trend': trend,
+            'avg_price': recent_avg,
+            'price_change_6m': price_change_6m,
+            'price_change_1y': price_change_1y,
+            'price_std': price_std,
+            'sample_size': sample_size,
+            'analysis_date': now.isoformat()
+        }
+
     def _get_feature_columns(self) -> List[str]:
         """Get the expected feature column names for the model."""
         if self.feature_columns:
@@ -973,9 +1111,15 @@ class MLService:
                 logger.error(f"Model file not found: {model_path}")
                 return False
             
-            # Load the new model
-            new_model = joblib.load(model_path)
+            # Load the new model, compiling it on first use
+            new_model = self._load_compiled_model(model_path)
+            if new_model is None:
+                new_model = joblib.load(model_path)
+                if self._use_compiled_models():
+                    new_model = self._export_compiled_model(model_path, new_model) or new_model
             self.models['valuation'] = new_model
+            self.model_version = self._model_version_for(model_path, new_model)
+            prediction_cache.invalidate()
             logger.info(f"Successfully switched to model: {model_name}")
             return True
             
@@ -983,6 +1127,83 @@ class MLService:
             logger.error(f"Error switching to model {model_name}: {str(e)}")
             return False
 
+    def compile_model(self, model_name: str = 'property') -> Dict[str, Any]:
+        """
+        Compile a trained model to its lean inference artifact.
+        
+        Predictions are checked against the pickled model on feature rows of
+        stored properties (synthetic rows when there are none).
+        
+        Args:
+            model_name: Model name as listed by ``get_available_models``
+            
+        Returns:
+            Dictionary with the artifact path, parity results and a latency
+            benchmark, or an ``error``
+        """
+        model_path = os.path.normpath(os.path.join(os.path.dirname(__file__),
+                                  f'../../models/trained_models/{model_name.lower()}_price_model.pkl'))
+        if not os.path.exists(model_path):
+            return {'success': False, 'error': f"Model file not found: {model_path}"}
+        
+        try:
+            estimator = joblib.load(model_path)
+            sample = self._sample_feature_rows()
+            compiled = model_compiler.export(model_path, estimator=estimator, X=sample)
+            if sample is None:
+                sample = model_compiler.sample_inputs(estimator, compiled.n_features)
+            with suppress_sklearn_warnings():
+                benchmark = model_compiler.benchmark(estimator, compiled, sample)
+        except Exception as e:
+            logger.error(f"Error compiling model {model_name}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+        
+        return {
+            'success': True,
+            'model': compiled.info['model'],
+            'path': compiled.info['path'],
+            'parity': compiled.info['parity'],
+            'benchmark': benchmark
+        }
+
+    @staticmethod
+    def _model_version_for(model_path: str, model) -> str:
+        """``<model file>:<pickle digest>``, shared by the pickle and its compiled artifact."""
+        if isinstance(model, CompiledModel) and model.info.get('source_sha256'):
+            digest = model.info['source_sha256']
+        else:
+            digest = model_compiler.fingerprint(model_path)
+        return f"{os.path.splitext(os.path.basename(model_path))[0]}:{digest[:12]}"
+
+    def _use_compiled_models(self) -> bool:
+        try:
+            return current_app.config.get('USE_COMPILED_MODELS', True)
+        except RuntimeError:
+            return True
+
+    def _load_compiled_model(self, model_path: str):
+        """The compiled artifact of ``model_path`` when enabled and current."""
+        if not self._use_compiled_models():
+            return None
+        return model_compiler.load_for(model_path)
+
+    def _export_compiled_model(self, model_path: str, estimator):
+        """Compile and save ``estimator``; None when it has no compiled form or fails parity."""
+        try:
+            return model_compiler.export(model_path, estimator=estimator, X=self._sample_feature_rows())
+        except Exception as e:
+            logger.warning(f"Serving {os.path.basename(model_path)} uncompiled: {str(e)}")
+            return None
+
+    def _sample_feature_rows(self, limit: int = 256) -> Optional[np.ndarray]:
+        """Feature rows of stored properties for parity checks, or None without a database."""
+        try:
+            properties = Property.query.filter(Property.sold_price.isnot(None)).limit(limit).all()
+        except Exception:
+            return None
+        rows = [features for features in (self._extract_features(p) for p in properties) if features is not None]
+        return np.array(rows, dtype=np.float64) if rows else None
+
     def get_model_comparison(self) -> Dict[str, Any]:
         """Get performance comparison of all available models."""
         try:
@@ -1162,6 +1383,17 @@ class MLService:
         try:
             from app import db
             
+            # Weekly aggregates (whole weeks covering the latest 50 sales) when built
+            series = market_cube.weekly_series(city, property_type, days=180)
+            if series is not None:
+                window = take_sales(series, 50)
+                sample_size, _, _ = summarize(window)
+                if sample_size < 10:
+                    return 'Insufficient Data'
+                _, recent_avg, _ = summarize(take_sales(window, 15))
+                _, older_avg, _ = summarize(take_sales(window[::-1], 15))
+                return self._classify_price_change(recent_avg, older_avg)
+            
             # Get recent sales data
             query = Property.query.filter(
                 Property.sold_price.isnot(None),
@@ -1169,9 +1401,9 @@ class MLService:
             )
             
             if city:
-                query = query.filter(Property.city.ilike(f'%{city}%'))
+                query = query.filter(location_resolver.city_clause(city))
             if property_type:
-                query = query.filter(Property.property_type.ilike(f'%{property_type}%'))
+                query = query.filter(location_resolver.property_type_clause(property_type))
             
             recent_sales = query.order_by(Property.sold_date.desc()).limit(50).all()
             
@@ -1183,24 +1415,71 @@ class MLService:
             recent_avg = np.mean(prices[:15])  # Last 15 sales
             older_avg = np.mean(prices[-15:])  # Older 15 sales
             
-            price_change = ((recent_avg - older_avg) / older_avg * 100) if older_avg > 0 else 0
-            
-            if price_change > 5:
-                return 'Rising'
-            elif price_change < -5:
-                return 'Declining'
-            else:
-                return 'Stable'
+            return self._classify_price_change(recent_avg, older_avg)
                 
         except Exception as e:
             logger.error(f"Error getting market trend: {str(e)}")
             return 'Stable'
 
+    @staticmethod
+    def _classify_price_change(recent_avg: float, older_avg: float) -> str:
+        """Rising/Declining/Stable from the change between two average prices."""
+        price_change = ((recent_avg - older_avg) / older_avg * 100) if older_avg > 0 else 0
+        
+        if price_change > 5:
+            return 'Rising'
+        elif price_change < -5:
+            return 'Declining'
+        else:
+            return 'Stable'
+
+    def _find_comparables_for(self, properties) -> Dict[str, List[Dict]]:
+        """
+        Comparables for many properties with one index lookup.
+        
+        Properties the comparables index cannot answer are omitted, so
+        ``analyze_property`` looks them up individually.
+        """
+        try:
+            found = comparables_index.find_many(
+                properties, k=self.COMPARABLES_LIMIT, max_age_days=self.COMPARABLES_MAX_AGE_DAYS
+            )
+        except Exception as e:
+            logger.error(f"Error finding comparable properties: {str(e)}")
+            return {}
+        if found is None:
+            return {}
+        return {
+            listing_id: [self._format_comparable(comp) for comp in comps]
+            for listing_id, comps in found.items()
+        }
+
+    def _format_comparable(self, comp: Dict) -> Dict:
+        """Comparable entry of an analysis, from a comparables index result."""
+        sqft = comp['sqft']
+        return {
+            'listing_id': comp['listing_id'],
+            'address': f"{comp['address']}, {comp['city']}" if comp['address'] and comp['city'] else 'Address not available',
+            'sold_price': comp['sold_price'],
+            'sqft': sqft,
+            'bedrooms': comp['bedrooms'],
+            'bathrooms': comp['bathrooms'],
+            'sold_date': comp['sold_date'].isoformat() if comp['sold_date'] else None,
+            'price_per_sqft': comp['sold_price'] / sqft if sqft and sqft > 0 else None
+        }
+
     def _find_comparable_properties(self, property) -> List[Dict]:
         """Find comparable properties for analysis."""
         try:
             from app import db
             
+            # Nearest sales from the comparables index when it covers this property
+            comparables = comparables_index.find(
+                property, k=self.COMPARABLES_LIMIT, max_age_days=self.COMPARABLES_MAX_AGE_DAYS
+            )
+            if comparables is not None:
+                return [self._format_comparable(comp) for comp in comparables]
+            
             # Build query for comparable properties
             query = Property.query.filter(
                 Property.sold_price.isnot(None),
@@ -1209,11 +1488,11 @@ class MLService:
             
             # Filter by location
             if property.city:
-                query = query.filter(Property.city.ilike(f'%{property.city}%'))
+                query = query.filter(location_resolver.city_clause(property.city))
             
             # Filter by property type
             if property.property_type:
-                query = query.filter(Property.property_type.ilike(f'%{property.property_type}%'))
+                query = query.filter(location_resolver.property_type_clause(property.property_type))
             
             # Filter by size (within 20% range)
             if property.sqft and property.sqft > 0:
@@ -1235,7 +1514,7 @@ class MLService:
             query = query.filter(Property.sold_date >= recent_date)
             
             # Get top 5 comparables
-            comparables = query.order_by(Property.sold_date.desc()).limit(5).all()
+            comparables = query.order_by(Property.sold_date.desc()).limit(self.COMPARABLES_LIMIT).all()
             
             comparable_list = []
             for comp in comparables:
@@ -1580,18 +1859,19 @@ class MLService:
             )
             
             if location:
-                query = query.filter(Property.city.ilike(f'%{location}%'))
+                query = query.filter(location_resolver.city_clause(location))
             if property_type:
-                query = query.filter(Property.property_type.ilike(f'%{property_type}%'))
+                query = query.filter(location_resolver.property_type_clause(property_type))
                 
             # Get properties for analysis
             properties = query.limit(500).all()  # Analyze up to 500 properties
             
             top_deals = []
+            comparables = self._find_comparables_for(properties)
             
             for property in properties:
                 # Get AI analysis
-                analysis = self.analyze_property(property)
+                analysis = self.analyze_property(property, comparables.get(property.listing_id))
                 
                 if analysis['predicted_price'] and property.sold_price:
                     listed_price = self._safe_float(property.sold_price)
@@ -1931,7 +2211,7 @@ class MLService:
             )
             
             if city:
-                query = query.filter(Property.city.ilike(f'%{city}%'))
+                query = query.filter(location_resolver.city_clause(city))
             
             # Group by city and street (extract street from address)
             neighbourhoods = []
@@ -0,0 +1,734 @@
+"""
+Compiled valuation models.
+
+Serving used to unpickle the full scikit-learn pipeline and call ``predict``
+for every property, which runs the per-step input validation (and, for
+forests, a thread pool) each time. For the one-row and small-batch calls that
+``MLService`` makes, that overhead costs far more than the prediction itself.
+The compiler turns a fitted model into plain NumPy arrays:
+
+- ``StandardScaler``, ``MinMaxScaler`` and ``PCA`` steps become affine transforms
+- linear models (``Ridge``, ``ElasticNet``, ...) become a dot product
+- tree ensembles (decision trees, random forests, gradient boosting, and the
+  XGBoost and LightGBM regressors) become one set of node arrays, walked one
+  level at a time for every row and tree together
+- ``StackingRegressor`` combines its compiled base models with the compiled
+  final estimator
+
+The compiled model is saved next to its pickle as ``<name>.compiled.npz``: a
+JSON spec plus named arrays, loaded without unpickling. An artifact is only
+written if its predictions match the source model within ``PARITY_RTOL``. It
+also records the SHA-256 of the pickle it was built from, so ``MLService``
+ignores it once that pickle is replaced.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.utils.errors import MLModelError
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = 'nextproperty-compiled-model'
+FORMAT_VERSION = 1
+
+# Boosting objectives whose raw score is the prediction (identity link)
+_XGBOOST_OBJECTIVES = {'reg:squarederror', 'reg:linear', 'reg:absoluteerror',
+                       'reg:pseudohubererror', 'reg:quantileerror'}
+_LIGHTGBM_OBJECTIVES = {'regression', 'regression_l1', 'huber', 'fair', 'quantile', 'mape'}
+_GRADIENT_BOOSTING_LOSSES = {'squared_error', 'absolute_error', 'huber', 'quantile'}
+
+
+def _put(arrays: Dict[str, np.ndarray], prefix: str, name: str, value) -> Optional[str]:
+    """Add ``value`` to the artifact arrays and return its key."""
+    if value is None:
+        return None
+    key = f'{prefix}{name}'
+    arrays[key] = np.ascontiguousarray(value)
+    return key
+
+
+def _get(arrays: Dict[str, np.ndarray], key: Optional[str]) -> Optional[np.ndarray]:
+    return None if key is None else arrays[key]
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Compiled steps: ``apply`` maps a float64 matrix to a matrix (transforms) or
+# to one prediction per row (estimators)
+
+class _Standardize:
+    op = 'standardize'
+
+    def __init__(self, mean: Optional[np.ndarray], scale: Optional[np.ndarray]):
+        self.mean = mean
+        self.scale = scale
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        # Same operations as StandardScaler.transform
+        if self.mean is not None:
+            X = X - self.mean
+        if self.scale is not None:
+            X = X / self.scale
+        return X
+
+    def to_spec(self, arrays, prefix):
+        return {'op': self.op, 'mean': _put(arrays, prefix, 'mean', self.mean),
+                'scale': _put(arrays, prefix, 'scale', self.scale)}
+
+    @classmethod
+    def from_spec(cls, spec, arrays):
+        return cls(_get(arrays, spec['mean']), _get(arrays, spec['scale']))
+
+
+class _Affine:
+    op = 'affine'
+
+    def __init__(self, scale: np.ndarray, offset: np.ndarray):
+        self.scale = scale
+        self.offset = offset
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        return X * self.scale + self.offset
+
+    def to_spec(self, arrays, prefix):
+        return {'op': self.op, 'scale': _put(arrays, prefix, 'scale', self.scale),
+                'offset': _put(arrays, prefix, 'offset', self.offset)}
+
+    @classmethod
+    def from_spec(cls, spec, arrays):
+        return cls(arrays[spec['scale']], arrays[spec['offset']])
+
+
+class _Project:
+    op = 'project'
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, whiten: Optional[np.ndarray]):
+        self.mean = mean
+        self.components_t = np.ascontiguousarray(components.T)
+        self.whiten = whiten
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        X = (X - self.mean) @ self.components_t
+        if self.whiten is not None:
+            X = X / self.whiten
+        return X
+
+    def to_spec(self, arrays, prefix):
+        return {'op': self.op, 'mean': _put(arrays, prefix, 'mean', self.mean),
+                'components': _put(arrays, prefix, 'components', self.components_t.T),
+                'whiten': _put(arrays, prefix, 'whiten', self.whiten)}
+
+    @classmethod
+    def from_spec(cls, spec, arrays):
+        return cls(arrays[spec['mean']], arrays[spec['components']], _get(arrays, spec['whiten']))
+
+
+class _Linear:
+    op = 'linear'
+
+    def __init__(self, coef: np.ndarray, intercept: float):
+        self.coef = coef
+        self.intercept = intercept
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        return X @ self.coef + self.intercept
+
+    def to_spec(self, arrays, prefix):
+        return {'op': self.op, 'coef': _put(arrays, prefix, 'coef', self.coef),
+                'intercept': self.intercept}
+
+    @classmethod
+    def from_spec(cls, spec, arrays):
+        return cls(arrays[spec['coef']], spec['intercept'])
+
+
+class _TreeEnsemble:
+    """
+    Every tree of an ensemble in one set of node arrays.
+
+    Nodes are laid out so each split's right child directly follows its left
+    child, and leaves point to themselves with an infinite threshold. One
+    level of every tree is then evaluated for every row with three gathers,
+    and ``depth`` levels reach all leaves.
+    """
+    op = 'trees'
+
+    def __init__(self, feature, threshold, left, missing, value, roots, depth: int,
+                 dtype: str = 'float32', combine: str = 'sum', scale: float = 1.0, offset: float = 0.0):
+        self.feature = feature.astype(np.intp)
+        self.threshold = threshold.astype(np.float64)
+        if dtype == 'float32':
+            # x <= t for a float32 x holds exactly when x <= t rounded down to float32
+            rounded = self.threshold.astype(np.float32)
+            self.threshold = np.where(rounded > self.threshold,
+                                      np.nextafter(rounded, np.float32(-np.inf)), rounded)
+        self.left = left.astype(np.intp)
+        self.missing = missing.astype(np.intp)
+        self.value = value.astype(np.float64)
+        self.roots = roots.astype(np.intp)
+        self.depth = int(depth)
+        self.dtype = dtype
+        self.combine = combine
+        self.scale = float(scale)
+        self.offset = float(offset)
+
+    @classmethod
+    def from_trees(cls, trees: Sequence[Dict[str, Any]], **options) -> '_TreeEnsemble':
+        """
+        Flatten trees given as node arrays.
+
+        Each tree has ``feature``, ``threshold``, ``left``, ``right``, ``missing``
+        and ``value`` arrays indexed by node (root first, children ``-1`` on leaves).
+        Splits send ``x <= threshold`` left and NaN to ``missing``.
+        """
+        columns = {name: [] for name in ('feature', 'threshold', 'left', 'missing', 'value')}
+        roots, start, depth = [], 0, 0
+        for tree in trees:
+            left, right = np.asarray(tree['left']), np.asarray(tree['right'])
+            # Breadth-first renumbering with siblings side by side
+            order, levels = [0], {0: 0}
+            queue = deque([0])
+            while queue:
+                node = queue.popleft()
+                if left[node] >= 0:
+                    for child in (left[node], right[node]):
+                        levels[child] = levels[node] + 1
+                        order.append(child)
+                        queue.append(child)
+            order = np.array(order)
+            renumber = np.full(len(left), -1)
+            renumber[order] = np.arange(len(order)) + start
+
+            is_leaf = left[order] < 0
+            own = renumber[order]
+            columns['feature'].append(np.where(is_leaf, 0, np.asarray(tree['feature'])[order]))
+            columns['threshold'].append(np.where(is_leaf, np.inf, np.asarray(tree['threshold'], dtype=np.float64)[order]))
+            columns['left'].append(np.where(is_leaf, own, renumber[np.maximum(left[order], 0)]))
+            columns['missing'].append(np.where(is_leaf, own, renumber[np.maximum(np.asarray(tree['missing'])[order], 0)]))
+            columns['value'].append(np.asarray(tree['value'], dtype=np.float64)[order])
+            roots.append(start)
+            depth = max(depth, max(levels.values()))
+            start += len(order)
+
+        arrays = {name: np.concatenate(parts) for name, parts in columns.items()}
+        return cls(roots=np.array(roots), depth=depth, **arrays, **options)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        # sklearn and XGBoost compare float32 features; LightGBM compares float64
+        X = np.ascontiguousarray(X, dtype=self.dtype)
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        base = (np.arange(n_rows) * n_features)[:, None]
+        nodes = np.repeat(self.roots[None, :], n_rows, axis=0)
+        check_missing = bool(np.isnan(flat).any())
+
+        for _ in range(self.depth):
+            x = flat[base + self.feature[nodes]]
+            children = self.left[nodes] + (x > self.threshold[nodes])
+            if check_missing:
+                children = np.where(np.isnan(x), self.missing[nodes], children)
+            nodes = children
+
+        leaves = self.value[nodes]
+        combined = leaves.mean(axis=1) if self.combine == 'mean' else leaves.sum(axis=1)
+        return self.offset + self.scale * combined
+
+    def to_spec(self, arrays, prefix):
+        spec = {'op': self.op, 'depth': self.depth, 'dtype': self.dtype, 'combine': self.combine,
+                'scale': self.scale, 'offset': self.offset}
+        for name in ('feature', 'threshold', 'left', 'missing', 'value', 'roots'):
+            spec[name] = _put(arrays, prefix, name, getattr(self, name))
+        return spec
+
+    @classmethod
+    def from_spec(cls, spec, arrays):
+        return cls(*(arrays[spec[name]] for name in ('feature', 'threshold', 'left', 'missing', 'value', 'roots')),
+                   depth=spec['depth'], dtype=spec['dtype'], combine=spec['combine'],
+                   scale=spec['scale'], offset=spec['offset'])
+
+
+class _Stack:
+    op = 'stack'
+
+    def __init__(self, estimators: List[Any], final: Any, passthrough: bool):
+        self.estimators = estimators
+        self.final = final
+        self.passthrough = passthrough
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        stacked = np.column_stack([estimator.apply(X) for estimator in self.estimators])
+        if self.passthrough:
+            stacked = np.hstack([stacked, X])
+        return self.final.apply(stacked)
+
+    def to_spec(self, arrays, prefix):
+        return {'op': self.op, 'passthrough': self.passthrough,
+                'estimators': [estimator.to_spec(arrays, f'{prefix}{i}.')
+                               for i, estimator in enumerate(self.estimators)],
+                'final': self.final.to_spec(arrays, f'{prefix}final.')}
+
+    @classmethod
+    def from_spec(cls, spec, arrays):
+        return cls([_step_from_spec(item, arrays) for item in spec['estimators']],
+                   _step_from_spec(spec['final'], arrays), spec['passthrough'])
+
+
+class _Pipeline:
+    op = 'pipeline'
+
+    def __init__(self, steps: List[Any]):
+        self.steps = steps
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        for step in self.steps:
+            X = step.apply(X)
+        return X
+
+    def to_spec(self, arrays, prefix):
+        return {'op': self.op, 'steps': [step.to_spec(arrays, f'{prefix}{i}.')
+                                         for i, step in enumerate(self.steps)]}
+
+    @classmethod
+    def from_spec(cls, spec, arrays):
+        return cls([_step_from_spec(item, arrays) for item in spec['steps']])
+
+
+_STEPS = {step.op: step for step in (_Standardize, _Affine, _Project, _Linear, _TreeEnsemble, _Stack, _Pipeline)}
+
+
+def _step_from_spec(spec, arrays):
+    try:
+        return _STEPS[spec['op']].from_spec(spec, arrays)
+    except KeyError as e:
+        raise ValueError(f"Unknown compiled model step: {spec.get('op')}") from e
+
+
+class CompiledModel:
+    """A compiled model: ``predict`` on rows of features, nothing else."""
+
+    def __init__(self, root, n_features: int, feature_names: Optional[List[str]] = None,
+                 info: Optional[Dict[str, Any]] = None, attributes: Optional[Dict[str, np.ndarray]] = None):
+        self.root = root
+        self.n_features = n_features
+        self.feature_names = feature_names
+        self.info = info or {}
+        # ``feature_importances_`` / ``coef_`` of the source model, for feature analysis
+        self.attributes = attributes or {}
+        for name, value in self.attributes.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"<CompiledModel {self.info.get('model', '?')}: {self.n_features} features>"
+
+    def predict(self, X) -> np.ndarray:
+        """Predictions for a 2-D array, list of rows or DataFrame."""
+        if (self.feature_names and hasattr(X, 'columns') and list(X.columns) != self.feature_names
+                and set(self.feature_names) <= set(X.columns)):
+            X = X[self.feature_names]
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features}")
+        return self.root.apply(X)
+
+    def save(self, path: str):
+        """Write the artifact to ``path`` atomically."""
+        arrays: Dict[str, np.ndarray] = {}
+        spec = {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'n_features': self.n_features,
+            'feature_names': self.feature_names,
+            'info': self.info,
+            'attributes': {name: _put(arrays, 'attributes.', name, value)
+                           for name, value in self.attributes.items()},
+            'root': self.root.to_spec(arrays, 'root.')
+        }
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.npz.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                np.savez(f, __spec__=np.array(json.dumps(spec)), **arrays)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'CompiledModel':
+        """Read an artifact written by ``save`` (no pickles are loaded)."""
+        with np.load(path, allow_pickle=False) as data:
+            spec = json.loads(str(data['__spec__']))
+            if spec.get('format') != FORMAT_NAME or spec.get('version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported compiled model format in {path}")
+            arrays = {key: data[key] for key in data.files if key != '__spec__'}
+        return cls(
+            _step_from_spec(spec['root'], arrays),
+            spec['n_features'],
+            feature_names=spec['feature_names'],
+            info=spec['info'],
+            attributes={name: arrays[key] for name, key in spec['attributes'].items()}
+        )
+
+
+class ModelCompiler:
+    """Compile, verify, save and load lean inference artifacts."""
+
+    ARTIFACT_SUFFIX = '.compiled.npz'
+    # Compiled predictions must match the source model this closely
+    PARITY_RTOL = 1e-5
+    PARITY_ATOL = 1e-6
+    BENCHMARK_BATCH_SIZES = (1, 32, 1024)
+
+    def fingerprint(self, model_path: str) -> str:
+        """SHA-256 of a model pickle, as recorded in its compiled artifact."""
+        return _file_sha256(model_path)
+
+    def artifact_path(self, model_path: str) -> str:
+        """Path of the compiled artifact for the pickle at ``model_path``."""
+        return os.path.splitext(model_path)[0] + self.ARTIFACT_SUFFIX
+
+    # Compiling
+
+    def compile(self, estimator) -> CompiledModel:
+        """
+        Compile a fitted estimator.
+
+        Raises:
+            MLModelError: When the estimator or one of its steps has no compiled form
+        """
+        n_features = getattr(estimator, 'n_features_in_', None)
+        if n_features is None:
+            raise MLModelError("Model is not fitted or does not report its input features",
+                               model_name=type(estimator).__name__, operation='compile')
+
+        feature_names = getattr(estimator, 'feature_names_in_', None)
+        attributes = {}
+        for name in ('feature_importances_', 'coef_'):
+            try:
+                value = getattr(estimator, name, None)
+            except Exception:
+                value = None
+            if value is not None:
+                attributes[name] = np.asarray(value, dtype=np.float64)
+
+        return CompiledModel(
+            self._compile_estimator(estimator),
+            int(n_features),
+            feature_names=[str(name) for name in feature_names] if feature_names is not None else None,
+            info={'model': type(estimator).__name__},
+            attributes=attributes
+        )
+
+    def _unsupported(self, step, reason: str = 'has no compiled equivalent'):
+        return MLModelError(f"{type(step).__name__} {reason}",
+                            model_name=type(step).__name__, operation='compile')
+
+    def _compile_estimator(self, estimator):
+        from sklearn.ensemble import (ExtraTreesRegressor, GradientBoostingRegressor,
+                                      RandomForestRegressor, StackingRegressor)
+        from sklearn.linear_model import (ARDRegression, BayesianRidge, ElasticNet, ElasticNetCV,
+                                          HuberRegressor, Lars, Lasso, LassoCV, LassoLars,
+                                          LinearRegression, Ridge, RidgeCV, SGDRegressor)
+        from sklearn.pipeline import Pipeline
+        from sklearn.tree import DecisionTreeRegressor
+
+        if isinstance(estimator, Pipeline):
+            steps = [step for _, step in estimator.steps if step not in (None, 'passthrough')]
+            return _Pipeline([self._compile_transform(step) for step in steps[:-1]]
+                             + [self._compile_estimator(steps[-1])])
+
+        if isinstance(estimator, StackingRegressor):
+            if any(method != 'predict' for method in estimator.stack_method_):
+                raise self._unsupported(estimator, 'stacks a method other than predict')
+            return _Stack([self._compile_estimator(base) for base in estimator.estimators_],
+                          self._compile_estimator(estimator.final_estimator_), bool(estimator.passthrough))
+
+        if isinstance(estimator, (LinearRegression, Ridge, RidgeCV, Lasso, LassoCV, ElasticNet, ElasticNetCV,
+                                  BayesianRidge, ARDRegression, HuberRegressor, SGDRegressor, Lars, LassoLars)):
+            coef = np.asarray(estimator.coef_, dtype=np.float64)
+            if coef.ndim != 1:
+                raise self._unsupported(estimator, 'has more than one output')
+            return _Linear(coef, float(np.ravel(estimator.intercept_)[0]) if np.size(estimator.intercept_) else 0.0)
+
+        if isinstance(estimator, DecisionTreeRegressor):
+            return _TreeEnsemble.from_trees([self._sklearn_tree(estimator)])
+
+        if isinstance(estimator, (RandomForestRegressor, ExtraTreesRegressor)):
+            return _TreeEnsemble.from_trees([self._sklearn_tree(tree) for tree in estimator.estimators_],
+                                            combine='mean')
+
+        if isinstance(estimator, GradientBoostingRegressor):
+            return self._compile_gradient_boosting(estimator)
+
+        module = type(estimator).__module__
+        if module.startswith('xgboost') and hasattr(estimator, 'get_booster'):
+            return self._compile_xgboost(estimator)
+        if module.startswith('lightgbm') and hasattr(estimator, 'booster_'):
+            return self._compile_lightgbm(estimator)
+
+        raise self._unsupported(estimator)
+
+    def _compile_transform(self, step):
+        from sklearn.decomposition import PCA
+        from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+        if isinstance(step, StandardScaler):
+            return _Standardize(step.mean_, step.scale_)
+        if isinstance(step, MinMaxScaler) and not step.clip:
+            return _Affine(step.scale_, step.min_)
+        if isinstance(step, PCA):
+            whiten = np.sqrt(step.explained_variance_) if step.whiten else None
+            return _Project(step.mean_, step.components_, whiten)
+        raise self._unsupported(step)
+
+    @staticmethod
+    def _sklearn_tree(estimator) -> Dict[str, Any]:
+        tree = estimator.tree_
+        left, right = tree.children_left, tree.children_right
+        # Trees fitted on data with NaN record where missing values go; older trees send NaN right
+        go_left = getattr(tree, 'missing_go_to_left', None)
+        missing = right if go_left is None else np.where(np.asarray(go_left).astype(bool), left, right)
+        return {'feature': tree.feature, 'threshold': tree.threshold, 'left': left, 'right': right,
+                'missing': missing, 'value': tree.value[:, 0, 0]}
+
+    def _compile_gradient_boosting(self, estimator):
+        from sklearn.dummy import DummyRegressor
+
+        if estimator.loss not in _GRADIENT_BOOSTING_LOSSES:
+            raise self._unsupported(estimator, f"loss '{estimator.loss}' has a non-identity link")
+        if isinstance(estimator.init_, str) and estimator.init_ == 'zero':
+            offset = 0.0
+        elif isinstance(estimator.init_, DummyRegressor):
+            offset = float(np.ravel(estimator.init_.constant_)[0])
+        else:
+            raise self._unsupported(estimator, 'has a non-constant init estimator')
+        return _TreeEnsemble.from_trees(
+            [self._sklearn_tree(tree) for tree in estimator.estimators_[:, 0]],
+            scale=estimator.learning_rate, offset=offset
+        )
+
+    def _compile_xgboost(self, estimator):
+        booster = estimator.get_booster()
+        config = json.loads(booster.save_config())['learner']
+        objective = config['objective']['name']
+        if objective not in _XGBOOST_OBJECTIVES or config['gradient_booster']['name'] != 'gbtree':
+            raise self._unsupported(estimator, f"objective '{objective}' is not supported")
+        base_score = float(str(config['learner_model_param']['base_score']).strip('[]'))
+
+        dumps = booster.get_dump(dump_format='json')
+        best_iteration = getattr(estimator, 'best_iteration', None)
+        if best_iteration is not None:
+            # predict() stops at the best early-stopping round
+            per_round = len(dumps) // max(1, booster.num_boosted_rounds())
+            dumps = dumps[:(best_iteration + 1) * per_round]
+
+        names = booster.feature_names
+        trees = []
+        for dump in dumps:
+            nodes: List[Dict[str, Any]] = []
+
+            def visit(node):
+                index = len(nodes)
+                entry = {'feature': 0, 'threshold': 0.0, 'left': -1, 'right': -1, 'missing': -1,
+                         'value': float(node.get('leaf', 0.0))}
+                nodes.append(entry)
+                if 'leaf' in node:
+                    return index
+                if 'split_condition' not in node:
+                    raise self._unsupported(estimator, 'uses categorical or indicator splits')
+                children = {child['nodeid']: visit(child) for child in node['children']}
+                split = node['split']
+                # XGBoost sends x < condition left; for float32 x that is x <= the next float32 below it
+                entry.update(
+                    feature=names.index(split) if names else int(split.lstrip('f')),
+                    threshold=float(np.nextafter(np.float32(node['split_condition']), np.float32(-np.inf))),
+                    left=children[node['yes']], right=children[node['no']],
+                    missing=children[node.get('missing', node['yes'])]
+                )
+                return index
+
+            visit(json.loads(dump))
+            trees.append({key: np.array([entry[key] for entry in nodes]) for key in nodes[0]})
+
+        return _TreeEnsemble.from_trees(trees, offset=base_score)
+
+    def _compile_lightgbm(self, estimator):
+        model = estimator.booster_.dump_model()
+        objective = str(model.get('objective', '')).split(' ')[0]
+        if objective not in _LIGHTGBM_OBJECTIVES:
+            raise self._unsupported(estimator, f"objective '{objective}' is not supported")
+
+        trees = []
+        for tree_info in model['tree_info']:
+            nodes: List[Dict[str, Any]] = []
+
+            def visit(node):
+                index = len(nodes)
+                entry = {'feature': 0, 'threshold': 0.0, 'left': -1, 'right': -1, 'missing': -1,
+                         'value': float(node.get('leaf_value', 0.0))}
+                nodes.append(entry)
+                if 'split_feature' not in node:
+                    return index
+                if node.get('decision_type') != '<=' or node.get('missing_type', 'None') == 'Zero':
+                    raise self._unsupported(estimator, 'uses categorical or zero-as-missing splits')
+                left, right = visit(node['left_child']), visit(node['right_child'])
+                if node.get('missing_type') == 'NaN':
+                    missing = left if node.get('default_left') else right
+                else:
+                    # Without missing-value handling LightGBM compares NaN as 0
+                    missing = left if 0.0 <= node['threshold'] else right
+                entry.update(feature=node['split_feature'], threshold=float(node['threshold']),
+                             left=left, right=right, missing=missing)
+                return index
+
+            visit(tree_info['tree_structure'])
+            trees.append({key: np.array([entry[key] for entry in nodes]) for key in nodes[0]})
+
+        return _TreeEnsemble.from_trees(trees, dtype='float64',
+                                        combine='mean' if model.get('average_output') else 'sum')
+
+    # Verifying and exporting
+
+    def sample_inputs(self, estimator, n_features: int, rows: int = 256, seed: int = 0) -> np.ndarray:
+        """Synthetic rows for the parity check, drawn around the scaler statistics when available."""
+        rng = np.random.default_rng(seed)
+        first = estimator.steps[0][1] if hasattr(estimator, 'steps') else estimator
+        mean, scale = getattr(first, 'mean_', None), getattr(first, 'scale_', None)
+        if mean is not None and scale is not None and np.shape(mean) == (n_features,):
+            return rng.normal(mean, scale, size=(rows, n_features))
+        return rng.normal(size=(rows, n_features))
+
+    def verify(self, estimator, compiled: CompiledModel, X) -> Dict[str, Any]:
+        """
+        Compare compiled and source predictions on ``X``.
+
+        Raises:
+            MLModelError: When any prediction differs by more than the parity tolerance
+        """
+        if compiled.feature_names and not hasattr(X, 'columns'):
+            # Source pipelines fitted on DataFrames expect the same columns
+            import pandas as pd
+            X = pd.DataFrame(np.asarray(X, dtype=np.float64), columns=compiled.feature_names)
+        expected = np.asarray(estimator.predict(X), dtype=np.float64).ravel()
+        actual = compiled.predict(X)
+        difference = np.abs(actual - expected)
+        parity = {
+            'rows': int(len(expected)),
+            'max_abs_diff': float(difference.max()),
+            'max_rel_diff': float((difference / np.maximum(np.abs(expected), 1e-12)).max())
+        }
+        if not np.allclose(actual, expected, rtol=self.PARITY_RTOL, atol=self.PARITY_ATOL):
+            raise MLModelError(
+                f"Compiled predictions differ from {type(estimator).__name__} "
+                f"(max relative difference {parity['max_rel_diff']:.2e})",
+                model_name=type(estimator).__name__, operation='verify'
+            )
+        return parity
+
+    def export(self, model_path: str, estimator=None, X=None) -> CompiledModel:
+        """
+        Compile the model pickled at ``model_path`` and save its artifact.
+
+        Args:
+            model_path: Pickled model (the artifact is written next to it)
+            estimator: The unpickled model, when already loaded
+            X: Feature rows for the parity check (synthetic rows by default)
+
+        Returns:
+            The compiled model; ``info`` holds the artifact path and parity results
+
+        Raises:
+            MLModelError: When the model cannot be compiled or fails the parity check
+        """
+        import joblib
+
+        start_time = time.time()
+        if estimator is None:
+            estimator = joblib.load(model_path)
+        compiled = self.compile(estimator)
+        if X is None or len(X) == 0:
+            X = self.sample_inputs(estimator, compiled.n_features)
+        parity = self.verify(estimator, compiled, X)
+
+        path = self.artifact_path(model_path)
+        compiled.info.update({
+            'source': os.path.basename(model_path),
+            'source_sha256': _file_sha256(model_path),
+            'compiled_at': datetime.utcnow().isoformat(),
+            'parity': parity
+        })
+        compiled.save(path)
+        compiled.info.update({'path': path, 'elapsed_seconds': time.time() - start_time})
+        logger.info(f"Compiled {os.path.basename(model_path)} to {path} "
+                    f"(max relative difference {parity['max_rel_diff']:.2e})")
+        return compiled
+
+    def load_for(self, model_path: str) -> Optional[CompiledModel]:
+        """The compiled artifact of ``model_path``, or None when missing, unreadable or stale."""
+        path = self.artifact_path(model_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            compiled = CompiledModel.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load compiled model {path}: {e}")
+            return None
+        try:
+            if compiled.info.get('source_sha256') != _file_sha256(model_path):
+                logger.info(f"Ignoring {path}: compiled from an earlier {os.path.basename(model_path)}")
+                return None
+        except OSError:
+            pass  # Only the compiled artifact was deployed
+        return compiled
+
+    def benchmark(self, estimator, compiled: CompiledModel, X, batch_sizes: Sequence[int] = None,
+                  min_seconds: float = 0.2) -> Dict[int, Dict[str, float]]:
+        """
+        Per-batch prediction latency of the source and compiled models.
+
+        Rows of ``X`` are repeated to fill the larger batches.
+
+        Returns:
+            Batch size -> ``source_ms``, ``compiled_ms`` and ``speedup``
+        """
+        X = np.asarray(X, dtype=np.float64)
+        feature_names = compiled.feature_names
+        results = {}
+        for batch_size in batch_sizes or self.BENCHMARK_BATCH_SIZES:
+            batch = X[np.arange(batch_size) % len(X)]
+            if feature_names:
+                # Timed with the DataFrame input MLService passes to the source model
+                import pandas as pd
+                batch = pd.DataFrame(batch, columns=feature_names)
+            timings = {}
+            for label, model in (('source', estimator), ('compiled', compiled)):
+                model.predict(batch)  # warm up
+                calls, start_time = 0, time.perf_counter()
+                while calls < 3 or time.perf_counter() - start_time < min_seconds:
+                    model.predict(batch)
+                    calls += 1
+                timings[f'{label}_ms'] = (time.perf_counter() - start_time) / calls * 1000
+            timings['speedup'] = timings['source_ms'] / timings['compiled_ms']
+            results[batch_size] = timings
+        return results
+
+
+# Global instance used by MLService, the model CLI commands and training
+model_compiler = ModelCompiler()
@@ -0,0 +1,138 @@
+"""
+Prediction result cache for ``MLService.predict_property_price``.
+
+The same inputs come in again and again: repeated tries of the
+``/predict-price`` form, ``/test-predict-price``, ``/api/model/test`` and
+``flask etl test-prediction`` with the sample property. Results are cached
+under (model version, digest of the feature vector). They live in a bounded
+in-process LRU and are shared across workers through the Flask cache.
+
+The key is the extracted feature vector, not the raw input. Inputs that
+extract to the same vector share one entry. The vector includes the current
+economic indicators, so a new economic snapshot leads to new keys. The model
+version includes the pickle's digest, so ``switch_model`` and retraining also
+lead to new keys. ``switch_model`` additionally clears the local tier.
+"""
+
+import hashlib
+import logging
+from threading import Lock
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from app.cache.local_cache import LocalTTLCache
+from app.extensions import cache
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """Two-tier (local LRU, shared Flask cache) cache of price predictions."""
+
+    DEFAULT_MAXSIZE = 4096
+    DEFAULT_TTL = 3600  # seconds
+    KEY_PREFIX = 'prediction'
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: int = DEFAULT_TTL, shared: bool = True):
+        self.ttl = ttl
+        self.shared = shared
+        self._local = LocalTTLCache(maxsize=maxsize, ttl=ttl)
+        self._stats_lock = Lock()
+        self._stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def configure(self, maxsize: Optional[int] = None, ttl: Optional[int] = None,
+                  shared: Optional[bool] = None):
+        """Resize the cache, change the TTL or turn the shared tier on or off."""
+        if maxsize is not None or ttl is not None:
+            self.ttl = ttl if ttl is not None else self.ttl
+            self._local = LocalTTLCache(
+                maxsize=maxsize if maxsize is not None else self._local.maxsize,
+                ttl=self.ttl
+            )
+        if shared is not None:
+            self.shared = shared
+
+    def key(self, model_version: str, features: Sequence[float]) -> str:
+        """Cache key for a feature vector scored by ``model_version``."""
+        # Adding 0.0 turns -0.0 into 0.0, so equal vectors have equal bytes
+        vector = np.asarray(features, dtype=np.float64) + 0.0
+        digest = hashlib.blake2b(vector.tobytes(), digest_size=16).hexdigest()
+        return f"{self.KEY_PREFIX}:{model_version}:{digest}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached prediction for ``key``, or None on a miss."""
+        result = self._local.get(key)
+        if result is not None:
+            self._record('hits')
+            return self._copy(result)
+
+        if self.shared:
+            try:
+                result = cache.get(key)
+            except Exception as e:
+                # No application context, or the shared cache is unavailable
+                logger.debug(f"Prediction cache lookup failed: {e}")
+                result = None
+            if result is not None:
+                self._local.set(key, result)
+                self._record('shared_hits')
+                return self._copy(result)
+
+        self._record('misses')
+        return None
+
+    def set(self, key: str, result: Dict[str, Any]):
+        """Cache a prediction locally and in the shared cache."""
+        result = self._copy(result)
+        self._local.set(key, result)
+        if self.shared:
+            try:
+                cache.set(key, result, timeout=self.ttl)
+            except Exception as e:
+                logger.debug(f"Prediction cache store failed: {e}")
+
+    @staticmethod
+    def _copy(result: Dict[str, Any]) -> Dict[str, Any]:
+        # Callers get their own dicts, so changing a response cannot change the cache
+        copied = dict(result)
+        if isinstance(copied.get('confidence_interval'), dict):
+            copied['confidence_interval'] = dict(copied['confidence_interval'])
+        return copied
+
+    def invalidate(self):
+        """Drop local entries after a model change (shared entries are keyed by model version)."""
+        self._local.clear()
+        self._record('invalidations')
+
+    def _record(self, counter: str):
+        with self._stats_lock:
+            self._stats[counter] += 1
+
+    def clear(self):
+        """Drop local entries and reset counters."""
+        self._local.clear()
+        with self._stats_lock:
+            for counter in self._stats:
+                self._stats[counter] = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rates and local cache statistics."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+        local_stats = self._local.get_stats()
+        return dict(
+            stats,
+            lookups=lookups,
+            hit_rate=(stats['hits'] + stats['shared_hits']) / lookups if lookups else 0.0,
+            shared_enabled=self.shared,
+            size=local_stats['size'],
+            maxsize=local_stats['maxsize'],
+            ttl=self.ttl,
+            evictions=local_stats['evictions']
+        )
+
+
+# Global instance shared by every MLService
+prediction_cache = PredictionCache()
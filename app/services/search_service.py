@@ -0,0 +1,276 @@
+"""
+Full-text property search.
+
+Text and location searches used to run leading-wildcard ``LIKE`` scans over
+the description and address columns, which no index can serve. This service
+uses the database's own full-text engine instead:
+
+- MySQL: ``FULLTEXT`` indexes queried with ``MATCH ... AGAINST`` in boolean mode
+- SQLite: an external-content FTS5 table ranked with ``bm25``, kept in sync
+  with ``properties`` by triggers so ORM writes and the ETL upserts update it
+
+The indexes are created by ``flask etl build-search-index``. Until they exist
+(or on other databases) searches fall back to the original ``LIKE`` filters.
+"""
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, bindparam, desc, literal_column, or_, text
+
+from app.models.property import Property
+
+logger = logging.getLogger(__name__)
+
+
+class PropertySearchService:
+    """Ranked full-text search over property text and location columns."""
+
+    # Column groups that can be searched independently
+    FIELD_COLUMNS = {
+        'text': ('address', 'features', 'community_features', 'remarks'),
+        'location': ('city', 'province', 'postal_code'),
+    }
+
+    # MySQL FULLTEXT index per column group (declared on the Property model)
+    MYSQL_INDEXES = {
+        'text': 'ft_property_text',
+        'location': 'ft_property_location',
+    }
+
+    FTS_TABLE = 'property_fts'
+    # bm25 weights in FTS_COLUMNS order: address matches outrank remark matches
+    FTS_COLUMNS = ('address', 'features', 'community_features', 'remarks',
+                   'city', 'province', 'postal_code')
+    FTS_WEIGHTS = (4.0, 2.0, 1.5, 1.0, 1.0, 1.0, 1.0)
+
+    # How long a missing index is remembered before checking again
+    BACKEND_RECHECK_SECONDS = 300
+
+    def __init__(self):
+        self._backends: Dict[str, Tuple[Optional[str], float]] = {}
+
+    def _get_db(self):
+        """Get database instance from current Flask app context."""
+        from app import db
+        return db
+
+    def clear_cache(self):
+        """Forget detected backends so the next search re-detects them."""
+        self._backends.clear()
+
+    def get_backend(self) -> Optional[str]:
+        """
+        Return the available full-text backend: ``mysql``, ``sqlite`` or None.
+
+        Detection runs once per engine; a missing index is re-checked every
+        ``BACKEND_RECHECK_SECONDS`` so a newly built index is picked up.
+        """
+        db = self._get_db()
+        engine_key = str(db.engine.url)
+        cached = self._backends.get(engine_key)
+        if cached and (cached[0] or time.time() - cached[1] < self.BACKEND_RECHECK_SECONDS):
+            return cached[0]
+
+        backend = None
+        try:
+            dialect = db.engine.dialect.name
+            if dialect == 'mysql' and self._mysql_indexes_exist():
+                backend = 'mysql'
+            elif dialect == 'sqlite' and self._fts_table_exists():
+                backend = 'sqlite'
+        except Exception as e:
+            logger.warning(f"Full-text backend detection failed: {e}")
+
+        self._backends[engine_key] = (backend, time.time())
+        return backend
+
+    def _mysql_indexes_exist(self) -> bool:
+        db = self._get_db()
+        rows = db.session.execute(text("""
+            SELECT DISTINCT index_name
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE()
+            AND table_name = 'properties'
+            AND index_type = 'FULLTEXT'
+        """)).fetchall()
+        return set(self.MYSQL_INDEXES.values()) <= {row[0] for row in rows}
+
+    def _fts_table_exists(self) -> bool:
+        db = self._get_db()
+        row = db.session.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': self.FTS_TABLE}
+        ).fetchone()
+        return row is not None
+
+    def build_index(self, rebuild: bool = False) -> Dict[str, Any]:
+        """
+        Create the full-text indexes for the current database.
+
+        Args:
+            rebuild: Repopulate an existing SQLite FTS table (needed after VACUUM,
+                which may renumber the rowids the index refers to)
+
+        Returns:
+            Dictionary with the backend, the actions taken and the elapsed time
+        """
+        db = self._get_db()
+        dialect = db.engine.dialect.name
+        start_time = time.time()
+        results = {'backend': None, 'actions': []}
+
+        if dialect == 'mysql':
+            existing = {
+                row[0] for row in db.session.execute(text("""
+                    SELECT DISTINCT index_name
+                    FROM information_schema.statistics
+                    WHERE table_schema = DATABASE() AND table_name = 'properties'
+                """)).fetchall()
+            }
+            for fields, index_name in self.MYSQL_INDEXES.items():
+                if index_name in existing:
+                    continue
+                columns = ', '.join(self.FIELD_COLUMNS[fields])
+                db.session.execute(text(
+                    f"ALTER TABLE properties ADD FULLTEXT INDEX {index_name} ({columns})"
+                ))
+                results['actions'].append(f"Created FULLTEXT index {index_name}")
+            results['backend'] = 'mysql'
+
+        elif dialect == 'sqlite':
+            fts5 = db.session.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar()
+            if not fts5:
+                raise RuntimeError("SQLite was built without FTS5")
+
+            if not self._fts_table_exists():
+                for statement in self._fts_schema():
+                    db.session.execute(text(statement))
+                results['actions'].append(f"Created FTS5 table {self.FTS_TABLE} and sync triggers")
+                rebuild = True
+            if rebuild:
+                db.session.execute(text(
+                    f"INSERT INTO {self.FTS_TABLE}({self.FTS_TABLE}) VALUES ('rebuild')"
+                ))
+                results['actions'].append(f"Populated {self.FTS_TABLE} from properties")
+            results['backend'] = 'sqlite'
+
+        else:
+            raise RuntimeError(f"Full-text search is not supported on {dialect}")
+
+        db.session.commit()
+        self._backends.pop(str(db.engine.url), None)
+        results['elapsed_seconds'] = time.time() - start_time
+        logger.info(f"Search index ready ({results['backend']}): {results['actions']}")
+        return results
+
+    def _fts_schema(self) -> List[str]:
+        """DDL for the external-content FTS5 table and its sync triggers."""
+        table = self.FTS_TABLE
+        columns = ', '.join(self.FTS_COLUMNS)
+        new_values = ', '.join(f"new.{column}" for column in self.FTS_COLUMNS)
+        old_values = ', '.join(f"old.{column}" for column in self.FTS_COLUMNS)
+        delete_old = (
+            f"INSERT INTO {table}({table}, rowid, {columns}) "
+            f"VALUES ('delete', old.rowid, {old_values});"
+        )
+        insert_new = f"INSERT INTO {table}(rowid, {columns}) VALUES (new.rowid, {new_values});"
+
+        return [
+            f"CREATE VIRTUAL TABLE {table} USING fts5({columns}, content='properties', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            f"CREATE TRIGGER {table}_ai AFTER INSERT ON properties BEGIN {insert_new} END",
+            f"CREATE TRIGGER {table}_ad AFTER DELETE ON properties BEGIN {delete_old} END",
+            f"CREATE TRIGGER {table}_au AFTER UPDATE OF {columns} ON properties "
+            f"BEGIN {delete_old} {insert_new} END",
+        ]
+
+    @staticmethod
+    def tokenize(query_text: str) -> List[str]:
+        """Split user input into lowercase search terms, dropping query syntax."""
+        return [term.lower() for term in re.findall(r'\w+', query_text or '')]
+
+    def filter_query(self, query, query_text: str, fields: str = 'text', rank: bool = True):
+        """
+        Restrict ``query`` to properties matching every term of ``query_text``.
+
+        Each term matches words starting with it, so partial input such as
+        ``Tor`` or ``M5V`` still finds Toronto or the postal code.
+
+        Args:
+            query: Property query to filter
+            query_text: Raw user input
+            fields: Column group to search (``text`` or ``location``)
+            rank: Order by relevance ahead of any ordering the caller adds
+
+        Returns:
+            The filtered query
+        """
+        terms = self.tokenize(query_text)
+        backend = self.get_backend() if terms else None
+
+        if backend == 'sqlite':
+            return self._filter_fts5(query, terms, fields, rank)
+        if backend == 'mysql':
+            return self._filter_mysql(query, terms, fields, rank)
+        return query.filter(self._like_clause(query_text, fields))
+
+    def _filter_fts5(self, query, terms: List[str], fields: str, rank: bool):
+        table = self.FTS_TABLE
+        column_filter = ' '.join(self.FIELD_COLUMNS[fields])
+        phrases = ' AND '.join(f'"{term}"*' for term in terms)
+        match = f"{{{column_filter}}} : ({phrases})"
+        weights = ', '.join(str(weight) for weight in self.FTS_WEIGHTS)
+
+        hits = text(
+            f"SELECT rowid AS fts_rowid, bm25({table}, {weights}) AS fts_score "
+            f"FROM {table} WHERE {table} MATCH :fts_{fields}"
+        ).bindparams(**{f'fts_{fields}': match}).columns(
+            fts_rowid=Integer, fts_score=Float
+        ).subquery(f'fts_{fields}_hits')
+
+        query = query.join(hits, hits.c.fts_rowid == literal_column('properties.rowid'))
+        if rank:
+            # bm25 scores are negative; lower is more relevant
+            query = query.order_by(hits.c.fts_score)
+        return query
+
+    def _filter_mysql(self, query, terms: List[str], fields: str, rank: bool):
+        # Prefix terms also match words longer than innodb_ft_min_token_size
+        # when the typed term itself is shorter
+        boolean_query = ' '.join(f"+{term}*" for term in terms)
+        columns = ', '.join(f"properties.{column}" for column in self.FIELD_COLUMNS[fields])
+        against = text(
+            f"MATCH ({columns}) AGAINST (:ft_{fields} IN BOOLEAN MODE)"
+        ).bindparams(bindparam(f'ft_{fields}', boolean_query))
+
+        query = query.filter(against)
+        if rank:
+            query = query.order_by(desc(against))
+        return query
+
+    @staticmethod
+    def _like_clause(query_text: str, fields: str):
+        """Substring filter used when no full-text index is available."""
+        if fields == 'location':
+            pattern = f'%{query_text}%'
+            return or_(
+                Property.city.ilike(pattern),
+                Property.province.ilike(pattern),
+                Property.postal_code.ilike(pattern)
+            )
+        return or_(
+            Property.features.contains(query_text),
+            Property.community_features.contains(query_text),
+            Property.remarks.contains(query_text),
+            Property.address.contains(query_text)
+        )
+
+    def search(self, query_text: str, limit: int = 20) -> List[Property]:
+        """Return the most relevant properties for a free-text query."""
+        return self.filter_query(Property.query, query_text).limit(limit).all()
+
+
+# Global instance shared by the model and routes
+search_service = PropertySearchService()
@@ -0,0 +1,363 @@
+"""
+Incremental AI valuation backfill.
+
+``/api/properties/bulk-analyze`` used to value at most 100 properties per
+request. It ran both ``predict_property_price`` and the full
+``analyze_property`` for each one, including comparables, trend queries and
+insights that were never stored. ``scripts/optimize_performance.py`` repeated
+the same work in its own loop. This job keeps ``ai_valuation``,
+``investment_score``, ``risk_assessment`` and ``market_trend`` current:
+
+- Properties are visited in ``(updated_at, listing_id)`` order in keyset
+  batches (``idx_updated_listing``). The ``backfill_checkpoints`` row records
+  the last position, so later runs only see properties changed since then,
+  and an interrupted run resumes where it stopped. Loading a different model
+  starts a new full pass.
+- Each batch is valued with one ``MLService.predict_prices`` call, and market
+  trends are computed once per city and property type.
+- Results are written with a single executemany ``UPDATE`` that keeps
+  ``updated_at`` and only matches rows still at the ``updated_at`` that was
+  read. Rows edited while a batch was being scored are left for the next
+  run. Rows changed in the last ``SETTLE_SECONDS`` are also left for later, so
+  a transaction that commits late cannot fall behind the watermark.
+- Each batch locks the checkpoint row (``SELECT ... FOR UPDATE``), continues
+  from the watermark it reads, and commits together with the new one, so
+  runners in different processes take turns instead of repeating batches. A
+  shared-cache lock, released only by the runner that holds it, keeps a second
+  runner from starting at all.
+
+Run with ``flask etl backfill-valuations``. The bulk-analyze endpoint starts
+the same job on a background thread.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy import and_, bindparam, func, or_, select
+
+from app.extensions import cache
+from app.models.property import BackfillCheckpoint, Property
+
+logger = logging.getLogger(__name__)
+
+
+class ValuationBackfill:
+    """Resumable keyset backfill of the AI valuation columns."""
+
+    JOB = 'ai_valuations'
+    LOCK_KEY = 'valuation_backfill:running'
+    # The lock outlives a stalled batch; runners refresh it after every batch
+    LOCK_TIMEOUT = 600
+
+    DEFAULT_BATCH_SIZE = 500
+    # Rows changed more recently than this are left for the next run
+    SETTLE_SECONDS = 60
+
+    COLUMNS = (
+        Property.listing_id, Property.updated_at, Property.bedrooms, Property.bathrooms,
+        Property.sqft, Property.lot_size, Property.rooms, Property.city, Property.province,
+        Property.property_type, Property.year_built, Property.dom, Property.taxes,
+        Property.ai_valuation, Property.investment_score, Property.risk_assessment,
+        Property.market_trend
+    )
+
+    def __init__(self):
+        self._ml_service = None
+        self._thread: Optional[threading.Thread] = None
+        self._last_result: Optional[Dict[str, Any]] = None
+
+    def _get_db(self):
+        """Get database instance from current Flask app context."""
+        from app import db
+        return db
+
+    def _get_ml_service(self):
+        if self._ml_service is None:
+            from app.services.ml_service import MLService
+            self._ml_service = MLService()
+        return self._ml_service
+
+    def _config(self, key: str, default):
+        try:
+            return current_app.config.get(key, default)
+        except RuntimeError:
+            return default
+
+    # Running
+
+    def run(self, batch_size: Optional[int] = None, max_batches: Optional[int] = None,
+            max_seconds: Optional[float] = None, full: bool = False,
+            progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Value properties changed since the checkpoint.
+
+        Args:
+            batch_size: Rows per batch (``VALUATION_BACKFILL_BATCH_SIZE``)
+            max_batches: Stop after this many batches (the rest resumes next run)
+            max_seconds: Stop after the batch that crosses this duration
+            full: Start a new pass over every property
+            progress: Called with the statistics of each batch
+
+        Returns:
+            Dictionary with status, row counts, throughput and the checkpoint
+        """
+        batch_size = batch_size or self._config('VALUATION_BACKFILL_BATCH_SIZE', self.DEFAULT_BATCH_SIZE)
+        pause = self._config('VALUATION_BACKFILL_PAUSE', 0.0)
+        token = f"{os.getpid()}:{uuid.uuid4().hex}"
+        if not cache.add(self.LOCK_KEY, token, timeout=self.LOCK_TIMEOUT):
+            return {'status': 'busy', 'message': 'Another valuation backfill is running'}
+
+        db = self._get_db()
+        start_time = time.perf_counter()
+        totals = {'batches': 0, 'rows': 0, 'written': 0, 'unchanged': 0, 'skipped': 0}
+        status = 'partial'
+        try:
+            ml_service = self._get_ml_service()
+            ml_service._load_models()
+            self._stamp_missing_timestamps()
+            self._checkpoint(ml_service.model_version, full)
+            # Fixed for the run, so rows updated while it runs wait for the next one
+            horizon = datetime.utcnow() - timedelta(seconds=self.SETTLE_SECONDS)
+            trends: Dict[tuple, str] = {}
+
+            while True:
+                batch_start = time.perf_counter()
+                # Held until the batch commits; another runner waits here, then sees our watermark
+                checkpoint = self._lock_checkpoint()
+                if checkpoint.model_version != ml_service.model_version:
+                    db.session.commit()
+                    logger.info("Valuation backfill stopped: another runner started a pass for a new model")
+                    break
+                rows = self._fetch_batch(checkpoint, horizon, batch_size)
+                if not rows:
+                    checkpoint.pass_completed_at = datetime.utcnow()
+                    db.session.commit()
+                    status = 'complete'
+                    break
+
+                values = self._score(ml_service, rows, trends)
+                written, unchanged = self._write(rows, values)
+
+                last = rows[-1]
+                checkpoint.watermark_updated_at = last.updated_at
+                checkpoint.watermark_key = last.listing_id
+                checkpoint.rows_processed += len(rows)
+                checkpoint.rows_written += written
+                db.session.commit()
+                if cache.get(self.LOCK_KEY) in (token, None):
+                    cache.set(self.LOCK_KEY, token, timeout=self.LOCK_TIMEOUT)
+
+                batch = {
+                    'rows': len(rows),
+                    'written': written,
+                    'unchanged': unchanged,
+                    'skipped': len(rows) - written - unchanged,
+                    'seconds': time.perf_counter() - batch_start
+                }
+                batch['rows_per_second'] = batch['rows'] / batch['seconds'] if batch['seconds'] else 0.0
+                totals['batches'] += 1
+                for key in ('rows', 'written', 'unchanged', 'skipped'):
+                    totals[key] += batch[key]
+                if progress is not None:
+                    progress({**batch, 'batch': totals['batches'], 'total_rows': totals['rows'],
+                              'watermark': last.updated_at.isoformat()})
+
+                if len(rows) < batch_size:
+                    continue  # The next fetch confirms the pass is complete
+                if max_batches is not None and totals['batches'] >= max_batches:
+                    break
+                if max_seconds is not None and time.perf_counter() - start_time >= max_seconds:
+                    break
+                if pause:
+                    time.sleep(pause)
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Valuation backfill failed: {str(e)}")
+            status = 'error'
+            totals['error'] = str(e)
+        finally:
+            # The lock may have expired and been taken by another runner; leave theirs alone
+            if cache.get(self.LOCK_KEY) == token:
+                cache.delete(self.LOCK_KEY)
+
+        elapsed = time.perf_counter() - start_time
+        result = {
+            'status': status,
+            **totals,
+            'elapsed_seconds': elapsed,
+            'rows_per_second': totals['rows'] / elapsed if elapsed else 0.0,
+            'checkpoint': self._checkpoint_dict()
+        }
+        self._last_result = result
+        logger.info(f"Valuation backfill {status}: {totals['rows']} rows, {totals['written']} written "
+                    f"in {elapsed:.2f}s ({result['rows_per_second']:.0f} rows/s)")
+        return result
+
+    def _lock_checkpoint(self) -> Optional[BackfillCheckpoint]:
+        """This job's checkpoint, freshly read and locked until the next commit."""
+        query = (
+            select(BackfillCheckpoint).where(BackfillCheckpoint.job == self.JOB)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return self._get_db().session.execute(query).scalar_one_or_none()
+
+    def _checkpoint(self, model_version: str, full: bool) -> BackfillCheckpoint:
+        """This job's checkpoint, restarted for a full pass or a different model."""
+        db = self._get_db()
+        checkpoint = self._lock_checkpoint()
+        if checkpoint is None:
+            checkpoint = BackfillCheckpoint(job=self.JOB, rows_processed=0, rows_written=0)
+            db.session.add(checkpoint)
+            full = True
+        elif checkpoint.model_version != model_version:
+            logger.info(f"Valuation model changed to {model_version}; starting a full backfill pass")
+            full = True
+
+        if full:
+            checkpoint.watermark_updated_at = None
+            checkpoint.watermark_key = None
+            checkpoint.rows_processed = 0
+            checkpoint.rows_written = 0
+            checkpoint.pass_started_at = datetime.utcnow()
+            checkpoint.pass_completed_at = None
+        elif checkpoint.pass_completed_at is not None:
+            # Incremental pass from the previous position
+            checkpoint.rows_processed = 0
+            checkpoint.rows_written = 0
+            checkpoint.pass_started_at = datetime.utcnow()
+            checkpoint.pass_completed_at = None
+        checkpoint.model_version = model_version
+        db.session.commit()
+        return checkpoint
+
+    def _stamp_missing_timestamps(self):
+        """Give legacy rows without ``updated_at`` one, so the keyset order reaches them."""
+        db = self._get_db()
+        table = Property.__table__
+        db.session.execute(
+            table.update().where(table.c.updated_at.is_(None)).values(updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+    def _fetch_batch(self, checkpoint: BackfillCheckpoint, horizon: datetime, batch_size: int) -> List[Any]:
+        query = select(*self.COLUMNS).where(Property.updated_at <= horizon)
+        if checkpoint.watermark_updated_at is not None:
+            query = query.where(or_(
+                Property.updated_at > checkpoint.watermark_updated_at,
+                and_(Property.updated_at == checkpoint.watermark_updated_at,
+                     Property.listing_id > checkpoint.watermark_key)
+            ))
+        query = query.order_by(Property.updated_at, Property.listing_id).limit(batch_size)
+        return self._get_db().session.execute(query).all()
+
+    def _score(self, ml_service, rows: List[Any], trends: Dict[tuple, str]) -> List[Dict[str, Any]]:
+        """Column values for each row, with one model call for the batch."""
+        prices = ml_service.predict_prices(rows)
+        values = []
+        for row, price in zip(rows, prices):
+            key = (row.city, row.property_type)
+            if key not in trends:
+                trends[key] = ml_service._get_market_trend(row.city, row.property_type)
+            values.append({
+                'ai_valuation': round(price, 2),
+                # investment_score is NUMERIC(3, 2)
+                'investment_score': min(round(ml_service._calculate_investment_score(row), 2), 9.99),
+                'risk_assessment': ml_service._assess_risk_level(row),
+                'market_trend': trends[key]
+            })
+        return values
+
+    def _write(self, rows: List[Any], values: List[Dict[str, Any]]) -> tuple:
+        """Bulk update changed rows; returns (written, unchanged)."""
+        db = self._get_db()
+        table = Property.__table__
+        params = []
+        for row, value in zip(rows, values):
+            if self._unchanged(row, value):
+                continue
+            params.append({
+                'key_listing_id': row.listing_id,
+                'key_updated_at': row.updated_at,
+                **{f'value_{column}': value[column] for column in value}
+            })
+        unchanged = len(rows) - len(params)
+        if not params:
+            return 0, unchanged
+
+        stmt = (
+            table.update()
+            .where(and_(table.c.listing_id == bindparam('key_listing_id'),
+                        table.c.updated_at == bindparam('key_updated_at')))
+            .values({column: bindparam(f'value_{column}') for column in values[0]})
+            # Valuations are derived data: keep updated_at, which is the watermark
+            .values(updated_at=table.c.updated_at)
+        )
+        result = db.session.execute(stmt, params)
+        if db.engine.dialect.supports_sane_multi_rowcount:
+            return result.rowcount, unchanged
+        return len(params), unchanged
+
+    @staticmethod
+    def _unchanged(row, value: Dict[str, Any]) -> bool:
+        return (row.ai_valuation is not None and abs(float(row.ai_valuation) - value['ai_valuation']) < 0.01
+                and row.investment_score is not None
+                and abs(float(row.investment_score) - value['investment_score']) < 0.005
+                and row.risk_assessment == value['risk_assessment']
+                and row.market_trend == value['market_trend'])
+
+    # Background runs and status
+
+    def start(self, app, **options) -> bool:
+        """Run the backfill on a background thread unless one is running."""
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        if cache.get(self.LOCK_KEY) is not None:
+            return False
+
+        def target():
+            with app.app_context():
+                try:
+                    self.run(**options)
+                finally:
+                    self._get_db().session.remove()
+
+        self._thread = threading.Thread(target=target, name='valuation-backfill', daemon=True)
+        self._thread.start()
+        return True
+
+    def _checkpoint_dict(self) -> Optional[Dict[str, Any]]:
+        try:
+            checkpoint = self._get_db().session.get(BackfillCheckpoint, self.JOB)
+        except Exception:
+            return None
+        return checkpoint.to_dict() if checkpoint is not None else None
+
+    def status(self) -> Dict[str, Any]:
+        """Checkpoint, rows waiting for a run, and the last run's result in this process."""
+        db = self._get_db()
+        checkpoint = db.session.get(BackfillCheckpoint, self.JOB)
+        pending = select(func.count()).select_from(Property)
+        if checkpoint is not None and checkpoint.watermark_updated_at is not None:
+            pending = pending.where(or_(
+                Property.updated_at > checkpoint.watermark_updated_at,
+                and_(Property.updated_at == checkpoint.watermark_updated_at,
+                     Property.listing_id > checkpoint.watermark_key),
+                Property.updated_at.is_(None)
+            ))
+        return {
+            'running': cache.get(self.LOCK_KEY) is not None,
+            'pending_rows': db.session.execute(pending).scalar(),
+            'checkpoint': checkpoint.to_dict() if checkpoint is not None else None,
+            'last_run': self._last_result
+        }
+
+
+# Global instance used by the ETL command, the bulk-analyze endpoint and scripts
+valuation_backfill = ValuationBackfill()
@@ -0,0 +1,183 @@
+"""
+Base class for versioned snapshots kept fresh by a background thread.
+
+A snapshot is plain data built from the database, stamped with a version
+(milliseconds since the epoch) and stored in the shared Flask cache. One
+thread per process checks it every few seconds and rebuilds it once it is
+older than the configured interval; a cache lock keeps the rebuild to one
+worker at a time, including requests that find no snapshot at all
+(``refresh_cold``). Subclasses supply the cache keys, the interval setting and
+``refresh``.
+"""
+import logging
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Mapping, Optional
+
+from flask import current_app
+
+from app.extensions import cache
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedSnapshotService(ABC):
+    """Scheduling, build locking and status shared by the snapshot services."""
+
+    CACHE_KEY: str = None
+    BUILD_LOCK_KEY: str = None
+    # Config key holding the rebuild interval in seconds (0 disables the scheduler)
+    INTERVAL_CONFIG: str = None
+    NAME: str = 'snapshot'
+
+    DEFAULT_INTERVAL = 300
+    # Upper bound on how long the scheduler sleeps between freshness checks
+    POLL_SECONDS = 30
+    # A snapshot older than this many intervals is reported as stale
+    STALE_INTERVALS = 2
+    # Snapshots outlive several missed rebuilds rather than dropping to a cold build
+    CACHE_TIMEOUT_INTERVALS = 12
+    # How long a request with no snapshot waits for another worker's build, and how often it looks
+    COLD_WAIT_SECONDS = 10
+    COLD_POLL_SECONDS = 0.1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ml_service = None
+        self._last_error: Optional[str] = None
+
+    def _get_interval(self) -> int:
+        """Rebuild interval from the ``INTERVAL_CONFIG`` setting."""
+        try:
+            interval = current_app.config.get(self.INTERVAL_CONFIG, self.DEFAULT_INTERVAL)
+        except RuntimeError:
+            interval = self.DEFAULT_INTERVAL
+        return interval if interval > 0 else self.DEFAULT_INTERVAL
+
+    def _get_ml_service(self):
+        if self._ml_service is None:
+            from app.services.ml_service import MLService
+            self._ml_service = MLService()
+        return self._ml_service
+
+    @abstractmethod
+    def refresh(self) -> Mapping[str, Any]:
+        """Build a new snapshot and publish it to the shared cache."""
+
+    @staticmethod
+    def _stamp(snapshot: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+        """Add the version, build time and build duration to a new snapshot."""
+        # Version and age both come from time.time(); a naive utcnow() timestamp is read
+        # as local time and skews the age by the host's UTC offset
+        built_at = time.time()
+        snapshot.update({
+            'version': int(built_at * 1000),
+            'built_at': datetime.utcfromtimestamp(built_at).isoformat(),
+            'build_seconds': built_at - start_time,
+        })
+        return snapshot
+
+    # Scheduling
+
+    def start_scheduler(self, app) -> bool:
+        """Start the background rebuild thread for this process (idempotent)."""
+        interval = app.config.get(self.INTERVAL_CONFIG, self.DEFAULT_INTERVAL)
+        if interval <= 0:
+            return False
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(app, interval), name=f'{self.NAME}-snapshot', daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def stop_scheduler(self):
+        """Stop the background rebuild thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self, app, interval: int):
+        # Wake often enough to notice a snapshot built by another worker
+        poll_seconds = min(interval, self.POLL_SECONDS)
+        while not self._stop.is_set():
+            try:
+                with app.app_context():
+                    self.refresh_if_due()
+            except Exception as e:
+                self._last_error = str(e)
+                logger.error(f"{self.NAME.capitalize()} snapshot rebuild failed: {str(e)}")
+            self._stop.wait(poll_seconds)
+
+    def refresh_if_due(self) -> Optional[Mapping[str, Any]]:
+        """Rebuild when the shared snapshot is missing or older than the interval."""
+        interval = self._get_interval()
+        snapshot = cache.get(self.CACHE_KEY)
+        if snapshot is not None and self._age_seconds(snapshot) < interval:
+            return None
+
+        # Only one worker rebuilds; the lock expires if that worker dies mid-build
+        token = f"{os.getpid()}:{uuid.uuid4().hex}"
+        if not cache.add(self.BUILD_LOCK_KEY, token, timeout=interval):
+            return None
+        try:
+            snapshot = self.refresh()
+            self._last_error = None
+            return snapshot
+        finally:
+            # A slow build may have outlived the lock; leave a newer builder's lock alone
+            if cache.get(self.BUILD_LOCK_KEY) == token:
+                cache.delete(self.BUILD_LOCK_KEY)
+
+    def refresh_cold(self) -> Optional[Mapping[str, Any]]:
+        """
+        Build a missing snapshot for a request, through the build lock.
+
+        When another worker holds the lock, waits up to ``COLD_WAIT_SECONDS``
+        for its snapshot instead of building a second one; returns None if
+        none appears by then.
+        """
+        snapshot = self.refresh_if_due()
+        deadline = time.time() + self.COLD_WAIT_SECONDS
+        while snapshot is None:
+            snapshot = cache.get(self.CACHE_KEY)
+            if snapshot is not None or time.time() >= deadline:
+                break
+            time.sleep(self.COLD_POLL_SECONDS)
+        return snapshot
+
+    @staticmethod
+    def _age_seconds(snapshot: Mapping[str, Any]) -> float:
+        return max(0.0, time.time() - snapshot['version'] / 1000)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Snapshot version, build duration and staleness for the admin stats."""
+        interval = self._get_interval()
+        snapshot = cache.get(self.CACHE_KEY)
+        status = {
+            'available': snapshot is not None,
+            'interval_seconds': interval,
+            'scheduler_running': self._thread is not None and self._thread.is_alive(),
+            'last_error': self._last_error
+        }
+        if snapshot is not None:
+            age = self._age_seconds(snapshot)
+            status.update({
+                'version': snapshot['version'],
+                'built_at': snapshot['built_at'],
+                'build_seconds': round(snapshot['build_seconds'], 3),
+                'age_seconds': round(age, 1),
+                'stale': age > interval * self.STALE_INTERVALS
+            })
+        return status
@@ -0,0 +1,341 @@
+"""
+Low-overhead request tracing for NextProperty AI platform.
+
+Requests are traced through a context-local ``Trace``. Instrumented stages
+(rate limiting, security analysis, database, cache, external APIs and model
+prediction) open spans that add their duration to the trace; at the end of the
+request the per-stage totals are folded into in-memory log-linear
+("HDR-style") histograms, exported by the ``/metrics`` endpoint.
+
+Only a sampled fraction of requests (``TRACING_SAMPLE_RATE``) time their
+spans. For the others, and outside requests, a span is a shared no-op
+context manager, so tracing costs a context variable lookup per span. Total
+request durations are recorded for every request.
+"""
+
+import contextvars
+import logging
+import random
+import threading
+import time
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+from flask import Flask
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram in microseconds.
+
+    Values below ``2**SUB_BUCKET_BITS`` microseconds get exact buckets; above
+    that each power of two is split into ``2**(SUB_BUCKET_BITS - 1)`` linear
+    sub-buckets, bounding the relative error of reported percentiles to about
+    3%. Recording is O(1) and memory is fixed (under 500 counters).
+    """
+
+    SUB_BUCKET_BITS = 5
+    SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+    SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+    # Values up to ~2**36 us (19 hours); larger values land in the last bucket
+    MAX_SHIFT = 32
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * ((self.MAX_SHIFT + 2) * self.SUB_BUCKET_HALF)
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.SUB_BUCKET_COUNT:
+            return value
+        shift = min(value.bit_length() - self.SUB_BUCKET_BITS, self.MAX_SHIFT)
+        return min(shift * self.SUB_BUCKET_HALF + (value >> shift), len(self._counts) - 1)
+
+    def _bucket_range(self, index: int):
+        if index < self.SUB_BUCKET_COUNT:
+            return index, index
+        shift = index // self.SUB_BUCKET_HALF - 1
+        lower = (index - shift * self.SUB_BUCKET_HALF) << shift
+        return lower, lower + (1 << shift) - 1
+
+    def record(self, seconds: float):
+        """Record a duration in seconds."""
+        value = max(0, int(seconds * 1_000_000))
+        index = self._index(value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total_us += value
+            if value > self.max_us:
+                self.max_us = value
+            if self.min_us is None or value < self.min_us:
+                self.min_us = value
+
+    def percentile(self, percent: float) -> float:
+        """Value in seconds at or below which ``percent`` of recordings fall."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = max(1, int(round(self.count * percent / 100.0)))
+            seen = 0
+            for index, bucket_count in enumerate(self._counts):
+                if not bucket_count:
+                    continue
+                seen += bucket_count
+                if seen >= target:
+                    lower, upper = self._bucket_range(index)
+                    midpoint = (lower + upper) / 2.0
+                    return min(max(midpoint, self.min_us), self.max_us) / 1_000_000
+        return self.max_us / 1_000_000
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, sum, extremes and standard percentiles, in seconds."""
+        return {
+            'count': self.count,
+            'sum': self.total_us / 1_000_000,
+            'min': (self.min_us or 0) / 1_000_000,
+            'max': self.max_us / 1_000_000,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9)
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * len(self._counts)
+            self.count = 0
+            self.total_us = 0
+            self.min_us = None
+            self.max_us = 0
+
+
+class Trace:
+    """Per-request accumulator of stage durations."""
+
+    __slots__ = ('sampled', 'start', 'stages')
+
+    def __init__(self, sampled: bool):
+        self.sampled = sampled
+        self.start = time.perf_counter()
+        # stage -> [total seconds, span count]
+        self.stages: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, seconds: float):
+        totals = self.stages.get(stage)
+        if totals is None:
+            self.stages[stage] = [seconds, 1]
+        else:
+            totals[0] += seconds
+            totals[1] += 1
+
+    def breakdown(self) -> Dict[str, float]:
+        """Milliseconds spent per stage so far."""
+        return {stage: round(totals[0] * 1000, 3) for stage, totals in self.stages.items()}
+
+
+class _NullSpan:
+    """Shared no-op span for unsampled requests."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'trace', 'stage', 'start')
+
+    def __init__(self, tracer: 'Tracer', trace: Trace, stage: str):
+        self.tracer = tracer
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.tracer._finish_span(self.trace, self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Tracer:
+    """Sampled span tracing with per-stage latency histograms."""
+
+    DEFAULT_SAMPLE_RATE = 0.05
+    CACHE_METHODS = ('get', 'set', 'add', 'delete', 'get_many', 'set_many', 'delete_many', 'has')
+
+    def __init__(self, sample_rate: float = DEFAULT_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._current: contextvars.ContextVar = contextvars.ContextVar('nextproperty_trace', default=None)
+        self._lock = threading.Lock()
+        self.request_histogram = LatencyHistogram()
+        self.stage_histograms: Dict[str, LatencyHistogram] = {}
+        self.span_histograms: Dict[str, LatencyHistogram] = {}
+        self.sampled_requests = 0
+
+    def init_app(self, app: Flask):
+        """
+        Register the request hooks.
+
+        Call before other extensions register their ``before_request`` hooks
+        so rate limiting and security analysis run inside the trace.
+        """
+        self.sample_rate = app.config.get('TRACING_SAMPLE_RATE', self.sample_rate)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    # Traces
+
+    def start_trace(self) -> Trace:
+        """Start a trace in the current context, sampled with ``sample_rate``."""
+        trace = Trace(self.sample_rate > 0 and random.random() < self.sample_rate)
+        self._current.set(trace)
+        return trace
+
+    def current_trace(self) -> Optional[Trace]:
+        return self._current.get()
+
+    def finish_trace(self) -> Optional[Trace]:
+        """Record the current trace into the histograms and clear it."""
+        trace = self._current.get()
+        if trace is None:
+            return None
+        self._current.set(None)
+
+        self.request_histogram.record(time.perf_counter() - trace.start)
+        if trace.sampled:
+            self.sampled_requests += 1
+            for stage, (seconds, _) in trace.stages.items():
+                self._histogram(self.stage_histograms, stage).record(seconds)
+        return trace
+
+    def _before_request(self):
+        self.start_trace()
+
+    def _after_request(self, response):
+        self.finish_trace()
+        return response
+
+    def _teardown_request(self, error=None):
+        # Requests that ended in an unhandled exception skip after_request
+        if self._current.get() is not None:
+            self.finish_trace()
+
+    # Spans
+
+    def span(self, stage: str):
+        """Context manager timing ``stage`` within a sampled trace."""
+        trace = self._current.get()
+        if trace is None or not trace.sampled:
+            return _NULL_SPAN
+        return _Span(self, trace, stage)
+
+    def traced(self, stage: str):
+        """Decorator timing every call of the wrapped function as ``stage``."""
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return f(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, stage: str, seconds: float):
+        """Add an externally timed span (e.g. from SQLAlchemy events)."""
+        trace = self._current.get()
+        if trace is not None and trace.sampled:
+            self._finish_span(trace, stage, seconds)
+
+    def is_sampled(self) -> bool:
+        trace = self._current.get()
+        return trace is not None and trace.sampled
+
+    def _finish_span(self, trace: Trace, stage: str, seconds: float):
+        trace.add(stage, seconds)
+        self._histogram(self.span_histograms, stage).record(seconds)
+
+    def _histogram(self, histograms: Dict[str, LatencyHistogram], stage: str) -> LatencyHistogram:
+        histogram = histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = histograms.setdefault(stage, LatencyHistogram())
+        return histogram
+
+    # Instrumentation
+
+    def instrument_cache(self, app: Flask, cache):
+        """Time the Flask-Caching backend operations of ``app`` as ``cache`` spans."""
+        backend = app.extensions.get('cache', {}).get(cache)
+        if backend is None or getattr(backend, '_nextproperty_traced', False):
+            return
+        for name in self.CACHE_METHODS:
+            method = getattr(backend, name, None)
+            if method is not None:
+                setattr(backend, name, self.traced('cache')(method))
+        backend._nextproperty_traced = True
+
+    # Export
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Histogram summaries for the JSON form of ``/metrics``."""
+        return {
+            'sample_rate': self.sample_rate,
+            'sampled_requests': self.sampled_requests,
+            'request': self.request_histogram.summary(),
+            'request_stages': {stage: h.summary() for stage, h in sorted(self.stage_histograms.items())},
+            'spans': {stage: h.summary() for stage, h in sorted(self.span_histograms.items())}
+        }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition of the histograms, as summaries."""
+        lines = []
+
+        def emit(name: str, help_text: str, histograms: Dict[str, LatencyHistogram]):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} summary')
+            for stage, histogram in sorted(histograms.items()):
+                labels = f'stage="{stage}",' if stage else ''
+                for quantile in (0.5, 0.9, 0.99, 0.999):
+                    lines.append(
+                        f'{name}{{{labels}quantile="{quantile}"}} {histogram.percentile(quantile * 100):.6f}'
+                    )
+                label_set = f'{{stage="{stage}"}}' if stage else ''
+                lines.append(f'{name}_sum{label_set} {histogram.total_us / 1_000_000:.6f}')
+                lines.append(f'{name}_count{label_set} {histogram.count}')
+
+        emit('nextproperty_request_duration_seconds', 'Total request duration (all requests).',
+             {'': self.request_histogram})
+        emit('nextproperty_request_stage_seconds', 'Time per request spent in each stage (sampled requests).',
+             self.stage_histograms)
+        emit('nextproperty_span_duration_seconds', 'Duration of individual spans (sampled requests).',
+             self.span_histograms)
+        lines.append('# HELP nextproperty_trace_sample_rate Fraction of requests traced with spans.')
+        lines.append('# TYPE nextproperty_trace_sample_rate gauge')
+        lines.append(f'nextproperty_trace_sample_rate {self.sample_rate}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Clear all histograms."""
+        with self._lock:
+            self.request_histogram = LatencyHistogram()
+            self.stage_histograms = {}
+            self.span_histograms = {}
+            self.sampled_requests = 0
+
+
+# Global tracer shared by the request hooks and instrumented services
+tracer = Tracer()
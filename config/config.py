@@ -44,7 +44,15 @@ class Config:
     # ML Model Configuration
     MODEL_PATH = os.environ.get('MODEL_PATH', 'models/trained_models/')
     MODEL_VERSION = os.environ.get('MODEL_VERSION', '1.0')
+    # Price prediction cache: local LRU entries, TTL, and sharing through the Flask cache
+    PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
     PREDICTION_CACHE_TTL = int(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+    PREDICTION_CACHE_SHARED = os.environ.get('PREDICTION_CACHE_SHARED', 'true').lower() == 'true'
+    # Serve the compiled artifact of a model when current (built with `flask etl compile-model`)
+    USE_COMPILED_MODELS = os.environ.get('USE_COMPILED_MODELS', 'true').lower() == 'true'
+    # AI valuation backfill (`flask etl backfill-valuations`): rows per batch, seconds between batches
+    VALUATION_BACKFILL_BATCH_SIZE = int(os.environ.get('VALUATION_BACKFILL_BATCH_SIZE', 500))
+    VALUATION_BACKFILL_PAUSE = float(os.environ.get('VALUATION_BACKFILL_PAUSE', 0.0))
     
     # Security
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or SECRET_KEY
@@ -64,7 +72,53 @@ class Config:
     CACHE_REDIS_DB = int(os.environ.get('CACHE_REDIS_DB', 0))
     CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 300))
     
+    # Homepage snapshot rebuild interval in seconds (0 disables the background rebuild)
+    HOMEPAGE_SNAPSHOT_INTERVAL = int(os.environ.get('HOMEPAGE_SNAPSHOT_INTERVAL', 300))
+    
+    # Seconds an approximate listing count (cursor pagination totals) is reused
+    APPROXIMATE_COUNT_TIMEOUT = int(os.environ.get('APPROXIMATE_COUNT_TIMEOUT', 300))
+    
+    # Request tracing: fraction of requests whose stages are timed, and the slow request log threshold
+    TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', 0.05))
+    SLOW_REQUEST_THRESHOLD = float(os.environ.get('SLOW_REQUEST_THRESHOLD', 2.0))
+    
+    # Asynchronous logging pipeline: queue capacity (records beyond it are dropped and counted),
+    # records written per batch, how long security/error records wait for room before being
+    # written on the calling thread, and the fraction of access log records kept per status class
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', 256))
+    LOG_PRIORITY_TIMEOUT = float(os.environ.get('LOG_PRIORITY_TIMEOUT', 0.5))
+    ACCESS_LOG_SAMPLE_RATES = {
+        'start': float(os.environ.get('ACCESS_LOG_SAMPLE_RATE_START', 0.1)),
+        '2xx': float(os.environ.get('ACCESS_LOG_SAMPLE_RATE_2XX', 0.1)),
+        '3xx': float(os.environ.get('ACCESS_LOG_SAMPLE_RATE_3XX', 0.1)),
+        '4xx': 1.0,
+        '5xx': 1.0
+    }
+    
+    # Economic snapshot rebuild interval in seconds (0 disables the background rebuild)
+    ECONOMIC_SNAPSHOT_INTERVAL = int(os.environ.get('ECONOMIC_SNAPSHOT_INTERVAL', 3600))
+    
+    # Start the snapshot rebuild threads; set by serving entry points (wsgi.py, python app.py),
+    # not by CLI commands, migrations or scripts that call create_app
+    START_SCHEDULERS = os.environ.get('START_SCHEDULERS', 'false').lower() == 'true'
+    
+    # Economic data refresh: concurrent requests per API host, and retries for failed requests
+    ECONOMIC_FETCH_CONCURRENCY = int(os.environ.get('ECONOMIC_FETCH_CONCURRENCY', 4))
+    ECONOMIC_FETCH_RETRIES = int(os.environ.get('ECONOMIC_FETCH_RETRIES', 3))
+    
+    # Directory of the memory-mapped economic time series (built with `flask etl build-economic-series`)
+    ECONOMIC_TIMESERIES_PATH = os.environ.get('ECONOMIC_TIMESERIES_PATH', 'data/timeseries')
+    
+    # Seconds a process trusts its in-memory market cube before checking for ETL updates
+    MARKET_CUBE_RECHECK_SECONDS = int(os.environ.get('MARKET_CUBE_RECHECK_SECONDS', 60))
+    
+    # Comparables index: days of sales kept, and seconds between checks for changed partitions
+    COMPARABLES_WINDOW_DAYS = int(os.environ.get('COMPARABLES_WINDOW_DAYS', 730))
+    COMPARABLES_RECHECK_SECONDS = int(os.environ.get('COMPARABLES_RECHECK_SECONDS', 300))
+    
     # Redis Configuration for Rate Limiting
+    REDIS_ENABLED = os.environ.get('REDIS_ENABLED', 'true').lower() == 'true'
     REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
     REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
     REDIS_DB = int(os.environ.get('REDIS_DB', 1))  # Use different DB for rate limiting
@@ -75,6 +129,14 @@ class Config:
     RATELIMIT_STRATEGY = "fixed-window"
     RATELIMIT_HEADERS_ENABLED = True
     
+    # Security analyzer verdict cache (shared through Redis when available)
+    SECURITY_VERDICT_CACHE_SIZE = int(os.environ.get('SECURITY_VERDICT_CACHE_SIZE', 4096))
+    SECURITY_VERDICT_CACHE_TTL = int(os.environ.get('SECURITY_VERDICT_CACHE_TTL', 600))
+    SECURITY_VERDICT_CACHE_SHARED = os.environ.get('SECURITY_VERDICT_CACHE_SHARED', 'true').lower() == 'true'
+    
+    # Offline IP geolocation database (built with `flask geographic-limiting build-geo-db`)
+    GEOIP_DATABASE_PATH = os.environ.get('GEOIP_DATABASE_PATH', 'data/geoip/canada-ip.npgeo')
+    
     # Import rate limiting configuration
     from app.security.rate_limit_config import (
         RATE_LIMIT_DEFAULTS, RATE_LIMIT_SENSITIVE, RATE_LIMIT_BURST,
@@ -100,6 +162,7 @@ class Config:
     
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_DIR = os.environ.get('LOG_DIR', 'logs')
     LOG_FILE = os.environ.get('LOG_FILE', 'logs/app.log')
     LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))  # 10MB
     LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
@@ -133,7 +196,11 @@ class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # Pool sizing and MySQL connect_args do not apply to SQLite
     WTF_CSRF_ENABLED = False
+    REDIS_ENABLED = False
+    HOMEPAGE_SNAPSHOT_INTERVAL = 0
+    ECONOMIC_SNAPSHOT_INTERVAL = 0
 
 
 # Configuration dictionary
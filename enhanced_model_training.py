@@ -6,6 +6,8 @@ Implements comprehensive model training with hyperparameter optimization and ens
 
 import os
 import sys
+import shutil
+import tempfile
 import datetime
 import pandas as pd
 import numpy as np
@@ -15,7 +17,9 @@ import warnings
 warnings.filterwarnings('ignore')
 
 # ML libraries
-from sklearn.model_selection import train_test_split, KFold, RandomizedSearchCV
+from joblib import Memory, Parallel, delayed, parallel_backend
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (enables HalvingRandomSearchCV)
+from sklearn.model_selection import train_test_split, KFold, RandomizedSearchCV, HalvingRandomSearchCV
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from sklearn.pipeline import Pipeline
@@ -52,6 +56,12 @@ except ImportError:
     print("⚠ Bayesian optimization not available, using RandomizedSearchCV")
     USE_BAYES = False
 
+# Parallel training: worker processes (-1 uses every core), hyperparameter search
+# strategy ('halving', 'random' or 'bayes') and where fitted preprocessing is cached
+N_JOBS = int(os.environ.get('TRAINING_N_JOBS', -1))
+SEARCH_STRATEGY = os.environ.get('TRAINING_SEARCH', 'halving')
+PREPROCESSING_CACHE_DIR = os.environ.get('TRAINING_CACHE_DIR')
+
 # Add the app directory to Python path
 sys.path.append('/Users/efeobukohwo/Desktop/Nextproperty Real Estate')
 
@@ -206,9 +216,13 @@ def create_enhanced_training_data(n_samples=5000):
     
     return df, feature_columns
 
-def get_param_distributions():
-    """Get parameter distributions for hyperparameter optimization."""
-    if USE_BAYES:
+def get_param_distributions(bayes=None):
+    """Get parameter distributions for hyperparameter optimization.
+    
+    Bayesian search spaces are returned when ``bayes`` is true (default: when
+    scikit-optimize is available), scipy distributions otherwise.
+    """
+    if USE_BAYES if bayes is None else bayes:
         # Bayesian optimization spaces
         return {
             'Ridge': {
@@ -283,44 +297,85 @@ def get_param_distributions():
             }
         }
 
-def train_model_enhanced(name, config, X_train, y_train, X_test, y_test):
-    """Enhanced model training with comprehensive error handling and metrics."""
+def resolve_search_strategy(strategy=None):
+    """Search strategy to use; Bayesian search falls back to halving without scikit-optimize."""
+    strategy = strategy or SEARCH_STRATEGY
+    if strategy not in ('halving', 'random', 'bayes'):
+        raise ValueError(f"Unknown search strategy: {strategy}")
+    if strategy == 'bayes' and not USE_BAYES:
+        print("⚠ Bayesian optimization not available, using successive halving")
+        return 'halving'
+    return strategy
+
+def build_search(config, strategy, n_jobs=1):
+    """Create the hyperparameter search for a model configuration."""
+    common = {
+        'cv': config.get('cv', 5),
+        'scoring': 'neg_mean_absolute_error',
+        'n_jobs': n_jobs,
+        'random_state': 42,
+        'verbose': 0
+    }
+    
+    if strategy == 'bayes':
+        return BayesSearchCV(config['pipeline'], config['params'], n_iter=config.get('n_iter', 15), **common)
+    if strategy == 'halving':
+        # Successive halving: many candidates on small samples, survivors on more data
+        return HalvingRandomSearchCV(
+            config['pipeline'],
+            config['params'],
+            n_candidates=config.get('n_candidates', config.get('n_iter', 15) * 3),
+            factor=3,
+            resource='n_samples',
+            min_resources='exhaust',
+            **common
+        )
+    return RandomizedSearchCV(config['pipeline'], config['params'], n_iter=config.get('n_iter', 15), **common)
+
+def export_compiled_model(model, model_path, X_check):
+    """Compile a saved model to the lean serving format, checked on ``X_check``.
+    
+    Returns the artifact info, or None when the model has no compiled form.
+    """
+    try:
+        from app.services.model_compiler import model_compiler
+        compiled = model_compiler.export(model_path, estimator=model, X=X_check)
+        print(f"✅ Compiled model saved: {compiled.info['path']} "
+              f"(max relative difference {compiled.info['parity']['max_rel_diff']:.1e})")
+        return compiled.info
+    except Exception as e:
+        print(f"⚠ {os.path.basename(model_path)} served uncompiled: {e}")
+        return None
+
+def train_model_enhanced(name, config, X_train, y_train, X_test, y_test, n_jobs=1, strategy=None):
+    """Enhanced model training with comprehensive error handling and metrics.
+    
+    Candidate/fold fits run in ``n_jobs`` worker processes.
+    """
     start_time = datetime.datetime.now()
     
     try:
+        strategy = resolve_search_strategy(strategy)
         print(f"\n[{name}] 🔄 Training {name}...")
         print(f"⏰ Started: {start_time.strftime('%H:%M:%S')}")
-        print(f"🔍 Hyperparameter search: {config.get('n_iter', 'Default')} iterations")
+        print(f"🔍 Hyperparameter search: {strategy}, {config.get('n_iter', 'Default')} iterations, {n_jobs} jobs")
         
-        # Choose search strategy
-        if USE_BAYES:
-            search = BayesSearchCV(
-                config['pipeline'],
-                config['params'],
-                n_iter=config.get('n_iter', 15),
-                cv=config.get('cv', 5),
-                scoring='neg_mean_absolute_error',
-                n_jobs=1,
-                random_state=42,
-                verbose=0
-            )
-        else:
-            search = RandomizedSearchCV(
-                config['pipeline'],
-                config['params'],
-                n_iter=config.get('n_iter', 15),
-                cv=config.get('cv', 5),
-                scoring='neg_mean_absolute_error',
-                n_jobs=1,
-                random_state=42,
-                verbose=0
-            )
+        search = build_search(config, strategy, n_jobs=n_jobs)
         
-        # Fit the model
-        search.fit(X_train, y_train)
+        # Fit the model; processes are requested explicitly because nested
+        # joblib calls inside a model worker would otherwise fall back to threads
+        search_start = datetime.datetime.now()
+        if n_jobs != 1:
+            with parallel_backend('loky', n_jobs=n_jobs):
+                search.fit(X_train, y_train)
+        else:
+            search.fit(X_train, y_train)
+        search_time = (datetime.datetime.now() - search_start).total_seconds()
         
-        # Get best model and make predictions
+        # Get best model and make predictions (the saved pipeline must not point at the fold cache)
         best_model = search.best_estimator_
+        if isinstance(best_model, Pipeline):
+            best_model.set_params(memory=None)
         y_pred_train = best_model.predict(X_train)
         y_pred_test = best_model.predict(X_test)
         
@@ -354,7 +409,11 @@ def train_model_enhanced(name, config, X_train, y_train, X_test, y_test):
             'y_pred_test': y_pred_test,
             'y_pred_train': y_pred_train,
             'overfitting': overfitting,
-            'cv_score': search.best_score_ if hasattr(search, 'best_score_') else None
+            'cv_score': search.best_score_ if hasattr(search, 'best_score_') else None,
+            'search_strategy': strategy,
+            'search_time': search_time,
+            'n_candidates': len(search.cv_results_['params']),
+            'n_jobs': n_jobs
         }
         
         # Performance assessment
@@ -367,7 +426,7 @@ def train_model_enhanced(name, config, X_train, y_train, X_test, y_test):
         print(f"✅ {name} completed successfully!")
         print(f"   📊 Test R²: {test_r2:.4f} | RMSE: ${test_rmse:,.0f} | MAE: ${test_mae:,.0f}")
         print(f"   📈 MAPE: {mape:.2f}% | Overfitting: {overfitting:.4f} {performance_grade}")
-        print(f"   ⏱ Training time: {duration:.1f}s")
+        print(f"   ⏱ Training time: {duration:.1f}s ({results['n_candidates']} candidates searched in {search_time:.1f}s)")
         
         return results
         
@@ -375,8 +434,16 @@ def train_model_enhanced(name, config, X_train, y_train, X_test, y_test):
         print(f"❌ Error training {name}: {str(e)}")
         return None
 
-def enhanced_model_training():
-    """Main enhanced model training pipeline."""
+def enhanced_model_training(n_jobs=None, strategy=None):
+    """Main enhanced model training pipeline.
+    
+    Models are trained concurrently in worker processes, each running its
+    search folds in its share of ``n_jobs`` (default ``TRAINING_N_JOBS``,
+    every core). Fitted scaler/PCA steps are cached per fold in a
+    ``joblib.Memory`` store so search candidates reuse them.
+    """
+    n_jobs = joblib.effective_n_jobs(N_JOBS if n_jobs is None else n_jobs)
+    strategy = resolve_search_strategy(strategy)
     
     print("\n" + "="*80)
     print("🚀 ENHANCED ML MODEL TRAINING PIPELINE - NextProperty AI")
@@ -416,7 +483,12 @@ def enhanced_model_training():
     print(f"   📊 Using {n_pca} PCA components for {cum_var[n_pca-1]:.1%} explained variance")
     
     # Get parameter distributions
-    param_dists = get_param_distributions()
+    param_dists = get_param_distributions(bayes=strategy == 'bayes')
+    
+    # Fitted preprocessing cached per fold (keyed by step parameters and fold data)
+    cache_dir = PREPROCESSING_CACHE_DIR or tempfile.mkdtemp(prefix='nextproperty-preprocessing-')
+    memory = Memory(cache_dir, verbose=0)
+    print(f"   💾 Preprocessing cache: {cache_dir}")
     
     # Model configurations
     model_configs = {
@@ -425,7 +497,7 @@ def enhanced_model_training():
                 ('scaler', StandardScaler()),
                 ('pca', PCA(n_components=n_pca)),
                 ('model', Ridge(random_state=42))
-            ]),
+            ], memory=memory),
             'params': param_dists['Ridge'],
             'n_iter': 25,
             'cv': kf
@@ -435,7 +507,7 @@ def enhanced_model_training():
                 ('scaler', StandardScaler()),
                 ('pca', PCA(n_components=n_pca)),
                 ('model', ElasticNet(random_state=42, max_iter=2000))
-            ]),
+            ], memory=memory),
             'params': param_dists['ElasticNet'],
             'n_iter': 25,
             'cv': kf
@@ -445,7 +517,7 @@ def enhanced_model_training():
                 ('scaler', StandardScaler()),
                 ('pca', PCA(n_components=n_pca)),
                 ('model', RandomForestRegressor(random_state=42, n_jobs=1))
-            ]),
+            ], memory=memory),
             'params': param_dists['RandomForest'],
             'n_iter': 20,
             'cv': kf
@@ -455,7 +527,7 @@ def enhanced_model_training():
                 ('scaler', StandardScaler()),
                 ('pca', PCA(n_components=n_pca)),
                 ('model', GradientBoostingRegressor(random_state=42))
-            ]),
+            ], memory=memory),
             'params': param_dists['GradientBoosting'],
             'n_iter': 20,
             'cv': kf
@@ -469,7 +541,7 @@ def enhanced_model_training():
                 ('scaler', StandardScaler()),
                 ('pca', PCA(n_components=n_pca)),
                 ('model', xgb.XGBRegressor(random_state=42, n_jobs=1, verbosity=0))
-            ]),
+            ], memory=memory),
             'params': param_dists['XGBoost'],
             'n_iter': 15,
             'cv': kf
@@ -483,7 +555,7 @@ def enhanced_model_training():
                 ('scaler', StandardScaler()),
                 ('pca', PCA(n_components=n_pca)),
                 ('model', lgb.LGBMRegressor(random_state=42, n_jobs=1, verbosity=-1))
-            ]),
+            ], memory=memory),
             'params': param_dists['LightGBM'],
             'n_iter': 15,
             'cv': kf
@@ -491,7 +563,7 @@ def enhanced_model_training():
         print("✓ LightGBM added to training pipeline")
     
     print(f"\n🔧 Configured {len(model_configs)} models for training")
-    print(f"🔍 Using {'Bayesian' if USE_BAYES else 'Random'} hyperparameter optimization")
+    print(f"🔍 Using {strategy} hyperparameter search")
     
     # Train all models
     print(f"\n" + "="*80)
@@ -501,9 +573,19 @@ def enhanced_model_training():
     results_models = {}
     total_start_time = datetime.datetime.now()
     
-    for i, (name, config) in enumerate(model_configs.items(), 1):
-        result = train_model_enhanced(name, config, X_train, y_train, X_test, y_test)
-        
+    # Models run side by side; each search gets an equal share of the cores
+    model_workers = min(len(model_configs), n_jobs)
+    search_jobs = max(1, n_jobs // model_workers)
+    print(f"⚙️ {n_jobs} cores: {model_workers} models in parallel, {search_jobs} search jobs each")
+    
+    trained = Parallel(n_jobs=model_workers, backend='loky')(
+        delayed(train_model_enhanced)(
+            name, config, X_train, y_train, X_test, y_test, n_jobs=search_jobs, strategy=strategy
+        )
+        for name, config in model_configs.items()
+    )
+    
+    for name, result in zip(model_configs, trained):
         if result is not None:
             results_models[name] = result
         else:
@@ -512,6 +594,10 @@ def enhanced_model_training():
     total_end_time = datetime.datetime.now()
     total_duration = (total_end_time - total_start_time).total_seconds()
     
+    memory.clear(warn=False)
+    if not PREPROCESSING_CACHE_DIR:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    
     # Performance Analysis
     print("\n" + "="*80)
     print("📊 COMPREHENSIVE PERFORMANCE ANALYSIS")
@@ -573,7 +659,7 @@ def enhanced_model_training():
                     estimators=estimators,
                     final_estimator=Ridge(alpha=1.0),
                     cv=3,
-                    n_jobs=1
+                    n_jobs=n_jobs
                 )
                 
                 # Train ensemble
@@ -627,6 +713,7 @@ def enhanced_model_training():
         best_model_path = os.path.join(model_dir, 'property_price_model.pkl')
         joblib.dump(final_model, best_model_path)
         print(f"✅ Best model saved: {best_model_path}")
+        compiled_info = export_compiled_model(final_model, best_model_path, X_test)
         
         # Save feature columns
         feature_path = os.path.join(artifacts_dir, 'feature_columns.json')
@@ -662,16 +749,30 @@ def enhanced_model_training():
                 'test_samples': int(len(X_test)),
                 'features_count': int(len(feature_columns)),
                 'pca_components': int(n_pca),
-                'cv_folds': int(kf.n_splits)
+                'cv_folds': int(kf.n_splits),
+                'search_strategy': strategy,
+                'n_jobs': int(n_jobs),
+                'parallel_models': int(model_workers),
+                'model_training_seconds': convert_numpy_types(total_duration),
+                'sum_of_model_seconds': convert_numpy_types(sum(
+                    result['training_time'] for name, result in results_models.items() if name != 'Ensemble'
+                ))
             },
             'feature_columns': feature_columns,
+            'compiled_model': {
+                'path': compiled_info['path'],
+                'parity': compiled_info['parity']
+            } if compiled_info else None,
             'all_models_performance': {
                 name: {
                     'r2': convert_numpy_types(result['test_r2']),
                     'rmse': convert_numpy_types(result['test_rmse']),
                     'mae': convert_numpy_types(result['test_mae']),
                     'mape': convert_numpy_types(result['mape']),
-                    'training_time': convert_numpy_types(result['training_time'])
+                    'training_time': convert_numpy_types(result['training_time']),
+                    'search_time': convert_numpy_types(result.get('search_time')),
+                    'n_candidates': result.get('n_candidates'),
+                    'cv_score': convert_numpy_types(result.get('cv_score'))
                 } for name, result in results_models.items()
             }
         }
@@ -686,6 +787,7 @@ def enhanced_model_training():
             if name != final_best:
                 alt_model_path = os.path.join(model_dir, f'{name.lower()}_price_model.pkl')
                 joblib.dump(result['model'], alt_model_path)
+                export_compiled_model(result['model'], alt_model_path, X_test)
         
         print(f"✅ All models saved to: {model_dir}")
         
@@ -0,0 +1,77 @@
+"""Add city and property type lookup tables
+
+Revision ID: a7c41d9e2b63
+Revises: f5c3f3da5ac1
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c41d9e2b63'
+down_revision = 'f5c3f3da5ac1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cities',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('province', sa.String(length=50), nullable=False),
+        sa.Column('name_key', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name_key', 'province', name='uq_city_name_province')
+    )
+    op.create_index(op.f('ix_cities_name_key'), 'cities', ['name_key'], unique=False)
+
+    op.create_table('property_types',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('name_key', sa.String(length=50), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name_key')
+    )
+
+    op.create_table('location_aliases',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('alias_key', sa.String(length=100), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'alias_key', name='uq_location_alias')
+    )
+
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('city_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('property_type_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_properties_city_id', 'cities', ['city_id'], ['id'])
+        batch_op.create_foreign_key('fk_properties_property_type_id', 'property_types', ['property_type_id'], ['id'])
+        batch_op.create_index(batch_op.f('ix_properties_city_id'), ['city_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_properties_property_type_id'), ['property_type_id'], unique=False)
+        batch_op.create_index('idx_city_type_price_id', ['city_id', 'property_type_id', 'original_price'], unique=False)
+        batch_op.create_index('idx_property_search_id', ['city_id', 'property_type_id', 'sold_price'], unique=False)
+
+    # Populate with: flask etl build-location-index
+
+
+def downgrade():
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.drop_index('idx_property_search_id')
+        batch_op.drop_index('idx_city_type_price_id')
+        batch_op.drop_index(batch_op.f('ix_properties_property_type_id'))
+        batch_op.drop_index(batch_op.f('ix_properties_city_id'))
+        batch_op.drop_constraint('fk_properties_property_type_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_properties_city_id', type_='foreignkey')
+        batch_op.drop_column('property_type_id')
+        batch_op.drop_column('city_id')
+
+    op.drop_table('location_aliases')
+    op.drop_table('property_types')
+    op.drop_index(op.f('ix_cities_name_key'), table_name='cities')
+    op.drop_table('cities')
@@ -0,0 +1,26 @@
+"""Add sold_date/listing_id index for keyset pagination
+
+Revision ID: b3e8f21c4d70
+Revises: a7c41d9e2b63
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8f21c4d70'
+down_revision = 'a7c41d9e2b63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.create_index('idx_sold_date_listing', ['sold_date', 'listing_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.drop_index('idx_sold_date_listing')
@@ -0,0 +1,39 @@
+"""Add weekly market aggregate table
+
+Revision ID: c6d2a9f4e1b8
+Revises: b3e8f21c4d70
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6d2a9f4e1b8'
+down_revision = 'b3e8f21c4d70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('market_aggregates',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('city_id', sa.Integer(), nullable=False),
+        sa.Column('property_type_id', sa.Integer(), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('sales_count', sa.Integer(), nullable=False),
+        sa.Column('price_sum', sa.Float(precision=53), nullable=False),
+        sa.Column('price_sum_sq', sa.Float(precision=53), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('city_id', 'property_type_id', 'week_start', name='uq_market_aggregate_cell')
+    )
+    op.create_index('idx_market_aggregate_week', 'market_aggregates', ['week_start'], unique=False)
+
+    # Populate with: flask etl build-market-cube
+
+
+def downgrade():
+    op.drop_index('idx_market_aggregate_week', table_name='market_aggregates')
+    op.drop_table('market_aggregates')
@@ -0,0 +1,32 @@
+"""Add unique key on economic observations
+
+Revision ID: d81f4b2a6c93
+Revises: c6d2a9f4e1b8
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f4b2a6c93'
+down_revision = 'c6d2a9f4e1b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the newest row of each duplicated observation before adding the key
+    op.execute(sa.text(
+        "DELETE FROM economic_data WHERE id NOT IN ("
+        "SELECT id FROM (SELECT MAX(id) AS id FROM economic_data "
+        "GROUP BY indicator_code, date, source) AS latest)"
+    ))
+    with op.batch_alter_table('economic_data', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_economic_observation', ['indicator_code', 'date', 'source'])
+
+
+def downgrade():
+    with op.batch_alter_table('economic_data', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_economic_observation', type_='unique')
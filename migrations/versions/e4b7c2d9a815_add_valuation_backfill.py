@@ -0,0 +1,41 @@
+"""Add backfill checkpoints and the updated_at/listing_id index
+
+Revision ID: e4b7c2d9a815
+Revises: d81f4b2a6c93
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c2d9a815'
+down_revision = 'd81f4b2a6c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('backfill_checkpoints',
+        sa.Column('job', sa.String(length=50), nullable=False),
+        sa.Column('model_version', sa.String(length=64), nullable=True),
+        sa.Column('watermark_updated_at', sa.DateTime(), nullable=True),
+        sa.Column('watermark_key', sa.String(length=50), nullable=True),
+        sa.Column('rows_processed', sa.Integer(), nullable=False),
+        sa.Column('rows_written', sa.Integer(), nullable=False),
+        sa.Column('pass_started_at', sa.DateTime(), nullable=True),
+        sa.Column('pass_completed_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('job')
+    )
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.create_index('idx_updated_listing', ['updated_at', 'listing_id'], unique=False)
+
+    # Run with: flask etl backfill-valuations
+
+
+def downgrade():
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.drop_index('idx_updated_listing')
+    op.drop_table('backfill_checkpoints')
@@ -9,10 +9,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import create_app, db
 from app.models.property import Property
-from app.services.ml_service import MLService
+from app.services.valuation_backfill import valuation_backfill
 from sqlalchemy import func, text
 import logging
-import time
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -43,47 +42,20 @@ def optimize_database():
             logger.error(f"Database optimization failed: {e}")
 
 def precompute_ai_valuations():
-    """Pre-compute AI valuations for properties that don't have them."""
+    """Refresh AI valuations for properties changed since the last backfill run."""
     app = create_app()
-    ml_service = MLService()
     
     with app.app_context():
-        try:
-            # Get properties without AI valuations
-            properties_without_ai = Property.query.filter(
-                Property.ai_valuation.is_(None),
-                Property.sold_price.isnot(None),
-                Property.sqft.isnot(None)
-            ).limit(100).all()  # Process in batches
-            
-            logger.info(f"Processing {len(properties_without_ai)} properties for AI valuation...")
-            
-            for i, property_obj in enumerate(properties_without_ai):
-                try:
-                    # Get AI analysis
-                    analysis = ml_service.analyze_property(property_obj)
-                    if analysis and 'predicted_price' in analysis:
-                        property_obj.ai_valuation = analysis['predicted_price']
-                        if 'investment_score' in analysis:
-                            property_obj.investment_score = analysis['investment_score']
-                    
-                    # Commit every 10 properties
-                    if (i + 1) % 10 == 0:
-                        db.session.commit()
-                        logger.info(f"Processed {i + 1} properties...")
-                        time.sleep(0.1)  # Small delay to prevent overwhelming the system
-                
-                except Exception as e:
-                    logger.warning(f"Failed to process property {property_obj.listing_id}: {e}")
-                    continue
-            
-            # Final commit
-            db.session.commit()
-            logger.info("AI valuation pre-computation complete")
-            
-        except Exception as e:
-            logger.error(f"AI valuation pre-computation failed: {e}")
-            db.session.rollback()
+        result = valuation_backfill.run(
+            progress=lambda batch: logger.info(
+                f"Valued {batch['total_rows']} properties ({batch['rows_per_second']:.0f} rows/s)..."
+            )
+        )
+        if result['status'] in ('complete', 'partial'):
+            logger.info(f"AI valuation pre-computation complete: {result['written']} of "
+                        f"{result['rows']} properties updated")
+        else:
+            logger.error(f"AI valuation pre-computation failed: {result.get('error') or result.get('message')}")
 
 def update_computed_fields():
     """Update computed fields to improve performance."""
@@ -5,6 +5,7 @@ Security test configuration that doesn't conflict with main conftest.py
 import pytest
 import sys
 import os
+import tempfile
 from pathlib import Path
 from unittest.mock import Mock
 
@@ -12,6 +13,10 @@ from unittest.mock import Mock
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+# Log to a scratch directory instead of the tracked files under logs/. Set before
+# the app is imported, because app.error_handling opens its log files at import.
+os.environ['LOG_DIR'] = tempfile.mkdtemp(prefix='nextproperty-test-logs-')
+
 # Configure pytest for security tests only
 def pytest_configure(config):
     """Configure pytest for security tests."""
@@ -22,6 +27,47 @@ def pytest_configure(config):
     config.addinivalue_line("markers", "performance: mark test as a performance test")
     config.addinivalue_line("markers", "attack_simulation: mark test as an attack simulation")
 
+@pytest.fixture
+def app_factory():
+    """
+    Build applications with ``create_app('testing')`` and an empty schema.
+    
+    Call the returned function with configuration overrides, for example
+    ``app_factory(MODEL_PATH=str(tmp_path))``. The app context stays pushed
+    for the rest of the test; tables are dropped and the cache cleared after.
+    """
+    from app import create_app, db
+    from app.extensions import cache
+    from app.models import agent, economic_data, property  # Register tables for create_all
+    
+    contexts = []
+    
+    def make(**overrides):
+        app = create_app('testing', overrides)
+        context = app.app_context()
+        context.push()
+        contexts.append(context)
+        db.create_all()
+        return app
+    
+    yield make
+    
+    for context in reversed(contexts):
+        db.session.remove()
+        db.drop_all()
+        cache.clear()
+        context.pop()
+
+@pytest.fixture
+def far_from_utc(monkeypatch):
+    """Run in UTC+14 so timestamps mistaken for local time are 14 hours off."""
+    import time
+    monkeypatch.setenv('TZ', 'Pacific/Kiritimati')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
 # Mock fixtures for testing without full app
 @pytest.fixture
 def mock_app():
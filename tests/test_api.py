@@ -449,3 +449,24 @@ class TestErrorHandling:
         # For now, just test that the endpoint exists
         response = client.get('/api/properties')
         assert response.status_code in [200, 429]  # Success or rate limited
+
+
+class TestApplicationFactory:
+    """Test cases for building the full application."""
+    
+    def test_create_app_testing(self, app_factory):
+        """The testing app builds twice with the Flask-Caching instance and every blueprint."""
+        import app as app_package
+        from app.extensions import cache
+        
+        app_factory()
+        app = app_factory()  # Building again must not find ``app.cache`` rebound
+        
+        assert app.testing
+        assert app_package.flask_cache is cache
+        assert cache in app.extensions['cache']
+        assert {'main', 'api', 'dashboard', 'admin'} <= set(app.blueprints)
+        
+        # Routes that use the cache through ``app.extensions`` run end to end
+        response = app.test_client().get('/health')
+        assert response.status_code in (200, 503)
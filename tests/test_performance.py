@@ -524,3 +524,1489 @@ class TestStressTests:
         # Should handle multiple complex searches efficiently
         assert successful_searches >= 45  # At least 90% success rate
         assert total_time < 15.0  # Should complete within 15 seconds
+
+
+class TestFullTextSearchPerformance:
+    """Compare the full-text search index with the LIKE fallback."""
+    
+    WORDS = ['granite', 'hardwood', 'pool', 'renovated', 'basement', 'garage', 'fireplace',
+             'sunny', 'spacious', 'condo', 'quiet', 'park', 'school', 'transit', 'modern',
+             'kitchen', 'ensuite', 'balcony', 'view', 'lake']
+    
+    @pytest.fixture
+    def search_app(self, app_factory):
+        """Testing application with detected search backends reset."""
+        from app import db
+        from app.services.search_service import search_service
+        
+        app = app_factory()
+        search_service.clear_cache()
+        yield app, db
+        # Every in-memory database shares the same URL
+        search_service.clear_cache()
+    
+    def insert_properties(self, db, count):
+        import random
+        rng = random.Random(42)
+        rows = [
+            {
+                'listing_id': f'FT{i}',
+                'address': f'{i} {rng.choice(self.WORDS).title()} Street',
+                'city': rng.choice(['Toronto', 'Ottawa', 'Calgary', 'Montréal']),
+                'features': ' '.join(rng.choices(self.WORDS, k=8)),
+                'remarks': ' '.join(rng.choices(self.WORDS, k=30)) + (' skylight' if i % 1000 == 0 else '')
+            }
+            for i in range(count)
+        ]
+        db.session.execute(Property.__table__.insert(), rows)
+        db.session.commit()
+    
+    def test_search_index_ranking_prefix_and_sync(self, search_app):
+        """Indexed search ranks, matches prefixes and follows writes and upserts."""
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        from app.services.search_service import search_service
+        _, db = search_app
+        
+        db.session.add_all([
+            Property(listing_id='A', address='12 Granite Way', city='Toronto', postal_code='M5V 3L9'),
+            Property(listing_id='B', address='5 Main St', city='Montréal', remarks='granite counters'),
+            Property(listing_id='C', address='9 Oak Ave', city='Vancouver', features='pool, gym'),
+        ])
+        db.session.commit()
+        assert search_service.build_index()['backend'] == 'sqlite'
+        
+        assert [p.listing_id for p in Property.search_properties('granite')] == ['A', 'B']
+        assert [p.listing_id for p in Property.search_properties('gran')] == ['A', 'B']
+        assert [p.listing_id for p in Property.search_properties('granite counters')] == ['B']
+        location = search_service.filter_query(Property.query, 'montreal', fields='location')
+        assert [p.listing_id for p in location] == ['B']
+        
+        # ORM update, ETL-style upsert and delete keep the index in sync
+        db.session.get(Property, 'C').remarks = 'granite island'
+        db.session.delete(db.session.get(Property, 'B'))
+        db.session.commit()
+        upsert = sqlite_insert(Property.__table__).values(listing_id='A', address='12 Elm Way')
+        upsert = upsert.on_conflict_do_update(index_elements=['listing_id'],
+                                              set_={'address': upsert.excluded.address})
+        with db.engine.begin() as conn:
+            conn.execute(upsert)
+        
+        assert [p.listing_id for p in Property.search_properties('granite')] == ['C']
+    
+    def test_api_city_filter_matches_city_only(self, search_app):
+        """The /api/search city filter matches cities, not provinces or postal codes."""
+        from flask import current_app
+        from app.services.search_service import search_service
+        _, db = search_app
+        
+        db.session.add_all([
+            Property(listing_id='A', city='Toronto', province='ON', postal_code='M5V 3L9'),
+            Property(listing_id='B', city='East Toronto', province='ON'),
+            Property(listing_id='C', city='Montréal', province='QC'),
+        ])
+        db.session.commit()
+        search_service.build_index()
+        client = current_app.test_client()
+        
+        def ids(query):
+            return sorted(p['listing_id'] for p in client.get(f'/api/search?{query}').get_json()['data'])
+        
+        assert ids('city=toronto') == ['A', 'B']
+        assert ids('city=Montr') == ['C']
+        assert ids('city=QC') == []
+        assert ids('city=M5V') == []
+    
+    def test_search_index_vs_like_at_scale(self, search_app):
+        """Selective searches over 100k rows should beat the LIKE scan."""
+        from app.services.search_service import search_service
+        _, db = search_app
+        self.insert_properties(db, 100000)
+        
+        queries = ['skylight', 'skyl', 'nonexistent', 'granite pool']
+        
+        def time_queries():
+            timings = {}
+            for query_text in queries:
+                start_time = time.perf_counter()
+                for _ in range(3):
+                    Property.search_properties(query_text)
+                timings[query_text] = (time.perf_counter() - start_time) / 3
+            return timings
+        
+        like_timings = time_queries()
+        build = search_service.build_index()
+        index_timings = time_queries()
+        
+        print(f"\nFull-text search over 100k rows (index built in {build['elapsed_seconds']:.2f}s):")
+        for query_text in queries:
+            print(f"{query_text!r:>16}: LIKE {like_timings[query_text] * 1000:.2f}ms, "
+                  f"index {index_timings[query_text] * 1000:.2f}ms")
+        
+        # Terms present in most rows are ranked over every hit, so only the
+        # selective queries are expected to be faster than an unranked LIMIT scan
+        for query_text in ('skylight', 'skyl', 'nonexistent'):
+            assert index_timings[query_text] < like_timings[query_text]
+
+
+class TestProjectionPerformance:
+    """Compare column projections with hydrating full Property objects."""
+    
+    @pytest.fixture
+    def projection_app(self, app_factory):
+        """Listings carrying large TEXT columns."""
+        from datetime import date
+        from app import db
+        
+        app_factory()
+        remarks = 'Bright corner unit with updated kitchen and large windows. ' * 60
+        db.session.execute(Property.__table__.insert(), [
+            {
+                'listing_id': f'PJ{i}', 'address': f'{i} Queen St', 'city': 'Toronto',
+                'province': 'ON', 'property_type': 'Condo', 'sold_price': 500000 + i,
+                'latitude': 43.65, 'longitude': -79.38, 'bedrooms': 2, 'bathrooms': 1.5,
+                'sqft': 850, 'sold_date': date(2024, 1, 1 + i % 28),
+                'features': remarks, 'community_features': remarks, 'remarks': remarks
+            }
+            for i in range(20000)
+        ])
+        db.session.commit()
+        return db
+    
+    def test_projection_matches_to_dict(self, projection_app):
+        """The detail projection serializes exactly like Property.to_dict()."""
+        from app.models.projections import PROPERTY_CARD, PROPERTY_DETAIL
+        
+        query = Property.query.order_by(Property.listing_id).limit(50)
+        expected = [prop.to_dict() for prop in query.all()]
+        assert PROPERTY_DETAIL.serialize_all(PROPERTY_DETAIL.rows(query).all()) == expected
+        
+        cards = PROPERTY_CARD.serialize_all(PROPERTY_CARD.rows(query).all())
+        assert 'remarks' not in cards[0]
+        assert cards[0]['sold_price'] == expected[0]['sold_price']
+    
+    def test_card_projection_vs_full_objects(self, projection_app):
+        """Card rows should load faster and with less memory than full objects."""
+        import tracemalloc
+        from app.models.projections import PROPERTY_CARD
+        db = projection_app
+        query = Property.query.filter(Property.city == 'Toronto').order_by(Property.sold_price.desc())
+        
+        def measure(load):
+            db.session.expunge_all()
+            tracemalloc.start()
+            start_time = time.perf_counter()
+            result = load()
+            elapsed = time.perf_counter() - start_time
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            assert len(result) == 20000
+            return elapsed, peak
+        
+        full_time, full_peak = measure(lambda: [prop.to_dict() for prop in query.all()])
+        card_time, card_peak = measure(lambda: PROPERTY_CARD.serialize_all(PROPERTY_CARD.rows(query).all()))
+        
+        print(f"\nFull objects: {full_time:.3f}s, peak {full_peak / 1e6:.1f}MB; "
+              f"card projection: {card_time:.3f}s, peak {card_peak / 1e6:.1f}MB")
+        
+        assert card_time < full_time
+        assert card_peak < full_peak / 2
+
+
+class TestKeysetPaginationPerformance:
+    """Compare cursor pagination with OFFSET pagination."""
+    
+    @pytest.fixture
+    def keyset_app(self, app_factory):
+        from app import db
+        app_factory()
+        return db
+    
+    def insert_properties(self, db, count):
+        from datetime import date, timedelta
+        start = date(2020, 1, 1)
+        db.session.execute(Property.__table__.insert(), [
+            {
+                'listing_id': f'KS{i:06d}', 'city': 'Toronto' if i % 2 else 'Ottawa',
+                'sold_price': 400000 + i,
+                # Shared dates exercise the listing_id tie-break; some rows have no date
+                'sold_date': None if i % 50 == 0 else start + timedelta(days=i % 700)
+            }
+            for i in range(count)
+        ])
+        db.session.commit()
+    
+    def test_cursor_walk_matches_ordered_query(self, keyset_app):
+        """Walking every cursor visits each row once, in the offset ordering."""
+        from app.models.projections import PROPERTY_CARD
+        from app.services.keyset_pagination import property_paginator
+        from app.utils.errors import ValidationError
+        db = keyset_app
+        self.insert_properties(db, 1000)
+        
+        query = PROPERTY_CARD.rows(Property.query.filter(Property.sold_price >= 400100))
+        expected = [row.listing_id for row in property_paginator.order(query).all()]
+        
+        seen, cursor = [], None
+        while True:
+            page = property_paginator.paginate(query, cursor=cursor, per_page=37)
+            seen.extend(row.listing_id for row in page.items)
+            assert page.total == 900 and page.total_is_approximate
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        assert seen == expected
+        
+        # Approximate totals come from the cache until it expires
+        db.session.execute(Property.__table__.delete().where(Property.listing_id == 'KS000999'))
+        assert property_paginator.paginate(query, per_page=5).total == 900
+        assert property_paginator.paginate(query, per_page=5, total='exact').total == 899
+        
+        with pytest.raises(ValidationError):
+            property_paginator.paginate(query, cursor='not-a-cursor')
+    
+    def test_deep_cursor_page_vs_offset(self, keyset_app):
+        """A deep cursor page should cost about the same as the first page."""
+        from app.models.projections import PROPERTY_CARD
+        from app.services.keyset_pagination import property_paginator
+        db = keyset_app
+        self.insert_properties(db, 200000)
+        query = PROPERTY_CARD.rows(Property.query)
+        
+        deep_row = property_paginator.order(query).offset(190000).first()
+        deep_cursor = property_paginator.cursor_for(deep_row)
+        
+        def timed(fetch, repeat=5):
+            start_time = time.perf_counter()
+            for _ in range(repeat):
+                fetch()
+            return (time.perf_counter() - start_time) / repeat
+        
+        offset_time = timed(lambda: property_paginator.order(query).paginate(
+            page=9501, per_page=20, error_out=False, count=False))
+        first_time = timed(lambda: property_paginator.paginate(query, per_page=20, total='none'))
+        cursor_time = timed(lambda: property_paginator.paginate(query, cursor=deep_cursor,
+                                                                per_page=20, total='none'))
+        
+        print(f"\nPage 9501 of 200k rows: OFFSET {offset_time * 1000:.2f}ms, "
+              f"cursor {cursor_time * 1000:.2f}ms (first page {first_time * 1000:.2f}ms)")
+        
+        assert cursor_time < offset_time / 5
+    
+    def test_ranked_search_pages_have_no_cursor(self, keyset_app):
+        """Relevance-ordered search pages cannot be continued by a recency cursor."""
+        from flask import current_app
+        from app.services.search_service import search_service
+        db = keyset_app
+        self.insert_properties(db, 60)
+        db.session.execute(Property.__table__.update().values(remarks='granite counters'))
+        db.session.commit()
+        search_service.clear_cache()
+        try:
+            search_service.build_index()
+            client = current_app.test_client()
+            
+            ranked = client.get('/api/search?q=granite&per_page=10').get_json()['pagination']
+            recency = client.get('/api/search?city=Toronto&per_page=10').get_json()['pagination']
+        finally:
+            search_service.clear_cache()
+        
+        assert ranked['has_next'] and ranked['next_cursor'] is None
+        assert recency['has_next'] and recency['next_cursor'] is not None
+    
+    def test_search_page_mode_counts_exactly(self, keyset_app):
+        """Numbered search pages count the current rows, not a cached approximate total."""
+        from flask import current_app
+        from app.services.search_service import search_service
+        db = keyset_app
+        self.insert_properties(db, 60)
+        # The result cards format the floor area
+        db.session.execute(Property.__table__.update().values(sqft=900))
+        db.session.commit()
+        search_service.clear_cache()
+        client = current_app.test_client()
+        
+        first = client.get('/search?location=Toronto').get_data(as_text=True)
+        db.session.execute(Property.__table__.delete().where(Property.listing_id.in_(['KS000001', 'KS000003'])))
+        db.session.commit()
+        second = client.get('/search?location=Toronto').get_data(as_text=True)
+        
+        assert '30 Properties Found' in first
+        assert '28 Properties Found' in second
+
+
+class TestRequestTracing:
+    """Test span tracing, its histograms and its overhead."""
+    
+    @pytest.fixture
+    def traced_app(self, app_factory):
+        """Testing application, every request traced, with a route touching each stage."""
+        from app.extensions import cache
+        from app.services import database_optimizer  # Registers the query timing events
+        from app.tracing import tracer
+        
+        sample_rate = tracer.sample_rate
+        app = app_factory(TRACING_SAMPLE_RATE=1.0)
+        
+        @app.route('/listing')
+        def listing():
+            cache.get('listing')
+            with tracer.span('ml'):
+                time.sleep(0.002)
+            return {'count': Property.query.count()}
+        
+        tracer.reset()
+        yield app, tracer
+        tracer.sample_rate = sample_rate
+        tracer.reset()
+    
+    def test_histogram_percentiles(self):
+        """Log-linear buckets keep percentiles within a few percent."""
+        import random
+        from app.tracing import LatencyHistogram
+        
+        rng = random.Random(7)
+        values = [rng.lognormvariate(-4, 1.2) for _ in range(20000)]
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+        
+        values.sort()
+        for percent in (50, 90, 99):
+            exact = values[int(len(values) * percent / 100) - 1]
+            assert histogram.percentile(percent) == pytest.approx(exact, rel=0.05)
+        assert histogram.count == 20000
+        assert histogram.summary()['max'] == pytest.approx(values[-1], abs=1e-6)
+    
+    def test_request_stages_and_metrics_export(self, traced_app):
+        """Sampled requests record db, cache and custom spans; unsampled ones only their total."""
+        app, tracer = traced_app
+        client = app.test_client()
+        
+        for _ in range(3):
+            assert client.get('/listing').status_code == 200
+        metrics = tracer.get_metrics()
+        assert metrics['request']['count'] == 3
+        assert metrics['sampled_requests'] == 3
+        assert set(metrics['request_stages']) >= {'db', 'cache', 'ml'}
+        assert metrics['request_stages']['ml']['p50'] >= 0.002
+        
+        exposition = tracer.render_prometheus()
+        assert 'nextproperty_request_stage_seconds{stage="db",quantile="0.99"}' in exposition
+        assert 'nextproperty_request_duration_seconds_count 3' in exposition
+        
+        tracer.sample_rate = 0
+        client.get('/listing')
+        metrics = tracer.get_metrics()
+        assert metrics['request']['count'] == 4
+        assert metrics['request_stages']['ml']['count'] == 3
+    
+    def test_sampled_tracing_overhead(self, traced_app):
+        """At the default sample rate tracing should add under 1% to a simple request."""
+        from app.tracing import Tracer
+        app, tracer = traced_app
+        client = app.test_client()
+        tracer.sample_rate = 0
+        
+        start_time = time.perf_counter()
+        for _ in range(200):
+            client.get('/listing')
+        request_seconds = (time.perf_counter() - start_time) / 200
+        
+        def per_request_cost(sampled):
+            probe = Tracer(sample_rate=1.0 if sampled else 0)
+            start_time = time.perf_counter()
+            for _ in range(2000):
+                probe.start_trace()
+                for _ in range(20):
+                    with probe.span('db'):
+                        pass
+                probe.finish_trace()
+            return (time.perf_counter() - start_time) / 2000
+        
+        sampled_cost, unsampled_cost = per_request_cost(True), per_request_cost(False)
+        expected = Tracer.DEFAULT_SAMPLE_RATE * sampled_cost + (1 - Tracer.DEFAULT_SAMPLE_RATE) * unsampled_cost
+        
+        print(f"\nRequest {request_seconds * 1e6:.0f}us; tracing 20 spans: sampled {sampled_cost * 1e6:.1f}us, "
+              f"unsampled {unsampled_cost * 1e6:.1f}us, expected {expected / request_seconds:.2%}")
+        
+        assert expected < request_seconds * 0.01
+
+
+class TestAsyncLoggingPipeline:
+    """Test the queued, batched logging pipeline."""
+    
+    @pytest.fixture
+    def logging_app(self, tmp_path):
+        """Flask application with logging set up in a temporary directory."""
+        import logging
+        from flask import Flask
+        from app import logging_config
+        
+        app = Flask(__name__)
+        app.config.update(LOG_DIR=str(tmp_path), LOG_LEVEL='INFO',
+                          ACCESS_LOG_SAMPLE_RATES={'start': 0.0, '2xx': 0.0, '4xx': 1.0})
+        loggers = logging_config.setup_logging(app)
+        yield app, loggers, tmp_path
+        logging_config._log_pipeline.stop()
+        logging_config._log_pipeline = None
+        logging.getLogger().handlers.clear()
+        for name in ('access', 'performance', 'security'):
+            logging.getLogger(f'nextproperty.{name}').handlers.clear()
+    
+    def test_records_are_written_in_batches_with_sampling(self, logging_app):
+        """Records reach their files after the listener drains; 2xx access logs are sampled out."""
+        import json
+        from app import logging_config
+        app, loggers, log_dir = logging_app
+        
+        for i in range(500):
+            loggers['access'].info("Request completed", extra={'status_code': 200})
+        loggers['access'].info("Request completed", extra={'status_code': 404})
+        loggers['performance'].warning("Slow request detected", extra={'duration_seconds': 3.2})
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            loggers['app'].exception("Import failed for %s", 'batch-7')
+        
+        pipeline = logging_config._log_pipeline
+        stats = logging_config.get_log_pipeline_stats()
+        assert stats['sampled_out'] == {'2xx': 500}
+        pipeline.stop()
+        
+        access = [json.loads(line) for line in (log_dir / 'nextproperty-ai-access.log').read_text().splitlines()]
+        assert [record['status_code'] for record in access] == [404]
+        performance = (log_dir / 'nextproperty-ai-performance.log').read_text()
+        assert '"duration_seconds": 3.2' in performance
+        error = json.loads((log_dir / 'nextproperty-ai-errors.log').read_text().splitlines()[-1])
+        assert error['message'] == 'Import failed for batch-7'
+        assert 'ValueError: boom' in error['exception']
+    
+    def test_slow_disk_does_not_block_callers(self):
+        """A stalled handler fills the bounded queue; callers drop and count instead of waiting."""
+        import logging
+        import threading
+        from app.logging_config import AsyncLogPipeline
+        
+        release = threading.Event()
+        
+        class StalledHandler(logging.Handler):
+            def __init__(self):
+                super().__init__()
+                self.records = []
+            
+            def emit(self, record):
+                release.wait(5)
+                self.records.append(record)
+        
+        stalled = StalledHandler()
+        pipeline = AsyncLogPipeline(queue_size=100, batch_size=10)
+        logger = logging.getLogger('nextproperty.test_pipeline')
+        logger.propagate = False
+        logger.addHandler(pipeline.handler('test', [stalled]))
+        pipeline.start()
+        try:
+            start_time = time.perf_counter()
+            for i in range(5000):
+                logger.warning("Record %d", i)
+            elapsed = time.perf_counter() - start_time
+        finally:
+            release.set()
+            pipeline.stop()
+            logger.handlers.clear()
+        
+        dropped = pipeline.get_stats()['dropped']['test']
+        print(f"\n5000 records against a stalled handler: {elapsed * 1000:.1f}ms, {dropped} dropped")
+        
+        assert elapsed < 1.0
+        assert dropped >= 5000 - 100 - 10
+        assert len(stalled.records) + dropped == 5000
+        assert stalled.records[0].getMessage() == 'Record 0'
+    
+    def test_security_and_error_records_survive_a_full_queue(self):
+        """With the queue full, security and error records bypass it instead of being dropped."""
+        import logging
+        import threading
+        from app.logging_config import AsyncLogPipeline
+        
+        stalled, release = threading.Event(), threading.Event()
+        pipeline = AsyncLogPipeline(queue_size=50, batch_size=10, priority_timeout=0.05)
+        
+        class RecordingHandler(logging.Handler):
+            """Stalls the listener thread (outside the handler lock) so the queue fills up."""
+            def __init__(self):
+                super().__init__()
+                self.records = []
+            
+            def handle(self, record):
+                if threading.current_thread() is pipeline.listener._thread:
+                    stalled.set()
+                    release.wait(5)
+                return super().handle(record)
+            
+            def emit(self, record):
+                self.records.append(record)
+        
+        app_handler, security_handler = RecordingHandler(), RecordingHandler()
+        app_logger = logging.getLogger('nextproperty.test_pipeline')
+        security_logger = logging.getLogger('nextproperty.test_security')
+        for logger, route, handler in ((app_logger, 'test', app_handler),
+                                       (security_logger, 'security', security_handler)):
+            logger.propagate = False
+            logger.addHandler(pipeline.handler(route, [handler]))
+        pipeline.start()
+        try:
+            app_logger.warning("Record 0")
+            assert stalled.wait(5)
+            for i in range(1, 500):
+                app_logger.warning("Record %d", i)
+            start_time = time.perf_counter()
+            for i in range(5):
+                security_logger.warning("Blocked request %d", i)
+                app_logger.error("Import failed %d", i)
+            elapsed = time.perf_counter() - start_time
+        finally:
+            release.set()
+            pipeline.stop()
+            app_logger.handlers.clear()
+            security_logger.handlers.clear()
+        
+        stats = pipeline.get_stats()
+        print(f"\n10 priority records against a full queue: {elapsed * 1000:.1f}ms, bypassed {stats['bypassed']}")
+        
+        assert stats['bypassed'] == {'security': 5, 'test': 5}
+        assert 'security' not in stats['dropped']
+        assert [r.getMessage() for r in security_handler.records] == [f"Blocked request {i}" for i in range(5)]
+        errors = [r.getMessage() for r in app_handler.records if r.levelno == logging.ERROR]
+        assert errors == [f"Import failed {i}" for i in range(5)]
+        assert len(app_handler.records) - 5 + stats['dropped']['test'] == 500
+        # Each priority record waits at most priority_timeout before writing directly
+        assert elapsed < 10 * 0.05 + 0.5
+    
+    def test_access_records_are_sampled_once_per_request(self):
+        """Start and end records of one request share a single sampling decision."""
+        import logging
+        import uuid
+        from flask import Flask, g
+        from app.logging_config import AccessLogSampler
+        
+        def record(status_code=None):
+            log_record = logging.LogRecord('nextproperty.access', logging.INFO, __file__, 0,
+                                           'Request', None, None)
+            if status_code is not None:
+                log_record.status_code = status_code
+            return log_record
+        
+        app = Flask(__name__)
+        paired = AccessLogSampler({'start': 0.3, '2xx': 0.3})
+        nested = AccessLogSampler({'start': 0.5, '2xx': 0.2, '4xx': 1.0})
+        kept = {'paired': 0, 'start': 0, 'end': 0}
+        for _ in range(2000):
+            with app.test_request_context('/'):
+                g.request_id = str(uuid.uuid4())
+                start_kept, end_kept = paired.filter(record()), paired.filter(record(200))
+                assert start_kept == end_kept
+                assert paired.filter(record()) == start_kept
+                kept['paired'] += start_kept
+                
+                # A lower end rate keeps a subset of the requests whose start was kept
+                start_kept, end_kept = nested.filter(record()), nested.filter(record(204))
+                assert start_kept or not end_kept
+                assert nested.filter(record(404))
+                kept['start'] += start_kept
+                kept['end'] += end_kept
+        
+        assert 450 < kept['paired'] < 750
+        assert 850 < kept['start'] < 1150
+        assert 300 < kept['end'] < 500
+
+
+class TestComparablesIndexPerformance:
+    """Compare the comparables index with per-property queries."""
+    
+    @pytest.fixture
+    def comparables_app(self, app_factory):
+        """A year of sales in three cities."""
+        import random
+        from datetime import date, timedelta
+        from app import db
+        from app.services.comparables_index import comparables_index
+        from app.services.location_resolver import location_resolver
+        
+        app_factory(COMPARABLES_RECHECK_SECONDS=0)
+        rng = random.Random(42)
+        today = date.today()
+        db.session.execute(Property.__table__.insert(), [
+            {
+                'listing_id': f'CP{i:05d}', 'province': 'ON', 'address': f'{i} Main St',
+                'city': ('Toronto', 'Ottawa', 'Hamilton')[i % 3],
+                'property_type': 'Condo' if i % 2 else 'House',
+                'sqft': rng.randint(600, 3000), 'bedrooms': rng.randint(1, 5),
+                'bathrooms': rng.randint(1, 4),
+                'latitude': 43.6 + rng.random(), 'longitude': -79.4 + rng.random(),
+                'sold_price': rng.randint(300000, 1500000),
+                'sold_date': today - timedelta(days=rng.randint(0, 365))
+            }
+            for i in range(6000)
+        ])
+        db.session.commit()
+        location_resolver.clear_cache()
+        location_resolver.rebuild()
+        comparables_index.clear_cache()
+        yield db, comparables_index
+        location_resolver.clear_cache()
+        comparables_index.clear_cache()
+    
+    def test_batched_comparables_vs_queries(self, comparables_app):
+        """One vectorized lookup for 200 properties beats 200 range queries."""
+        from datetime import date, timedelta
+        db, index = comparables_app
+        ml_service = MLService()
+        targets = Property.query.order_by(Property.listing_id).limit(200).all()
+        
+        start_time = time.perf_counter()
+        queried = {}
+        with patch('app.services.ml_service.comparables_index.find', return_value=None):
+            for prop in targets:
+                queried[prop.listing_id] = ml_service._find_comparable_properties(prop)
+        query_time = time.perf_counter() - start_time
+        
+        index.refresh()
+        start_time = time.perf_counter()
+        batched = ml_service._find_comparables_for(targets)
+        index_time = time.perf_counter() - start_time
+        
+        print(f"\nComparables for 200 properties: queries {query_time * 1000:.1f}ms, "
+              f"index {index_time * 1000:.1f}ms")
+        
+        assert set(batched) == set(queried)
+        recent = (date.today() - timedelta(days=180)).isoformat()
+        by_id = {prop.listing_id: prop for prop in Property.query.all()}
+        for prop in targets:
+            comps = batched[prop.listing_id]
+            assert len(comps) == len(queried[prop.listing_id]) == 5
+            for comp in comps:
+                match = by_id[comp['listing_id']]
+                assert match.listing_id != prop.listing_id
+                assert (match.city_id, match.property_type_id) == (prop.city_id, prop.property_type_id)
+                assert abs(match.bedrooms - prop.bedrooms) <= 1
+                assert abs(match.sqft - prop.sqft) <= prop.sqft * 0.2
+                assert comp['sold_date'] >= recent
+        
+        assert index_time < query_time / 5
+    
+    def test_incremental_refresh(self, comparables_app):
+        """Only partitions with changed sales are reloaded."""
+        from datetime import date, datetime
+        from app.services.data_service import DataService
+        db, index = comparables_app
+        
+        first = index.refresh()
+        assert first['partitions'] == first['reloaded'] == 6
+        assert first['sales'] == 6000
+        assert index.refresh()['reloaded'] == 0
+        
+        target = db.session.get(Property, 'CP00001')
+        twin = Property(
+            listing_id='TWIN01', city=target.city, province='ON', property_type=target.property_type,
+            sqft=target.sqft, bedrooms=target.bedrooms, bathrooms=target.bathrooms,
+            latitude=target.latitude, longitude=target.longitude,
+            sold_price=500000, sold_date=date.today(), updated_at=datetime.utcnow()
+        )
+        db.session.add(twin)
+        db.session.commit()
+        
+        refreshed = index.refresh()
+        assert refreshed['reloaded'] == 1 and refreshed['sales'] == 6001
+        
+        comparables = DataService.get_comparable_properties('CP00001', limit=3)
+        assert len(comparables) == 3
+        assert comparables[0]['listing_id'] == 'TWIN01'
+
+
+class TestEconomicFetcherPerformance:
+    """Concurrent, conditional economic data refresh against a local stub server."""
+    
+    DELAY = 0.3
+    
+    @pytest.fixture
+    def stub_server(self):
+        """Local HTTP server imitating the Valet and StatsCan endpoints."""
+        import json
+        import threading
+        from email.utils import formatdate
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import parse_qs, urlsplit
+        
+        state = {'requests': [], 'in_flight': 0, 'max_in_flight': 0, 'flaky_calls': 0}
+        lock = threading.Lock()
+        delay = self.DELAY
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                url = urlsplit(self.path)
+                with lock:
+                    state['requests'].append((url.path, parse_qs(url.query), dict(self.headers)))
+                    state['in_flight'] += 1
+                    state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+                try:
+                    time.sleep(delay)
+                    self.respond(url)
+                finally:
+                    with lock:
+                        state['in_flight'] -= 1
+            
+            def respond(self, url):
+                if url.path == '/flaky':
+                    with lock:
+                        state['flaky_calls'] += 1
+                        calls = state['flaky_calls']
+                    if calls == 1:
+                        self.send_response(503)
+                        self.send_header('Retry-After', '0')
+                        self.end_headers()
+                        return
+                if url.path.startswith('/valet/observations/'):
+                    code = url.path.split('/')[3]
+                    etag = f'"{code}-v1"'
+                    if self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.end_headers()
+                        return
+                    body = json.dumps({'observations': [
+                        {'d': f'2024-01-0{day}', code: {'v': str(2.5 + day / 100)}} for day in (1, 2, 3)
+                    ]}).encode()
+                    self.send_response(200)
+                    self.send_header('ETag', etag)
+                elif url.path in ('/statcan', '/flaky'):
+                    # Every StatCan table is served from one URL with its own Last-Modified
+                    pid = parse_qs(url.query).get('pid', ['0'])[0]
+                    last_modified = formatdate(1704067200 + int(pid), usegmt=True)
+                    if self.headers.get('If-Modified-Since') == last_modified:
+                        self.send_response(304)
+                        self.end_headers()
+                        return
+                    body = b'REF_DATE,VALUE\n2024-01,100\n'
+                    self.send_response(200)
+                    self.send_header('Last-Modified', last_modified)
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f'http://127.0.0.1:{server.server_address[1]}', state
+        server.shutdown()
+        server.server_close()
+    
+    @pytest.fixture
+    def economic_app(self, app_factory, stub_server, tmp_path):
+        """Testing application whose external API URLs point at the stub server."""
+        from app.services.economic_timeseries import economic_timeseries
+        from app.services.external_apis import ExternalAPIsService
+        
+        base_url, state = stub_server
+        app_factory(ECONOMIC_FETCH_CONCURRENCY=16, ECONOMIC_TIMESERIES_PATH=str(tmp_path))
+        with patch.object(ExternalAPIsService, 'BOC_OBSERVATIONS_URL', f'{base_url}/valet/observations'), \
+                patch.object(ExternalAPIsService, 'STATCAN_DOWNLOAD_URL', f'{base_url}/statcan'), \
+                patch('app.services.economic_snapshot.economic_snapshot.refresh',
+                      return_value={'version': 1}):
+            yield ExternalAPIsService, state
+        economic_timeseries.clear_cache()
+    
+    def test_refresh_is_concurrent_conditional_and_incremental(self, economic_app):
+        """A full refresh takes about one response time; the next one is all 304s."""
+        from app.models.economic_data import EconomicData
+        service, state = economic_app
+        series_count = len(service.BOC_INDICATORS) + len(service.STATCAN_TABLES)
+        
+        results = service.refresh_all_data()
+        
+        print(f"\nEconomic refresh of {series_count} series: {results['elapsed_seconds'] * 1000:.1f}ms "
+              f"(sequential would take {series_count * self.DELAY * 1000:.0f}ms)")
+        
+        assert results['errors'] == []
+        assert len(results['success']) == series_count
+        assert results['total_processed'] == len(service.BOC_INDICATORS) * 3 + len(service.STATCAN_TABLES)
+        assert EconomicData.query.filter_by(source='BOC').count() == len(service.BOC_INDICATORS) * 3
+        assert results['elapsed_seconds'] < series_count * self.DELAY / 3
+        
+        state['requests'].clear()
+        second = service.refresh_all_data()
+        
+        assert second['success'] == [] and second['errors'] == []
+        assert len(second['not_modified']) == series_count
+        boc_requests = [params for path, params, _ in state['requests'] if path.startswith('/valet/')]
+        assert len(boc_requests) == len(service.BOC_INDICATORS)
+        assert all(params['start_date'] == ['2024-01-03'] for params in boc_requests)
+    
+    def test_failed_store_is_fetched_again(self, economic_app):
+        """Validators are kept only for stored series, so a failed store is not answered with 304."""
+        from sqlalchemy.exc import OperationalError
+        from app.models.economic_data import EconomicData
+        service, state = economic_app
+        series_count = len(service.BOC_INDICATORS) + len(service.STATCAN_TABLES)
+        first_indicator = next(iter(service.BOC_INDICATORS))
+        original_upsert = EconomicData.bulk_upsert
+        calls = []
+        
+        def failing_once(rows, *args, **kwargs):
+            calls.append(rows)
+            if len(calls) == 1:
+                raise OperationalError('INSERT', {}, Exception('database is locked'))
+            return original_upsert(rows, *args, **kwargs)
+        
+        with patch.object(EconomicData, 'bulk_upsert', side_effect=failing_once):
+            first = service.refresh_all_data()
+        
+        assert len(first['errors']) == 1 and first['errors'][0].startswith(f'boc_{first_indicator}:')
+        assert len(first['success']) == series_count - 1
+        assert EconomicData.query.filter_by(indicator_name=first_indicator).count() == 0
+        
+        second = service.refresh_all_data()
+        
+        assert second['errors'] == []
+        assert second['success'] == [f'boc_{first_indicator}']
+        assert len(second['not_modified']) == series_count - 1
+        assert EconomicData.query.filter_by(indicator_name=first_indicator).count() == 3
+    
+    def test_per_host_limit_and_retries(self, economic_app, stub_server):
+        """Requests to one host stay within the limit; transient failures are retried."""
+        from app.services.economic_fetcher import EconomicFetcher, SeriesRequest
+        base_url, state = stub_server
+        
+        fetcher = EconomicFetcher(per_host_limit=2, max_retries=2, backoff_base=0.01)
+        series = [
+            SeriesRequest(key=f'series_{i}', url=f'{base_url}/valet/observations/S{i}/json',
+                          parse=lambda response: response.json()['observations'])
+            for i in range(6)
+        ]
+        series.append(SeriesRequest(key='flaky', url=f'{base_url}/flaky', parse=lambda response: []))
+        series.append(SeriesRequest(key='missing', url=f'{base_url}/missing', parse=lambda response: []))
+        
+        results = fetcher.run(series)
+        
+        assert state['max_in_flight'] == 2
+        assert all(results[f'series_{i}'].status == 'updated' for i in range(6))
+        assert len(results['series_0'].points) == 3
+        assert results['flaky'].status == 'updated' and results['flaky'].attempts == 2
+        assert results['missing'].status == 'error' and results['missing'].attempts == 1
+        assert not results['missing'].ok
+
+
+class TestEconomicBulkUpsertPerformance:
+    """Set-based economic data upserts."""
+    
+    @pytest.fixture
+    def upsert_app(self, app_factory):
+        from app import db
+        app_factory()
+        return db
+    
+    @staticmethod
+    def daily_series(days, code='V39079', offset=0.0):
+        from datetime import date, timedelta
+        start = date(2020, 1, 1)
+        return [
+            {'indicator_name': 'overnight_rate', 'indicator_code': code, 'source': 'BOC',
+             'date': start + timedelta(days=i), 'value': round(1.0 + i / 1000 + offset, 6),
+             'unit': '%', 'frequency': 'daily'}
+            for i in range(days)
+        ]
+    
+    def test_five_year_series_in_a_few_statements(self, upsert_app):
+        """A five-year daily series is written with one lookup and a statement per chunk."""
+        from sqlalchemy import event
+        from app.models.economic_data import EconomicData
+        db = upsert_app
+        series = self.daily_series(1827)
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            start_time = time.perf_counter()
+            first = EconomicData.bulk_upsert(series)
+            first_time = time.perf_counter() - start_time
+            first_statements = len(statements)
+            
+            statements.clear()
+            start_time = time.perf_counter()
+            second = EconomicData.bulk_upsert(series)
+            second_time = time.perf_counter() - start_time
+            second_statements = len(statements)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        print(f"\nUpsert of 1827 observations: {first_time * 1000:.1f}ms in {first_statements} statements, "
+              f"unchanged re-run {second_time * 1000:.1f}ms in {second_statements} statements")
+        
+        assert first == {'inserted': 1827, 'updated': 0, 'unchanged': 0}
+        assert second == {'inserted': 0, 'updated': 0, 'unchanged': 1827}
+        assert first_statements == 1 + 4  # lookup + ceil(1827 / 500) upserts
+        assert second_statements == 1
+        assert EconomicData.query.count() == 1827
+    
+    def test_counts_and_revisions(self, upsert_app):
+        """Revised values update in place; duplicates in the input collapse to the last row."""
+        from datetime import date
+        from app.models.economic_data import EconomicData
+        series = self.daily_series(10)
+        EconomicData.bulk_upsert(series)
+        
+        revised = self.daily_series(10)
+        revised[3]['value'] += 0.25
+        revised.append(dict(revised[4], value=9.5))
+        revised.append(dict(revised[0], date='2020-01-11'))
+        revised.append(dict(revised[0], source='STATCAN'))
+        
+        counts = EconomicData.bulk_upsert(revised, chunk_size=3)
+        
+        assert counts == {'inserted': 2, 'updated': 2, 'unchanged': 8}
+        assert EconomicData.query.count() == 12
+        stored = EconomicData.query.filter_by(source='BOC', date=date(2020, 1, 5)).one()
+        assert float(stored.value) == 9.5
+        assert float(EconomicData.query.filter_by(date=date(2020, 1, 4)).one().value) == pytest.approx(1.253)
+    
+    def test_omitted_columns_keep_stored_values(self, upsert_app):
+        """Rows that leave out a column do not overwrite its stored value with NULL."""
+        from datetime import date
+        from app.models.economic_data import EconomicData
+        EconomicData.bulk_upsert(self.daily_series(3))
+        
+        # A value-only revision next to a full row that adds data_quality
+        counts = EconomicData.bulk_upsert([
+            {'indicator_name': 'overnight_rate', 'indicator_code': 'V39079', 'source': 'BOC',
+             'date': date(2020, 1, 1), 'value': 2.5},
+            dict(self.daily_series(3)[1], data_quality='good'),
+            {'indicator_name': 'overnight_rate', 'indicator_code': 'V39079', 'source': 'BOC',
+             'date': date(2020, 1, 3), 'value': 1.002}
+        ])
+        
+        assert counts == {'inserted': 0, 'updated': 2, 'unchanged': 1}
+        first, second, third = EconomicData.query.order_by(EconomicData.date).all()
+        assert float(first.value) == 2.5
+        assert (first.unit, first.frequency) == ('%', 'daily')
+        assert first.data_quality is None
+        assert (second.data_quality, second.unit) == ('good', '%')
+        assert third.unit == '%'
+
+
+class TestEconomicTimeSeriesPerformance:
+    """Columnar economic series against ORM reads and pandas."""
+    
+    @pytest.fixture
+    def series_app(self, app_factory, tmp_path):
+        """Five years of daily rates and quarterly GDP."""
+        from datetime import date, timedelta
+        from app import db
+        from app.models.economic_data import EconomicData
+        from app.services.economic_timeseries import economic_timeseries
+        
+        app_factory(ECONOMIC_TIMESERIES_PATH=str(tmp_path))
+        today = date.today()
+        rows = [
+            {'indicator_name': 'overnight_rate', 'indicator_code': 'V39079', 'source': 'BOC',
+             'date': today - timedelta(days=i), 'value': round(2 + (i % 97) / 50, 4)}
+            for i in range(5 * 365) if (today - timedelta(days=i)).weekday() < 5
+        ]
+        rows += [
+            {'indicator_name': 'gdp', 'indicator_code': '65201210', 'source': 'STATCAN',
+             'date': date(2019 + q // 4, q % 4 * 3 + 1, 1), 'value': 2000 + q * 10 + (q % 4) * 3}
+            for q in range(24)
+        ]
+        EconomicData.bulk_upsert(rows)
+        economic_timeseries.clear_cache()
+        yield db, economic_timeseries
+        economic_timeseries.clear_cache()
+    
+    def test_resample_yoy_and_rolling_match_pandas(self, series_app):
+        """Vectorized transforms agree with the pandas equivalents."""
+        import numpy as np
+        import pandas as pd
+        db, store = series_app
+        series = store.get('V39079')
+        frame = pd.Series(np.asarray(series.values), index=pd.to_datetime(np.asarray(series.dates)))
+        
+        monthly = series.resample('M', how='mean')
+        expected = frame.resample('MS').mean().dropna()
+        assert list(monthly.dates.astype('datetime64[ns]')) == list(expected.index.values)
+        assert np.allclose(monthly.values, expected.values)
+        
+        quarterly = series.resample('Q', how='last')
+        expected = frame.resample('QS').last().dropna()
+        assert np.allclose(quarterly.values, expected.values)
+        
+        rolling = series.rolling(20, how='mean')
+        assert np.allclose(rolling.values, frame.rolling(20).mean().dropna().values)
+        rolling = series.rolling(20, how='std')
+        assert np.allclose(rolling.values, frame.rolling(20).std(ddof=0).dropna().values)
+        
+        gdp_growth = store.get('65201210').yoy_change()
+        gdp = pd.Series([2000 + q * 10 + (q % 4) * 3 for q in range(24)], dtype=float)
+        assert len(gdp_growth) == 20
+        assert np.allclose(gdp_growth.values, (gdp.pct_change(4) * 100).dropna().values)
+    
+    def test_memory_mapped_reads_vs_orm(self, series_app):
+        """Other stores map the written files; chart data needs no queries."""
+        import numpy as np
+        from sqlalchemy import event
+        from app.models.economic_data import EconomicData
+        from app.services.economic_timeseries import EconomicTimeSeriesStore
+        db, store = series_app
+        assert store.build()['series'] == 2
+        
+        start_time = time.perf_counter()
+        for _ in range(50):
+            rows = EconomicData.get_time_series('V39079')
+            values = [float(row.value) for row in rows]
+        orm_time = time.perf_counter() - start_time
+        
+        other_worker = EconomicTimeSeriesStore()
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            start_time = time.perf_counter()
+            for _ in range(50):
+                series = other_worker.get('V39079')
+                monthly = series.resample('M', how='mean')
+            store_time = time.perf_counter() - start_time
+            chart = DataService.get_economic_indicators_chart_data('24m')
+            lookups = len(statements)
+            DataService.get_economic_indicators_chart_data('24m')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        print(f"\n50 reads of {len(values)} observations: ORM {orm_time * 1000:.1f}ms, "
+              f"columnar with monthly resample {store_time * 1000:.1f}ms")
+        
+        assert isinstance(series.values, np.memmap)
+        assert sorted(series.values) == sorted(values)
+        assert len(monthly) in (60, 61)
+        # BoC indicators without observations are looked up once, then remembered as empty
+        assert lookups == len(statements) == 5
+        assert list(chart['indicators']) == ['overnight_rate']
+        assert len(chart['indicators']['overnight_rate']['dates']) == 24
+        assert store_time < orm_time / 5
+
+
+class TestParallelModelSearch:
+    """Successive-halving search with cached preprocessing in enhanced_model_training."""
+    
+    def test_halving_search_reuses_cached_preprocessing(self, tmp_path):
+        """Scaler/PCA fits are cached per fold; candidates reuse them across worker processes."""
+        import os
+        from joblib import Memory
+        from sklearn.decomposition import PCA
+        from sklearn.linear_model import ElasticNet
+        from sklearn.model_selection import KFold
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import StandardScaler
+        import enhanced_model_training as training
+        
+        df, feature_columns = training.create_enhanced_training_data(n_samples=900)
+        X, y = df[feature_columns], df['price']
+        X_train, X_test, y_train, y_test = X[:720], X[720:], y[:720], y[720:]
+        config = {
+            'pipeline': Pipeline([
+                ('scaler', StandardScaler()),
+                ('pca', PCA(n_components=10)),
+                ('model', ElasticNet(random_state=42, max_iter=2000))
+            ], memory=Memory(str(tmp_path), verbose=0)),
+            'params': training.get_param_distributions(bayes=False)['ElasticNet'],
+            'n_iter': 10,
+            'cv': KFold(n_splits=3, shuffle=True, random_state=42)
+        }
+        
+        result = training.train_model_enhanced(
+            'ElasticNet', config, X_train, y_train, X_test, y_test, n_jobs=2, strategy='halving'
+        )
+        
+        assert result is not None
+        assert result['search_strategy'] == 'halving'
+        assert result['n_candidates'] > config['n_iter']  # halving screens more candidates
+        assert 0 < result['search_time'] <= result['training_time']
+        assert result['model'].memory is None
+        
+        cached_fits = [
+            directory for directory, _, files in os.walk(tmp_path)
+            if 'output.pkl' in files
+        ]
+        # One scaler and one PCA fit per (iteration sample, fold), not per candidate
+        assert 0 < len(cached_fits) < result['n_candidates']
+
+
+class TestCompiledModelPerformance:
+    """Compiled inference artifacts against the pickled scikit-learn models."""
+    
+    @pytest.fixture
+    def fitted_models(self):
+        """Pipelines like enhanced_model_training's, fitted on 26 synthetic features."""
+        import numpy as np
+        from sklearn.decomposition import PCA
+        from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor, StackingRegressor
+        from sklearn.linear_model import ElasticNet, Ridge
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import StandardScaler
+        
+        rng = np.random.default_rng(7)
+        X = rng.normal(size=(1500, 26))
+        y = 800000 + 150000 * X[:, 2] + 60000 * np.sin(X[:, 0] * 2) + 40000 * X[:, 5] * X[:, 13] \
+            + rng.normal(scale=20000, size=1500)
+        
+        def pipeline(model, whiten=False):
+            return Pipeline([
+                ('scaler', StandardScaler()),
+                ('pca', PCA(n_components=15, whiten=whiten)),
+                ('model', model)
+            ])
+        
+        models = {
+            'Ridge': pipeline(Ridge(alpha=1.0)),
+            'ElasticNet': pipeline(ElasticNet(alpha=0.1, max_iter=2000), whiten=True),
+            'RandomForest': pipeline(RandomForestRegressor(n_estimators=60, random_state=42)),
+            'GradientBoosting': pipeline(GradientBoostingRegressor(n_estimators=120, max_depth=4, random_state=42))
+        }
+        for model in models.values():
+            model.fit(X[:1200], y[:1200])
+        models['Ensemble'] = StackingRegressor(
+            estimators=[(name, models[name]) for name in ('GradientBoosting', 'RandomForest', 'Ridge')],
+            final_estimator=Ridge(alpha=1.0), cv=3
+        ).fit(X[:1200], y[:1200])
+        return models, X[1200:]
+    
+    def test_parity_at_serving_batch_sizes(self, fitted_models, tmp_path):
+        """Saved and reloaded artifacts reproduce every model's predictions."""
+        import numpy as np
+        from app.services.model_compiler import CompiledModel, model_compiler
+        models, X = fitted_models
+        
+        for name, model in models.items():
+            compiled = model_compiler.compile(model)
+            path = str(tmp_path / f'{name}.compiled.npz')
+            compiled.save(path)
+            loaded = CompiledModel.load(path)
+            
+            for batch_size in (1, 32, 1024):
+                batch = X[np.arange(batch_size) % len(X)]
+                assert np.allclose(loaded.predict(batch), model.predict(batch),
+                                   rtol=model_compiler.PARITY_RTOL), f'{name} at batch {batch_size}'
+            # Rows given as lists, as MLService.analyze_property passes them
+            assert np.isclose(loaded.predict([list(X[0])])[0], model.predict(X[:1])[0])
+    
+    def test_latency_against_pickled_pipelines(self, fitted_models):
+        """Single rows and small batches skip sklearn's validation and forest thread pools."""
+        import numpy as np
+        from app.services.model_compiler import model_compiler
+        models, X = fitted_models
+        
+        speedups = {}
+        for name in ('RandomForest', 'GradientBoosting', 'Ensemble'):
+            model = models[name]
+            compiled = model_compiler.compile(model)
+            results = model_compiler.benchmark(model, compiled, X, min_seconds=0.05)
+            speedups[name] = results
+            print(f"\n{name}: " + ", ".join(
+                f"batch {size} {timing['source_ms']:.2f}ms -> {timing['compiled_ms']:.2f}ms"
+                for size, timing in results.items()
+            ))
+        
+        for name, results in speedups.items():
+            assert set(results) == {1, 32, 1024}
+            assert results[1]['speedup'] > 3, name
+            assert results[32]['speedup'] > 1, name
+    
+    def test_ml_service_serves_current_artifact(self, app_factory, fitted_models, tmp_path):
+        """MLService loads the compiled artifact, ignores stale ones and keeps uncompilable pickles."""
+        import joblib
+        from sklearn.neighbors import KNeighborsRegressor
+        from app.services.model_compiler import CompiledModel, model_compiler
+        from app.utils.errors import MLModelError
+        models, X = fitted_models
+        
+        model_path = str(tmp_path / 'property_price_model.pkl')
+        joblib.dump(models['GradientBoosting'], model_path)
+        compiled = model_compiler.export(model_path, X=X)
+        assert compiled.info['parity']['rows'] == len(X)
+        
+        app = app_factory(MODEL_PATH=str(tmp_path), USE_COMPILED_MODELS=True)
+        ml_service = MLService()
+        ml_service._load_models()
+        assert isinstance(ml_service.models['valuation'], CompiledModel)
+        
+        app.config['USE_COMPILED_MODELS'] = False
+        ml_service = MLService()
+        ml_service._load_models()
+        assert not isinstance(ml_service.models['valuation'], CompiledModel)
+        
+        # A retrained pickle makes the old artifact stale
+        joblib.dump(models['Ridge'], model_path)
+        assert model_compiler.load_for(model_path) is None
+        
+        knn = KNeighborsRegressor().fit(X, X[:, 0])
+        with pytest.raises(MLModelError):
+            model_compiler.compile(knn)
+
+
+class TestValuationBackfillPerformance:
+    """Resumable keyset valuation backfill against the per-row bulk-analyze loop."""
+    
+    @pytest.fixture
+    def backfill_app(self, app_factory, tmp_path):
+        """3000 properties and a small trained model."""
+        import random
+        import joblib
+        import numpy as np
+        from datetime import datetime, timedelta
+        from sklearn.linear_model import Ridge
+        from app import db
+        from app.services.valuation_backfill import ValuationBackfill
+        
+        rng = np.random.default_rng(3)
+        X = rng.normal(size=(200, 26))
+        joblib.dump(Ridge().fit(X, 700000 + 50000 * X[:, 2]), str(tmp_path / 'property_price_model.pkl'))
+        
+        app_factory(MODEL_PATH=str(tmp_path), USE_COMPILED_MODELS=False)
+        pick = random.Random(5)
+        edited = datetime.utcnow() - timedelta(days=2)
+        db.session.execute(Property.__table__.insert(), [
+            {
+                'listing_id': f'VB{i:05d}', 'province': 'ON', 'address': f'{i} King St',
+                'city': ('Toronto', 'Ottawa', 'Winnipeg')[i % 3],
+                'property_type': ('Detached', 'Condo', 'Townhouse')[i % 3],
+                'sqft': pick.randint(600, 3200), 'bedrooms': pick.randint(1, 5),
+                'bathrooms': pick.randint(1, 4), 'year_built': pick.randint(1950, 2022),
+                'dom': pick.randint(1, 120), 'original_price': pick.randint(300000, 1500000),
+                'updated_at': edited + timedelta(seconds=i // 2)  # Shared timestamps exercise the tie-break
+            }
+            for i in range(3000)
+        ])
+        db.session.commit()
+        return db, ValuationBackfill()
+    
+    def test_resumes_from_checkpoint_and_preserves_updated_at(self, backfill_app):
+        """Interrupted passes resume, later runs only see changes and a new model restarts."""
+        from sqlalchemy import select
+        db, backfill = backfill_app
+        updated_at = select(Property.listing_id, Property.updated_at)
+        stamps = dict(db.session.execute(updated_at).all())
+        
+        first = backfill.run(batch_size=400, max_batches=3)
+        assert first['status'] == 'partial' and first['rows'] == 1200
+        assert Property.query.filter(Property.ai_valuation.isnot(None)).count() == 1200
+        
+        second = backfill.run(batch_size=400)
+        assert second['status'] == 'complete' and second['rows'] == 1800
+        assert Property.query.filter(Property.ai_valuation.is_(None)).count() == 0
+        assert Property.query.filter(Property.investment_score.is_(None)).count() == 0
+        assert dict(db.session.execute(updated_at).all()) == stamps
+        
+        # Only properties edited since the watermark are revisited
+        edited = db.session.get(Property, 'VB00010')
+        edited.sqft = 4000
+        db.session.commit()
+        with patch.object(backfill, 'SETTLE_SECONDS', 0):
+            third = backfill.run(batch_size=400)
+            assert third['rows'] == 1 and third['written'] == 1
+            assert backfill.status()['pending_rows'] == 0
+            
+            # Values are unchanged for the same model, so a full pass writes nothing
+            fourth = backfill.run(batch_size=1000, full=True)
+            assert fourth['rows'] == 3000 and fourth['written'] == 0
+        
+        with patch('app.services.ml_service.MLService._model_version_for', return_value='property:retrained'):
+            backfill._ml_service = None
+            fifth = backfill.run(batch_size=1000, max_batches=1)
+        assert fifth['rows'] == 1000 and fifth['checkpoint']['model_version'] == 'property:retrained'
+        assert fifth['checkpoint']['pass_completed_at'] is None
+    
+    def test_concurrent_edits_and_single_runner(self, backfill_app):
+        """Rows edited while a batch is scored are not overwritten, and a second runner backs off."""
+        from datetime import datetime
+        from app.extensions import cache
+        db, backfill = backfill_app
+        score = backfill._score
+        
+        def score_while_editing(ml_service, rows, trends):
+            values = score(ml_service, rows, trends)
+            db.session.execute(Property.__table__.update()
+                               .where(Property.listing_id == rows[0].listing_id)
+                               .values(updated_at=datetime.utcnow(), sqft=5000))
+            return values
+        
+        with patch.object(backfill, '_score', side_effect=score_while_editing):
+            result = backfill.run(batch_size=500, max_batches=2)
+        assert result['skipped'] == 2 and result['written'] == 998
+        assert db.session.get(Property, 'VB00000').ai_valuation is None
+        
+        cache.add(backfill.LOCK_KEY, 1)
+        assert backfill.run()['status'] == 'busy'
+        assert backfill.start(None) is False
+        cache.delete(backfill.LOCK_KEY)
+    
+    def test_endpoint_only_starts_incremental_runs(self, backfill_app):
+        """A full pass cannot be requested over HTTP; the endpoint starts the incremental job."""
+        from flask import current_app
+        from app.services.valuation_backfill import valuation_backfill
+        client = current_app.test_client()
+        
+        with patch.object(valuation_backfill, 'start', return_value=True) as start:
+            rejected = client.post('/api/properties/bulk-analyze', json={'full': True})
+            accepted = client.post('/api/properties/bulk-analyze', json={})
+        
+        assert rejected.status_code == 400
+        assert 'backfill-valuations --full' in rejected.get_json()['error']
+        assert accepted.status_code == 202 and accepted.get_json()['started'] is True
+        start.assert_called_once_with(current_app._get_current_object())
+    
+    def test_runners_share_the_checkpoint_row(self, backfill_app):
+        """Each batch continues from the stored watermark, and only the holder releases the lock."""
+        from sqlalchemy import select
+        from app.extensions import cache
+        from app.models.property import BackfillCheckpoint
+        db, backfill = backfill_app
+        keyset_order = select(Property.listing_id).order_by(Property.updated_at, Property.listing_id)
+        listing_ids = db.session.execute(keyset_order).scalars().all()
+        
+        def other_runner_moves_on(batch):
+            # Another process valued the next 500 rows and committed its watermark
+            if batch['batch'] == 1:
+                checkpoint = db.session.get(BackfillCheckpoint, backfill.JOB)
+                skip_to = db.session.get(Property, listing_ids[999])
+                checkpoint.watermark_updated_at = skip_to.updated_at
+                checkpoint.watermark_key = skip_to.listing_id
+                db.session.commit()
+                # ... and its lock replaced ours after ours expired
+                cache.set(backfill.LOCK_KEY, 'other-runner')
+        
+        result = backfill.run(batch_size=500, max_batches=2, progress=other_runner_moves_on)
+        
+        assert result['rows'] == 1000
+        valued = set(db.session.execute(
+            keyset_order.where(Property.ai_valuation.isnot(None))).scalars())
+        assert valued == set(listing_ids[:500]) | set(listing_ids[1000:1500])
+        assert cache.get(backfill.LOCK_KEY) == 'other-runner'
+        cache.delete(backfill.LOCK_KEY)
+    
+    def test_throughput_against_per_row_analysis(self, backfill_app):
+        """Batched scoring and executemany writes outpace the old bulk-analyze loop."""
+        db, backfill = backfill_app
+        ml_service = MLService()
+        targets = Property.query.order_by(Property.listing_id).limit(100).all()
+        
+        start_time = time.perf_counter()
+        for property_obj in targets:
+            prediction = ml_service.predict_property_price({
+                'bedrooms': property_obj.bedrooms, 'bathrooms': property_obj.bathrooms,
+                'square_feet': property_obj.sqft, 'city': property_obj.city,
+                'property_type': property_obj.property_type, 'province': property_obj.province
+            })
+            analysis = ml_service.analyze_property(property_obj)
+            property_obj.ai_valuation = prediction['predicted_price']
+            property_obj.investment_score = analysis.get('investment_score')
+        db.session.commit()
+        per_row_rate = len(targets) / (time.perf_counter() - start_time)
+        
+        result = backfill.run(batch_size=500)
+        print(f"\nValuations: per-row {per_row_rate:.0f} rows/s, backfill {result['rows_per_second']:.0f} rows/s")
+        
+        # The 100 rows just saved through the ORM got a new updated_at and are still settling
+        assert result['status'] == 'complete' and result['rows'] == 2900
+        assert result['rows_per_second'] > per_row_rate * 3
+
+
+class TestPredictionCachePerformance:
+    """Repeated valuations served from the feature-vector prediction cache."""
+    
+    @pytest.fixture
+    def prediction_app(self, app_factory, tmp_path):
+        """Application with a pickled gradient boosting model."""
+        import joblib
+        import numpy as np
+        from sklearn.ensemble import GradientBoostingRegressor
+        from app.services.prediction_cache import prediction_cache
+        
+        rng = np.random.default_rng(11)
+        X = rng.normal(size=(400, 26))
+        model = GradientBoostingRegressor(n_estimators=150, max_depth=4, random_state=0)
+        joblib.dump(model.fit(X, 700000 + 80000 * X[:, 2]), str(tmp_path / 'property_price_model.pkl'))
+        
+        app_factory(MODEL_PATH=str(tmp_path), USE_COMPILED_MODELS=False)
+        prediction_cache.clear()
+        yield prediction_cache
+        prediction_cache.clear()
+    
+    @staticmethod
+    def form(**overrides):
+        features = {
+            'bedrooms': 3, 'bathrooms': 2, 'square_feet': 1800, 'lot_size': 0.3,
+            'year_built': 2012, 'property_type': 'Detached', 'city': 'Toronto',
+            'province': 'ON', 'dom': 20, 'taxes': 6000
+        }
+        features.update(overrides)
+        return features
+    
+    def test_repeated_predictions_hit_cache(self, prediction_app):
+        """Identical submissions skip the model call and hit rates are counted."""
+        ml_service = MLService()
+        
+        start_time = time.perf_counter()
+        first = ml_service.predict_property_price(self.form())
+        cold_time = time.perf_counter() - start_time
+        assert first['prediction_method'] == 'ml_model'
+        
+        start_time = time.perf_counter()
+        for _ in range(200):
+            repeat = ml_service.predict_property_price(self.form())
+        warm_time = (time.perf_counter() - start_time) / 200
+        print(f"\nPrediction: cold {cold_time * 1e6:.0f}us, cached {warm_time * 1e6:.0f}us")
+        
+        assert repeat == first
+        assert warm_time < cold_time / 3
+        
+        # Responses are copies, so callers cannot change cached results
+        repeat['confidence_interval']['lower'] = 0
+        assert ml_service.predict_property_price(self.form()) == first
+        
+        # Equivalent inputs extract to the same vector; different ones miss
+        assert ml_service.predict_property_price(self.form(bedrooms='3')) == first
+        ml_service.predict_property_price(self.form(square_feet=2400))
+        
+        stats = prediction_app.get_stats()
+        assert 'prediction_cache' not in ml_service.get_model_metadata()
+        assert stats['misses'] == 2 and stats['hits'] == 202
+        assert stats['hit_rate'] == pytest.approx(202 / 204)
+    
+    def test_shared_tier_and_model_switch(self, prediction_app):
+        """Other workers reuse shared entries, and switch_model stops serving old results."""
+        import numpy as np
+        from sklearn.linear_model import Ridge
+        prediction_cache = prediction_app
+        ml_service = MLService()
+        first = ml_service.predict_property_price(self.form())
+        
+        # A second worker starts with an empty local tier
+        prediction_cache._local.clear()
+        assert MLService().predict_property_price(self.form()) == first
+        assert prediction_cache.get_stats()['shared_hits'] == 1
+        
+        rng = np.random.default_rng(5)
+        X = rng.normal(size=(100, 26))
+        ridge = Ridge().fit(X, 400000 + 10000 * X[:, 0])
+        with patch('app.services.ml_service.joblib.load', return_value=ridge), \
+                patch('app.services.ml_service.os.path.exists', return_value=True), \
+                patch.object(MLService, '_model_version_for', return_value='ridge:retrained'):
+            assert ml_service.switch_model('ridge')
+        
+        with patch.object(ml_service, '_load_models'):  # Keep the switched model
+            switched = ml_service.predict_property_price(self.form())
+        assert switched['predicted_price'] != first['predicted_price']
+        stats = prediction_cache.get_stats()
+        assert stats['invalidations'] == 1 and stats['size'] == 1
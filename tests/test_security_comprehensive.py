@@ -966,6 +966,441 @@ class TestSecurityConfiguration:
             pytest.skip("Security logging module not available")
 
 
+class TestIPGeolocationDatabase:
+    """Test the memory-mapped IP geolocation database."""
+    
+    def build_database(self, tmp_path):
+        """Build a small database from CSV rows."""
+        from app.security.ip_geolocation import build_geo_database, IPGeoDatabase
+        
+        csv_path = tmp_path / 'geo.csv'
+        csv_path.write_text(
+            "network,country,province,city,timezone,postal_code,isp,latitude,longitude\n"
+            "142.1.0.0/16,CA,ON,Toronto,America/Toronto,M5V,Rogers,43.65,-79.38\n"
+            "24.80.0.0/16,CA,BC,Vancouver,America/Vancouver,,Shaw,49.28,-123.12\n"
+            "8.8.8.0/24,US,,,,,Google,,\n"
+            "142.1.5.0/24,CA,ON,Overlap,,,,,\n"
+            "not-an-ip,CA,,,,,,,\n"
+        )
+        db_path = tmp_path / 'canada-ip.npgeo'
+        counts = build_geo_database(str(csv_path), str(db_path))
+        return counts, IPGeoDatabase(str(db_path))
+    
+    def test_build_and_lookup(self, tmp_path):
+        """Test CSV compilation and range lookups."""
+        counts, geo_db = self.build_database(tmp_path)
+        
+        assert counts['records'] == 3
+        assert counts['invalid'] == 1
+        assert counts['overlapping'] == 1
+        
+        toronto = geo_db.lookup('142.1.200.7')
+        assert toronto['city'] == 'Toronto'
+        assert toronto['province'] == 'ON'
+        assert toronto['latitude'] == pytest.approx(43.65, abs=1e-4)
+        
+        assert geo_db.lookup('24.80.255.255')['postal_code'] is None
+        assert geo_db.lookup('8.8.8.8')['country'] == 'US'
+        assert geo_db.lookup('1.1.1.1') is None
+        assert geo_db.lookup('invalid') is None
+        geo_db.close()
+    
+    def test_limiter_uses_database(self, tmp_path):
+        """Test that the geographic limiter resolves locations from the database."""
+        from app.security.geographic_rate_limiter import GeographicRateLimiter
+        
+        _, geo_db = self.build_database(tmp_path)
+        limiter = GeographicRateLimiter(geo_database_path=geo_db.path)
+        
+        location = limiter.get_client_location('client-1', '142.1.2.3')
+        assert location.country == 'CA'
+        assert location.city == 'Toronto'
+        
+        foreign = limiter.get_client_location('client-2', '8.8.8.8')
+        assert foreign.country == 'US'
+        assert foreign.is_proxy
+        
+        stats = limiter.get_geographic_status()
+        assert stats['geo_database']['records'] == 3
+        assert stats['location_cache']['size'] == 2
+    
+    def test_limiter_reads_database_path_from_config(self, tmp_path):
+        """Test that GEOIP_DATABASE_PATH is taken from the app config when one is active."""
+        from app.security.geographic_rate_limiter import GeographicRateLimiter
+        
+        _, geo_db = self.build_database(tmp_path)
+        app = Flask(__name__)
+        app.config['GEOIP_DATABASE_PATH'] = geo_db.path
+        with patch.dict(os.environ, {'GEOIP_DATABASE_PATH': str(tmp_path / 'missing.npgeo')}):
+            with app.app_context():
+                limiter = GeographicRateLimiter()
+            assert limiter.geo_database_path == geo_db.path
+            assert limiter.get_client_location('client-1', '142.1.2.3').city == 'Toronto'
+            
+            # Outside an app context the environment still applies
+            assert GeographicRateLimiter().geo_database_path == str(tmp_path / 'missing.npgeo')
+
+
+class TestStreamingRequestStats:
+    """Test streaming accumulators used by abuse pattern analysis."""
+    
+    def test_window_summary_matches_exact_values(self):
+        """Test that merged bucket statistics match exact computation."""
+        import statistics
+        from app.security.streaming_stats import WindowedRequestStats
+        
+        stats = WindowedRequestStats(window=300)
+        now = time.time()
+        response_times = []
+        for i in range(600):
+            response_time = (i * 37) % 250
+            response_times.append(response_time)
+            stats.record(now - (i % 200), f'/api/auth/{i % 12}', 401 if i % 3 == 0 else 200,
+                         response_time, f'agent-{i % 4}', json.dumps({'page': i % 25}))
+        
+        summary = stats.summarize(now)
+        assert summary.request_count == 600
+        assert summary.error_count == 200
+        assert summary.failed_auth_count == 200
+        assert summary.response_time_variance == pytest.approx(statistics.pvariance(response_times))
+        assert summary.unique_endpoints == pytest.approx(12, abs=1)
+        assert summary.parameter_variations == pytest.approx(25, abs=2)
+        assert summary.unique_user_agents == 4
+    
+    def test_expired_buckets_leave_window(self):
+        """Test that requests older than the window are expired."""
+        from app.security.streaming_stats import WindowedRequestStats
+        
+        stats = WindowedRequestStats(window=300)
+        now = time.time()
+        stats.record(now - 1000, '/old', 200, 10, 'agent', '{}')
+        stats.record(now, '/new', 200, 10, 'agent', '{}')
+        
+        assert stats.request_count(now) == 1
+        assert stats.summarize(now + 400).request_count == 0
+    
+    def test_idle_clients_swept_off_the_request_path(self):
+        """Test that idle client statistics are dropped by a background sweep, not by requests."""
+        from app.security.abuse_detection import AbuseDetectionRateLimiter
+        
+        detector = AbuseDetectionRateLimiter()
+        try:
+            with patch.object(detector, 'cleanup_inactive_clients') as cleanup:
+                for i in range(2500):
+                    detector.record_request(f'ip:10.0.{i % 50}.1', {'endpoint': '/api/properties'})
+            assert not cleanup.called
+            assert detector._cleanup_thread.is_alive()
+            
+            detector.stop_cleanup()
+            detector.CLEANUP_INTERVAL = 0.01
+            detector.client_stats['ip:10.0.0.1'].last_seen = time.time() - 1000
+            detector.record_request('ip:10.0.1.1', {'endpoint': '/api/properties'})
+            deadline = time.time() + 5
+            while 'ip:10.0.0.1' in detector.client_stats and time.time() < deadline:
+                time.sleep(0.01)
+            assert 'ip:10.0.0.1' not in detector.client_stats
+            assert len(detector.client_stats) == 49
+        finally:
+            detector.stop_cleanup()
+
+
+def _rule_samples(parsed, limit=32):
+    """Shortest strings for each alternative of a parsed regex (bounded)."""
+    try:
+        from re import _constants as sre_constants
+    except ImportError:  # Python < 3.11
+        import sre_constants
+    categories = {
+        sre_constants.CATEGORY_DIGIT: '0', sre_constants.CATEGORY_NOT_DIGIT: 'a',
+        sre_constants.CATEGORY_SPACE: ' ', sre_constants.CATEGORY_NOT_SPACE: 'a',
+        sre_constants.CATEGORY_WORD: 'a', sre_constants.CATEGORY_NOT_WORD: ' ',
+    }
+    
+    def pick(items):
+        if items[0][0] is sre_constants.NEGATE:
+            return next(char for char in 'ax0 _-"' if not any(
+                (op is sre_constants.LITERAL and chr(av) == char) or
+                (op is sre_constants.RANGE and av[0] <= ord(char) <= av[1]) or
+                (op is sre_constants.CATEGORY and categories[av] == char)
+                for op, av in items[1:]
+            ))
+        op, av = items[0]
+        if op is sre_constants.LITERAL:
+            return chr(av)
+        if op is sre_constants.RANGE:
+            return chr(av[0])
+        return categories[av]
+    
+    samples = ['']
+    for op, av in parsed:
+        if op is sre_constants.LITERAL:
+            options = [chr(av)]
+        elif op is sre_constants.NOT_LITERAL:
+            options = ['b' if av == ord('a') else 'a']
+        elif op is sre_constants.ANY:
+            options = ['a']
+        elif op is sre_constants.IN:
+            options = [pick(av)]
+        elif op is sre_constants.BRANCH:
+            options = [sample for branch in av[1] for sample in _rule_samples(branch, limit)]
+        elif op is sre_constants.SUBPATTERN:
+            options = _rule_samples(av[-1], limit)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            minimum, _, sub = av
+            options = [sample * minimum for sample in _rule_samples(sub, limit)] if minimum else ['']
+        else:  # Anchors and lookarounds
+            options = ['']
+        samples = [prefix + option for prefix in samples for option in options][:limit]
+    return samples
+
+
+class TestEnhancedSecurityPipeline:
+    """Test the tiered security pipeline in EnhancedSecurityManager."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        from app.security.enhanced_integration import EnhancedSecurityManager
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.manager = EnhancedSecurityManager()
+    
+    def test_benign_request_skips_deep_analysis(self):
+        """Test that clean payloads never reach the expensive analyzers."""
+        with self.app.test_request_context('/search?city=Toronto&beds=3', method='POST',
+                                           data={'notes': 'Close to transit, 2 parking spots'}):
+            report = self.manager.analyze_request('public')
+            
+            assert report.prefilter_flagged == 0
+            assert report.validation_reports == {}
+            assert 'xss' not in report.stage_timings
+            assert 'validation' not in report.stage_timings
+            assert 'behavioral' in report.stage_timings
+            assert g.security_payload.fields['city'] == 'Toronto'
+    
+    def test_flagged_field_is_analyzed(self):
+        """Test that only pre-filter hits are validated and threats still surface."""
+        with self.app.test_request_context('/contact', method='POST',
+                                           data={'name': 'Jane', 'comment': '<script>alert(1)</script>'}):
+            report = self.manager.analyze_request('public')
+            
+            assert report.prefilter_flagged == 1
+            assert list(report.validation_reports) == ['comment']
+            assert report.overall_threat_level.value >= ThreatLevel.HIGH.value
+    
+    def test_json_payload_parsed_once(self):
+        """Test that JSON bodies are flattened once and shared through g."""
+        with self.app.test_request_context('/api/data', method='POST',
+                                           json={'profile': {'bio': 'javascript:alert(1)'}}):
+            report = self.manager.analyze_request('api')
+            
+            assert 'profile.bio' in report.validation_reports
+            assert g.security_payload.json_fields == {'profile.bio': 'javascript:alert(1)'}
+    
+    def test_penalty_bucket_exits_early(self):
+        """Test that rate-limited IPs exhaust their bucket before deep analysis."""
+        self.manager._apply_rate_limit('127.0.0.1')
+        
+        reports = []
+        for _ in range(self.manager.PENALTY_BUCKET_CAPACITY + 1):
+            with self.app.test_request_context('/', environ_base={'REMOTE_ADDR': '127.0.0.1'}):
+                reports.append(self.manager.analyze_request('public'))
+        
+        assert 'rate_limit_exceeded' in reports[-1].actions_taken
+        assert 'behavioral' not in reports[-1].stage_timings
+        assert all('rate_limit_exceeded' not in r.actions_taken for r in reports[:-1])
+    
+    def test_oversized_payload_rejected(self):
+        """Test that payloads over the context limit are rejected without parsing."""
+        self.manager.context_configs['public'].max_payload_bytes = 100
+        with self.app.test_request_context('/', method='POST', data={'text': 'x' * 500}):
+            report = self.manager.analyze_request('public')
+            
+            assert 'payload_too_large' in report.actions_taken
+            assert 'parse' not in report.stage_timings
+    
+    def test_chunked_payload_size_is_measured(self):
+        """Test that bodies without a Content-Length are measured against the limit."""
+        import io
+        self.manager.context_configs['public'].max_payload_bytes = 100
+        for size, rejected in ((500, True), (50, False)):
+            body = b'x' * size
+            with self.app.test_request_context('/', method='POST', content_type='text/plain',
+                                               headers={'Transfer-Encoding': 'chunked'},
+                                               input_stream=io.BytesIO(body),
+                                               # Set by WSGI servers that decode chunked bodies
+                                               environ_base={'wsgi.input_terminated': True}):
+                assert request.content_length is None
+                report = self.manager.analyze_request('public')
+                
+                assert ('payload_too_large' in report.actions_taken) is rejected
+                assert request.get_data() == body  # Still readable by the route
+    
+    def test_rejections_abort_in_every_context(self):
+        """Test that penalty and size rejections return 429 and 413 on public routes."""
+        from werkzeug.exceptions import RequestEntityTooLarge, TooManyRequests
+        self.manager.context_configs['public'].max_payload_bytes = 100
+        view = self.manager.create_security_decorator('public')(lambda: 'ok')
+        
+        with self.app.test_request_context('/', method='POST', data={'text': 'x' * 500}):
+            with pytest.raises(RequestEntityTooLarge):
+                view()
+            assert g.security_report.rejection_status == 413
+        
+        self.manager._apply_rate_limit('127.0.0.1')
+        self.manager.penalty_buckets['127.0.0.1'] = (0.0, time.time())
+        with self.app.test_request_context('/', environ_base={'REMOTE_ADDR': '127.0.0.1'}):
+            with pytest.raises(TooManyRequests):
+                view()
+    
+    def test_top_level_json_array_is_analyzed(self):
+        """Test that array bodies are flattened by index instead of skipped."""
+        with self.app.test_request_context('/api/data', method='POST',
+                                           json=[{'bio': 'fine'}, {'bio': '<script>alert(1)</script>'}]):
+            report = self.manager.analyze_request('api')
+            
+            assert g.security_payload.json_fields == {
+                '0.bio': 'fine', '1.bio': '<script>alert(1)</script>'
+            }
+            assert list(report.validation_reports) == ['1.bio']
+            assert report.overall_threat_level.value >= ThreatLevel.HIGH.value
+    
+    def test_metrics_include_stage_timings(self):
+        """Test that per-stage timings are aggregated in metrics."""
+        with self.app.test_request_context('/', method='POST', data={'q': '<b>hi</b>'}):
+            self.manager.analyze_request('public')
+        with self.app.test_request_context('/', method='POST', data={'q': 'hello'}):
+            self.manager.analyze_request('public')
+        
+        metrics = self.manager.get_security_metrics()
+        assert metrics['deep_scanned_requests'] == 1
+        assert metrics['stage_timings']['blocklist']['count'] == 2
+        assert metrics['stage_timings']['validation']['count'] == 1
+        assert metrics['stage_timings']['parse']['avg_ms'] >= 0.0
+    
+    def test_prefilter_passes_every_analyzer_rule(self):
+        """Test that a match for any analyzer rule or keyword is never pre-filtered out."""
+        try:
+            from re import _parser as sre_parse
+        except ImportError:  # Python < 3.11
+            import sre_parse
+        from app.security.advanced_xss import advanced_xss
+        from app.security.advanced_validation import advanced_validator
+        from app.security.enhanced_integration import PREFILTER_PATTERN
+        
+        missed = []
+        for scanner in (advanced_xss.pattern_scanner, advanced_validator.pattern_scanner):
+            for rule in scanner.rules:
+                samples = [sample for sample in _rule_samples(sre_parse.parse(rule.pattern, rule.regex.flags))
+                           if rule.regex.search(sample)]
+                assert samples, f"no sample generated for {rule.pattern!r}"
+                missed.extend((rule.pattern, sample) for sample in samples
+                              if not PREFILTER_PATTERN.search(sample))
+        missed.extend((keyword, keyword) for keyword in advanced_xss.suspicious_keywords
+                      if not PREFILTER_PATTERN.search(keyword))
+        assert missed == []
+    
+    def test_cheap_checks_run_before_abuse_detection(self):
+        """Test that blocklisted and penalized clients are rejected before pattern analysis."""
+        from app.security.abuse_detection import AbuseDetectionMiddleware
+        self.manager.init_app(self.app)
+        abuse = AbuseDetectionMiddleware(app=self.app)
+        view = self.manager.create_security_decorator('public')(lambda: 'ok')
+        self.app.add_url_rule('/listing', 'listing', view)
+        client = self.app.test_client()
+        
+        with patch.object(abuse.abuse_detector, 'check_abuse_rate_limit',
+                          return_value=(True, 0, None)) as check_abuse:
+            self.manager.blocked_ips.add('10.0.0.1')
+            assert client.get('/listing', environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 403
+            assert not check_abuse.called
+            
+            # One penalty token per request, shared by the hook and the route decorator
+            self.manager._apply_rate_limit('10.0.0.2')
+            statuses = [client.get('/listing?page=2', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code
+                        for _ in range(self.manager.PENALTY_BUCKET_CAPACITY + 1)]
+            assert statuses == [200] * self.manager.PENALTY_BUCKET_CAPACITY + [429]
+            assert check_abuse.call_count == self.manager.PENALTY_BUCKET_CAPACITY
+        
+        stats = abuse.abuse_detector.client_stats['ip:10.0.0.2']
+        assert stats.request_count(time.time()) == self.manager.PENALTY_BUCKET_CAPACITY
+
+
+class TestVerdictCache:
+    """Test the content-hash verdict cache shared by the analyzers."""
+    
+    class FakeRedis:
+        """Minimal in-memory stand-in for the Redis get/setex calls."""
+        
+        def __init__(self):
+            self.store = {}
+        
+        def get(self, key):
+            return self.store.get(key)
+        
+        def setex(self, key, ttl, value):
+            self.store[key] = value
+    
+    def setup_method(self):
+        """Give each test a private cache."""
+        from app.security.verdict_cache import VerdictCache
+        self.cache = VerdictCache(maxsize=100, ttl=60)
+        self.xss = AdvancedXSSProtection()
+        self.xss.verdict_cache = self.cache
+        self.validator = AdvancedInputValidator()
+        self.validator.verdict_cache = self.cache
+    
+    def test_repeated_content_hits_cache(self):
+        """Test that identical content is analyzed once per context."""
+        payload = '<img src=x onerror=alert(1)>'
+        first = self.xss.analyze_content(payload, Context.HTML)
+        second = self.xss.analyze_content(payload, Context.HTML)
+        self.xss.analyze_content(payload, Context.JSON)
+        
+        assert second.score == first.score
+        assert second.threat_level == first.threat_level
+        stats = self.cache.get_stats()['namespaces']['xss']
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+    
+    def test_cached_verdicts_are_not_mutated_by_callers(self):
+        """Test that extending a returned verdict leaves the cached one intact."""
+        first = self.xss.analyze_content('<script>alert(1)</script>', Context.HTML)
+        first.patterns_detected.append('suspicious_file_type')
+        
+        second = self.xss.analyze_content('<script>alert(1)</script>', Context.HTML)
+        assert 'suspicious_file_type' not in second.patterns_detected
+    
+    def test_validation_keyed_by_field_context(self):
+        """Test that the field name is part of the validation cache key."""
+        as_email = self.validator.validate_input('not-an-email', InputType.TEXT, context='email')
+        as_notes = self.validator.validate_input('not-an-email', InputType.TEXT, context='notes')
+        
+        assert as_email.threat_score != as_notes.threat_score
+        assert self.cache.get_stats()['namespaces']['validation']['misses'] == 2
+    
+    def test_redis_backing_shares_verdicts(self):
+        """Test that a second worker reuses verdicts stored in Redis."""
+        from app.security.verdict_cache import VerdictCache
+        redis_client = self.FakeRedis()
+        self.cache.configure(redis_client=redis_client)
+        original = self.validator.validate_input("1' OR '1'='1", context='search')
+        
+        other_worker = VerdictCache(maxsize=100, ttl=60, redis_client=redis_client)
+        self.validator.verdict_cache = other_worker
+        shared = self.validator.validate_input("1' OR '1'='1", context='search')
+        
+        assert shared.result == original.result
+        assert shared.threat_score == original.threat_score
+        assert shared.patterns_detected == original.patterns_detected
+        assert other_worker.get_stats()['namespaces']['validation']['redis_hits'] == 1
+    
+    def test_oversized_content_bypasses_cache(self):
+        """Test that very large inputs are analyzed without being cached."""
+        large = 'a' * (self.cache.MAX_CACHEABLE_LENGTH + 1)
+        self.xss.analyze_content(large, Context.TEXT)
+        
+        assert self.cache.get_stats()['size'] == 0
+
 if __name__ == '__main__':
     # Run tests with verbose output
     pytest.main([
@@ -22,6 +22,7 @@ import psutil
 import random
 import string
 import statistics
+import numpy as np
 import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch, MagicMock
@@ -113,6 +114,27 @@ except ImportError as e:
     BehavioralAnalyzer = MockBehavioralAnalyzer
     RequestSignature = MockRequestSignature
 
+try:
+    from app.security.geographic_rate_limiter import GeographicRateLimiter, CompiledIPRangeSet
+except ImportError as e:
+    print(f"Warning: Could not import geographic_rate_limiter: {e}")
+    GeographicRateLimiter = None
+    CompiledIPRangeSet = None
+
+try:
+    from app.security.pattern_scanner import MultiPatternScanner, fold_case
+except ImportError as e:
+    print(f"Warning: Could not import pattern_scanner: {e}")
+    MultiPatternScanner = None
+
+try:
+    from app.security.predictive_rate_limiter import (
+        PredictiveRateLimiter, PredictionModel, RequestTimeRing
+    )
+except ImportError as e:
+    print(f"Warning: Could not import predictive_rate_limiter: {e}")
+    PredictiveRateLimiter = None
+
 
 class TestSecurityPerformance:
     """Performance test suite for security components."""
@@ -630,5 +652,520 @@ class TestSecurityEdgeCases:
         assert success_rate > 0.9  # At least 90% success rate
 
 
+@pytest.mark.skipif(GeographicRateLimiter is None, reason="geographic_rate_limiter not available")
+class TestGeographicIPMatchingPerformance:
+    """Microbenchmarks for compiled IP range matching."""
+    
+    def generate_ranges(self, count=5000):
+        """Generate random IPv4 /24 and /28 ranges plus a few IPv6 ranges."""
+        ranges = set()
+        while len(ranges) < count:
+            prefix = random.choice([24, 28])
+            octets = [random.randint(1, 223), random.randint(0, 255), random.randint(0, 255), 0]
+            ranges.add(f"{'.'.join(map(str, octets))}/{prefix}")
+        ranges.update(['2001:db8::/32', '2607:f8b0::/32'])
+        return list(ranges)
+    
+    def test_compiled_ranges_match_linear_scan(self):
+        """Compiled matcher must agree with ipaddress network membership."""
+        import ipaddress
+        
+        ranges = self.generate_ranges(2000)
+        networks = [ipaddress.ip_network(r, strict=False) for r in ranges]
+        compiled = CompiledIPRangeSet(ranges)
+        
+        samples = [f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}"
+                   for _ in range(500)]
+        # Guarantee some hits
+        samples.extend(str(n.network_address + 1) for n in networks[:100] if n.version == 4)
+        samples.extend(['2001:db8::1', '2607:f8b0:4000::1', '::1'])
+        
+        for sample in samples:
+            ip = ipaddress.ip_address(sample)
+            expected = any(ip in network for network in networks if network.version == ip.version)
+            assert compiled.contains(ip) == expected, sample
+    
+    def test_blocked_range_lookup_performance(self):
+        """Blocked-range checks should stay fast with thousands of ranges."""
+        limiter = GeographicRateLimiter()
+        limiter.blocked_ranges.update(self.generate_ranges(5000))
+        limiter.rebuild_ip_ranges()
+        
+        samples = [f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}"
+                   for _ in range(20000)]
+        
+        start_time = time.perf_counter()
+        for sample in samples:
+            limiter._is_ip_blocked(sample)
+        cold_time = time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        for sample in samples[:5000]:
+            limiter._is_ip_blocked(sample)
+        warm_time = time.perf_counter() - start_time
+        
+        print(f"\nGeographic IP Matching Performance (5000 ranges):")
+        print(f"Cold lookups: {len(samples) / cold_time:.0f}/second")
+        print(f"Cached lookups: {5000 / warm_time:.0f}/second")
+        
+        assert cold_time / len(samples) < 0.0005  # Less than 0.5ms per uncached lookup
+        assert len(limiter._ip_verdicts) <= limiter.IP_VERDICT_CACHE_SIZE
+    
+    def test_block_list_updates_invalidate_verdicts(self):
+        """Adding or removing a blocked range must take effect immediately."""
+        limiter = GeographicRateLimiter()
+        assert not limiter._is_ip_blocked('142.10.20.30')
+        
+        limiter.add_blocked_ip_range('142.10.0.0/16')
+        assert limiter._is_ip_blocked('142.10.20.30')
+        assert limiter._is_canadian_ip('142.10.20.30')
+        
+        limiter.remove_blocked_ip_range('142.10.0.0/16')
+        assert not limiter._is_ip_blocked('142.10.20.30')
+
+
+@pytest.mark.skipif(MultiPatternScanner is None, reason="pattern_scanner not available")
+class TestPatternScannerPerformance:
+    """Benchmarks for the compiled multi-pattern scanner."""
+    
+    ATTACK_FRAGMENTS = [
+        "<script>alert(1)</script>", "<SCRIPT src=x/>", "JaVaScRiPt :", "onerror=alert(1)",
+        "onclick = 'x'", "eval (", "document.write(", "&#x3c;", "&#60;", "%3C", "\\u003c",
+        " OR 1=1", "' or '1'='1", "UNION ALL SELECT", "; ls ", "| nc ", "sleep(5)",
+        "<iframe>", "<style>x</style>", "expression(", "-moz-binding", "\u017fcript",
+        "<\u017fcript>", "\u0130nnerHTML", "PHNjcmlwdD5hbGVydCgxKTwvc2NyaXB0Pg==",
+    ]
+    BENIGN_FRAGMENTS = ["Toronto", "condo", "on", "or", "and", "(", ")", "=", "'", "%", "&", " ", "\n"]
+    
+    @staticmethod
+    def naive_score(pattern_groups, content):
+        """Reference implementation: one re.findall per pattern."""
+        import re
+        score, labels = 0.0, []
+        for prefix, groups in pattern_groups:
+            for category, info in groups.items():
+                for pattern in info['patterns']:
+                    matches = re.findall(pattern, content, re.IGNORECASE | re.DOTALL)
+                    if matches:
+                        score += info.get('weight', info.get('score')) * len(matches)
+                        labels.append(f"{prefix}_{category}")
+        return score, labels
+    
+    def realistic_payload(self, listings):
+        """JSON body resembling a bulk property submission."""
+        import json
+        words = ['spacious', 'condo', 'near', 'transit', 'with', 'and', 'on', 'or', 'select',
+                 'modern', 'kitchen', '(2', 'parking)', 'downtown', 'Toronto']
+        return json.dumps([
+            {'id': i, 'city': 'Toronto', 'price': 650000 + i,
+             'description': ' '.join(random.choice(words) for _ in range(40))}
+            for i in range(listings)
+        ])
+    
+    def test_validator_scan_matches_per_pattern_findall(self):
+        """Scanner scores and labels must equal the per-pattern reference."""
+        validator = AdvancedInputValidator()
+        groups = [('xss', validator.xss_patterns), ('sqli', validator.sqli_patterns),
+                  ('cmdi', validator.command_injection_patterns)]
+        fragments = self.ATTACK_FRAGMENTS + self.BENIGN_FRAGMENTS
+        
+        for _ in range(2000):
+            content = ''.join(random.choice(fragments) for _ in range(random.randint(1, 8)))
+            assert validator._detect_patterns(content) == self.naive_score(groups, content), content
+    
+    def test_xss_scan_matches_per_pattern_findall(self):
+        """XSS pattern scores must equal the per-pattern reference."""
+        xss = AdvancedXSSProtection()
+        fragments = self.ATTACK_FRAGMENTS + self.BENIGN_FRAGMENTS
+        
+        for _ in range(2000):
+            content = ''.join(random.choice(fragments) for _ in range(random.randint(1, 8)))
+            expected, _ = self.naive_score([('', xss.xss_patterns)], content)
+            score, _ = xss.pattern_scanner.score(content)
+            assert score == expected, content
+    
+    def test_case_fold_table_covers_ignorecase(self):
+        """Every non-ASCII character re.IGNORECASE equates with ASCII must fold to it."""
+        import re
+        chars = ''.join(chr(c) for c in range(0x80, 0x110000) if not 0xD800 <= c < 0xE000)
+        for char in re.findall(r'[a-z]', chars, re.IGNORECASE):
+            folded = fold_case(char)
+            assert folded.isascii() and re.fullmatch(folded, char, re.IGNORECASE), hex(ord(char))
+    
+    def test_scan_performance_on_realistic_payloads(self):
+        """Scanning benign bodies should beat one findall per pattern."""
+        validator = AdvancedInputValidator()
+        groups = [('xss', validator.xss_patterns), ('sqli', validator.sqli_patterns),
+                  ('cmdi', validator.command_injection_patterns)]
+        
+        print(f"\nPattern Scanner Performance:")
+        for listings in (5, 50, 500):
+            payload = self.realistic_payload(listings)
+            assert validator._detect_patterns(payload) == self.naive_score(groups, payload)
+            
+            start_time = time.perf_counter()
+            for _ in range(5):
+                self.naive_score(groups, payload)
+            naive_time = (time.perf_counter() - start_time) / 5
+            
+            start_time = time.perf_counter()
+            for _ in range(5):
+                validator._detect_patterns(payload)
+            scan_time = (time.perf_counter() - start_time) / 5
+            
+            print(f"{len(payload):>8} bytes: per-pattern {naive_time * 1000:.2f}ms, "
+                  f"scanner {scan_time * 1000:.2f}ms")
+            if listings >= 50:
+                assert scan_time < naive_time
+
+
+
+class TestBatchValidationPerformance:
+    """Benchmarks for vectorized batch input validation."""
+    
+    FRAGMENTS = TestPatternScannerPerformance.ATTACK_FRAGMENTS + [
+        "Toronto", "condo", "3 bedrooms", "(2 parking)", "\u00e9", "\u6f22\u5b57", " ", "=", ";"
+    ]
+    
+    def random_fields(self, count):
+        return {
+            f"field_{i}": ''.join(random.choice(self.FRAGMENTS) for _ in range(random.randint(1, 12)))
+            for i in range(count)
+        }
+    
+    @staticmethod
+    def fresh_validator():
+        from app.security.verdict_cache import VerdictCache
+        validator = AdvancedInputValidator()
+        validator.verdict_cache = VerdictCache()
+        return validator
+    
+    @staticmethod
+    def reference_features(input_str):
+        """Reference implementation: the per-string feature extraction batch_validate replaced."""
+        import re
+        from collections import Counter
+        features = [len(input_str)] + [input_str.count(c) for c in ['<', '>', '(', ')', '"', "'", '=', ';', '&', '%', '\\']]
+        
+        char_counts = Counter(input_str.lower())
+        total_chars = len(input_str)
+        if total_chars > 0:
+            features.extend(char_counts.get(c, 0) / total_chars for c in 'script')
+        else:
+            features.extend([0.0] * 6)
+        
+        input_lower = input_str.lower()
+        keywords = ['script', 'javascript', 'eval', 'alert', 'document', 'window', 'location', 'cookie',
+                    'onload', 'onerror', 'union', 'select', 'insert', 'delete', 'drop', 'exec', 'system',
+                    'cmd', 'shell']
+        features.extend(1.0 if keyword in input_lower else 0.0 for keyword in keywords)
+        trigrams = ['scr', 'ipt', 'eva', 'ale', 'ert', 'uni', 'ion', 'sel']
+        features.extend(1.0 if trigram in input_lower else 0.0 for trigram in trigrams)
+        
+        features.extend([
+            1.0 if re.search(r'%[0-9a-f]{2}', input_str, re.IGNORECASE) else 0.0,
+            1.0 if re.search(r'&#\d+;', input_str) else 0.0,
+            1.0 if re.search(r'\\u[0-9a-f]{4}', input_str, re.IGNORECASE) else 0.0,
+            1.0 if re.search(r'\\x[0-9a-f]{2}', input_str, re.IGNORECASE) else 0.0,
+        ])
+        features.extend([
+            input_str.count('http://') + input_str.count('https://'),
+            len(re.findall(r'<[^>]+>', input_str)),
+            len(re.findall(r'\b\w+\s*\(', input_str)),
+        ])
+        return np.array(features, dtype=np.float32)
+    
+    @staticmethod
+    def reference_ml_score(features):
+        """Reference implementation: the per-vector heuristic score."""
+        normalized = features / (np.linalg.norm(features) + 1e-8)
+        weights = np.array([2.0, 5.0, 5.0, 3.0, 3.0, 2.0, 2.0, 3.0, 4.0, 2.0, 3.0, 3.0]
+                           + [1.0] * (len(normalized) - 12))
+        score = np.dot(normalized, weights)
+        return float(10 / (1 + np.exp(-score + 5)))
+    
+    def test_batch_features_match_reference_extraction(self):
+        """Rows of the batch feature matrix equal the per-string reference extraction and score."""
+        validator = self.fresh_validator()
+        inputs = list(self.random_fields(300).values()) + [
+            '', 'a', '\U0001f600<b>', '%3Cscript%3E', '&#60;img src=x onerror=alert(1)&#62;',
+            '\\u003c \\x3c', 'see https://example.com/a?b=c and http://x.y', 'SeLeCt * FrOm t'
+        ]
+        features = validator._extract_features_batch(inputs)
+        scores = validator._ml_predict_batch(features)
+        
+        for row, input_str in enumerate(inputs):
+            expected = self.reference_features(input_str)
+            assert np.array_equal(features[row], expected), input_str
+            # The reference normalizes in float32, the batch kernel in float64
+            assert scores[row] == pytest.approx(self.reference_ml_score(expected), rel=1e-5), input_str
+            single = validator._extract_features(input_str, InputType.TEXT)
+            assert validator._ml_predict(single, InputType.TEXT) == scores[row], input_str
+    
+    def test_batch_validate_matches_per_field(self):
+        """batch_validate must return the same verdicts as validating each field."""
+        fields = self.random_fields(300)
+        fields['empty'] = ''
+        batch = self.fresh_validator().batch_validate(fields)
+        single = self.fresh_validator()
+        
+        assert list(batch) == list(fields)
+        for name, value in fields.items():
+            expected = single.validate_input(value, InputType.TEXT, context=name)
+            actual = batch[name]
+            assert (actual.result, actual.threat_score, actual.patterns_detected,
+                    actual.ml_prediction, actual.sanitized_input) == \
+                   (expected.result, expected.threat_score, expected.patterns_detected,
+                    expected.ml_prediction, expected.sanitized_input), name
+    
+    def test_batch_validate_performance(self):
+        """Validating a large form in one batch must beat per-field validation."""
+        fields = self.random_fields(200)
+        values = list(fields.values())
+        validator = self.fresh_validator()
+        single_times, batch_times, reference_times, extract_times = [], [], [], []
+        
+        for _ in range(3):
+            start_time = time.perf_counter()
+            single = self.fresh_validator()
+            for name, value in fields.items():
+                single.validate_input(value, InputType.TEXT, context=name)
+            single_times.append(time.perf_counter() - start_time)
+            
+            start_time = time.perf_counter()
+            self.fresh_validator().batch_validate(fields)
+            batch_times.append(time.perf_counter() - start_time)
+            
+            start_time = time.perf_counter()
+            for value in values:
+                self.reference_features(value)
+            reference_times.append(time.perf_counter() - start_time)
+            
+            start_time = time.perf_counter()
+            validator._extract_features_batch(values)
+            extract_times.append(time.perf_counter() - start_time)
+        
+        single_time, batch_time = min(single_times), min(batch_times)
+        reference_time, extract_time = min(reference_times), min(extract_times)
+        print(f"\nBatch Validation Performance ({len(fields)} fields):")
+        print(f"Per-field: {single_time * 1000:.2f}ms, batch: {batch_time * 1000:.2f}ms")
+        print(f"Per-string extraction: {reference_time * 1000:.2f}ms, batch: {extract_time * 1000:.2f}ms")
+        assert batch_time < single_time
+        assert extract_time < reference_time
+
+@pytest.mark.skipif(PredictiveRateLimiter is None, reason="predictive_rate_limiter not available")
+class TestPredictiveRateLimiterModels:
+    """Vectorized prediction models against the per-request reference models."""
+    
+    NOW = 1_700_000_000.0
+    CATEGORIES = ['search_api', 'property_details', 'user_uploads']
+    
+    # Reference implementations: the list-based models the vectorized kernels replaced
+    
+    @staticmethod
+    def reference_linear_regression(timestamps, window):
+        buckets = {}
+        for t in timestamps:
+            bucket = int((t - timestamps[0]) / 60)
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+        if len(buckets) < 2:
+            return len(timestamps), 0.5
+        x_values, y_values = list(buckets), list(buckets.values())
+        n = len(x_values)
+        sum_x, sum_y = sum(x_values), sum(y_values)
+        sum_xy = sum(x * y for x, y in zip(x_values, y_values))
+        sum_x2 = sum(x * x for x in x_values)
+        slope = (n * sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x * sum_x)
+        intercept = (sum_y - slope * sum_x) / n
+        predicted = max(0, slope * (max(x_values) + window / 60) + intercept)
+        variance = sum((y - (slope * x + intercept)) ** 2 for x, y in zip(x_values, y_values)) / n
+        return int(predicted), max(0.1, min(0.9, 1.0 / (1.0 + variance)))
+    
+    @staticmethod
+    def reference_exponential_smoothing(timestamps, window):
+        interval_size = max(60, window // 10)
+        intervals = {}
+        for t in timestamps:
+            interval = int((t - timestamps[0]) / interval_size)
+            intervals[interval] = intervals.get(interval, 0) + 1
+        if len(intervals) < 2:
+            return len(timestamps), 0.4
+        values = [intervals.get(i, 0) for i in range(max(intervals) + 1)]
+        smoothed = [values[0]]
+        for value in values[1:]:
+            smoothed.append(0.3 * value + 0.7 * smoothed[-1])
+        avg_error = statistics.mean(abs(v - s) for v, s in zip(values, smoothed))
+        return int(smoothed[-1] * (window / interval_size)), max(0.1, min(0.9, 1.0 / (1.0 + avg_error)))
+    
+    @staticmethod
+    def reference_moving_average(timestamps, window, now):
+        if timestamps[-1] - timestamps[0] < 60:
+            return len(timestamps), 0.4
+        rates = []
+        for w in [300, 600, 1800]:
+            count = len([t for t in timestamps if t >= now - w])
+            if count:
+                rates.append(count / (w / 60))
+        if not rates:
+            return 0, 0.3
+        weights = [3, 2, 1][:len(rates)]
+        weighted_rate = sum(r * w for r, w in zip(rates, weights)) / sum(weights)
+        if len(rates) > 1:
+            confidence = max(0.2, min(0.8, 1.0 / (1.0 + statistics.variance(rates))))
+        else:
+            confidence = 0.5
+        return int(weighted_rate * (window / 60)), confidence
+    
+    @staticmethod
+    def reference_adaptive_threshold(timestamps, window):
+        if len(timestamps) < 5:
+            return 0, 0.3
+        intervals = [b - a for a, b in zip(timestamps, timestamps[1:])]
+        mean_interval = statistics.mean(intervals)
+        std_interval = statistics.stdev(intervals) if len(intervals) > 1 else 0
+        if mean_interval <= 0:
+            return len(timestamps), 0.4
+        adjustment = 1.3 if std_interval > mean_interval else 0.9
+        cv = std_interval / mean_interval
+        return int(window / mean_interval * adjustment), max(0.2, min(0.8, 1.0 / (1.0 + cv)))
+    
+    def reference_predict(self, history, category, window, model):
+        """Per-client scoring as it was: filter the request history, then run the model."""
+        if len(history) < 5:
+            return 0, 0.5
+        timestamps = [t for t, c in history if t >= self.NOW - window * 2 and c == category]
+        if len(timestamps) < 3:
+            return 0, 0.3
+        if model == PredictionModel.LINEAR_REGRESSION:
+            return self.reference_linear_regression(timestamps, window)
+        if model == PredictionModel.MOVING_AVERAGE:
+            return self.reference_moving_average(timestamps, window, self.NOW)
+        if model == PredictionModel.ADAPTIVE_THRESHOLD:
+            return self.reference_adaptive_threshold(timestamps, window)
+        return self.reference_exponential_smoothing(timestamps, window)
+    
+    def recorded_trace(self):
+        """An hour of steady, bursty and sparse clients across three categories."""
+        rng = random.Random(29)
+        trace = []
+        for t in np.arange(self.NOW - 3600, self.NOW, 7.5):
+            trace.append((float(t), 'steady', 'search_api'))
+        for burst_start in range(int(self.NOW) - 3500, int(self.NOW), 420):
+            for _ in range(rng.randint(5, 40)):
+                trace.append((burst_start + rng.uniform(0, 30), 'bursty', rng.choice(self.CATEGORIES)))
+        for _ in range(12):
+            trace.append((self.NOW - rng.uniform(0, 3600), 'sparse', rng.choice(self.CATEGORIES)))
+        trace.sort()
+        return trace
+    
+    def replay(self, trace):
+        limiter = PredictiveRateLimiter()
+        for timestamp, client_id, category in trace:
+            with patch('time.time', return_value=timestamp):
+                limiter.record_request(client_id, category)
+        return limiter
+    
+    def test_ring_sizes_buffer_lazily(self):
+        """A new ring allocates a small buffer and grows only to twice its capacity."""
+        ring = RequestTimeRing(capacity=100)
+        assert ring._buffer.size == RequestTimeRing.INITIAL_SIZE
+        
+        for t in range(RequestTimeRing.INITIAL_SIZE + 1):
+            ring.append(float(t))
+        assert ring._buffer.size == RequestTimeRing.INITIAL_SIZE * 2
+        
+        for t in range(RequestTimeRing.INITIAL_SIZE + 1, 1000):
+            ring.append(float(t))
+        assert ring._buffer.size == 200
+        assert len(ring) == 100
+        assert np.array_equal(ring.values(), np.arange(900, 1000, dtype=np.float64))
+    
+    def test_ring_window_queries(self):
+        """since and count_since agree with filtering the retained timestamps."""
+        ring = RequestTimeRing(capacity=50)
+        timestamps = sorted(random.uniform(0, 1000) for _ in range(237))
+        for t in timestamps:
+            ring.append(t)
+        retained = timestamps[-50:]
+        
+        for start in [-1.0, retained[0], retained[10], 500.0, retained[-1], 1001.0]:
+            expected = [t for t in retained if t >= start]
+            assert ring.since(start).tolist() == expected
+            assert ring.count_since(start) == len(expected)
+    
+    def test_ring_concurrent_appends(self):
+        """Appends from many threads are neither lost nor duplicated."""
+        ring = RequestTimeRing(capacity=40000)
+        threads = [
+            threading.Thread(target=lambda k=k: [ring.append(float(k * 10000 + i)) for i in range(5000)])
+            for k in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        expected = sorted(float(k * 10000 + i) for k in range(8) for i in range(5000))
+        assert len(ring) == 40000
+        assert sorted(ring.values().tolist()) == expected
+    
+    def test_ewma_matches_recurrence(self):
+        """Smoothing equals the step-by-step recurrence exactly (predictions are truncated)."""
+        for size in [1, 2, 5, 21]:
+            values = np.array([random.randint(0, 50) for _ in range(size)], dtype=np.float64)
+            expected = [values[0]]
+            for value in values[1:]:
+                expected.append(0.3 * value + 0.7 * expected[-1])
+            assert PredictiveRateLimiter._ewma(values, 0.3).tolist() == expected, values
+    
+    def test_models_match_reference_on_recorded_trace(self):
+        """Each vectorized model returns what the per-request models returned on the same trace."""
+        trace = self.recorded_trace()
+        limiter = self.replay(trace)
+        
+        checked = 0
+        for client_id in ['steady', 'bursty', 'sparse']:
+            history = [(t, c) for t, cid, c in trace if cid == client_id]
+            profile = limiter.client_profiles[client_id]
+            for category in self.CATEGORIES:
+                for window in [60, 300, 900, 1800]:
+                    for model in [PredictionModel.LINEAR_REGRESSION, PredictionModel.EXPONENTIAL_SMOOTHING,
+                                  PredictionModel.MOVING_AVERAGE, PredictionModel.ADAPTIVE_THRESHOLD]:
+                        predicted, confidence = limiter._predict_for_profile(
+                            profile, category, window, model, self.NOW
+                        )
+                        expected_predicted, expected_confidence = self.reference_predict(
+                            history, category, window, model
+                        )
+                        assert predicted == expected_predicted, (client_id, category, window, model)
+                        assert confidence == pytest.approx(expected_confidence, rel=1e-9), \
+                            (client_id, category, window, model)
+                        checked += 1
+        assert checked == 3 * 3 * 4 * 4
+    
+    def test_predict_all_clients_matches_per_client_scoring(self):
+        """One pass over every profile gives the per-client predictions for each category."""
+        limiter = self.replay(self.recorded_trace())
+        
+        with patch('time.time', return_value=self.NOW):
+            all_predictions = limiter.predict_all_clients()
+            only_search = limiter.predict_all_clients('search_api')
+            
+            assert set(all_predictions) == {'steady', 'bursty', 'sparse'}
+            assert set(all_predictions['steady']) == {'search_api'}
+            assert set(only_search) == {'steady', 'bursty', 'sparse'}
+            for client_id, categories in all_predictions.items():
+                for category, prediction in categories.items():
+                    limit_config = limiter._get_limit_config(client_id, category)
+                    expected = limiter.predict_future_requests(
+                        client_id, category, limit_config.prediction_window, limit_config.model
+                    )
+                    assert (prediction['predicted_requests'], prediction['confidence']) == expected
+                    assert prediction['model'] == limit_config.model.value
+                    assert prediction['prediction_window'] == limit_config.prediction_window
+                    if category == 'search_api':
+                        assert only_search[client_id]['search_api'] == prediction
+
+
 if __name__ == '__main__':
     pytest.main(['-v', '--tb=short', __file__])
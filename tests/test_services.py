@@ -429,3 +429,512 @@ class TestGeospatialService:
         # Invalid coordinates
         assert geo_service.validate_coordinates(200, -300) is False
         assert geo_service.validate_coordinates('invalid', 'coords') is False
+
+
+class TestLocationResolver:
+    """Test cases for the city/property type lookup resolver."""
+    
+    @pytest.fixture
+    def location_app(self, app_factory):
+        """Testing application with the lookup tables."""
+        from app import db
+        from app.services.location_resolver import location_resolver
+        
+        app_factory()
+        location_resolver.clear_cache()
+        yield db, location_resolver
+        location_resolver.clear_cache()
+    
+    def test_backfill_and_resolved_filters(self, location_app):
+        """Backfilled ids answer substring, accent and alias filters like ILIKE did."""
+        from app.models.property import Property, City
+        db, resolver = location_app
+        
+        # Rows loaded without ids (e.g. before the lookup tables existed)
+        db.session.execute(Property.__table__.insert(), [
+            {'listing_id': 'A', 'city': 'Toronto', 'province': 'ON', 'property_type': 'House'},
+            {'listing_id': 'B', 'city': 'East Toronto', 'province': 'ON', 'property_type': 'Townhouse'},
+            {'listing_id': 'C', 'city': 'Montréal', 'province': 'QC', 'property_type': 'Condo'},
+            {'listing_id': 'D', 'city': 'Windsor', 'province': 'ON', 'property_type': 'Condo'},
+            {'listing_id': 'E', 'city': 'Windsor', 'province': 'NS', 'property_type': 'House'},
+        ])
+        db.session.commit()
+        assert resolver.resolve('city', 'toronto') is None
+        
+        results = resolver.rebuild()
+        assert results['cities'] == 5
+        assert results['properties_updated'] == 10
+        assert resolver.rebuild()['properties_updated'] == 0
+        
+        def ids(city=None, property_type=None):
+            return sorted(p.listing_id for p in Property.get_filtered(city=city, property_type=property_type))
+        
+        assert ids(city='toronto') == ['A', 'B']
+        assert ids(city='montreal') == ['C']
+        assert ids(city='Windsor') == ['D', 'E']
+        assert ids(city='Torntoo') == ['A']  # Fuzzy match
+        assert ids(property_type='house') == ['A', 'B', 'E']
+        assert ids(property_type='apartment') == ['C', 'D']  # Alias
+        assert ids(city='windsor', property_type='condo') == ['D']
+        
+        clause = resolver.city_clause('montreal')
+        assert clause.left.key == 'city_id'
+        
+        # ORM writes keep ids in sync
+        db.session.add(Property(listing_id='F', city='Ottawa', province='ON', property_type='Condo'))
+        db.session.get(Property, 'A').city = 'Ottawa'
+        db.session.commit()
+        resolver.clear_cache()
+        assert ids(city='ottawa') == ['A', 'F']
+        assert City.query.filter_by(name_key='ottawa').count() == 1
+    
+    def test_etl_records_get_ids(self, location_app):
+        """DataMapper resolves ids while mapping CSV records."""
+        from app.services.data_processors import DataMapper
+        db, resolver = location_app
+        
+        record = DataMapper().map_csv_to_property({
+            'ListingID': 'X1', 'City': 'Québec', 'Province': 'QC', 'PropertyType': 'Condo'
+        })
+        again = DataMapper().map_csv_to_property({
+            'ListingID': 'X2', 'City': 'quebec', 'Province': 'QC', 'PropertyType': 'condo'
+        })
+        
+        assert record['city_id'] is not None
+        assert record['city_id'] == again['city_id']
+        assert record['property_type_id'] == again['property_type_id']
+    
+    def test_id_errors_are_not_swallowed(self, location_app):
+        """A failing lookup insert fails the flush; ETL records are counted as pending."""
+        from sqlalchemy.exc import OperationalError
+        from app.models.property import Property
+        from app.services.data_processors import DataMapper
+        db, resolver = location_app
+        resolver.rebuild()
+        
+        error = OperationalError('INSERT INTO cities', {}, Exception('current transaction is aborted'))
+        with patch.object(resolver, '_fetch_or_insert', side_effect=error):
+            db.session.add(Property(listing_id='P1', city='Halifax', province='NS'))
+            with pytest.raises(OperationalError):
+                db.session.commit()
+            db.session.rollback()
+            assert db.session.get(Property, 'P1') is None
+            
+            failures = resolver.get_status()['assign_failures']
+            record = DataMapper().map_csv_to_property({'ListingID': 'P2', 'City': 'Halifax', 'Province': 'NS'})
+        assert 'city_id' not in record
+        
+        db.session.execute(Property.__table__.insert(), [record])
+        db.session.commit()
+        resolver.clear_cache()
+        status = resolver.get_status()
+        assert status['assign_failures'] == failures + 1
+        assert status['city'] == {'ready': False, 'pending': 1}
+        assert status['property_type'] == {'ready': False, 'pending': 0}
+
+
+class TestHomepageSnapshot:
+    """Test cases for the precomputed homepage snapshot."""
+    
+    @pytest.fixture
+    def snapshot_app(self, app_factory):
+        """Testing application with a local cache."""
+        from app import db
+        
+        app_factory(HOMEPAGE_SNAPSHOT_INTERVAL=60)
+        yield db
+    
+    def test_snapshot_is_plain_versioned_data(self, snapshot_app, far_from_utc):
+        """Snapshots hold plain data and are served from the cache without queries."""
+        import pickle
+        from sqlalchemy import event
+        from app.models.property import Property
+        from app.services.homepage_snapshot import homepage_snapshot
+        db = snapshot_app
+        
+        db.session.add_all([
+            Property(listing_id='H1', city='Toronto', sold_price=Decimal('900000'), sqft=1200, bedrooms=3),
+            Property(listing_id='H2', city='Toronto', sold_price=Decimal('700000'), ai_valuation=Decimal('750000')),
+            Property(listing_id='H3', city='Ottawa', sold_price=Decimal('500000')),
+        ])
+        db.session.commit()
+        
+        snapshot = homepage_snapshot.refresh()
+        assert snapshot['version'] > 0
+        assert snapshot['market_stats'] == {
+            'total_properties': 3, 'avg_price': 700000.0, 'cities_covered': 2, 'ai_analyzed': 1
+        }
+        assert snapshot['top_cities'][0] == {'city': 'Toronto', 'count': 2, 'avg_price': 800000.0}
+        assert [card['listing_id'] for card in snapshot['featured_properties']] == ['H1', 'H2', 'H3']
+        assert snapshot['featured_properties'][0]['images'] == []
+        pickle.dumps(snapshot)
+        
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            context = homepage_snapshot.template_context(homepage_snapshot.get())
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        assert statements == []
+        assert context['market_stats']['total_properties'] == 3
+        
+        status = homepage_snapshot.get_status()
+        assert status['version'] == snapshot['version']
+        assert 0 <= status['age_seconds'] < 60
+        assert status['stale'] is False
+    
+    def test_refresh_if_due_rebuilds_once(self, snapshot_app):
+        """A fresh snapshot or a held build lock skips the rebuild."""
+        from app.extensions import cache
+        from app.services.homepage_snapshot import homepage_snapshot
+        
+        cache.delete(homepage_snapshot.CACHE_KEY)
+        cache.set(homepage_snapshot.BUILD_LOCK_KEY, 1)
+        assert homepage_snapshot.refresh_if_due() is None
+        
+        cache.delete(homepage_snapshot.BUILD_LOCK_KEY)
+        snapshot = homepage_snapshot.refresh_if_due()
+        assert snapshot is not None
+        assert homepage_snapshot.refresh_if_due() is None
+        assert homepage_snapshot.get()['version'] == snapshot['version']
+        assert cache.get(homepage_snapshot.BUILD_LOCK_KEY) is None
+    
+    def test_refresh_keeps_a_newer_builders_lock(self, snapshot_app):
+        """A build that outlives its lock does not release the next builder's lock."""
+        from app.extensions import cache
+        from app.services.homepage_snapshot import homepage_snapshot
+        
+        cache.delete(homepage_snapshot.CACHE_KEY)
+        build = homepage_snapshot.build
+        
+        def slow_build():
+            # Our lock expired mid-build and another worker took over
+            cache.set(homepage_snapshot.BUILD_LOCK_KEY, 'other-worker')
+            return build()
+        
+        with patch.object(homepage_snapshot, 'build', side_effect=slow_build):
+            assert homepage_snapshot.refresh_if_due() is not None
+        assert cache.get(homepage_snapshot.BUILD_LOCK_KEY) == 'other-worker'
+    
+    def test_schedulers_start_only_in_serving_processes(self, snapshot_app):
+        """create_app for CLI commands and scripts starts no rebuild threads."""
+        from app import create_app
+        from app.services.homepage_snapshot import homepage_snapshot
+        
+        with patch.object(homepage_snapshot, 'start_scheduler') as start_scheduler:
+            create_app('testing', overrides={'HOMEPAGE_SNAPSHOT_INTERVAL': 60})
+            assert not start_scheduler.called
+            serving = create_app('testing', overrides={'HOMEPAGE_SNAPSHOT_INTERVAL': 60, 'START_SCHEDULERS': True})
+        start_scheduler.assert_called_once_with(serving)
+    
+    def test_cold_homepage_waits_for_the_builder(self, snapshot_app):
+        """A request with no snapshot does not build one while another worker holds the lock."""
+        from flask import current_app
+        from app.extensions import cache
+        from app.services.homepage_snapshot import homepage_snapshot
+        
+        cache.delete(homepage_snapshot.CACHE_KEY)
+        cache.set(homepage_snapshot.BUILD_LOCK_KEY, 'other-worker')
+        built = homepage_snapshot.build()
+        
+        def other_worker_publishes(seconds):
+            cache.set(homepage_snapshot.CACHE_KEY, built)
+        
+        with patch.object(homepage_snapshot, 'build') as build, \
+                patch('app.services.versioned_snapshot.time.sleep', side_effect=other_worker_publishes):
+            response = current_app.test_client().get('/')
+        assert response.status_code == 200
+        assert not build.called
+        assert b'Error loading data' not in response.data
+        assert cache.get(homepage_snapshot.CACHE_KEY)['version'] == built['version']
+        
+        # Nothing held: the request builds it through the lock
+        cache.delete(homepage_snapshot.CACHE_KEY)
+        cache.delete(homepage_snapshot.BUILD_LOCK_KEY)
+        assert homepage_snapshot.refresh_cold()['version'] > 0
+        assert cache.get(homepage_snapshot.BUILD_LOCK_KEY) is None
+
+
+class TestMarketCube:
+    """Test cases for the weekly market aggregate cube."""
+    
+    @pytest.fixture
+    def cube_app(self, app_factory):
+        """Testing application with sales in two cities."""
+        from datetime import date, timedelta
+        from app import db
+        from app.models.property import Property
+        from app.services.location_resolver import location_resolver
+        from app.services.market_cube import market_cube
+        
+        app_factory()
+        today = date.today()
+        db.session.execute(Property.__table__.insert(), [
+            {
+                'listing_id': f'MC{i:04d}', 'province': 'ON',
+                'city': 'Toronto' if i % 2 else 'Ottawa',
+                'property_type': 'Condo' if i % 3 else 'House',
+                # Toronto prices rise with recency, Ottawa prices are flat
+                'sold_price': (900000 - i * 800) if i % 2 else 500000 + (i % 7) * 1000,
+                'sold_date': today - timedelta(days=i)
+            }
+            for i in range(300)
+        ])
+        db.session.commit()
+        location_resolver.clear_cache()
+        location_resolver.rebuild()
+        market_cube.clear_cache()
+        yield db, market_cube
+        location_resolver.clear_cache()
+        market_cube.clear_cache()
+    
+    def test_cube_matches_property_queries(self, cube_app):
+        """Trends and aggregates agree with the per-call property queries."""
+        import numpy as np
+        from app.models.property import Property
+        from app.services.location_resolver import location_resolver as resolver
+        from app.services.market_cube import summarize
+        db, cube = cube_app
+        service = MLService()
+        
+        # Not built yet: callers fall back to querying properties
+        assert cube.weekly_series('toronto') is None
+        queried = {city: service._get_market_trend(city, None) for city in ('Toronto', 'Ottawa')}
+        assert queried == {'Toronto': 'Rising', 'Ottawa': 'Stable'}
+        
+        assert cube.rebuild()['sales'] == 300
+        assert {city: service._get_market_trend(city, None) for city in ('Toronto', 'Ottawa')} == queried
+        
+        prices = [float(p.sold_price) for p in Property.query.filter(
+            resolver.city_clause('toronto'), resolver.property_type_clause('condo'))]
+        count, mean, std = summarize(cube.weekly_series('toronto', 'condo'))
+        assert count == len(prices)
+        assert mean == pytest.approx(np.mean(prices))
+        assert std == pytest.approx(np.std(prices))
+        
+        predictions = service.get_market_predictions(city='Toronto')
+        assert predictions['trend'] == 'Rising'
+        assert predictions['sample_size'] >= 100
+        assert predictions['price_std'] > 0
+    
+    def test_etl_upserts_update_cube(self, cube_app):
+        """ETL batches apply their changes incrementally and need no queries to read."""
+        from datetime import date
+        from sqlalchemy import event
+        from app.models.property import MarketAggregate, Property
+        from app.services.etl_service import ETLService
+        db, cube = cube_app
+        cube.rebuild()
+        service = MLService()
+        service._get_market_trend('Toronto', 'Condo')
+        
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            for _ in range(200):
+                service._get_market_trend('Toronto', 'Condo')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert statements == []
+        
+        existing = db.session.get(Property, 'MC0001')
+        city_id, property_type_id = existing.city_id, existing.property_type_id
+        
+        # The new version is published after the batch commits, not inside it
+        log = []
+        event.listen(db.engine, 'commit', lambda conn: log.append('commit'))
+        bump_version = cube._bump_version
+        with patch.object(cube, '_bump_version', side_effect=lambda: log.append('bump') or bump_version()):
+            result = ETLService()._load_batch_to_database([
+                # Price change, a new sale and an unsold listing
+                {'listing_id': 'MC0001', 'city': 'Toronto', 'sold_price': 1000000.0,
+                 'sold_date': existing.sold_date, 'city_id': city_id, 'property_type_id': property_type_id},
+                {'listing_id': 'NEW001', 'city': 'Toronto', 'sold_price': 750000.0,
+                 'sold_date': date.today(), 'city_id': city_id, 'property_type_id': property_type_id},
+                {'listing_id': 'NEW002', 'city': 'Toronto', 'sold_price': None,
+                 'sold_date': None, 'city_id': city_id, 'property_type_id': property_type_id},
+            ], Property)
+        assert result['error_count'] == 0
+        assert log[-2:] == ['commit', 'bump'] and log.count('bump') == 1
+        
+        def cells():
+            return sorted(
+                (row.city_id, row.property_type_id, row.week_start, row.sales_count,
+                 round(row.price_sum, 2), round(row.price_sum_sq / 1e6, 2))
+                for row in MarketAggregate.query.all()
+            )
+        
+        incremental = cells()
+        db.session.expire_all()
+        cube.rebuild()
+        assert cells() == incremental
+        assert sum(cell[3] for cell in incremental) == 301
+    
+    def test_concurrent_batches_creating_the_same_cell(self, cube_app):
+        """A cell created by another batch mid-write is added to, not a unique-key failure."""
+        from datetime import date
+        from sqlalchemy import event
+        from sqlalchemy.dialects import mysql
+        from app.models.property import MarketAggregate
+        from app.services.market_cube import week_start
+        db, cube = cube_app
+        cube.rebuild()
+        week = week_start(date(2001, 1, 3))
+        
+        def other_batch(conn, cursor, statement, parameters, context, executemany):
+            # The other batch's INSERT lands just before this batch writes the cell
+            if statement.startswith('INSERT INTO market_aggregates') and not raced:
+                raced.append(True)
+                cursor.connection.execute(
+                    'INSERT INTO market_aggregates (city_id, property_type_id, week_start, '
+                    'sales_count, price_sum, price_sum_sq) VALUES (7, 3, ?, 1, 400000.0, 1.6e11)',
+                    (week.isoformat(),)
+                )
+        
+        raced = []
+        event.listen(db.engine, 'before_cursor_execute', other_batch)
+        try:
+            with db.engine.begin() as conn:
+                changed = cube.apply_changes(conn, [], [
+                    ('NEW1', 7, 3, date(2001, 1, 3), 600000.0),
+                    ('NEW2', 7, 3, date(2001, 1, 4), 500000.0),
+                ])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', other_batch)
+        
+        assert raced and changed == 1
+        cell = MarketAggregate.query.filter_by(city_id=7, property_type_id=3, week_start=week).one()
+        assert cell.sales_count == 3
+        assert cell.price_sum == 1500000.0
+        assert cell.price_sum_sq == 1.6e11 + 3.6e11 + 2.5e11
+        
+        # Sums of squared prices need double precision (DOUBLE on MySQL, not 4-byte FLOAT)
+        for column in ('price_sum', 'price_sum_sq'):
+            column_type = MarketAggregate.__table__.c[column].type
+            assert column_type.compile(dialect=mysql.dialect()) == 'FLOAT(53)'
+
+
+class TestEconomicSnapshot:
+    """Test cases for the shared economic snapshot."""
+    
+    @pytest.fixture
+    def economic_app(self, app_factory, tmp_path):
+        """Testing application with recent economic data."""
+        from datetime import date
+        from app import db
+        from app.models.economic_data import EconomicData
+        from app.services.economic_snapshot import economic_snapshot
+        from app.services.economic_timeseries import economic_timeseries
+        
+        app_factory(ECONOMIC_TIMESERIES_PATH=str(tmp_path))
+        db.session.add_all([
+            EconomicData(indicator_name='Policy Rate', indicator_code='V39079', source='BOC',
+                         date=date.today(), value=2.25),
+            EconomicData(indicator_name='Five Year Mortgage', indicator_code='V80691335',
+                         source='BOC', date=date.today(), value=4.9),
+        ])
+        db.session.commit()
+        economic_snapshot.clear()
+        economic_timeseries.clear_cache()
+        with patch('app.services.external_apis.ExternalAPIsService.get_current_interest_rates',
+                   return_value={'overnight_rate': 2.25}):
+            yield db, economic_snapshot
+        economic_snapshot.clear()
+        economic_timeseries.clear_cache()
+    
+    def test_indicators_served_without_queries(self, economic_app):
+        """Indicators are built once and then read with no database queries."""
+        from sqlalchemy import event
+        db, snapshot = economic_app
+        service = MLService()
+        
+        indicators = service._get_economic_indicators()
+        assert indicators['policy_rate'] == 2.25
+        assert indicators['mortgage_5yr'] == 4.9
+        assert indicators['interest_rate_environment'] == 0.25
+        assert snapshot.summary().bank_rate == 2.25
+        assert snapshot.interest_rates() == {'overnight_rate': 2.25}
+        
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            for _ in range(100):
+                assert MLService()._get_economic_indicators() == indicators
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert statements == []
+        
+        # Callers get copies; the snapshot itself is read-only
+        indicators['policy_rate'] = 99
+        assert service._get_economic_indicators()['policy_rate'] == 2.25
+        with pytest.raises(TypeError):
+            snapshot.get()['indicators']['policy_rate'] = 99
+    
+    def test_status_age_ignores_host_timezone(self, economic_app, far_from_utc):
+        """Version and age come from the same clock, whatever the local timezone."""
+        db, snapshot = economic_app
+        snapshot.refresh()
+        
+        status = snapshot.get_status()
+        assert 0 <= status['age_seconds'] < 60
+        assert status['stale'] is False
+        assert snapshot.refresh_if_due() is None
+    
+    def test_new_version_reaches_other_workers(self, economic_app):
+        """A rebuilt snapshot is picked up through the shared version key."""
+        from datetime import date
+        from app.models.economic_data import EconomicData
+        from app.services.economic_timeseries import economic_timeseries
+        db, snapshot = economic_app
+        first = snapshot.get()
+        
+        # Another worker refreshes after new data arrives
+        from app.services.economic_snapshot import EconomicSnapshotService
+        other_worker = EconomicSnapshotService()
+        db.session.query(EconomicData).filter_by(value=4.9).delete()
+        db.session.add(EconomicData(indicator_name='Five Year Mortgage', indicator_code='V80691335',
+                                    source='BOC', date=date.today(), value=5.4, frequency='daily'))
+        db.session.commit()
+        economic_timeseries.build(['V80691335'])
+        rebuilt = other_worker.refresh()
+        assert rebuilt['version'] > first['version']
+        
+        # Served from the local copy until the next version check
+        assert snapshot.indicators()['mortgage_5yr'] == 4.9
+        snapshot._local = (snapshot._local[0], snapshot._local[1], 0)
+        assert snapshot.indicators()['mortgage_5yr'] == 5.4
+    
+    def test_cold_workers_build_once(self, economic_app):
+        """Workers without a snapshot wait for the lock holder's build instead of each building."""
+        from app.extensions import cache
+        from app.services.economic_snapshot import EconomicSnapshotService
+        from app.services.versioned_snapshot import VersionedSnapshotService
+        db, snapshot = economic_app
+        
+        with pytest.raises(TypeError):
+            VersionedSnapshotService()
+        
+        builder, waiting = EconomicSnapshotService(), EconomicSnapshotService()
+        cache.set(snapshot.BUILD_LOCK_KEY, 'builder')
+        
+        def builder_publishes(seconds):
+            cache.delete(snapshot.BUILD_LOCK_KEY)
+            builder.refresh()
+        
+        with patch.object(waiting, 'build') as build, \
+                patch('app.services.versioned_snapshot.time.sleep', side_effect=builder_publishes):
+            assert waiting.indicators()['policy_rate'] == 2.25
+        assert not build.called
+        assert waiting.get()['version'] == builder.get()['version']
+        
+        # A builder that never finishes: serve an unpublished copy
+        cache.clear()
+        cache.set(snapshot.BUILD_LOCK_KEY, 'stuck')
+        stranded = EconomicSnapshotService()
+        with patch.object(stranded, 'COLD_WAIT_SECONDS', 0):
+            assert stranded.indicators()['policy_rate'] == 2.25
+        assert cache.get(snapshot.CACHE_KEY) is None
@@ -0,0 +1,9 @@
+"""
+WSGI entry point for serving processes: ``gunicorn wsgi:app``.
+
+``app.py`` is also what ``flask`` CLI commands load, so only this entry point
+(and ``python app.py``) starts the background snapshot schedulers.
+"""
+from app import create_app
+
+app = create_app(overrides={'START_SCHEDULERS': True})